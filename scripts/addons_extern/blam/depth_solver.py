@@ -0,0 +1,270 @@
+'''
+blam - Blender Camera Calibration Tools
+Copyright (C) 2012  Per Gantelius
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see http://www.gnu.org/licenses/
+'''
+
+'''
+NumPy backend of the 3D reconstruction. Computes the depth information of
+all quads at once, assembles the depth factor least squares system as a
+sparse matrix and solves it with SciPy when available, with dense NumPy
+normal equations otherwise.
+'''
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import scipy.sparse
+    import scipy.sparse.linalg
+except ImportError:
+    scipy = None
+
+
+def solveCubics(a, b, c, d):
+    '''
+    the three roots of each cubic a x^3 + b x^2 + c x + d, as solveCubic
+    computes them. the first root is always real, the other two are real
+    where realMask is set.
+    '''
+    a, b, c = b / a, c / a, d / a
+    t = a / 3.0
+    p, q = b - 3 * t**2, c - b * t + 2 * t**3
+
+    #u, v are the roots of x^2 + q x - (p/3)^3
+    r = (q / 2.0)**2 + (p / 3.0)**3
+    complexU = r < 0
+    s = np.sqrt(np.abs(r))
+    u = np.where(complexU, 0.0, s - q / 2.0)
+    v = np.where(complexU, 0.0, -s - q / 2.0)
+    y1 = np.cbrt(u) + np.cbrt(v)
+    #complex cubic root
+    radius = np.hypot(-q / 2.0, s)
+    angle = np.arctan2(s, -q / 2.0)
+    y1 = np.where(complexU, 2 * np.cbrt(radius) * np.cos(angle / 3.0), y1)
+
+    #y2, y3 are the roots of x^2 + y1 x + p + y1^2
+    r2 = (y1 / 2.0)**2 - (p + y1**2)
+    realMask = r2 >= 0
+    s2 = np.sqrt(np.abs(r2))
+    roots = np.stack((y1, s2 - y1 / 2.0, -s2 - y1 / 2.0), axis=-1) - t[..., None]
+    return roots, realMask
+
+
+def quadErrors(pA, pB, pC, pD):
+    '''mean absolute orthogonality error of the quad corners (eq 17)'''
+    def eq17(origin, p1, p2):
+        return np.einsum('...i,...i->...', origin - p1, origin - p2)
+    return 0.25 * (np.abs(eq17(pA, pB, pD)) + np.abs(eq17(pB, pA, pC)) +
+                   np.abs(eq17(pC, pB, pD)) + np.abs(eq17(pD, pA, pC)))
+
+
+def quadDepths(qHats):
+    '''
+    computeQuadDepthInformation for all quads: qHats are the normalized
+    camera space directions of the quad corners, shape (n, 4, 3). returns
+    the corner positions in camera space and a mask of the quads for
+    which a positive real root was found.
+    '''
+    qHats = np.asarray(qHats, dtype=np.float64)
+    qHatA, qHatB, qHatC, qHatD = [qHats[:, i] for i in range(4)]
+
+    def dot(x, y):
+        return np.einsum('ij,ij->i', x, y)
+
+    Qab = dot(qHatA, qHatB)
+    Qac = dot(qHatA, qHatC)
+    Qad = dot(qHatA, qHatD)
+    Qbc = dot(qHatB, qHatC)
+    Qbd = dot(qHatB, qHatD)
+    Qcd = dot(qHatC, qHatD)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #coefficients of equations (27) and (28)
+        C4 = Qad * Qbc * Qbd - Qac * Qbd ** 2
+        C3 = Qab * Qad * Qbd * Qcd - Qad ** 2 * Qcd + Qac * Qad * Qbd ** 2 - Qad ** 2 * Qbc * Qbd - Qbc * Qbd + 2 * Qab * Qac * Qbd - Qab * Qad * Qbc
+        C2 = -Qab * Qbd * Qcd - Qab ** 2 * Qad * Qcd + 2 * Qad * Qcd + Qad * Qbc * Qbd - 3 * Qab * Qac * Qad * Qbd + Qab * Qad ** 2 * Qbc + Qab * Qbc + Qac * Qad ** 2 - Qab ** 2 * Qac
+        C1 = Qab ** 2 * Qcd - Qcd + Qab * Qac * Qbd - Qab * Qad * Qbc + 2 * Qab ** 2 * Qac * Qad - 2 * Qac * Qad
+        C0 = Qac - Qab ** 2 * Qac
+
+        B4 = Qbd - Qbd * Qcd ** 2
+        B3 = 2 * Qad * Qbd * Qcd ** 2 + Qab * Qcd ** 2 + Qac * Qbd * Qcd - Qad * Qbc * Qcd - 2 * Qad * Qbd - Qab
+        B2 = - Qbd * Qcd ** 2 - Qab * Qad * Qcd ** 2 - 3 * Qac * Qad * Qbd * Qcd + Qad ** 2 * Qbc * Qcd + Qbc * Qcd - Qab * Qac * Qcd + Qad ** 2 * Qbd + Qac * Qad * Qbc + 2 * Qab * Qad
+        B1 = 2 * Qac * Qbd * Qcd - Qad * Qbc * Qcd + Qab * Qac * Qad * Qcd + Qac ** 2 * Qad * Qbd - Qac * Qad ** 2 * Qbc - Qac * Qbc - Qab * Qad ** 2
+        B0 = Qac * Qad * Qbc - Qac ** 2 * Qbd
+
+        #coefficients of equation (29), solved for lambdaD
+        ratio = C4 / B4
+        roots, realMask = solveCubics(ratio * B3 - C3, ratio * B2 - C2,
+                                      ratio * B1 - C1, ratio * B0 - C0)
+
+        #depths and orthogonality error for each root, lambdaA = 1
+        lambdaD = roots
+        lambdaB = (Qad[:, None] * lambdaD - 1.0) / (Qbd[:, None] * lambdaD - Qab[:, None])
+        lambdaC = (Qad[:, None] * lambdaD - lambdaD * lambdaD) / (Qac[:, None] - Qcd[:, None] * lambdaD)
+        errors = quadErrors(qHatA[:, None], lambdaB[..., None] * qHatB[:, None],
+                            lambdaC[..., None] * qHatC[:, None], lambdaD[..., None] * qHatD[:, None])
+
+    #the positive real root with the least error, the first of equal ones
+    valid = (roots > 0) & ~np.isnan(errors)
+    valid[:, 1:] &= realMask[:, None]
+    errors = np.where(valid, errors, np.inf)
+    chosen = np.argmin(errors, axis=1)
+    found = valid.any(axis=1)
+
+    rows = np.arange(len(qHats))
+    lambdas = np.stack((np.ones(len(qHats)), lambdaB[rows, chosen],
+                        lambdaC[rows, chosen], lambdaD[rows, chosen]), axis=1)
+    points = qHats * lambdas[..., None]
+    return points, found
+
+
+def sharedQuadEdges(faceVerts):
+    '''
+    the edges shared by two quads: the edge vertices (E, 2) and the two
+    faces (E, 2), the lower face index first
+    '''
+    faceVerts = np.asarray(faceVerts, dtype=np.int64)
+    n = len(faceVerts)
+    v0 = faceVerts.ravel()
+    v1 = np.roll(faceVerts, -1, axis=1).ravel()
+    edges = np.stack((np.minimum(v0, v1), np.maximum(v0, v1)), axis=1)
+    faces = np.repeat(np.arange(n), 4)
+
+    order = np.lexsort((faces, edges[:, 1], edges[:, 0]))
+    edges = edges[order]
+    faces = faces[order]
+    uniqueEdges, starts, counts = np.unique(edges, axis=0, return_index=True, return_counts=True)
+    if np.any(counts > 2):
+        raise ValueError("an edge can be shared by at most two faces")
+    shared = starts[counts == 2]
+    return uniqueEdges[counts == 2], np.stack((faces[shared], faces[shared + 1]), axis=1)
+
+
+def facesConnected(faceVerts):
+    '''True if all faces are connected through shared edges'''
+    n = len(faceVerts)
+    if n <= 1:
+        return True
+    edges, pairs = sharedQuadEdges(faceVerts)
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[pairs[:, 0]], labels[pairs[:, 1]])
+        new = labels.copy()
+        np.minimum.at(new, pairs[:, 0], low)
+        np.minimum.at(new, pairs[:, 1], low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    return bool(np.all(labels == 0))
+
+
+def cornerDepths(points, faceVerts, faces, verts):
+    '''the depth (camera space z) of vertex verts[i] in face faces[i]'''
+    corner = np.argmax(np.asarray(faceVerts)[faces] == verts[:, None], axis=1)
+    return points[faces, corner, 2], corner
+
+
+def depthFactors(points, faceVerts):
+    '''
+    least squares depth factors of the faces, the first one being 1, that
+    make the depths of the vertices of shared edges agree between the two
+    faces: lambda0 * k0 - lambda1 * k1 = 0 for each edge vertex
+    '''
+    n = len(points)
+    if n == 1:
+        return np.ones(1)
+    edges, pairs = sharedQuadEdges(faceVerts)
+    f0 = np.repeat(pairs[:, 0], 2)
+    f1 = np.repeat(pairs[:, 1], 2)
+    verts = edges.ravel()
+    lambda0, corner0 = cornerDepths(points, faceVerts, f0, verts)
+    lambda1, corner1 = cornerDepths(points, faceVerts, f1, verts)
+
+    if n == 2:
+        #as the special case of the list solver, the mean of the two ratios
+        return np.array([1.0, 0.5 * (lambda0[0] / lambda1[0] + lambda0[1] / lambda1[1])])
+
+    #columns are faces 1..n-1, face 0 goes to the right hand side
+    rowIdx = np.arange(len(verts))
+    rows = np.concatenate((rowIdx, rowIdx))
+    cols = np.concatenate((f0, f1)) - 1
+    values = np.concatenate((lambda0, -lambda1))
+    first = cols < 0
+    rhs = np.zeros(len(verts))
+    np.add.at(rhs, rows[first], -values[first])
+    rows, cols, values = rows[~first], cols[~first], values[~first]
+
+    if scipy is not None:
+        A = scipy.sparse.csr_matrix((values, (rows, cols)), shape=(len(verts), n - 1))
+        normal = (A.T @ A).tocsc()
+        factors = scipy.sparse.linalg.spsolve(normal, A.T @ rhs)
+    else:
+        A = np.zeros((len(verts), n - 1))
+        np.add.at(A, (rows, cols), values)
+        factors = np.linalg.lstsq(A, rhs, rcond=None)[0]
+
+    return np.concatenate(([1.0], factors))
+
+
+def mergeSharedCorners(verts, faceVerts):
+    '''
+    move the output vertices (4 per face) of each input vertex on a shared
+    edge to their mean, only the corners whose face shares an edge there
+    '''
+    faceVerts = np.asarray(faceVerts, dtype=np.int64)
+    edges, pairs = sharedQuadEdges(faceVerts)
+    if len(edges) == 0:
+        return verts
+    f = np.repeat(pairs.ravel(), 2)
+    v = np.repeat(edges, 2, axis=0).ravel()
+    corner = np.argmax(faceVerts[f] == v[:, None], axis=1)
+    outIdx = np.unique(4 * f + corner)
+    original = faceVerts.ravel()[outIdx]
+
+    groups, inverse = np.unique(original, return_inverse=True)
+    inverse = inverse.ravel()
+    sums = np.zeros((len(groups), 3))
+    np.add.at(sums, inverse, verts[outIdx])
+    counts = np.bincount(inverse)
+    verts = verts.copy()
+    verts[outIdx] = (sums / counts[:, None])[inverse]
+    return verts
+
+
+def reconstruct(cameraSpacePoints, faceVerts, mergeVertices=True):
+    '''
+    the reconstructed output vertices, 4 per quad in camera space, from
+    the camera space positions of the input vertices and the vertex
+    indices of the quads. returns None for the vertices if some quad has
+    no appropriate root.
+    '''
+    cameraSpacePoints = np.asarray(cameraSpacePoints, dtype=np.float64).reshape(-1, 3)
+    faceVerts = np.asarray(faceVerts, dtype=np.int64).reshape(-1, 4)
+    corners = cameraSpacePoints[faceVerts]
+    qHats = corners / np.linalg.norm(corners, axis=2, keepdims=True)
+
+    points, found = quadDepths(qHats)
+    if not found.all():
+        return None, found
+
+    factors = depthFactors(points, faceVerts)
+    verts = (points * factors[:, None, None]).reshape(-1, 3)
+    if mergeVertices:
+        verts = mergeSharedCorners(verts, faceVerts)
+    return verts, found
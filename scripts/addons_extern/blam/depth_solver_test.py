@@ -0,0 +1,151 @@
+'''
+blam - Blender Camera Calibration Tools
+Copyright (C) 2012  Per Gantelius
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see http://www.gnu.org/licenses/
+'''
+
+'''
+Tests of depth_solver against the list based solver of the addon, run from
+this directory with:
+    python depth_solver_test.py
+'''
+import unittest
+
+import numpy as np
+
+import depth_solver
+from depth_solver import (depthFactors, facesConnected, quadDepths,
+                          quadErrors, reconstruct, sharedQuadEdges)
+from linalg import Mat, dot, normalize, solveCubic
+
+
+def gridOfRectangles(nx, ny, seed=0):
+    '''
+    a grid of rectangles on a plane in front of the camera (looking down
+    -z), as camera space points randomly moved along their line of sight
+    '''
+    rnd = np.random.RandomState(seed)
+    x, y = np.meshgrid(np.linspace(-1, 1, nx + 1), np.linspace(-0.7, 0.8, ny + 1))
+    points = np.stack((x.ravel(), y.ravel(), np.zeros(x.size)), axis=1)
+    angle = 0.6
+    rotation = np.array([[1, 0, 0], [0, np.cos(angle), -np.sin(angle)], [0, np.sin(angle), np.cos(angle)]])
+    points = points.dot(rotation.T) + [0.1, -0.2, -4.0]
+    points *= rnd.uniform(0.5, 2.0, (len(points), 1))
+    faceVerts = [(j * (nx + 1) + i, j * (nx + 1) + i + 1, (j + 1) * (nx + 1) + i + 1, (j + 1) * (nx + 1) + i)
+                 for j in range(ny) for i in range(nx)]
+    return points, np.array(faceVerts)
+
+
+def _legacyReconstruct(cameraSpacePoints, faceVerts):
+    #computeQuadDepthInformation and step 1 of createMesh with lists
+    quads = []
+    for fv in faceVerts.tolist():
+        qHatA, qHatB, qHatC, qHatD = [normalize(cameraSpacePoints[i].tolist()) for i in fv]
+        Qab, Qac, Qad = dot(qHatA, qHatB), dot(qHatA, qHatC), dot(qHatA, qHatD)
+        Qbc, Qbd, Qcd = dot(qHatB, qHatC), dot(qHatB, qHatD), dot(qHatC, qHatD)
+        C4 = Qad * Qbc * Qbd - Qac * Qbd ** 2
+        C3 = Qab * Qad * Qbd * Qcd - Qad ** 2 * Qcd + Qac * Qad * Qbd ** 2 - Qad ** 2 * Qbc * Qbd - Qbc * Qbd + 2 * Qab * Qac * Qbd - Qab * Qad * Qbc
+        C2 = -Qab * Qbd * Qcd - Qab ** 2 * Qad * Qcd + 2 * Qad * Qcd + Qad * Qbc * Qbd - 3 * Qab * Qac * Qad * Qbd + Qab * Qad ** 2 * Qbc + Qab * Qbc + Qac * Qad ** 2 - Qab ** 2 * Qac
+        C1 = Qab ** 2 * Qcd - Qcd + Qab * Qac * Qbd - Qab * Qad * Qbc + 2 * Qab ** 2 * Qac * Qad - 2 * Qac * Qad
+        C0 = Qac - Qab ** 2 * Qac
+        B4 = Qbd - Qbd * Qcd ** 2
+        B3 = 2 * Qad * Qbd * Qcd ** 2 + Qab * Qcd ** 2 + Qac * Qbd * Qcd - Qad * Qbc * Qcd - 2 * Qad * Qbd - Qab
+        B2 = - Qbd * Qcd ** 2 - Qab * Qad * Qcd ** 2 - 3 * Qac * Qad * Qbd * Qcd + Qad ** 2 * Qbc * Qcd + Qbc * Qcd - Qab * Qac * Qcd + Qad ** 2 * Qbd + Qac * Qad * Qbc + 2 * Qab * Qad
+        B1 = 2 * Qac * Qbd * Qcd - Qad * Qbc * Qcd + Qab * Qac * Qad * Qcd + Qac ** 2 * Qad * Qbd - Qac * Qad ** 2 * Qbc - Qac * Qbc - Qab * Qad ** 2
+        B0 = Qac * Qad * Qbc - Qac ** 2 * Qbd
+        roots = solveCubic((C4 / B4) * B3 - C3, (C4 / B4) * B2 - C2, (C4 / B4) * B1 - C1, (C4 / B4) * B0 - C0)
+
+        def corners(lambdaD):
+            lambdaB = (Qad * lambdaD - 1.0) / (Qbd * lambdaD - Qab)
+            lambdaC = (Qad * lambdaD - lambdaD * lambdaD) / (Qac - Qcd * lambdaD)
+            return [[x * l for x in q] for q, l in zip((qHatA, qHatB, qHatC, qHatD), (1, lambdaB, lambdaC, lambdaD))]
+
+        chosenRoot = minError = None
+        for root in roots:
+            if type(root) == type(0j) or root <= 0:
+                continue
+            pA, pB, pC, pD = [np.array(p) for p in corners(root)]
+            meanError = quadErrors(pA, pB, pC, pD)
+            if minError == None or meanError < minError:
+                minError, chosenRoot = meanError, root
+        quads.append(corners(chosenRoot))
+
+    matrixRows = []
+    rhRows = []
+    numQuadFaces = len(quads)
+    edges, pairs = sharedQuadEdges(faceVerts)
+    for (ev0, ev1), (f0Idx, f1Idx) in zip(edges.tolist(), pairs.tolist()):
+        for ev in (ev0, ev1):
+            lambda0 = quads[f0Idx][faceVerts[f0Idx].tolist().index(ev)][2]
+            lambda1 = quads[f1Idx][faceVerts[f1Idx].tolist().index(ev)][2]
+            row = [0] * (numQuadFaces - 1)
+            rhRow = [0]
+            if f0Idx == 0:
+                rhRow[0] = lambda0
+                row[f1Idx - 1] = lambda1
+            else:
+                row[f0Idx - 1] = lambda0
+                row[f1Idx - 1] = -lambda1
+            matrixRows.append(row)
+            rhRows.append(rhRow)
+    if numQuadFaces > 2:
+        factors = [1] + [f[0] for f in Mat(matrixRows).solve(Mat(rhRows))]
+    else:
+        factors = [1, 0.5 * (rhRows[0][0] / matrixRows[0][0] + rhRows[1][0] / matrixRows[1][0])]
+    return np.array(quads), np.array(factors)
+
+
+class TestDepthSolver(unittest.TestCase):
+
+    def test_quads(self):
+        points, faceVerts = gridOfRectangles(5, 4)
+        qHats = points[faceVerts] / np.linalg.norm(points[faceVerts], axis=2, keepdims=True)
+        computed, found = quadDepths(qHats)
+        self.assertTrue(found.all())
+        quads, factors = _legacyReconstruct(points, faceVerts)
+        #the cubics of rectangles have a double root, only agree to ~1e-8
+        np.testing.assert_allclose(computed, quads, rtol=1e-6)
+        #rectangles: all corners right angles
+        self.assertLess(quadErrors(*[computed[:, i] for i in range(4)]).max(), 1e-7)
+
+    def test_factors(self):
+        for nx, ny in ((2, 1), (3, 2), (4, 4)):
+            points, faceVerts = gridOfRectangles(nx, ny, seed=nx)
+            quads, expected = _legacyReconstruct(points, faceVerts)
+            np.testing.assert_allclose(depthFactors(quads, faceVerts), expected, rtol=1e-7)
+            if depth_solver.scipy is not None:
+                saved = depth_solver.scipy
+                depth_solver.scipy = None
+                try:
+                    np.testing.assert_allclose(depthFactors(quads, faceVerts), expected, rtol=1e-7)
+                finally:
+                    depth_solver.scipy = saved
+
+    def test_reconstruct(self):
+        points, faceVerts = gridOfRectangles(6, 3)
+        verts, found = reconstruct(points, faceVerts)
+        self.assertTrue(found.all())
+        #merged corners: the grid shape is recovered up to scale
+        inner = verts.reshape(-1, 4, 3)
+        np.testing.assert_allclose(inner[0, 1], inner[1, 0], atol=1e-9)
+        np.testing.assert_allclose(inner[0, 2], inner[6, 1], atol=1e-9)
+        sides = np.linalg.norm(inner[:, 1] - inner[:, 0], axis=1)
+        np.testing.assert_allclose(sides / sides[0], 1.0, rtol=1e-6)
+        self.assertTrue(facesConnected(faceVerts))
+        self.assertFalse(facesConnected(np.concatenate((faceVerts, [[100, 101, 102, 103]]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
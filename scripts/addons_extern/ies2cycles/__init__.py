@@ -37,6 +37,8 @@ import os
 
 from math import pi
 from operator import add, truediv
+
+from . import ies_data
       
 def clamp(x, min, max):
     if x < min:
@@ -112,14 +114,18 @@ def reinterpolate_line(x_data, y_data, new_width):
     return new_y_data
 
 
-# default number of vertices for vertical and horizontal directions in rig
-rig_v = {'TYPE90': 10, 'TYPE180': 20}
-rig_h = {'TYPE90': 16, 'TYPE180': 16}
+rig_v = ies_data.rig_v
+rig_h = ies_data.rig_h
 
 
 def gen_vcurves_rig(name, x_data, y_data, cone_type):
-    new_data = [reinterpolate_line(x_data, y_data, rig_v[cone_type])] * rig_h[cone_type]
-    return gen_rig_object(name, new_data)
+    length = rig_v[cone_type]
+    if ies_data.np is not None:
+        new_x_data = [i / (length - 1) for i in range(length)]
+        line = ies_data.interp_rows(new_x_data, ies_data.np.asarray(x_data), y_data).tolist()
+    else:
+        line = reinterpolate_line(x_data, y_data, length)
+    return gen_rig_object(name, [line] * rig_h[cone_type])
 
 
 def reinterpolate_2d(data, size, h_type):
@@ -142,13 +148,80 @@ def reinterpolate_2d(data, size, h_type):
 
 
 def gen_2d_rig(name, data, cone_type, h_type):
-    # reinterpolate a deep copy of data
-    new_size = [rig_v[cone_type], rig_h[cone_type]]
-    new_data = reinterpolate_2d(data[:], new_size, h_type)
+    if ies_data.np is not None:
+        new_data = ies_data.rig_data(ies_data.np.asarray(data, dtype=float), cone_type, h_type).tolist()
+    else:
+        # reinterpolate a deep copy of data
+        new_size = [rig_v[cone_type], rig_h[cone_type]]
+        new_data = reinterpolate_2d(data[:], new_size, h_type)
     return gen_rig_object(name, new_data)
 
 
+def add_lamp_image(name, pixels, width, height, intensity, lamp_cone_type,
+                   lamp_h_type, image_format, color_temperature, rig_name):
+    # pixels is a flat list of RGBA values, a row per horizontal angle
+    if image_format == 'PNG':
+        float_buffer = False
+        filepath = '//' + name + '.png'
+    else:
+        float_buffer = True
+        filepath = '//' + name + '.exr'
+
+    img = bpy.data.images.new(name, width, height, float_buffer=float_buffer)
+    img.pixels = pixels
+
+    bpy.ops.import_lamp.gen_exr('INVOKE_DEFAULT',
+                                image_name=img.name,
+                                intensity=intensity,
+                                lamp_cone_type=lamp_cone_type,
+                                lamp_h_type=lamp_h_type,
+                                image_format=image_format,
+                                color_temperature=color_temperature,
+                                filepath=filepath,
+                                rig_name=rig_name)
+
+    return {'FINISHED'}
+
+
 def read_lamp_data(log, filename, generate_rig, multiplier, image_format, color_temperature):
+    if ies_data.np is None:
+        return read_lamp_data_legacy(log, filename, generate_rig, multiplier,
+                                     image_format, color_temperature)
+
+    rig_name = ''
+
+    lamp = ies_data.read_ies(filename, log)
+    if lamp is None:
+        return {'CANCELLED'}
+
+    if image_format == 'VCURVES':
+        x_rig_data, lamp_rig_y_data, lamp_data, intensity = ies_data.vcurves_data(lamp, multiplier)
+        if generate_rig:
+            rig_name = gen_vcurves_rig(lamp.name, x_rig_data, lamp_rig_y_data, lamp.cone_type)
+
+        return add_img(name=lamp.name,
+                       intensity=intensity,
+                       lamp_cone_type=lamp.cone_type,
+                       lamp_h_type=lamp.h_type,
+                       image_format=image_format,
+                       color_temperature=color_temperature,
+                       lamp_data=lamp_data,
+                       rig_name=rig_name)
+
+    ies_data.uniform_vertical(lamp, log)
+    pixels, candela, intensity = ies_data.lamp_image(lamp, multiplier)
+
+    # generate rig object
+    if generate_rig:
+        rig_name = gen_2d_rig(lamp.name, candela, lamp.cone_type, lamp.h_type)
+
+    return add_lamp_image(lamp.name, pixels.ravel().tolist(), pixels.shape[1], pixels.shape[0],
+                          intensity, lamp.cone_type, lamp.h_type, image_format,
+                          color_temperature, rig_name)
+
+
+# Per value version, used when numpy isn't available
+def read_lamp_data_legacy(log, filename, generate_rig, multiplier, image_format, color_temperature):
     # log({'INFO'}, 'Start IES import')
     rig_name = ''
     
@@ -326,30 +399,11 @@ def read_lamp_data(log, filename, generate_rig, multiplier, image_format, color_
     
     intensity = max(500, min(maxval * multiplier * candela_mult, 5000))
 
-    if image_format == 'PNG':
-        float_buffer = False
-        filepath = '//' + name + '.png'
-    else:
-        float_buffer = True
-        filepath = '//' + name + '.exr'
-
-    img = bpy.data.images.new(name, len(candela_2d[0]), len(candela_2d),
-                              float_buffer=float_buffer)
-
-    for i, val in enumerate(candela_values):
-        img.pixels[4 * i] = img.pixels[4 * i + 1] = img.pixels[4 * i + 2] = val
-
-    bpy.ops.import_lamp.gen_exr('INVOKE_DEFAULT',
-                                image_name=img.name,
-                                intensity=intensity,
-                                lamp_cone_type=lamp_cone_type,
-                                lamp_h_type=lamp_h_type,
-                                image_format=image_format,
-                                color_temperature=color_temperature,
-                                filepath=filepath,
-                                rig_name=rig_name)
+    pixels = [c for val in candela_values for c in (val, val, val, 1.0)]
 
-    return {'FINISHED'}
+    return add_lamp_image(name, pixels, len(candela_2d[0]), len(candela_2d),
+                          intensity, lamp_cone_type, lamp_h_type, image_format,
+                          color_temperature, rig_name)
 
 
 def scale_coords(nt, sock_in, sock_out, size):
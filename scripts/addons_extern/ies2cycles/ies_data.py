@@ -0,0 +1,405 @@
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# IES photometric data with numpy: parsing, resampling and the lamp image.
+# The candela values are resampled on whole arrays, for the image node as
+# for the rig spokes. Whole directories of IES files can also be converted
+# to 16 bit PNG or float PFM images outside of Blender:
+#     python ies_data.py -o images lamps/*.ies
+
+import os
+import struct
+import time
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+version_table = {
+    'IESNA:LM-63-1986': 1986,
+    'IESNA:LM-63-1991': 1991,
+    'IESNA91': 1991,
+    'IESNA:LM-63-1995': 1995,
+    'IESNA:LM-63-2002': 2002,
+}
+
+# default number of vertices for vertical and horizontal directions in rig
+rig_v = {'TYPE90': 10, 'TYPE180': 20}
+rig_h = {'TYPE90': 16, 'TYPE180': 16}
+
+
+class IESLamp:
+    """
+    Photometric data of an IES file, candela[h, v] for the horizontal
+    angles h_angs and vertical angles v_angs
+    """
+    def __init__(self, name, version, keywords, header, v_angs, h_angs, candela):
+        self.name = name
+        self.version = version
+        self.keywords = keywords
+        self.header = header
+        self.v_angs = v_angs
+        self.h_angs = h_angs
+        self.candela = candela
+        self.candela_mult = header['candela_mult']
+        self.cone_type = 'TYPE180'
+        self.h_type = 'TYPE360'
+
+
+def parse_ies(name, content, log):
+    """
+    Parse the text of an IES file, the numbers after TILT in one go.
+    Returns an IESLamp or None if the file can't be read, problems are
+    reported with log({'INFO'} or {'ERROR'}, message).
+    """
+    s, content = content.split('\n', 1)
+    s = s.strip()
+
+    if s in version_table:
+        version = version_table[s]
+    else:
+        log({'INFO'}, "IES file does not specify any version")
+        version = None
+
+    keywords = dict()
+
+    while content and not content.startswith('TILT='):
+        s, content = content.split('\n', 1)
+
+        if s.startswith('['):
+            endbracket = s.find(']')
+            if endbracket != -1:
+                keywords[s[1:endbracket]] = s[endbracket + 1:].strip()
+
+    if not content.startswith('TILT'):
+        log({'ERROR'}, "TILT keyword not found, check your IES file")
+        return None
+    s, content = content.split('\n', 1)
+
+    # fight against ill-formed files
+    try:
+        file_data = np.array(content.replace(',', ' ').split(), dtype=np.float64)
+    except ValueError:
+        log({'ERROR'}, "Invalid number in candela data, check your IES file")
+        return None
+
+    if len(file_data) < 13:
+        log({'ERROR'}, "TILT keyword not found, check your IES file")
+        return None
+
+    header = {
+        'lamps_num': int(file_data[0]),
+        'lumens_per_lamp': file_data[1],
+        'candela_mult': file_data[2],
+        'photometric_type': int(file_data[5]),
+        'units_type': int(file_data[6]),
+        'width': file_data[7],
+        'length': file_data[8],
+        'height': file_data[9],
+        'ballast_factor': file_data[10],
+        'future_use': file_data[11],
+        'input_watts': file_data[12],
+    }
+
+    if header['lamps_num'] != 1:
+        log({'INFO'}, "Only 1 lamp is supported, %d in IES file" % header['lamps_num'])
+
+    v_angles_num = int(file_data[3])
+    h_angles_num = int(file_data[4])
+    if not v_angles_num or not h_angles_num:
+        log({'ERROR'}, "TILT keyword not found, check your IES file")
+        return None
+
+    if header['units_type'] not in [1, 2]:
+        log({'INFO'}, "Units type should be either 1 (feet) or 2 (meters)")
+
+    if header['future_use'] != 1.0:
+        log({'INFO'}, "Invalid future use field")
+
+    offset = 13 + v_angles_num + h_angles_num
+    candela_num = v_angles_num * h_angles_num
+    if len(file_data) < offset + candela_num:
+        log({'ERROR'}, "Candela data is incomplete, check your IES file")
+        return None
+
+    v_angs = file_data[13:13 + v_angles_num]
+    h_angs = file_data[13 + v_angles_num:offset]
+    candela = file_data[offset:offset + candela_num].reshape(h_angles_num, v_angles_num)
+
+    lamp = IESLamp(name, version, keywords, header, v_angs, h_angs, candela)
+
+    if v_angs[0] == 0 and v_angs[-1] == 90:
+        lamp.cone_type = 'TYPE90'
+    elif v_angs[0] == 0 and v_angs[-1] == 180:
+        lamp.cone_type = 'TYPE180'
+    else:
+        log({'INFO'}, "Lamps with vertical angles (%d-%d) are not supported" %
+                       (v_angs[0], v_angs[-1]))
+
+    h_span = abs(h_angs[0] - h_angs[-1])
+    if len(h_angs) == 1 or h_span == 360:
+        lamp.h_type = 'TYPE360'
+    elif h_span == 180:
+        lamp.h_type = 'TYPE180'
+    elif h_span == 90:
+        lamp.h_type = 'TYPE90'
+    else:
+        log({'INFO'}, "Lamps with horizontal angles (%d-%d) are not supported" %
+                       (h_angs[0], h_angs[-1]))
+
+    return lamp
+
+
+def read_ies(filename, log):
+    name = os.path.splitext(os.path.split(filename)[1])[0]
+
+    file = open(filename, 'rt', encoding='cp1252')
+    content = file.read()
+    file.close()
+
+    return parse_ies(name, content, log)
+
+
+def interp_rows(new_x, x, y):
+    """
+    Linear interpolation of the rows of y, given at the increasing x,
+    at new_x. Points out of x take the value of the nearest end.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    new_x = np.clip(np.asarray(new_x, dtype=np.float64), x[0], x[-1])
+    if len(x) == 1:
+        return np.repeat(y, len(new_x), axis=-1)
+
+    i = np.clip(np.searchsorted(x, new_x), 1, len(x) - 1)
+    x0 = x[i - 1]
+    x1 = x[i]
+    t = (new_x - x0) / (x1 - x0)
+    y0 = y[..., i - 1]
+    y1 = y[..., i]
+    return np.where(new_x == x1, y1, y0 + t * (y1 - y0))
+
+
+def resample(data, length, axis=-1):
+    """Resample data along axis to length points over the same range"""
+    data = np.moveaxis(np.asarray(data, dtype=np.float64), axis, -1)
+    x = np.arange(data.shape[-1]) / (data.shape[-1] - 1)
+    new_x = np.arange(length) / (length - 1)
+    return np.moveaxis(interp_rows(new_x, x, data), -1, axis)
+
+
+def uniform_vertical(lamp, log):
+    """
+    Resample the candela values to evenly spaced vertical angles, the
+    image node can't map uneven angles.
+    """
+    v_angs = lamp.v_angs
+    v_d = np.diff(v_angs)
+    h_d = np.diff(lamp.h_angs)
+
+    if len(v_d) > 1 and np.any(np.abs(np.diff(v_d)) >= 0.001):
+        vmin, vmax = v_angs[0], v_angs[-1]
+        divisions = int((vmax - vmin) / max(1, v_d.min()))
+        step = (vmax - vmin) / divisions
+
+        # Approximating non-uniform vertical angles with step = step
+        new_v_angs = vmin + np.arange(divisions + 1) * step
+        lamp.candela = interp_rows(new_v_angs, v_angs, lamp.candela)
+        lamp.v_angs = new_v_angs
+
+    if len(h_d) > 1 and np.any(np.abs(np.diff(h_d)) >= 0.001):
+        log({'INFO'}, "Different offsets for horizontal angles!")
+
+    return lamp
+
+
+def mirror_horizontal(data, h_type):
+    """Complete the horizontal angles of symmetric lamps to a full circle"""
+    if h_type == 'TYPE90' or h_type == 'TYPE180':
+        data = np.concatenate((data, data[::-1][1:]))
+
+    if h_type == 'TYPE90':
+        data = np.concatenate((data, data[::-1][1:]))
+
+    if len(data) == 1:
+        data = np.concatenate((data, data))
+
+    return data
+
+
+def rig_data(candela, cone_type, h_type):
+    """Lengths of the rig spokes, rig_h spokes of rig_v points"""
+    data = mirror_horizontal(candela, h_type)
+    data = resample(data, rig_v[cone_type], axis=1)
+    return resample(data, rig_h[cone_type], axis=0)
+
+
+def vcurves_data(lamp, multiplier):
+    """
+    The lamp approximated by a single vertical profile. Returns the rig
+    profile x, y, the curve points and the intensity.
+    """
+    # scale vertical angles to [0, 1] range
+    x_rig_data = lamp.v_angs / lamp.v_angs[-1]
+    x_data = 0.5 + 0.5 * x_rig_data
+
+    # approximate multidimentional lamp data to single dimention
+    y_data = lamp.candela.mean(axis=0)
+    y_data_max = y_data.max()
+
+    intensity = max(500, min(y_data_max * multiplier * lamp.candela_mult, 5000))
+
+    lamp_rig_y_data = y_data / y_data_max
+    lamp_y_data = 0.5 + 0.5 * lamp_rig_y_data
+
+    lamp_data = list(zip(x_data.tolist(), lamp_y_data.tolist()))
+    return x_rig_data, lamp_rig_y_data, lamp_data, float(intensity)
+
+
+def lamp_image(lamp, multiplier):
+    """
+    The RGBA pixels of the lamp image, a row per horizontal angle and
+    a column per vertical angle, with the normalised candela values
+    for the rig and the intensity. Call uniform_vertical first.
+    """
+    maxval = lamp.candela.max()
+    candela = lamp.candela / maxval
+
+    # add extra left and right rows to bypass cycles repeat of uv coordinates
+    values = np.pad(candela, ((0, 0), (1, 1)), mode='edge')
+
+    if len(values) > 1:
+        values = np.pad(values, ((1, 1), (0, 0)), mode='edge')
+
+    pixels = np.ones(values.shape + (4,), dtype=np.float32)
+    pixels[..., :3] = values[..., None]
+
+    intensity = max(500, min(maxval * multiplier * lamp.candela_mult, 5000))
+    return pixels, candela, float(intensity)
+
+
+# batch conversion
+
+def write_png(filepath, values):
+    """Write values in [0, 1] as a 16 bit grey PNG"""
+    height, width = values.shape
+    data = (np.clip(values, 0.0, 1.0) * 65535.0 + 0.5).astype('>u2')
+    raw = np.zeros((height, 1 + 2 * width), dtype=np.uint8)
+    raw[:, 1:] = data.view(np.uint8).reshape(height, -1)
+
+    def chunk(kind, body):
+        return (struct.pack('>I', len(body)) + kind + body +
+                struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff))
+
+    # the bottom row first, as Blender images
+    file = open(filepath, 'wb')
+    file.write(b'\x89PNG\r\n\x1a\n')
+    file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 16, 0, 0, 0, 0)))
+    file.write(chunk(b'IDAT', zlib.compress(raw[::-1].tobytes(), 6)))
+    file.write(chunk(b'IEND', b''))
+    file.close()
+
+
+def write_pfm(filepath, values):
+    """Write float values as a grey PFM, bottom row first"""
+    height, width = values.shape
+    file = open(filepath, 'wb')
+    file.write(b'Pf\n%d %d\n-1.0\n' % (width, height))
+    file.write(values.astype('<f4').tobytes())
+    file.close()
+
+
+def convert_file(filename, out_dir, image_format='PNG', multiplier=1.0):
+    """
+    Convert an IES file to a lamp image in out_dir. Returns a dict with
+    the image path and the settings of the lamp node group.
+    """
+    messages = []
+    lamp = read_ies(filename, lambda level, message: messages.append(message))
+    result = {'source': filename, 'messages': messages, 'filepath': None}
+    if lamp is None:
+        return result
+
+    uniform_vertical(lamp, lambda level, message: messages.append(message))
+    pixels, candela, intensity = lamp_image(lamp, multiplier)
+
+    if image_format == 'PNG':
+        filepath = os.path.join(out_dir, lamp.name + '.png')
+        write_png(filepath, pixels[..., 0])
+    else:
+        filepath = os.path.join(out_dir, lamp.name + '.pfm')
+        write_pfm(filepath, pixels[..., 0])
+
+    result.update(filepath=filepath,
+                  size=(pixels.shape[1], pixels.shape[0]),
+                  intensity=intensity,
+                  lamp_cone_type=lamp.cone_type,
+                  lamp_h_type=lamp.h_type)
+    return result
+
+
+def convert_files(filenames, out_dir, image_format='PNG', multiplier=1.0, workers=0):
+    """Convert IES files in parallel processes, 0 workers is one per processor"""
+    if workers <= 0:
+        workers = multiprocessing.cpu_count()
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    count = len(filenames)
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, count))) as pool:
+        return list(pool.map(convert_file, filenames, [out_dir] * count,
+                             [image_format] * count, [multiplier] * count))
+
+
+def ies_files(paths):
+    """The IES files of paths, directories are searched for *.ies"""
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(os.path.join(path, f) for f in os.listdir(path)
+                                    if f.lower().endswith('.ies')))
+        else:
+            filenames.append(path)
+    return filenames
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert IES lamp data to lamp images.')
+    parser.add_argument('files', nargs='*', help='IES files or directories of IES files')
+    parser.add_argument('-o', dest='out_dir', default='.', help='output directory')
+    parser.add_argument('-f', dest='image_format', choices=['PNG', 'PFM'], default='PNG',
+                        help='16 bit PNG or float PFM images')
+    parser.add_argument('-m', dest='multiplier', type=float, default=1.0, help='lamp strength multiplier')
+    parser.add_argument('-j', dest='workers', type=int, default=0, help='worker processes, 0 is one per processor')
+    args = parser.parse_args()
+
+    start = time.time()
+    results = convert_files(ies_files(args.files), args.out_dir, args.image_format,
+                            args.multiplier, args.workers)
+    for result in results:
+        for message in result['messages']:
+            print('%s: %s' % (result['source'], message))
+        if result['filepath']:
+            print('%s -> %s, intensity %.1f, %s %s' % (result['source'], result['filepath'],
+                  result['intensity'], result['lamp_cone_type'], result['lamp_h_type']))
+    print('Converted %d files in %.2fs' % (len(results), time.time() - start))
@@ -0,0 +1,172 @@
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Tests of the IES parsing and resampling against the list code of the
+# importer, on synthetic IES files. Run from this directory with:
+#     python ies_data_test.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ies_data import (np, rig_v, rig_h, parse_ies, uniform_vertical, lamp_image, rig_data,
+                      convert_files, ies_files)
+
+
+def synthetic_ies(v_num, h_num, h_span=360, uneven=False, seed=0):
+    """The text of an IES file with random candela values"""
+    rnd = np.random.RandomState(seed)
+    if uneven:
+        v_angs = np.r_[0.0, np.sort(rnd.choice(np.arange(1, 720) / 4.0, v_num - 2, replace=False)), 180.0]
+    else:
+        v_angs = np.linspace(0, 180, v_num)
+    h_angs = np.linspace(0, h_span, h_num)
+    candela = rnd.uniform(0, 1000, (h_num, v_num)).round(1)
+    lines = ['IESNA:LM-63-2002', '[TEST] synthetic', '[MANUFAC] none', 'TILT=NONE',
+             '1 1000 1.0 %d %d 1 2 0 0 0' % (v_num, h_num), '1.0 1.0 100']
+    for values in (v_angs, h_angs):
+        lines.append(' '.join('%g' % v for v in values))
+    for row in candela:
+        lines.append(', '.join('%g' % v for v in row))
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def _legacy_simple_interp(k, x, y):
+    for i in range(len(x)):
+        if k == x[i]:
+            return y[i]
+        elif k < x[i]:
+            return y[i] + (k - x[i]) * (y[i - 1] - y[i]) / (x[i - 1] - x[i])
+
+
+def _legacy_reinterpolate_line(x_data, y_data, new_width):
+    new_x_data = [i/(new_width-1) for i in range(new_width)]
+    return [_legacy_simple_interp(k, x_data, y_data) for k in new_x_data]
+
+
+def _legacy_reinterpolate_2d(data, size, h_type):
+    if h_type == 'TYPE90' or h_type == 'TYPE180':
+        data += list(reversed(data))[1:]
+
+    if h_type == 'TYPE90':
+        data += list(reversed(data))[1:]
+
+    if len(data) == 1:
+        data = [data[0]] * 2
+
+    for length in size:
+        x_data = [i / (len(data[0]) - 1) for i in range(len(data[0]))]
+        for i in range(len(data)):
+            data[i] = _legacy_reinterpolate_line(x_data, data[i], length)
+        data = list(zip(*data))
+
+    return data
+
+
+def _legacy_lamp_image(content):
+    # the parsing and image filling of read_lamp_data, with plain lists
+    file_data = content.split('TILT=', 1)[1].split('\n', 1)[1].replace(',', ' ').split()
+    v_angles_num = int(file_data[3])
+    h_angles_num = int(file_data[4])
+    v_angs = [float(s) for s in file_data[13:13 + v_angles_num]]
+    offset = 13 + v_angles_num + h_angles_num
+    candela_values = [float(s) for s in file_data[offset:offset + v_angles_num * h_angles_num]]
+    candela_2d = list(zip(*[iter(candela_values)] * len(v_angs)))
+
+    v_d = [v_angs[i] - v_angs[i - 1] for i in range(1, len(v_angs))]
+    v_same = all(abs(v_d[i] - v_d[i - 1]) < 0.001 for i in range(1, len(v_d)))
+    if not v_same:
+        vmin, vmax = v_angs[0], v_angs[-1]
+        divisions = int((vmax - vmin) / max(1, min(v_d)))
+        step = (vmax - vmin) / divisions
+        new_v_angs = [vmin + i * step for i in range(divisions + 1)]
+        new_v_angs[-1] = min(new_v_angs[-1], vmax)
+        candela_2d = [[_legacy_simple_interp(ang, v_angs, line)
+                       for ang in new_v_angs] for line in candela_2d]
+
+    maxval = max([max(row) for row in candela_2d])
+    candela_2d = [[val / maxval for val in row] for row in candela_2d]
+    normalised = [list(row) for row in candela_2d]
+
+    candela_2d = [[line[0]] + list(line) + [line[-1]] for line in candela_2d]
+    if len(candela_2d) > 1:
+        candela_2d = [candela_2d[0]] + candela_2d + [candela_2d[-1]]
+
+    pixels = [0.0] * (4 * len(candela_2d) * len(candela_2d[0]))
+    for i, val in enumerate(y for x in candela_2d for y in x):
+        pixels[4 * i] = pixels[4 * i + 1] = pixels[4 * i + 2] = val
+        pixels[4 * i + 3] = 1.0
+    return pixels, normalised
+
+
+class TestIESData(unittest.TestCase):
+
+    def lamp(self, content):
+        messages = []
+        lamp = parse_ies('test', content, lambda level, message: messages.append(message))
+        return lamp, messages
+
+    def test_parse(self):
+        lamp, messages = self.lamp(synthetic_ies(7, 5, 180))
+        self.assertEqual(messages, [])
+        self.assertEqual(lamp.version, 2002)
+        self.assertEqual(lamp.keywords['TEST'], 'synthetic')
+        self.assertEqual(lamp.candela.shape, (5, 7))
+        self.assertEqual((lamp.cone_type, lamp.h_type), ('TYPE180', 'TYPE180'))
+        lamp, messages = self.lamp('no version\nTILT=NONE\n1 1000')
+        self.assertIsNone(lamp)
+
+    def test_image(self):
+        for v_num, h_num, uneven in ((19, 1, False), (37, 9, True), (91, 73, True)):
+            content = synthetic_ies(v_num, h_num, uneven=uneven, seed=v_num)
+            lamp, messages = self.lamp(content)
+            uniform_vertical(lamp, lambda level, message: None)
+            pixels, candela, intensity = lamp_image(lamp, 1.0)
+            expected, normalised = _legacy_lamp_image(content)
+            np.testing.assert_allclose(pixels.ravel(), expected, rtol=1e-6, atol=1e-7)
+            np.testing.assert_allclose(candela, normalised, rtol=1e-12)
+
+    def test_rig(self):
+        for h_span, h_type in ((90, 'TYPE90'), (180, 'TYPE180'), (360, 'TYPE360'), (0, 'TYPE360')):
+            lamp, messages = self.lamp(synthetic_ies(13, 1 if h_span == 0 else 7, h_span))
+            self.assertEqual(lamp.h_type, h_type)
+            candela = lamp.candela / lamp.candela.max()
+            new_size = [rig_v[lamp.cone_type], rig_h[lamp.cone_type]]
+            expected = _legacy_reinterpolate_2d([tuple(row) for row in candela.tolist()], new_size, h_type)
+            np.testing.assert_allclose(rig_data(candela, lamp.cone_type, h_type), expected, rtol=1e-12)
+
+    def test_convert(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            for i, h_span in enumerate((90, 360)):
+                with open(os.path.join(tmp, 'lamp%d.ies' % i), 'w') as f:
+                    f.write(synthetic_ies(10, 5, h_span))
+            results = convert_files(ies_files([tmp]), os.path.join(tmp, 'out'), workers=2)
+            self.assertEqual([r['lamp_h_type'] for r in results], ['TYPE90', 'TYPE360'])
+            for result in results:
+                self.assertEqual(result['size'], (12, 7))
+                with open(result['filepath'], 'rb') as f:
+                    self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
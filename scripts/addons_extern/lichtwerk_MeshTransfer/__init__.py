@@ -52,6 +52,8 @@ from operator import attrgetter, itemgetter
 
 import time
 
+from . import closest_verts
+
 '''
 # ----------------------------------------
 # Helper functions
@@ -190,11 +192,8 @@ def licBuildVertFaceDict(oObject):
     d = {}
     
     for oFace in oObject.data.faces:
-        lAlreadyInList = d.keys()
-        for iVertexIndex in oFace.vertices:
-            if not iVertexIndex in lAlreadyInList:
-                d[iVertexIndex] = []
-            d[iVertexIndex].append( (oFace.index, oFace.vertices[:].index(iVertexIndex)) )
+        for iIndexInFace, iVertexIndex in enumerate(oFace.vertices):
+            d.setdefault(iVertexIndex, []).append( (oFace.index, iIndexInFace) )
             
     return d
 
@@ -682,20 +681,35 @@ class DATA_OT_lichtwerk_meshtransfer_bind(bpy.types.Operator):
             oDefMesh_target.transform(oTargetObject.matrix_world)
             oDefMesh_source.transform(oSourceObject.matrix_world)
             
-        lSourceVerticesGlobalSpace = [(oVertex.index, oVertex.co) for oVertex in oDefMesh_source.vertices]
-
-        # multithreading?
-        # http://blenderartists.org/forum/showthread.php?193522-Multi-threading-has-an-effect-but-it-doesn-t-improve-performance&highlight=subprocess
-        # http://www.blender.org/documentation/blender_python_api_2_61_0/info_gotcha.html
-        for oVertex in oDefMesh_target.vertices:
-            # get the closest vert on the other mesh
-            #dClosestVerts = licGetClosestVerts(oSourceObject, oTargetObject.matrix_world*oVertex.co, iAveraging=iVertAveraging)
-            dClosestVerts = licGetClosestVertsTransformed(lSourceVerticesGlobalSpace, 
-                                                          oVertex.co, 
-                                                          iAveraging=iVertAveraging)
+        if closest_verts.np is not None and len(oDefMesh_source.vertices):
+            # all target vertices at once, see closest_verts
+            lSourcePositions = [0.0] * (3 * len(oDefMesh_source.vertices))
+            oDefMesh_source.vertices.foreach_get('co', lSourcePositions)
+            lTargetPositions = [0.0] * (3 * len(oDefMesh_target.vertices))
+            oDefMesh_target.vertices.foreach_get('co', lTargetPositions)
+            
+            aIndices, aFactors = closest_verts.licBindClosestVerts(lSourcePositions, 
+                                                                   lTargetPositions, 
+                                                                   iAveraging=iVertAveraging)
             
-            # store closest vert in the dict (note: can only use string dict-keys in Blender)
-            oTargetObject[sDictName]['%s' % oVertex.index] = dClosestVerts
+            # store closest verts in the dict (note: can only use string dict-keys in Blender)
+            oTargetObject[sDictName] = dict(('%s' % iIndex, dClosestVerts) for iIndex, dClosestVerts 
+                                            in enumerate(closest_verts.licBindDicts(aIndices, aFactors)))
+        else:
+            lSourceVerticesGlobalSpace = [(oVertex.index, oVertex.co) for oVertex in oDefMesh_source.vertices]
+
+            # multithreading?
+            # http://blenderartists.org/forum/showthread.php?193522-Multi-threading-has-an-effect-but-it-doesn-t-improve-performance&highlight=subprocess
+            # http://www.blender.org/documentation/blender_python_api_2_61_0/info_gotcha.html
+            for oVertex in oDefMesh_target.vertices:
+                # get the closest vert on the other mesh
+                #dClosestVerts = licGetClosestVerts(oSourceObject, oTargetObject.matrix_world*oVertex.co, iAveraging=iVertAveraging)
+                dClosestVerts = licGetClosestVertsTransformed(lSourceVerticesGlobalSpace, 
+                                                              oVertex.co, 
+                                                              iAveraging=iVertAveraging)
+                
+                # store closest vert in the dict (note: can only use string dict-keys in Blender)
+                oTargetObject[sDictName]['%s' % oVertex.index] = dClosestVerts
 
         if context.window_manager.bMeshTransfer_RespectModifiers:
             del oDefMesh_target
@@ -0,0 +1,200 @@
+# --------------------------------------------------------------------------
+# Lichtwerk Scripts (author Philipp Oeser)
+# --------------------------------------------------------------------------
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+# --------------------------------------------------------------------------
+
+'''
+# ----------------------------------------
+# Closest vertices on coordinate arrays
+# ----------------------------------------
+the n closest source vertices of all target vertices at once, looked up
+in a uniform grid over the source positions instead of measuring the
+distance to every source vertex for each target vertex
+'''
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+'''
+# ----------------------------------------
+# Grid
+# ----------------------------------------
+'''
+
+class licPointGrid:
+    '''
+    source positions sorted into cubic cells of about iPointsPerCell points,
+    query() returns the k nearest points of many query points
+    '''
+    iQueryChunk = 65536
+    iBruteForceChunk = 4000000
+
+    def __init__(self, aPoints, iPointsPerCell=2):
+        self.aPoints = np.asarray(aPoints, dtype=np.float64).reshape(-1, 3)
+        iPoints = len(self.aPoints)
+        if iPoints == 0:
+            raise ValueError("no source points")
+
+        self.vMin = self.aPoints.min(axis=0)
+        vExtent = self.aPoints.max(axis=0) - self.vMin
+        fMaxExtent = vExtent.max()
+
+        # cell size for the dimensions the points actually spread in (planes are common)
+        iDims = max(1, int(np.count_nonzero(vExtent > fMaxExtent * 1e-6)))
+        if fMaxExtent > 0:
+            self.fCellSize = fMaxExtent / max(1.0, (iPoints / iPointsPerCell) ** (1.0 / iDims))
+        else:
+            self.fCellSize = 1.0
+        self.aDims = (vExtent // self.fCellSize).astype(np.int64) + 1
+
+        aKeys = self.cell_keys(self.cells(self.aPoints))
+        self.aOrder = np.argsort(aKeys, kind='mergesort')
+        aSortedKeys = aKeys[self.aOrder]
+        self.aCellKeys, self.aCellStarts, self.aCellCounts = np.unique(
+            aSortedKeys, return_index=True, return_counts=True)
+
+    def cells(self, aPoints):
+        return np.floor((aPoints - self.vMin) / self.fCellSize).astype(np.int64)
+
+    def cell_keys(self, aCells):
+        return (aCells[:, 0] * self.aDims[1] + aCells[:, 1]) * self.aDims[2] + aCells[:, 2]
+
+    def query(self, aQueries, k):
+        '''
+        indices and distances of the k nearest points, nearest first,
+        equally distant points by index as a stable sort would order them
+        '''
+        aQueries = np.asarray(aQueries, dtype=np.float64).reshape(-1, 3)
+        k = min(k, len(self.aPoints))
+        aIndices = np.zeros((len(aQueries), k), dtype=np.int64)
+        aDistances = np.zeros((len(aQueries), k))
+
+        for iStart in range(0, len(aQueries), self.iQueryChunk):
+            aTodo = np.arange(iStart, min(iStart + self.iQueryChunk, len(aQueries)))
+            # rings of cells around the query cell, far queries are measured against all points
+            for iRing in (1, 2):
+                if len(aTodo) == 0:
+                    break
+                aFound, aIdx, aDist = self.search_cells(aQueries[aTodo], k, iRing)
+                aIndices[aTodo[aFound]] = aIdx
+                aDistances[aTodo[aFound]] = aDist
+                aTodo = aTodo[~aFound]
+            if len(aTodo):
+                aIndices[aTodo], aDistances[aTodo] = self.search_all(aQueries[aTodo], k)
+
+        return aIndices, aDistances
+
+    def search_cells(self, aQueries, k, iRing):
+        '''
+        the k nearest among the points in the cells within iRing cells,
+        for the queries that surely have them all there
+        '''
+        iQueries = len(aQueries)
+        aQueryCells = self.cells(aQueries)
+        r = np.arange(-iRing, iRing + 1)
+        aOffsets = np.stack(np.meshgrid(r, r, r, indexing='ij'), axis=-1).reshape(-1, 3)
+
+        # cells of all queries and offsets, with their range in the sorted points
+        aCells = (aQueryCells[:, None, :] + aOffsets[None, :, :]).reshape(-1, 3)
+        aInside = np.all((aCells >= 0) & (aCells < self.aDims), axis=1)
+        aKeys = self.cell_keys(np.where(aInside[:, None], aCells, 0))
+        aSlot = np.minimum(np.searchsorted(self.aCellKeys, aKeys), len(self.aCellKeys) - 1)
+        aHit = aInside & (self.aCellKeys[aSlot] == aKeys)
+        aCounts = np.where(aHit, self.aCellCounts[aSlot], 0)
+        aStarts = self.aCellStarts[aSlot]
+
+        # all candidate pairs
+        iTotal = int(aCounts.sum())
+        aQuery = np.repeat(np.arange(len(aCells)) // len(aOffsets), aCounts)
+        aRunStarts = np.repeat(np.cumsum(aCounts) - aCounts, aCounts)
+        aPoint = self.aOrder[np.arange(iTotal) - aRunStarts + np.repeat(aStarts, aCounts)]
+        aDist = np.sqrt(((self.aPoints[aPoint] - aQueries[aQuery]) ** 2).sum(axis=1))
+
+        # k nearest per query
+        aSort = np.lexsort((aPoint, aDist, aQuery))
+        aQuery = aQuery[aSort]
+        aPoint = aPoint[aSort]
+        aDist = aDist[aSort]
+        aPerQuery = np.bincount(aQuery, minlength=iQueries)
+        aRank = np.arange(iTotal) - np.repeat(np.cumsum(aPerQuery) - aPerQuery, aPerQuery)
+        aKeep = aRank < k
+
+        aFound = aPerQuery >= k
+        aKth = np.full(iQueries, np.inf)
+        aKth[aQuery[aRank == k - 1]] = aDist[aRank == k - 1]
+        # all points closer than the ring radius are in the searched cells
+        aFound &= aKth <= (iRing - 1e-6) * self.fCellSize
+
+        aTake = aKeep & aFound[aQuery]
+        return (aFound, aPoint[aTake].reshape(-1, k), aDist[aTake].reshape(-1, k))
+
+    def search_all(self, aQueries, k):
+        aIndices = np.zeros((len(aQueries), k), dtype=np.int64)
+        aDistances = np.zeros((len(aQueries), k))
+        iChunk = max(1, self.iBruteForceChunk // len(self.aPoints))
+        aPointIndices = np.arange(len(self.aPoints))
+        for iStart in range(0, len(aQueries), iChunk):
+            aChunk = aQueries[iStart:iStart + iChunk]
+            aDist = np.sqrt(((aChunk[:, None, :] - self.aPoints[None, :, :]) ** 2).sum(axis=2))
+            aSort = np.lexsort((np.broadcast_to(aPointIndices, aDist.shape), aDist))[:, :k]
+            aIndices[iStart:iStart + iChunk] = aSort
+            aDistances[iStart:iStart + iChunk] = np.take_along_axis(aDist, aSort, axis=1)
+        return aIndices, aDistances
+
+'''
+# ----------------------------------------
+# Binding
+# ----------------------------------------
+'''
+
+def licInverseDistanceFactors(aDistances):
+    '''
+    the factors of licGetClosestVertsTransformed for rows of sorted distances:
+    normalize the distances to sum one, then 2/n - normalized
+    note: all Factors add up to one, equal factors for zero distances
+    '''
+    n = aDistances.shape[1]
+    aSums = aDistances.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aNormalized = np.where(aSums > 0, aDistances / aSums, 1.0 / n)
+    return 2.0 / n - aNormalized
+
+
+def licBindClosestVerts(aSourcePositions, aTargetPositions, iAveraging=1):
+    '''
+    returns arrays of the closest source vertex indices and their factors
+    for all target positions
+    '''
+    oGrid = licPointGrid(aSourcePositions)
+    aIndices, aDistances = oGrid.query(aTargetPositions, iAveraging)
+    if aIndices.shape[1] == 1:
+        return aIndices, np.ones(aIndices.shape, dtype=np.int64)
+    return aIndices, licInverseDistanceFactors(aDistances)
+
+
+def licBindDicts(aIndices, aFactors):
+    '''
+    the bindings as dictionaries {'sVertIndex':iFactor) for IDProperties
+    note: IDProperties can only be ints, floats, dicts (not lists unfortunately)
+    '''
+    lKeys = [['%s' % i for i in aRow] for aRow in aIndices.tolist()]
+    return [dict(zip(lRowKeys, lRowFactors)) for lRowKeys, lRowFactors in zip(lKeys, aFactors.tolist())]
@@ -0,0 +1,93 @@
+# --------------------------------------------------------------------------
+# Lichtwerk Scripts (author Philipp Oeser)
+# --------------------------------------------------------------------------
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+# --------------------------------------------------------------------------
+
+'''
+# ----------------------------------------
+# Tests of closest_verts
+# ----------------------------------------
+the grid binding against the distance to every source vertex as the
+addon measured it before, run from this directory with:
+    python closest_verts_test.py
+'''
+
+import math
+import unittest
+
+import numpy as np
+
+from closest_verts import licBindClosestVerts, licBindDicts
+
+
+def _legacy_closest_verts(lGlobalVertexPositions, vPoint, iAveraging=1):
+    # licGetClosestVertsTransformed with tuples instead of mathutils vectors
+    def length(pos):
+        return math.sqrt(sum((a - b) ** 2 for a, b in zip(vPoint, pos)))
+    ltVertDistances = [ (index, length(pos)) for (index, pos) in lGlobalVertexPositions ]
+    if iAveraging == 1:
+        return {'%s' % min(ltVertDistances, key=lambda x: x[1])[0]: 1}
+    ltVertDistances = sorted(ltVertDistances, key=lambda x: x[1])[:iAveraging]
+    fSum = sum(iDistance for (iIndex, iDistance) in ltVertDistances)
+    lNormalized = [ x/(fSum*1.0) for (iIndex, x) in ltVertDistances ]
+    lNormalizedInverse = [ (2/len(lNormalized))-iValue for iValue in lNormalized ]
+    return dict(('%s' % k, f) for ((k, i), f) in zip(ltVertDistances, lNormalizedInverse))
+
+
+class TestClosestVerts(unittest.TestCase):
+
+    def compare(self, aSource, aTarget, iAveraging):
+        lSource = list(enumerate(aSource.tolist()))
+        aIndices, aFactors = licBindClosestVerts(aSource, aTarget, iAveraging)
+        for dBound, vPoint in zip(licBindDicts(aIndices, aFactors), aTarget.tolist()):
+            dExpected = _legacy_closest_verts(lSource, vPoint, iAveraging)
+            self.assertEqual(sorted(dBound), sorted(dExpected))
+            for sKey in dExpected:
+                self.assertAlmostEqual(dBound[sKey], dExpected[sKey], places=9)
+
+    def test_volume(self):
+        oRandom = np.random.RandomState(0)
+        aSource = oRandom.uniform(-1, 1, (2000, 3))
+        aTarget = oRandom.uniform(-1.2, 1.2, (300, 3))
+        for iAveraging in (1, 2, 4, 8):
+            self.compare(aSource, aTarget, iAveraging)
+
+    def test_plane_and_far_points(self):
+        # a flat grid with doubled vertices, queries far off the plane
+        x, y = np.meshgrid(np.arange(30.0), np.arange(30.0))
+        aSource = np.stack((x.ravel(), y.ravel(), np.zeros(x.size)), axis=1)
+        aSource = np.concatenate((aSource, aSource[::7]))
+        oRandom = np.random.RandomState(1)
+        aTarget = np.concatenate((oRandom.uniform(-2, 32, (200, 3)) * [1, 1, 0.01],
+                                  oRandom.uniform(-200, 200, (20, 3))))
+        for iAveraging in (1, 3, 5):
+            self.compare(aSource, aTarget, iAveraging)
+
+    def test_few_points(self):
+        aSource = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+        aIndices, aFactors = licBindClosestVerts(aSource, [[0.25, 0.0, 0.0]], 4)
+        self.assertEqual(aIndices.tolist(), [[0, 1]])
+        self.assertEqual(aFactors.tolist(), [[0.75, 0.25]])
+        aIndices, aFactors = licBindClosestVerts(aSource[:1], [[0.0, 0.0, 0.0]], 3)
+        self.assertEqual(aFactors.tolist(), [[1.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -44,6 +44,8 @@ try:
     import re
     from mathutils import Vector
 
+    from . import topology
+
     SUBPANEL_LABEL = 'MeshLint'
     COMPLAINT_TIMEOUT = 3 # seconds
     ELEM_TYPES = [ 'verts', 'edges', 'faces' ]
@@ -80,6 +82,8 @@ try:
             self.num_problems_found = None
 
         def find_problems(self):
+            if not None is topology.np:
+                return self.find_problems_arrays()
             analysis = []
             self.num_problems_found = 0
             for lint in MeshLintAnalyzer.CHECKS:
@@ -101,6 +105,35 @@ try:
                 analysis.append(report)
             return analysis
 
+        def find_problems_arrays(self):
+            symbols = tuple(
+                lint['symbol'] for lint in MeshLintAnalyzer.CHECKS
+                if getattr(bpy.context.scene, lint['check_prop']))
+            arrays = topology.bmesh_arrays(self.b)
+            key = (self.obj.data.name, symbols) + topology.topology_key(*arrays)
+            found = topology.cache.get(key)
+            if None is found:
+                found = topology.analyse(
+                    topology.MeshTopology(*arrays), symbols)
+                topology.cache.store(key, found)
+            analysis = []
+            self.num_problems_found = 0
+            for lint in MeshLintAnalyzer.CHECKS:
+                sym = lint['symbol']
+                if not sym in found:
+                    lint['count'] = N_A_STR
+                    continue
+                lint['count'] = 0
+                bad = found[sym]
+                report = { 'lint': lint }
+                for elemtype in ELEM_TYPES:
+                    indices = bad.get(elemtype, [])
+                    report[elemtype] = indices
+                    lint['count'] += len(indices)
+                    self.num_problems_found += len(indices)
+                analysis.append(report)
+            return analysis
+
         def found_zero_problems(self):
             return 0 == self.num_problems_found
 
@@ -221,7 +254,8 @@ try:
                 'data': self.obj.data,
                 'faces': len(self.b.faces),
                 'edges': len(self.b.edges),
-                'verts': len(self.b.verts) }
+                'verts': len(self.b.verts),
+                'checksum': topology.bmesh_key(self.b)[-1] }
 
         for lint in CHECKS:
             sym = lint['symbol']
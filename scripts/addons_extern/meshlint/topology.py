@@ -0,0 +1,171 @@
+# Array-based MeshLint analysis.
+#
+# The checks are computed from flat topology arrays (face sizes, loop verts,
+# loop edges, edge verts) gathered from the BMesh in one pass, with the
+# edge-face and vert-edge incidence counts taken by bincount, instead of
+# walking the BMesh once per check. The last result is kept, keyed by the
+# topology counts and a checksum of the arrays, so the live checker doesn't
+# analyse an unchanged mesh again on every scene update.
+
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def bmesh_arrays(b):
+    """
+    The arguments of MeshTopology for a BMesh: the number of verts and the
+    face sizes, loop verts, loop edges and edge verts as int arrays.
+    """
+    b.verts.index_update()
+    b.edges.index_update()
+    b.faces.index_update()
+    face_sizes = array('i', [len(f.loops) for f in b.faces])
+    loop_verts = array('i', [l.vert.index for f in b.faces for l in f.loops])
+    loop_edges = array('i', [l.edge.index for f in b.faces for l in f.loops])
+    edge_verts = array('i', [v.index for e in b.edges for v in e.verts])
+    return len(b.verts), face_sizes, loop_verts, loop_edges, edge_verts
+
+
+def topology_key(num_verts, face_sizes, loop_verts, loop_edges, edge_verts):
+    """
+    The topology counts and a checksum of the face sizes, all loop verts and
+    the edge verts, so an edit that keeps the counts (an edge rotate, say)
+    still changes the key.
+    """
+    crc = 0
+    for values in (face_sizes, loop_verts, edge_verts):
+        crc = zlib.crc32(values.tobytes(), crc)
+    return num_verts, len(edge_verts) // 2, len(face_sizes), crc
+
+
+def bmesh_key(b):
+    return topology_key(*bmesh_arrays(b))
+
+
+class MeshTopology:
+    """
+    Polygon topology as flat arrays: face_sizes[f] loops per face,
+    loop_verts[l] and loop_edges[l] for the loops of all faces in order,
+    edge_verts[e] the two verts of each edge.
+    """
+    def __init__(self, num_verts, face_sizes, loop_verts, loop_edges, edge_verts):
+        self.num_verts = num_verts
+        self.face_sizes = np.asarray(face_sizes, dtype=np.int64)
+        self.loop_verts = np.asarray(loop_verts, dtype=np.int64)
+        self.loop_edges = np.asarray(loop_edges, dtype=np.int64)
+        self.edge_verts = np.asarray(edge_verts, dtype=np.int64).reshape(-1, 2)
+
+        self.face_starts = np.cumsum(self.face_sizes) - self.face_sizes
+        # faces per edge, the radial length of bmesh
+        self.edge_faces = np.bincount(self.loop_edges, minlength=len(self.edge_verts))
+        self.vert_edges = np.bincount(self.edge_verts.ravel(), minlength=num_verts)
+
+    @classmethod
+    def from_bmesh(cls, b):
+        return cls(*bmesh_arrays(b))
+
+    def next_loops(self):
+        loops = np.arange(len(self.loop_verts)) + 1
+        loops[self.face_starts + self.face_sizes - 1] = self.face_starts
+        return loops
+
+    def vert_fans(self):
+        """
+        The number of fans of faces around each vert, faces joined by the
+        edges they share at the vert when the edge has exactly two faces.
+        """
+        num_loops = len(self.loop_verts)
+        if num_loops == 0:
+            return np.zeros(self.num_verts, dtype=np.int64)
+        next_loop = self.next_loops()
+
+        # the two loops of each edge with two faces
+        order = np.argsort(self.loop_edges, kind='mergesort')
+        starts = np.searchsorted(self.loop_edges[order], np.flatnonzero(self.edge_faces == 2))
+        l1 = order[starts]
+        l2 = order[starts + 1]
+        # the corners of both faces at either end of the edge
+        same = self.loop_verts[l1] == self.loop_verts[l2]
+        a = np.concatenate((l1, next_loop[l1]))
+        b = np.concatenate((np.where(same, l2, next_loop[l2]), np.where(same, next_loop[l2], l2)))
+
+        # connected corners, by propagating the lowest loop number
+        labels = np.arange(num_loops)
+        while True:
+            low = np.minimum(labels[a], labels[b])
+            new = labels.copy()
+            np.minimum.at(new, a, low)
+            np.minimum.at(new, b, low)
+            new = new[new]
+            if np.array_equal(new, labels):
+                break
+            labels = new
+
+        pairs = np.unique(self.loop_verts * num_loops + labels)
+        return np.bincount(pairs // num_loops, minlength=self.num_verts)
+
+
+def check_tris(topology):
+    return {'faces': np.flatnonzero(topology.face_sizes == 3).tolist()}
+
+
+def check_ngons(topology):
+    return {'faces': np.flatnonzero(topology.face_sizes > 4).tolist()}
+
+
+def check_nonmanifold(topology):
+    # BM_vert_is_manifold: no loose verts, no loose edges or edges with
+    # more than two faces, and the faces around the vert in one fan
+    edge_faces = topology.edge_faces
+    bad_verts = topology.vert_edges == 0
+    bad_verts[topology.edge_verts[(edge_faces == 0) | (edge_faces > 2)].ravel()] = True
+    bad_verts |= topology.vert_fans() > 1
+    return {
+        'verts': np.flatnonzero(bad_verts).tolist(),
+        'edges': np.flatnonzero(edge_faces != 2).tolist()}
+
+
+def check_interior_faces(topology):
+    if len(topology.face_sizes) == 0:
+        return {'faces': []}
+    least = np.minimum.reduceat(topology.edge_faces[topology.loop_edges], topology.face_starts)
+    return {'faces': np.flatnonzero(least > 2).tolist()}
+
+
+def check_sixplus_poles(topology):
+    return {'verts': np.flatnonzero(topology.vert_edges > 5).tolist()}
+
+
+CHECKS = {
+    'tris': check_tris,
+    'ngons': check_ngons,
+    'nonmanifold': check_nonmanifold,
+    'interior_faces': check_interior_faces,
+    'sixplus_poles': check_sixplus_poles,
+}
+
+
+def analyse(topology, symbols):
+    return {sym: CHECKS[sym](topology) for sym in symbols}
+
+
+class AnalysisCache:
+    """The last analysis and the key it was made for"""
+    def __init__(self):
+        self.key = None
+        self.analysis = None
+
+    def get(self, key):
+        if key == self.key:
+            return self.analysis
+        return None
+
+    def store(self, key, analysis):
+        self.key = key
+        self.analysis = analysis
+
+cache = AnalysisCache()
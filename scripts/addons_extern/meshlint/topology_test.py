@@ -0,0 +1,156 @@
+# Tests of the array-based MeshLint checks against per element checks on
+# plain lists, run outside of Blender from this directory with:
+#     python topology_test.py
+
+import unittest
+from array import array
+
+from topology import CHECKS, MeshTopology, analyse, topology_key
+
+
+def grid(nx, ny):
+    """A grid of nx * ny quads, as verts and faces"""
+    verts = [(x, y) for y in range(ny + 1) for x in range(nx + 1)]
+    faces = [(y * (nx + 1) + x, y * (nx + 1) + x + 1, (y + 1) * (nx + 1) + x + 1, (y + 1) * (nx + 1) + x)
+             for y in range(ny) for x in range(nx)]
+    return len(verts), faces
+
+
+def face_arrays(num_verts, faces, loose_edges=()):
+    """The MeshTopology arguments of faces given by their verts, edges numbered as they appear"""
+    edge_index = {}
+    loop_edges = []
+    for face in faces:
+        for i, v in enumerate(face):
+            key = frozenset((v, face[(i + 1) % len(face)]))
+            loop_edges.append(edge_index.setdefault(key, len(edge_index)))
+    for edge in loose_edges:
+        edge_index.setdefault(frozenset(edge), len(edge_index))
+    edge_verts = [v for key in sorted(edge_index, key=edge_index.get) for v in sorted(key)]
+    return (num_verts, array('i', [len(f) for f in faces]), array('i', [v for f in faces for v in f]),
+            array('i', loop_edges), array('i', edge_verts))
+
+
+def from_faces(num_verts, faces, loose_edges=()):
+    """A MeshTopology of faces given by their verts"""
+    return MeshTopology(*face_arrays(num_verts, faces, loose_edges))
+
+
+def _python_analysis(topology):
+    # the per element checks of MeshLintAnalyzer on plain lists
+    face_sizes = topology.face_sizes.tolist()
+    loop_verts = topology.loop_verts.tolist()
+    loop_edges = topology.loop_edges.tolist()
+    edge_verts = topology.edge_verts.tolist()
+    starts = topology.face_starts.tolist()
+    faces = [list(range(s, s + n)) for s, n in zip(starts, face_sizes)]
+
+    link_faces = [[] for e in edge_verts]
+    for f, loops in enumerate(faces):
+        for l in loops:
+            link_faces[loop_edges[l]].append(f)
+    link_edges = [[] for v in range(topology.num_verts)]
+    for e, (v1, v2) in enumerate(edge_verts):
+        link_edges[v1].append(e)
+        link_edges[v2].append(e)
+
+    def vert_is_manifold(v):
+        if not link_edges[v]:
+            return False
+        if any(not link_faces[e] or len(link_faces[e]) > 2 for e in link_edges[v]):
+            return False
+        # walk the fan from the first edge, as the disk cycle walk
+        around = set()
+        todo = [link_edges[v][0]]
+        while todo:
+            e = todo.pop()
+            if e in around:
+                continue
+            around.add(e)
+            for f in link_faces[e]:
+                todo.extend(loop_edges[l] for l in faces[f]
+                            if v in edge_verts[loop_edges[l]])
+        return len(around) == len(link_edges[v])
+
+    return {
+        'tris': {'faces': [f for f, n in enumerate(face_sizes) if 3 == n]},
+        'ngons': {'faces': [f for f, n in enumerate(face_sizes) if 4 < n]},
+        'nonmanifold': {
+            'verts': [v for v in range(topology.num_verts) if not vert_is_manifold(v)],
+            'edges': [e for e in range(len(edge_verts)) if len(link_faces[e]) != 2]},
+        'interior_faces': {'faces': [f for f, loops in enumerate(faces)
+                                     if not any(3 > len(link_faces[loop_edges[l]]) for l in loops)]},
+        'sixplus_poles': {'verts': [v for v in range(topology.num_verts) if 5 < len(link_edges[v])]},
+    }
+
+
+class TestTopology(unittest.TestCase):
+
+    def analysis(self, num_verts, faces, loose_edges=()):
+        topology = from_faces(num_verts, faces, loose_edges)
+        result = analyse(topology, CHECKS)
+        self.assertEqual(result, _python_analysis(topology))
+        return result
+
+    def test_cube(self):
+        faces = [(0, 1, 2, 3), (7, 6, 5, 4), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (3, 7, 4, 0)]
+        result = self.analysis(8, faces)
+        self.assertTrue(all(not indices for check in result.values() for indices in check.values()))
+
+    def test_open_grid(self):
+        num_verts, faces = grid(3, 3)
+        result = self.analysis(num_verts, faces)
+        self.assertEqual(result['nonmanifold']['verts'], [])
+        self.assertEqual(len(result['nonmanifold']['edges']), 12)
+
+    def test_fans(self):
+        # two triangles touching at a vert, a pyramid touching a triangle at its apex
+        result = self.analysis(5, [(0, 1, 2), (0, 3, 4)])
+        self.assertEqual(result['nonmanifold']['verts'], [0])
+        self.assertEqual(result['tris']['faces'], [0, 1])
+        pyramid = [(0, 1, 2), (0, 2, 3), (0, 3, 4), (0, 4, 1), (4, 3, 2, 1), (0, 5, 6)]
+        result = self.analysis(7, pyramid)
+        self.assertEqual(result['nonmanifold']['verts'], [0])
+        # flipped face in a closed pyramid is still one fan
+        pyramid[1] = (0, 3, 2)
+        self.assertEqual(self.analysis(5, pyramid[:5])['nonmanifold']['verts'], [])
+
+    def test_interior_face(self):
+        # two cubes stacked with the face between them, as Ctrl+r and f
+        faces = [(0, 1, 2, 3), (8, 9, 10, 11), (4, 5, 6, 7)]
+        for level in (0, 4):
+            for i in range(4):
+                j = (i + 1) % 4
+                faces.append((level + i, level + j, level + 4 + j, level + 4 + i))
+        result = self.analysis(12, faces)
+        self.assertEqual(result['interior_faces']['faces'], [2])
+        self.assertEqual(result['nonmanifold']['verts'], [4, 5, 6, 7])
+
+    def test_loose_and_poles(self):
+        hexagon = [(0, i, i % 6 + 1) for i in range(1, 7)]
+        result = self.analysis(9, hexagon, loose_edges=[(7, 1)])
+        self.assertEqual(result['sixplus_poles']['verts'], [0])
+        self.assertEqual(result['nonmanifold']['verts'], [1, 7, 8])
+        self.assertEqual(result['ngons']['faces'], [])
+
+    def test_grid_with_ngons(self):
+        num_verts, faces = grid(20, 20)
+        faces[5] = faces[5][:3]
+        faces[30] = faces[30] + (num_verts,)
+        self.analysis(num_verts + 1, faces)
+
+    def test_key_edge_rotate(self):
+        # split a quad in the middle of the grid along either diagonal, the
+        # counts are the same but the cached analysis must not be
+        num_verts, faces = grid(40, 40)
+        a, b, c, d = faces[820]
+        split = faces[:820] + [(a, b, c), (a, c, d)] + faces[821:]
+        rotated = faces[:820] + [(a, b, d), (b, c, d)] + faces[821:]
+        key = topology_key(*face_arrays(num_verts, split))
+        self.assertEqual(key, topology_key(*face_arrays(num_verts, split)))
+        self.assertEqual(key[:3], topology_key(*face_arrays(num_verts, rotated))[:3])
+        self.assertNotEqual(key, topology_key(*face_arrays(num_verts, rotated)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,8 +16,7 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
-import os, struct
-import array, zlib
+import os
 
 import bpy, mathutils, math
 from bpy.app.handlers import persistent
@@ -27,6 +26,8 @@ from extensions_framework import util as efutil
 from ..outputs import MtsLog
 from ..export import ParamSet, ExportProgressThread, ExportCache
 from ..export import is_obj_visible
+from ..export import mesh_buffers, hair_buffers
+from ..export.geometry_cache import GeometryCache
 
 class InvalidGeometryException(Exception):
 	pass
@@ -40,6 +41,37 @@ class MeshExportProgressThread(ExportProgressThread):
 class DupliExportProgressThread(ExportProgressThread):
 	message = '... %i%% ...'
 
+def read_mesh_buffers(mesh):
+	"""
+	Read the tessellated mesh into flat buffers for mesh_buffers, returns
+	(co, vnormals, faces, face_normals, smooth, material_index, uvs).
+	"""
+	
+	nverts = len(mesh.vertices)
+	nfaces = len(mesh.tessfaces)
+	
+	co = [0.0] * (3 * nverts)
+	vnormals = [0.0] * (3 * nverts)
+	mesh.vertices.foreach_get('co', co)
+	mesh.vertices.foreach_get('normal', vnormals)
+	
+	faces = [0] * (4 * nfaces)
+	face_normals = [0.0] * (3 * nfaces)
+	smooth = [False] * nfaces
+	material_index = [0] * nfaces
+	mesh.tessfaces.foreach_get('vertices_raw', faces)
+	mesh.tessfaces.foreach_get('normal', face_normals)
+	mesh.tessfaces.foreach_get('use_smooth', smooth)
+	mesh.tessfaces.foreach_get('material_index', material_index)
+	
+	uvs = None
+	uv_textures = mesh.tessface_uv_textures
+	if len(uv_textures) > 0 and uv_textures.active and uv_textures.active.data:
+		uvs = [0.0] * (8 * nfaces)
+		uv_textures.active.data.foreach_get('uv_raw', uvs)
+	
+	return co, vnormals, faces, face_normals, smooth, material_index, uvs
+
 class GeometryExporter(object):
 	
 	# for partial mesh export
@@ -61,6 +93,15 @@ class GeometryExporter(object):
 		# start fresh
 		GeometryExporter.NewExportedObjects = set()
 		
+		# persistent content-hash cache of mesh files
+		self.geometry_cache = None
+		engine = visibility_scene.mitsuba_engine
+		if engine.geometry_cache:
+			self.geometry_cache = GeometryCache(
+				os.path.join(mts_context.meshes_dir, 'cache'),
+				engine.geometry_cache_size * 1048576
+			)
+		
 		self.objects_used_as_duplis = set()
 		
 		self.have_emitting_object = False
@@ -126,12 +167,8 @@ class GeometryExporter(object):
 				raise UnexportableObjectException('Cannot create render/export mesh')
 			
 			# collate faces by mat index
-			ffaces_mats = {}
-			mesh_faces = mesh.tessfaces
-			for f in mesh_faces:
-				mi = f.material_index
-				if mi not in ffaces_mats.keys(): ffaces_mats[mi] = []
-				ffaces_mats[mi].append( f )
+			co, vnormals, faces, face_normals, smooth, material_index, uvs = read_mesh_buffers(mesh)
+			ffaces_mats = mesh_buffers.split_by_material(material_index, faces, face_normals, smooth, uvs)
 			material_indices = ffaces_mats.keys()
 			
 			if len(mesh.materials) > 0 and mesh.materials[0] != None:
@@ -139,6 +176,9 @@ class GeometryExporter(object):
 			else:
 				mats = [(0, None)]
 			
+			if self.geometry_cache is not None:
+				mesh_key = GeometryCache.make_key(co, vnormals)
+			
 			for i, mat in mats:
 				try:
 					if i not in material_indices: continue
@@ -149,152 +189,59 @@ class GeometryExporter(object):
 						mesh_definitions.append( self.ExportedMeshes.get(mesh_cache_key) )
 						continue
 					
-					# Put PLY files in frame-numbered subfolders to avoid
-					# clobbering when rendering animations
-					#sc_fr = '%s/%s/%s/%05d' % (efutil.export_path, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
-					sc_fr = '%s/%s/%s/%05d' % (self.mts_context.meshes_dir, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
-					if not os.path.exists( sc_fr ):
-						os.makedirs(sc_fr)
-					
-					def make_plyfilename():
-						ply_serial = self.ExportedPLYs.serial(mesh_cache_key)
-						mesh_name = '%s_%04d_m%03d' % (obj.data.name, ply_serial, i)
-						ply_filename = '%s.ply' % bpy.path.clean_name(mesh_name)
-						ply_path = '/'.join([sc_fr, ply_filename])
-						return mesh_name, ply_path
-					
-					mesh_name, ply_path = make_plyfilename()
-					
-					# Ensure that all PLY files have unique names
-					while self.ExportedPLYs.have(ply_path):
+					cache_key = None
+					if self.geometry_cache is not None:
+						# reuse the file of identical geometry and material, the
+						# cache directory is shared by all frames
+						cache_key = GeometryCache.make_key('ply', mat.name if mat else '', mesh_key, *ffaces_mats[i])
+						mesh_name = '%s_%04d_m%03d' % (obj.data.name, self.ExportedPLYs.serial(mesh_cache_key), i)
+						ply_path = self.geometry_cache.path(cache_key, '.ply')
+						write_file = self.geometry_cache.lookup(cache_key, '.ply') is None
+					else:
+						# Put PLY files in frame-numbered subfolders to avoid
+						# clobbering when rendering animations
+						#sc_fr = '%s/%s/%s/%05d' % (efutil.export_path, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
+						sc_fr = '%s/%s/%s/%05d' % (self.mts_context.meshes_dir, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
+						if not os.path.exists( sc_fr ):
+							os.makedirs(sc_fr)
+						
+						def make_plyfilename():
+							ply_serial = self.ExportedPLYs.serial(mesh_cache_key)
+							mesh_name = '%s_%04d_m%03d' % (obj.data.name, ply_serial, i)
+							ply_filename = '%s.ply' % bpy.path.clean_name(mesh_name)
+							ply_path = '/'.join([sc_fr, ply_filename])
+							return mesh_name, ply_path
+						
 						mesh_name, ply_path = make_plyfilename()
+						
+						# Ensure that all PLY files have unique names
+						while self.ExportedPLYs.have(ply_path):
+							mesh_name, ply_path = make_plyfilename()
+						
+						# skip writing the PLY file if the box is checked
+						skip_exporting = obj in self.KnownExportedObjects and not obj in self.KnownModifiedObjects
+						write_file = not os.path.exists(ply_path) or not (self.visibility_scene.mitsuba_engine.partial_export and skip_exporting)
 					
 					self.ExportedPLYs.add(ply_path, None)
 					
-					# skip writing the PLY file if the box is checked
-					skip_exporting = obj in self.KnownExportedObjects and not obj in self.KnownModifiedObjects
-					if not os.path.exists(ply_path) or not (self.visibility_scene.mitsuba_engine.partial_export and skip_exporting):
+					if write_file:
 						
 						GeometryExporter.NewExportedObjects.add(obj)
 						
-						uv_textures = mesh.tessface_uv_textures
-						if len(uv_textures) > 0:
-							if uv_textures.active and uv_textures.active.data:
-								uv_layer = uv_textures.active.data
-						else:
-							uv_layer = None
-						
-						# Here we work out exactly which vert+normal combinations
-						# we need to export. This is done first, and the export
-						# combinations cached before writing to file because the
-						# number of verts needed needs to be written in the header
-						# and that number is not known before this is done.
-						
-						# Export data
-						ntris = 0
-						co_no_uv_cache = []
-						face_vert_indices = []		# mapping of face index to list of exported vert indices for that face
-						
-						# Caches
-						vert_vno_indices = {}		# mapping of vert index to exported vert index for verts with vert normals
-						vert_use_vno = set()		# Set of vert indices that use vert normals
+						# Work out exactly which vert+normal combinations we need
+						# to export, and triangulate the faces. UVs of flat faces
+						# are written unflipped, as this exporter always did.
+						points, normals, texcoords, tris = mesh_buffers.build_buffers(
+							co, vnormals, *ffaces_mats[i], flip_flat_uvs=False
+						)
 						
-						vert_index = 0				# exported vert index
-						for face in ffaces_mats[i]:
-							fvi = []
-							for j, vertex in enumerate(face.vertices):
-								v = mesh.vertices[vertex]
-								
-								if uv_layer:
-									# Flip UV Y axis. Blender UV coord is bottom-left, Mitsuba is top-left.
-									uv_coord = (uv_layer[face.index].uv[j][0], 1.0 - uv_layer[face.index].uv[j][1])
-								
-								if face.use_smooth:
-									
-									if uv_layer:
-										vert_data = (v.co[:], v.normal[:], uv_coord )
-									else:
-										vert_data = (v.co[:], v.normal[:] )
-									
-									if vert_data not in vert_use_vno:
-										vert_use_vno.add(vert_data)
-										
-										co_no_uv_cache.append( vert_data )
-										
-										vert_vno_indices[vert_data] = vert_index
-										fvi.append(vert_index)
-										
-										vert_index += 1
-									else:
-										fvi.append(vert_vno_indices[vert_data])
-									
-								else:
-									
-									if uv_layer:
-										vert_data = (v.co[:], face.normal[:], uv_layer[face.index].uv[j][:])
-									else:
-										vert_data = (v.co[:], face.normal[:])
-									
-									# All face-vert-co-no are unique, we cannot
-									# cache them
-									co_no_uv_cache.append( vert_data )
-									
-									fvi.append(vert_index)
-									
-									vert_index += 1
-							
-							# For Mitsuba, we need to triangulate quad faces
-							face_vert_indices.append( fvi[0:3] )
-							ntris += 3
-							if len(fvi) == 4:
-								face_vert_indices.append(( fvi[0], fvi[2], fvi[3] ))
-								ntris += 3
+						with open(ply_path, 'wb') as ply:
+							mesh_buffers.write_ply(ply, points, normals, texcoords, tris)
 						
-						del vert_vno_indices
-						del vert_use_vno
+						del points, normals, texcoords, tris
 						
-						with open(ply_path, 'wb') as ply:
-							ply.write(b'ply\n')
-							ply.write(b'format binary_little_endian 1.0\n')
-							ply.write(b'comment Created by MtsBlend 2.5 exporter for Mitsuba - www.mitsuba.net\n')
-							
-							# vert_index == the number of actual verts needed
-							ply.write( ('element vertex %d\n' % vert_index).encode() )
-							ply.write(b'property float x\n')
-							ply.write(b'property float y\n')
-							ply.write(b'property float z\n')
-							
-							ply.write(b'property float nx\n')
-							ply.write(b'property float ny\n')
-							ply.write(b'property float nz\n')
-							
-							if uv_layer:
-								ply.write(b'property float s\n')
-								ply.write(b'property float t\n')
-							
-							ply.write( ('element face %d\n' % int(ntris / 3)).encode() )
-							ply.write(b'property list uchar uint vertex_indices\n')
-							
-							ply.write(b'end_header\n')
-							
-							# dump cached co/no/uv
-							if uv_layer:
-								for co,no,uv in co_no_uv_cache:
-									ply.write( struct.pack('<3f', *co) )
-									ply.write( struct.pack('<3f', *no) )
-									ply.write( struct.pack('<2f', *uv) )
-							else:
-								for co,no in co_no_uv_cache:
-									ply.write( struct.pack('<3f', *co) )
-									ply.write( struct.pack('<3f', *no) )
-							
-							# dump face vert indices
-							for face in face_vert_indices:
-								ply.write( struct.pack('<B', 3) )
-								ply.write( struct.pack('<3I', *face) )
-							
-							del co_no_uv_cache
-							del face_vert_indices
+						if cache_key is not None:
+							self.geometry_cache.store(cache_key, '.ply')
 						
 						MtsLog('Binary PLY file written: %s' % (ply_path))
 					else:
@@ -356,12 +303,8 @@ class GeometryExporter(object):
 				raise UnexportableObjectException('Cannot create render/export mesh')
 			
 			# collate faces by mat index
-			ffaces_mats = {}
-			mesh_faces = mesh.tessfaces
-			for f in mesh_faces:
-				mi = f.material_index
-				if mi not in ffaces_mats.keys(): ffaces_mats[mi] = []
-				ffaces_mats[mi].append( f )
+			co, vnormals, faces, face_normals, smooth, material_index, uvs = read_mesh_buffers(mesh)
+			ffaces_mats = mesh_buffers.split_by_material(material_index, faces, face_normals, smooth, uvs)
 			material_indices = ffaces_mats.keys()
 			
 			if len(mesh.materials) > 0 and mesh.materials[0] != None:
@@ -369,6 +312,9 @@ class GeometryExporter(object):
 			else:
 				mats = [(0, None)]
 			
+			if self.geometry_cache is not None:
+				mesh_key = GeometryCache.make_key(co, vnormals)
+			
 			for i, mat in mats:
 				try:
 					if i not in material_indices: continue
@@ -379,133 +325,59 @@ class GeometryExporter(object):
 						mesh_definitions.append( self.ExportedMeshes.get(mesh_cache_key) )
 						continue
 					
-					# Put Serialized files in frame-numbered subfolders to avoid
-					# clobbering when rendering animations
-					#sc_fr = '%s/%s/%s/%05d' % (efutil.export_path, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
-					sc_fr = '%s/%s/%s/%05d' % (self.mts_context.meshes_dir, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
-					if not os.path.exists( sc_fr ):
-						os.makedirs(sc_fr)
-					
-					def make_serfilename():
-						ser_serial = self.ExportedSERs.serial(mesh_cache_key)
-						mesh_name = '%s_%04d_m%03d' % (obj.data.name, ser_serial, i)
-						ser_filename = '%s.serialized' % bpy.path.clean_name(mesh_name)
-						ser_path = '/'.join([sc_fr, ser_filename])
-						return mesh_name, ser_path
-					
-					mesh_name, ser_path = make_serfilename()
-					
-					# Ensure that all Serialized files have unique names
-					while self.ExportedSERs.have(ser_path):
+					cache_key = None
+					if self.geometry_cache is not None:
+						# reuse the file of identical geometry and material, the
+						# cache directory is shared by all frames
+						cache_key = GeometryCache.make_key('serialized', mat.name if mat else '', mesh_key, *ffaces_mats[i])
+						mesh_name = '%s_%04d_m%03d' % (obj.data.name, self.ExportedSERs.serial(mesh_cache_key), i)
+						ser_path = self.geometry_cache.path(cache_key, '.serialized')
+						write_file = self.geometry_cache.lookup(cache_key, '.serialized') is None
+					else:
+						# Put Serialized files in frame-numbered subfolders to avoid
+						# clobbering when rendering animations
+						#sc_fr = '%s/%s/%s/%05d' % (efutil.export_path, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
+						sc_fr = '%s/%s/%s/%05d' % (self.mts_context.meshes_dir, efutil.scene_filename(), bpy.path.clean_name(self.geometry_scene.name), self.visibility_scene.frame_current)
+						if not os.path.exists( sc_fr ):
+							os.makedirs(sc_fr)
+						
+						def make_serfilename():
+							ser_serial = self.ExportedSERs.serial(mesh_cache_key)
+							mesh_name = '%s_%04d_m%03d' % (obj.data.name, ser_serial, i)
+							ser_filename = '%s.serialized' % bpy.path.clean_name(mesh_name)
+							ser_path = '/'.join([sc_fr, ser_filename])
+							return mesh_name, ser_path
+						
 						mesh_name, ser_path = make_serfilename()
+						
+						# Ensure that all Serialized files have unique names
+						while self.ExportedSERs.have(ser_path):
+							mesh_name, ser_path = make_serfilename()
+						
+						# skip writing the Serialized file if the box is checked
+						skip_exporting = obj in self.KnownExportedObjects and not obj in self.KnownModifiedObjects
+						write_file = not os.path.exists(ser_path) or not (self.visibility_scene.mitsuba_engine.partial_export and skip_exporting)
 					
 					self.ExportedSERs.add(ser_path, None)
 					
-					# skip writing the Serialized file if the box is checked
-					skip_exporting = obj in self.KnownExportedObjects and not obj in self.KnownModifiedObjects
-					if not os.path.exists(ser_path) or not (self.visibility_scene.mitsuba_engine.partial_export and skip_exporting):
+					if write_file:
 						
 						GeometryExporter.NewExportedObjects.add(obj)
 						
-						uv_textures = mesh.tessface_uv_textures
-						if len(uv_textures) > 0:
-							if uv_textures.active and uv_textures.active.data:
-								uv_layer = uv_textures.active.data
-						else:
-							uv_layer = None
-						
-						# Export data
-						points = array.array('d',[])
-						normals = array.array('d',[])
-						uvs = array.array('d',[])
-						ntris = 0
-						face_vert_indices = array.array('I',[])		# list of face vert indices
-						
-						# Caches
-						vert_vno_indices = {}		# mapping of vert index to exported vert index for verts with vert normals
-						vert_use_vno = set()		# Set of vert indices that use vert normals
+						# Work out exactly which vert+normal combinations we need
+						# to export, and triangulate the faces
+						points, normals, texcoords, tris = mesh_buffers.build_buffers(
+							co, vnormals, *ffaces_mats[i]
+						)
 						
-						vert_index = 0				# exported vert index
-						for face in ffaces_mats[i]:
-							fvi = []
-							for j, vertex in enumerate(face.vertices):
-								v = mesh.vertices[vertex]
-								
-								if uv_layer:
-									# Flip UV Y axis. Blender UV coord is bottom-left, Mitsuba is top-left.
-									uv_coord = (uv_layer[face.index].uv[j][0], 1.0 - uv_layer[face.index].uv[j][1])
-								
-								if face.use_smooth:
-									
-									if uv_layer:
-										vert_data = (v.co[:], v.normal[:], uv_coord )
-									else:
-										vert_data = (v.co[:], v.normal[:], tuple() )
-									
-									if vert_data not in vert_use_vno:
-										vert_use_vno.add(vert_data)
-										
-										points.extend( vert_data[0] )
-										normals.extend( vert_data[1] )
-										uvs.extend( vert_data[2] )
-										
-										vert_vno_indices[vert_data] = vert_index
-										fvi.append(vert_index)
-										
-										vert_index += 1
-									else:
-										fvi.append(vert_vno_indices[vert_data])
-									
-								else:
-									# all face-vert-co-no are unique, we cannot
-									# cache them
-									points.extend( v.co[:] )
-									normals.extend( face.normal[:] )
-									if uv_layer: uvs.extend( uv_coord )
-									
-									fvi.append(vert_index)
-									
-									vert_index += 1
-							
-							# For Mitsuba, we need to triangulate quad faces
-							face_vert_indices.extend( fvi[0:3] )
-							ntris += 3
-							if len(fvi) == 4:
-								face_vert_indices.extend(( fvi[0], fvi[2], fvi[3] ))
-								ntris += 3
+						# cached files are shared by objects, name them by content
+						with open(ser_path, 'wb') as ser:
+							mesh_buffers.write_serialized(ser, cache_key or mesh_name, points, normals, texcoords, tris)
 						
-						del vert_vno_indices
-						del vert_use_vno
+						del points, normals, texcoords, tris
 						
-						with open(ser_path, 'wb') as ser:
-							# create mesh flags
-							flags = 0
-							# turn on double precision
-							flags = flags | 0x2000
-							# turn on vertex normals
-							flags = flags | 0x0001
-							# turn on uv layer
-							if uv_layer:
-								flags = flags | 0x0002
-							
-							# begin serialized mesh data
-							ser.write(struct.pack('<HH', 0x041C, 0x0004))
-							
-							# encode serialized mesh
-							encoder = zlib.compressobj()
-							ser.write(encoder.compress(struct.pack('<I', flags)))
-							ser.write(encoder.compress(bytes(mesh_name + "_serialized\0",'latin-1')))
-							ser.write(encoder.compress(struct.pack('<QQ', vert_index, int(ntris/3))))
-							ser.write(encoder.compress(points.tostring()))
-							ser.write(encoder.compress(normals.tostring()))
-							if uv_layer:
-								ser.write(encoder.compress(uvs.tostring()))
-							ser.write(encoder.compress(face_vert_indices.tostring()))
-							ser.write(encoder.flush())
-							
-							ser.write(struct.pack('<Q', 0))
-							ser.write(struct.pack('<I', 1))
-							ser.close()
+						if cache_key is not None:
+							self.geometry_cache.store(cache_key, '.serialized')
 						
 						MtsLog('Binary Serialized file written: %s' % (ser_path))
 					else:
@@ -672,43 +544,6 @@ class GeometryExporter(object):
 			
 			self.mts_context.closeElement()
 	
-	def BSpline(self, points, dimension, degree, u):
-		controlpoints = []
-		def Basispolynom(controlpoints, i, u, degree):
-			if degree == 0:
-				temp = 0
-				if (controlpoints[i] <= u) and (u < controlpoints[i+1]): temp = 1
-			else:
-				N0 = Basispolynom(controlpoints,i,u,degree-1)
-				N1 = Basispolynom(controlpoints,i+1,u,degree-1)
-				
-				if N0 == 0: 
-					sum1 = 0
-				else:
-					sum1 = (u-controlpoints[i])/(controlpoints[i+degree] - controlpoints[i])*N0
-				if N1 == 0: 
-					sum2 = 0
-				else:
-					sum2 = (controlpoints[i+1+degree]-u)/(controlpoints[i+1+degree] - controlpoints[i+1])*N1
-				
-				temp = sum1 + sum2
-			return temp
-		
-		for i in range(len(points)+degree+1):
-			if i <= degree:
-				controlpoints.append(0)
-			elif i >= len(points):
-				controlpoints.append(len(points)-degree)
-			else:
-				controlpoints.append(i - degree)
-		
-		if dimension == 2: temp = mathutils.Vector((0.0,0.0))
-		elif dimension == 3: temp = mathutils.Vector((0.0,0.0,0.0))
-		
-		for i in range(len(points)):
-			temp = temp + Basispolynom(controlpoints, i, u, degree)*points[i]
-		return temp
-	
 	def handler_Duplis_PATH(self, obj, *args, **kwargs):
 		if not 'particle_system' in kwargs.keys():
 			MtsLog('ERROR: handler_Duplis_PATH called without particle_system')
@@ -762,9 +597,7 @@ class GeometryExporter(object):
 		mesh_definitions.append( mesh_definition )
 		self.exportShapeInstances(obj, mesh_definitions)
 		
-		hair_file = open(hair_file_path, 'w')
-		
-		transform = obj.matrix_world.inverted()
+		strands = []
 		for pindex in range(num_parents + num_children):
 			det.exported_objects += 1
 			points = []
@@ -772,26 +605,19 @@ class GeometryExporter(object):
 			for step in range(0,steps+1):
 				co = psys.co_hair(obj, mod, pindex, step)
 				if not co.length_squared == 0:
-					points.append(transform*co)
-			
-			if psys.settings.use_hair_bspline:
-				temp = []
-				degree = 2
-				dimension = 3
-				for i in range(math.trunc(math.pow(2,psys.settings.render_step))):
-					if i > 0:
-						u = i*(len(points)- degree)/math.trunc(math.pow(2,psys.settings.render_step)-1)-0.0000000000001
-					else:
-						u = i*(len(points)- degree)/math.trunc(math.pow(2,psys.settings.render_step)-1)
-					temp.append(self.BSpline(points, dimension, degree, u))
-				points = temp
-			
-			for p in points:
-				hair_file.write('%f %f %f\n' % (p[0], p[1], p[2]))
+					points.append(co[:])
 			
-			hair_file.write('\n')
+			strands.append(points)
+		
+		# transform and smooth all strands at once
+		transform = obj.matrix_world.inverted()
+		strands = hair_buffers.transform_strands(strands, [row[:] for row in transform])
+		
+		if psys.settings.use_hair_bspline:
+			strands = hair_buffers.evaluate_bsplines(strands, 2, steps)
 		
-		hair_file.close()
+		with open(hair_file_path, 'wb') as hair_file:
+			hair_buffers.write_hair(hair_file, strands, self.visibility_scene.mitsuba_engine.binary_hair)
 		
 		psys.set_resolution(self.geometry_scene, obj, 'PREVIEW')
 		det.stop()
@@ -967,6 +793,11 @@ class GeometryExporter(object):
 		GeometryExporter.KnownExportedObjects |= GeometryExporter.NewExportedObjects
 		GeometryExporter.NewExportedObjects = set()
 		
+		if self.geometry_cache is not None:
+			self.geometry_cache.prune()
+			self.geometry_cache.save()
+			MtsLog(self.geometry_cache.stats())
+		
 		return self.have_emitting_object
 
 # Update handlers
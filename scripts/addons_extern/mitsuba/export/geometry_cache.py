@@ -0,0 +1,144 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Persistent cache of exported mesh files, keyed by a hash of the mesh
+# buffers and material assignment. Files are kept in one directory with an
+# index that survives Blender restarts, so unchanged geometry is reused
+# across sessions and animation frames.
+
+import os, json, time
+import array, hashlib
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+def buffer_bytes(buf):
+	if buf is None:
+		return b''
+	if np is not None:
+		return np.ascontiguousarray(buf).tobytes()
+	return array.array('d', buf).tobytes()
+
+class GeometryCache(object):
+
+	index_name = 'index.json'
+
+	def __init__(self, cache_dir, max_size):
+		self.cache_dir = cache_dir
+		self.max_size = max_size
+		self.index_path = os.path.join(cache_dir, self.index_name)
+
+		self.hits = 0
+		self.misses = 0
+		self.evicted = 0
+		self.bytes_reused = 0
+		# keys referenced by the current export, never evicted
+		self.used = set()
+
+		if not os.path.exists(cache_dir):
+			os.makedirs(cache_dir)
+
+		self.index = {}
+		try:
+			with open(self.index_path, 'r') as f:
+				self.index = json.load(f)
+		except (IOError, ValueError):
+			pass
+
+	@staticmethod
+	def make_key(*parts):
+		"""
+		Hash strings and buffers (lists or arrays) into a cache key.
+		"""
+		h = hashlib.sha1()
+		for part in parts:
+			if isinstance(part, str):
+				part = part.encode('utf-8')
+			elif not isinstance(part, bytes):
+				part = buffer_bytes(part)
+			h.update(('%d:' % len(part)).encode())
+			h.update(part)
+		return h.hexdigest()
+
+	def path(self, key, ext):
+		return os.path.join(self.cache_dir, key + ext)
+
+	def lookup(self, key, ext):
+		"""
+		Return the path of the cached file, or None if it has to be
+		written (and then registered with store()).
+		"""
+		path = self.path(key, ext)
+		entry = self.index.get(key)
+		if entry is not None and os.path.exists(path):
+			entry['used'] = time.time()
+			self.used.add(key)
+			self.hits += 1
+			self.bytes_reused += entry['size']
+			return path
+		self.misses += 1
+		return None
+
+	def store(self, key, ext):
+		path = self.path(key, ext)
+		self.index[key] = {
+			'file': os.path.basename(path),
+			'size': os.path.getsize(path),
+			'used': time.time()
+		}
+		self.used.add(key)
+
+	def total_size(self):
+		return sum(entry['size'] for entry in self.index.values())
+
+	def prune(self):
+		"""
+		Remove least recently used files not used by this export until the
+		cache fits max_size.
+		"""
+		total = self.total_size()
+		lru = sorted(self.index.items(), key=lambda item: item[1]['used'])
+		for key, entry in lru:
+			if total <= self.max_size:
+				break
+			if key in self.used:
+				continue
+			try:
+				os.remove(os.path.join(self.cache_dir, entry['file']))
+			except OSError:
+				pass
+			total -= entry['size']
+			del self.index[key]
+			self.evicted += 1
+
+	def save(self):
+		tmp_path = self.index_path + '.tmp'
+		with open(tmp_path, 'w') as f:
+			json.dump(self.index, f)
+		if os.path.exists(self.index_path):
+			os.remove(self.index_path)
+		os.rename(tmp_path, self.index_path)
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		ratio = 100.0 * self.hits / lookups if lookups > 0 else 0.0
+		return 'Geometry cache: %d hits, %d misses (%.1f%% hit ratio), %.1f MB reused, %d evicted, %.1f MB cached' % (
+			self.hits, self.misses, ratio, self.bytes_reused / 1048576.0, self.evicted, self.total_size() / 1048576.0
+		)
@@ -0,0 +1,123 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Persistent cache of exported mesh files, keyed by a hash of the mesh
+# buffers and material assignment. Files are kept in one directory with an
+# Tests of the persistent geometry cache, run from this directory with:
+#	python geometry_cache_test.py
+
+import os, shutil, tempfile, unittest
+
+from geometry_cache import GeometryCache
+
+class TestGeometryCache(unittest.TestCase):
+	
+	def setUp(self):
+		self.cache_dir = tempfile.mkdtemp()
+	
+	def tearDown(self):
+		shutil.rmtree(self.cache_dir)
+	
+	def write(self, cache, key, size, used):
+		# a file exported for a lookup miss
+		self.assertIsNone(cache.lookup(key, '.ply'))
+		with open(cache.path(key, '.ply'), 'wb') as f:
+			f.write(b'x' * size)
+		cache.store(key, '.ply')
+		cache.index[key]['used'] = used
+	
+	def test_make_key(self):
+		key = GeometryCache.make_key('ply', 'Material', [0.0, 1.0, 2.0])
+		self.assertEqual(len(key), 40)
+		self.assertEqual(key, GeometryCache.make_key('ply', 'Material', [0.0, 1.0, 2.0]))
+		self.assertNotEqual(key, GeometryCache.make_key('ply', 'Material', [0.0, 1.0, 2.5]))
+		self.assertNotEqual(key, GeometryCache.make_key('serialized', 'Material', [0.0, 1.0, 2.0]))
+		# parts are length-prefixed, moving bytes between them changes the key
+		self.assertNotEqual(GeometryCache.make_key('ab', 'c'), GeometryCache.make_key('a', 'bc'))
+		self.assertEqual(GeometryCache.make_key(None), GeometryCache.make_key(b''))
+	
+	def test_lookup_store(self):
+		cache = GeometryCache(self.cache_dir, 1000)
+		key = GeometryCache.make_key('mesh')
+		self.write(cache, key, 100, 1.0)
+		self.assertEqual((cache.hits, cache.misses), (0, 1))
+		self.assertEqual(cache.lookup(key, '.ply'), cache.path(key, '.ply'))
+		self.assertEqual((cache.hits, cache.misses, cache.bytes_reused), (1, 1, 100))
+		self.assertGreater(cache.index[key]['used'], 1.0)
+		# a file deleted behind the back of the index is written again
+		os.remove(cache.path(key, '.ply'))
+		self.assertIsNone(cache.lookup(key, '.ply'))
+		self.assertEqual(cache.misses, 2)
+	
+	def test_prune(self):
+		cache = GeometryCache(self.cache_dir, 1200)
+		keys = [GeometryCache.make_key('mesh', str(i)) for i in range(6)]
+		for i, key in enumerate(keys):
+			self.write(cache, key, 300, 10.0 - i)
+		self.assertEqual(cache.total_size(), 1800)
+		
+		# files of the current export stay, the least recently used of the
+		# others are removed until the cache fits
+		cache.used = set(keys[4:])
+		cache.prune()
+		self.assertEqual(sorted(cache.index), sorted(keys[:2] + keys[4:]))
+		self.assertEqual(cache.evicted, 2)
+		self.assertEqual(cache.total_size(), 1200)
+		for key in keys:
+			self.assertEqual(os.path.exists(cache.path(key, '.ply')), key in cache.index)
+		
+		# when everything is in use the cache stays over max_size
+		cache.max_size = 600
+		cache.used = set(cache.index)
+		cache.prune()
+		self.assertEqual(cache.total_size(), 1200)
+		
+		cache.used = set()
+		cache.prune()
+		self.assertEqual(sorted(cache.index), sorted(keys[:2]))
+		self.assertEqual(cache.total_size(), 600)
+	
+	def test_save(self):
+		cache = GeometryCache(self.cache_dir, 1000)
+		keys = [GeometryCache.make_key('mesh', str(i)) for i in range(3)]
+		for i, key in enumerate(keys):
+			self.write(cache, key, 100 * (i + 1), float(i))
+		cache.save()
+		cache.save()
+		self.assertFalse(os.path.exists(cache.index_path + '.tmp'))
+		
+		# the next session finds the files of the last one
+		reloaded = GeometryCache(self.cache_dir, 1000)
+		self.assertEqual(reloaded.index, cache.index)
+		self.assertEqual(reloaded.used, set())
+		self.assertEqual(reloaded.lookup(keys[2], '.ply'), cache.path(keys[2], '.ply'))
+		self.assertEqual(reloaded.bytes_reused, 300)
+		
+		# an unreadable index starts an empty cache
+		with open(cache.index_path, 'w') as f:
+			f.write('{')
+		self.assertEqual(GeometryCache(self.cache_dir, 1000).index, {})
+	
+	def test_new_dir(self):
+		cache_dir = os.path.join(self.cache_dir, 'meshes', 'cache')
+		cache = GeometryCache(cache_dir, 1000)
+		self.assertTrue(os.path.isdir(cache_dir))
+		self.assertEqual(cache.index, {})
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,191 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Hair strand core for the dupli PATH exporter.
+#
+# Strands are lists of control points in object space. The B-spline
+# smoothing of all strands is evaluated from a basis matrix shared by all
+# strands with the same number of points, instead of the Cox-de Boor
+# recursion per control point and sample. write_hair formats or packs
+# whole strands at once where numpy is available.
+
+import struct
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+BINARY_HAIR_HEADER = b'BINARY_HAIR'
+
+def bspline_knots(count, degree):
+	knots = []
+	for i in range(count + degree + 1):
+		if i <= degree:
+			knots.append(0)
+		elif i >= count:
+			knots.append(count - degree)
+		else:
+			knots.append(i - degree)
+	return knots
+
+def bspline_params(count, degree, samples):
+	"""
+	The sample positions along a strand of count control points, the last
+	one is moved just inside of the knot range.
+	"""
+	
+	if samples < 2:
+		return [0.0] * samples
+	params = []
+	for i in range(samples):
+		u = i * (count - degree) / (samples - 1)
+		if i > 0:
+			u -= 0.0000000000001
+		params.append(u)
+	return params
+
+def bspline_basis(knots, i, u, degree):
+	if degree == 0:
+		return 1 if knots[i] <= u < knots[i+1] else 0
+	
+	N0 = bspline_basis(knots, i, u, degree-1)
+	N1 = bspline_basis(knots, i+1, u, degree-1)
+	
+	sum1 = 0
+	if N0 != 0:
+		sum1 = (u - knots[i]) / (knots[i+degree] - knots[i]) * N0
+	sum2 = 0
+	if N1 != 0:
+		sum2 = (knots[i+1+degree] - u) / (knots[i+1+degree] - knots[i+1]) * N1
+	return sum1 + sum2
+
+def bspline_point(points, degree, u):
+	"""
+	Evaluate a single point of a strand by recursion, as the exporter did
+	for every sample.
+	"""
+	
+	knots = bspline_knots(len(points), degree)
+	temp = [0.0, 0.0, 0.0]
+	for i, p in enumerate(points):
+		N = bspline_basis(knots, i, u, degree)
+		temp = [t + N * c for t, c in zip(temp, p)]
+	return temp
+
+_basis_matrices = {}
+
+def basis_matrix(count, degree, samples):
+	"""
+	Rows of basis function values per sample, one column per control
+	point. Cached, hair systems have only a few distinct strand lengths.
+	"""
+	
+	key = (count, degree, samples)
+	if key not in _basis_matrices:
+		knots = bspline_knots(count, degree)
+		_basis_matrices[key] = [
+			[bspline_basis(knots, i, u, degree) for i in range(count)]
+			for u in bspline_params(count, degree, samples)
+		]
+	return _basis_matrices[key]
+
+def evaluate_bsplines(strands, degree, samples):
+	"""
+	Smooth all strands, returns a list of samples points per strand in the
+	order of strands. Strands of the same length are evaluated together.
+	"""
+	
+	groups = {}
+	for index, points in enumerate(strands):
+		groups.setdefault(len(points), []).append(index)
+	
+	result = [None] * len(strands)
+	for count, indices in groups.items():
+		basis = basis_matrix(count, degree, samples)
+		if np is None:
+			for index in indices:
+				points = strands[index]
+				result[index] = [
+					[sum(N * p[axis] for N, p in zip(row, points)) for axis in range(3)]
+					for row in basis
+				]
+			continue
+		
+		if count == 0:
+			evaluated = np.zeros((len(indices), samples, 3))
+		else:
+			points = np.array([strands[index] for index in indices], dtype=np.float64).reshape(len(indices), count, 3)
+			evaluated = np.einsum('sc,kcx->ksx', np.array(basis, dtype=np.float64), points)
+		for index, strand in zip(indices, evaluated):
+			result[index] = strand
+	return result
+
+def transform_strands(strands, matrix):
+	"""
+	Apply a 4x4 matrix (rows) to the points of all strands.
+	"""
+	
+	if np is None:
+		return [
+			[[sum(row[j] * p[j] for j in range(3)) + row[3] for row in matrix[:3]] for p in points]
+			for points in strands
+		]
+	
+	m = np.array(matrix, dtype=np.float64)
+	counts = [len(points) for points in strands]
+	flat = np.array([p for points in strands for p in points], dtype=np.float64).reshape(-1, 3)
+	flat = flat.dot(m[:3, :3].T) + m[:3, 3]
+	return np.split(flat, np.cumsum(counts)[:-1]) if strands else []
+
+def write_hair(hair_file, strands, binary=False):
+	"""
+	Write strands in Mitsuba's hair format. The ASCII format has a line
+	per point and an empty line after each strand, the binary format
+	separates strands by +inf. Points are written as single precision
+	floats in either case. hair_file has to be opened in binary mode.
+	Empty strands are skipped, they would be strands of no points.
+	"""
+	
+	strands = [points for points in strands if len(points)]
+	if binary:
+		nverts = sum(len(points) for points in strands)
+		hair_file.write(BINARY_HAIR_HEADER)
+		hair_file.write(struct.pack('<I', nverts))
+		if np is not None:
+			chunks = []
+			for points in strands:
+				chunks.append(np.asarray(points, dtype='<f4').ravel())
+				chunks.append(np.array([np.inf], dtype='<f4'))
+			if chunks:
+				hair_file.write(np.concatenate(chunks[:-1]).tobytes())
+			return
+		for n, points in enumerate(strands):
+			if n > 0:
+				hair_file.write(struct.pack('<f', float('inf')))
+			for p in points:
+				hair_file.write(struct.pack('<3f', p[0], p[1], p[2]))
+		return
+	
+	# rounded to single precision as the mathutils vectors used before
+	for points in strands:
+		if np is not None:
+			coords = np.asarray(points, dtype=np.float32).ravel().tolist()
+		else:
+			coords = struct.unpack('<%df' % (3 * len(points)), struct.pack('<%df' % (3 * len(points)), *[c for p in points for c in p[:3]]))
+		hair_file.write(((('%f %f %f\n' * len(points)) % tuple(coords)) + '\n').encode())
@@ -0,0 +1,126 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Tests of the hair strand core, run from this directory with:
+#	python hair_buffers_test.py
+# and the benchmark against the recursion of the exporter with:
+#	python hair_buffers_test.py benchmark
+
+import struct
+import sys
+import unittest
+
+import hair_buffers
+from hair_buffers import BINARY_HAIR_HEADER, bspline_params, bspline_point, evaluate_bsplines, write_hair
+
+def synthetic_hair(nstrands, npoints=5, seed=0):
+	import random
+	rnd = random.Random(seed)
+	strands = []
+	for i in range(nstrands):
+		root = (rnd.uniform(-1, 1), rnd.uniform(-1, 1), 0.0)
+		strands.append([(root[0] + rnd.uniform(-0.01, 0.01) * j, root[1], root[2] + 0.02 * j) for j in range(npoints)])
+	return strands
+
+class TestHairBuffers(unittest.TestCase):
+	
+	def test_recursion(self):
+		strands = synthetic_hair(50, 5) + synthetic_hair(20, 9, seed=1)
+		for samples in (2, 8, 16):
+			evaluated = evaluate_bsplines(strands, 2, samples)
+			for points, smooth in zip(strands, evaluated):
+				params = bspline_params(len(points), 2, samples)
+				for u, p in zip(params, smooth):
+					for a, b in zip(bspline_point(points, 2, u), p):
+						self.assertAlmostEqual(a, b, 9)
+	
+	def test_ends(self):
+		# clamped knots, the curve starts at the first control point
+		points = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (2, 1, 1)]
+		smooth = evaluate_bsplines([points], 2, 8)[0]
+		self.assertEqual([float(c) for c in smooth[0]], [0.0, 0.0, 0.0])
+		for a, b in zip(smooth[-1], points[-1]):
+			self.assertAlmostEqual(float(a), b, 9)
+	
+	def test_binary(self):
+		import io
+		strands = synthetic_hair(3, 4)
+		out = io.BytesIO()
+		write_hair(out, strands, True)
+		data = out.getvalue()
+		self.assertEqual(data[:11], BINARY_HAIR_HEADER)
+		self.assertEqual(struct.unpack('<I', data[11:15])[0], 12)
+		self.assertEqual(len(data), 15 + 4 * (12 * 3 + 2))
+	
+	def test_empty_strands(self):
+		# no two separators in a row, nor one at either end
+		import io
+		strands = [[], [(0, 0, 0), (1, 1, 1)], [], [], [(2, 2, 2)], []]
+		saved = hair_buffers.np
+		try:
+			for np in (saved, None):
+				hair_buffers.np = np
+				out = io.BytesIO()
+				write_hair(out, strands, True)
+				data = out.getvalue()
+				self.assertEqual(struct.unpack('<I', data[11:15])[0], 3)
+				values = struct.unpack('<%df' % ((len(data) - 15) // 4), data[15:])
+				self.assertEqual(values, (0, 0, 0, 1, 1, 1, float('inf'), 2, 2, 2))
+				out = io.BytesIO()
+				write_hair(out, strands)
+				self.assertEqual(out.getvalue().count(b'\n\n'), 2)
+		finally:
+			hair_buffers.np = saved
+	
+	def test_ascii(self):
+		import io
+		out = io.BytesIO()
+		write_hair(out, [[(0.1, 0.2, 0.3), (1, 2, 3)], [(4, 5, 6)]])
+		legacy = ''
+		for points in ([(0.1, 0.2, 0.3), (1, 2, 3)], [(4, 5, 6)]):
+			for p in points:
+				p = struct.unpack('<3f', struct.pack('<3f', *p))
+				legacy += '%f %f %f\n' % (p[0], p[1], p[2])
+			legacy += '\n'
+		self.assertEqual(out.getvalue(), legacy.encode())
+
+def benchmark(nstrands=200000, npoints=5, samples=16):
+	import io, time
+	strands = synthetic_hair(nstrands, npoints)
+	
+	start = time.time()
+	count = min(nstrands, 5000)
+	for points in strands[:count]:
+		[bspline_point(points, 2, u) for u in bspline_params(npoints, 2, samples)]
+	recursion = (time.time() - start) * nstrands / count
+	
+	start = time.time()
+	evaluated = evaluate_bsplines(strands, 2, samples)
+	batched = time.time() - start
+	print('%d strands, %d samples: recursion %.2fs (estimated from %d), batched %.2fs' % (nstrands, samples, recursion, count, batched))
+	
+	for binary in (False, True):
+		start = time.time()
+		write_hair(io.BytesIO(), evaluated, binary)
+		print('%s write %.2fs' % ('binary' if binary else 'ascii ', time.time() - start))
+
+if __name__ == '__main__':
+	if sys.argv[1:] == ['benchmark']:
+		benchmark()
+	else:
+		unittest.main()
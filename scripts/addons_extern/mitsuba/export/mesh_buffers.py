@@ -0,0 +1,282 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Mesh serialization core for the PLY and serialized exporters.
+#
+# Works on plain face/vertex buffers as returned by foreach_get on a
+# tessellated mesh. The vert+normal(+uv) combinations are found and the
+# faces triangulated on whole arrays with numpy; build_buffers_py does the
+# same face by face where numpy is not available.
+
+import struct, zlib
+import array
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+PLY_COMMENT = b'comment Created by MtsBlend 2.5 exporter for Mitsuba - www.mitsuba.net\n'
+
+def build_buffers(co, vnormals, faces, face_normals, smooth, uvs=None, flip_flat_uvs=True):
+	"""
+	Work out which vert+normal(+uv) combinations need to be exported and
+	triangulate the faces.
+	
+	co, vnormals		vertex coordinates and normals, 3 floats per vertex
+	faces				4 vertex indices per face, the 4th is 0 for triangles
+	face_normals		3 floats per face
+	smooth				use_smooth flag per face
+	uvs					8 floats per face (uv_raw) or None
+	flip_flat_uvs		flip the V coordinate of flat shaded faces as well
+						(smooth faces are always flipped)
+	
+	Corners of smooth faces sharing the same co/normal/uv are exported once,
+	corners of flat faces are always unique. Returns (points, normals, uvs,
+	tris), uvs is None if no uvs were given.
+	"""
+	
+	if np is None:
+		return build_buffers_py(co, vnormals, faces, face_normals, smooth, uvs, flip_flat_uvs)
+	
+	co = np.asarray(co, dtype=np.float32).reshape(-1, 3)
+	vnormals = np.asarray(vnormals, dtype=np.float32).reshape(-1, 3)
+	faces = np.asarray(faces, dtype=np.int64).reshape(-1, 4)
+	face_normals = np.asarray(face_normals, dtype=np.float32).reshape(-1, 3)
+	smooth = np.asarray(smooth, dtype=bool).ravel()
+	
+	nfaces = len(faces)
+	is_quad = faces[:,3] != 0
+	corner_mask = np.ones((nfaces, 4), dtype=bool)
+	corner_mask[:,3] = is_quad
+	face_size = 3 + is_quad
+	
+	# corners in face order, as the exporters always walked them
+	corner_verts = faces[corner_mask]
+	corner_faces = np.repeat(np.arange(nfaces), face_size)
+	corner_smooth = smooth[corner_faces]
+	
+	columns = [
+		co[corner_verts],
+		np.where(corner_smooth[:,None], vnormals[corner_verts], face_normals[corner_faces]),
+	]
+	if uvs is not None:
+		uv = np.asarray(uvs, dtype=np.float32).reshape(-1, 4, 2)[corner_mask].astype(np.float64)
+		# Flip UV Y axis. Blender UV coord is bottom-left, Mitsuba is top-left.
+		flipped = uv.copy()
+		flipped[:,1] = 1.0 - uv[:,1]
+		if flip_flat_uvs:
+			uv = flipped
+		else:
+			uv = np.where(corner_smooth[:,None], flipped, uv)
+		columns.append(uv)
+	data = np.hstack([c.astype(np.float64) for c in columns])
+	
+	# dedup smooth corners on their values, adding 0.0 makes -0.0 equal to 0.0
+	# like the tuple comparison did
+	smooth_corners = np.nonzero(corner_smooth)[0]
+	emitted = ~corner_smooth
+	if len(smooth_corners) > 0:
+		keys = np.ascontiguousarray(data[smooth_corners] + 0.0)
+		keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+		_, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+		inverse = inverse.ravel()
+		emitted[smooth_corners[first]] = True
+	
+	export_index = np.cumsum(emitted) - 1
+	corner_index = export_index.copy()
+	if len(smooth_corners) > 0:
+		corner_index[smooth_corners] = export_index[smooth_corners[first]][inverse]
+	
+	# For Mitsuba, we need to triangulate quad faces
+	offsets = np.cumsum(face_size) - face_size
+	tri_corners = np.empty((nfaces, 2, 3), dtype=np.int64)
+	tri_corners[:,0] = offsets[:,None] + (0, 1, 2)
+	tri_corners[:,1] = offsets[:,None] + (0, 2, 3)
+	tri_mask = np.ones((nfaces, 2), dtype=bool)
+	tri_mask[:,1] = is_quad
+	tris = corner_index[tri_corners[tri_mask]].astype(np.uint32)
+	
+	vertices = data[emitted]
+	return vertices[:,0:3], vertices[:,3:6], (vertices[:,6:8] if uvs is not None else None), tris
+
+def split_by_material(material_index, faces, face_normals, smooth, uvs=None):
+	"""
+	Group the per face buffers by material index, returns a dict of
+	material index to (faces, face_normals, smooth, uvs).
+	"""
+	
+	groups = {}
+	if np is not None:
+		material_index = np.asarray(material_index).ravel()
+		faces = np.asarray(faces).reshape(-1, 4)
+		face_normals = np.asarray(face_normals).reshape(-1, 3)
+		smooth = np.asarray(smooth, dtype=bool).ravel()
+		if uvs is not None:
+			uvs = np.asarray(uvs).reshape(-1, 8)
+		for mi in np.unique(material_index):
+			sel = material_index == mi
+			groups[int(mi)] = (faces[sel], face_normals[sel], smooth[sel], uvs[sel] if uvs is not None else None)
+		return groups
+	
+	for f, mi in enumerate(material_index):
+		if mi not in groups:
+			groups[mi] = ([], [], [], [] if uvs is not None else None)
+		g = groups[mi]
+		g[0].extend(faces[4*f:4*f+4])
+		g[1].extend(face_normals[3*f:3*f+3])
+		g[2].append(smooth[f])
+		if uvs is not None:
+			g[3].extend(uvs[8*f:8*f+8])
+	return groups
+
+def build_buffers_py(co, vnormals, faces, face_normals, smooth, uvs=None, flip_flat_uvs=True):
+	"""
+	Pure python version of build_buffers, returns lists of tuples.
+	"""
+	
+	points = []
+	normals = []
+	texcoords = []
+	tris = []
+	
+	# mapping of vert data to exported vert index for verts with vert normals
+	vert_vno_indices = {}
+	
+	for f in range(len(smooth)):
+		face = faces[4*f:4*f+4]
+		nverts = 4 if face[3] != 0 else 3
+		fvi = []
+		for j in range(nverts):
+			v = face[j]
+			v_co = tuple(co[3*v:3*v+3])
+			
+			if uvs is not None:
+				uv_raw = (uvs[8*f+2*j], uvs[8*f+2*j+1])
+				uv_coord = (uv_raw[0], 1.0 - uv_raw[1])
+			else:
+				uv_raw = uv_coord = ()
+			
+			if smooth[f]:
+				vert_data = (v_co, tuple(vnormals[3*v:3*v+3]), uv_coord)
+				if vert_data in vert_vno_indices:
+					fvi.append(vert_vno_indices[vert_data])
+					continue
+				vert_vno_indices[vert_data] = len(points)
+			else:
+				# all face-vert-co-no are unique, we cannot cache them
+				vert_data = (v_co, tuple(face_normals[3*f:3*f+3]), uv_coord if flip_flat_uvs else uv_raw)
+			
+			fvi.append(len(points))
+			points.append(vert_data[0])
+			normals.append(vert_data[1])
+			texcoords.append(vert_data[2])
+		
+		tris.append(tuple(fvi[0:3]))
+		if nverts == 4:
+			tris.append((fvi[0], fvi[2], fvi[3]))
+	
+	return points, normals, (texcoords if uvs is not None else None), tris
+
+def write_ply(ply, points, normals, uvs, tris):
+	"""
+	Write a binary little endian PLY to the open file ply, with one write
+	per header, vertex and face block.
+	"""
+	
+	header = [
+		b'ply\n',
+		b'format binary_little_endian 1.0\n',
+		PLY_COMMENT,
+		('element vertex %d\n' % len(points)).encode(),
+		b'property float x\n',
+		b'property float y\n',
+		b'property float z\n',
+		b'property float nx\n',
+		b'property float ny\n',
+		b'property float nz\n',
+	]
+	if uvs is not None:
+		header.append(b'property float s\n')
+		header.append(b'property float t\n')
+	header.append(('element face %d\n' % len(tris)).encode())
+	header.append(b'property list uchar uint vertex_indices\n')
+	header.append(b'end_header\n')
+	ply.write(b''.join(header))
+	
+	if np is not None:
+		columns = [(points, 3), (normals, 3)] if uvs is None else [(points, 3), (normals, 3), (uvs, 2)]
+		ply.write(np.hstack([np.asarray(c, dtype=np.float64).reshape(len(points), n) for c, n in columns]).astype('<f4').tobytes())
+		face_block = np.empty(len(tris), dtype=[('n', 'u1'), ('v', '<u4', (3,))])
+		face_block['n'] = 3
+		face_block['v'] = np.asarray(tris).reshape(-1, 3)
+		ply.write(face_block.tobytes())
+	else:
+		if uvs is None:
+			vert_struct = struct.Struct('<6f')
+			ply.write(b''.join(vert_struct.pack(*(co + no)) for co, no in zip(points, normals)))
+		else:
+			vert_struct = struct.Struct('<8f')
+			ply.write(b''.join(vert_struct.pack(*(co + no + uv)) for co, no, uv in zip(points, normals, uvs)))
+		face_struct = struct.Struct('<B3I')
+		ply.write(b''.join(face_struct.pack(3, *face) for face in tris))
+
+def write_serialized(ser, mesh_name, points, normals, uvs, tris):
+	"""
+	Write a Mitsuba serialized mesh with double precision vertex data to the
+	open file ser.
+	"""
+	
+	if np is not None:
+		blocks = [np.asarray(b, dtype='<f8').tobytes() for b in (points, normals)]
+		if uvs is not None:
+			blocks.append(np.asarray(uvs, dtype='<f8').tobytes())
+		blocks.append(np.asarray(tris, dtype='<u4').tobytes())
+	else:
+		blocks = [flatten('d', b) for b in (points, normals)]
+		if uvs is not None:
+			blocks.append(flatten('d', uvs))
+		blocks.append(flatten('I', tris))
+	
+	# create mesh flags: double precision, vertex normals and uv layer
+	flags = 0x2000 | 0x0001
+	if uvs is not None:
+		flags = flags | 0x0002
+	
+	# begin serialized mesh data
+	ser.write(struct.pack('<HH', 0x041C, 0x0004))
+	
+	# encode serialized mesh
+	encoder = zlib.compressobj()
+	ser.write(encoder.compress(struct.pack('<I', flags)))
+	ser.write(encoder.compress(bytes(mesh_name + "_serialized\0",'latin-1')))
+	ser.write(encoder.compress(struct.pack('<QQ', len(points), len(tris))))
+	for block in blocks:
+		ser.write(encoder.compress(block))
+	ser.write(encoder.flush())
+	
+	ser.write(struct.pack('<Q', 0))
+	ser.write(struct.pack('<I', 1))
+
+def flatten(typecode, rows):
+	buf = array.array(typecode)
+	for row in rows:
+		buf.extend(row)
+	if struct.pack('=H', 1) != struct.pack('<H', 1):
+		buf.byteswap()
+	return buf.tobytes()
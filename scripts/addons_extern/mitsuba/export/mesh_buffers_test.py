@@ -0,0 +1,152 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Tests of the mesh serialization core on synthetic meshes, run from this
+# directory with:
+#	python mesh_buffers_test.py
+# and the benchmark on a million-triangle mesh with:
+#	python mesh_buffers_test.py benchmark
+
+import struct
+import sys
+import unittest
+
+from mesh_buffers import np, build_buffers, build_buffers_py, write_ply, write_serialized
+
+def synthetic_mesh(nquads, seed=0):
+	"""
+	A grid of quads, every third split into two triangles, with random
+	smooth flags and uvs. Returns the buffers build_buffers takes.
+	"""
+	
+	import random
+	rnd = random.Random(seed)
+	side = max(2, int(nquads ** 0.5) + 1)
+	# vertex 0 is left unused, no quad may use it as 4th vertex
+	co = [0.0, 0.0, 0.0]
+	vnormals = [0.0, 0.0, 1.0]
+	for y in range(side):
+		for x in range(side):
+			co.extend(struct.unpack('<3f', struct.pack('<3f', x, y, rnd.random())))
+			vnormals.extend(struct.unpack('<3f', struct.pack('<3f', 0, rnd.random(), 1)))
+	faces = []
+	face_normals = []
+	smooth = []
+	uvs = []
+	for y in range(side - 1):
+		for x in range(side - 1):
+			a = y * side + x + 1
+			b, c, d = a + 1, a + side + 1, a + side
+			if (x + y) % 3 == 0:
+				quads = [(a, b, c, 0), (a, c, d, 0)]
+			else:
+				quads = [(a, b, c, d)]
+			for q in quads:
+				faces.extend(q)
+				face_normals.extend(struct.unpack('<3f', struct.pack('<3f', 0, 0, 1)))
+				smooth.append(rnd.random() < 0.7)
+				uvs.extend(struct.unpack('<8f', struct.pack('<8f', *[rnd.choice((0.0, 0.25, 0.5, 1.0)) for i in range(8)])))
+	return co, vnormals, faces, face_normals, smooth, uvs
+
+def _write_all(builder, mesh, use_uvs):
+	import io
+	co, vnormals, faces, face_normals, smooth, uvs = mesh
+	out = []
+	for flip in (True, False):
+		points, normals, texcoords, tris = builder(co, vnormals, faces, face_normals, smooth, uvs if use_uvs else None, flip)
+		ply = io.BytesIO()
+		write_ply(ply, points, normals, texcoords, tris)
+		ser = io.BytesIO()
+		write_serialized(ser, 'mesh', points, normals, texcoords, tris)
+		out.append((ply.getvalue(), ser.getvalue()))
+	return out
+
+def _legacy_ply(mesh):
+	# the per element writes of the exporter before the array based core
+	import io
+	co, vnormals, faces, face_normals, smooth, uvs = mesh
+	points, normals, texcoords, tris = build_buffers_py(co, vnormals, faces, face_normals, smooth, uvs, False)
+	ply = io.BytesIO()
+	ply.write(b'ply\n')
+	ply.write(b'format binary_little_endian 1.0\n')
+	ply.write(b'comment Created by MtsBlend 2.5 exporter for Mitsuba - www.mitsuba.net\n')
+	ply.write( ('element vertex %d\n' % len(points)).encode() )
+	ply.write(b'property float x\n')
+	ply.write(b'property float y\n')
+	ply.write(b'property float z\n')
+	ply.write(b'property float nx\n')
+	ply.write(b'property float ny\n')
+	ply.write(b'property float nz\n')
+	ply.write(b'property float s\n')
+	ply.write(b'property float t\n')
+	ply.write( ('element face %d\n' % len(tris)).encode() )
+	ply.write(b'property list uchar uint vertex_indices\n')
+	ply.write(b'end_header\n')
+	for co,no,uv in zip(points, normals, texcoords):
+		ply.write( struct.pack('<3f', *co) )
+		ply.write( struct.pack('<3f', *no) )
+		ply.write( struct.pack('<2f', *uv) )
+	for face in tris:
+		ply.write( struct.pack('<B', 3) )
+		ply.write( struct.pack('<3I', *face) )
+	return ply.getvalue()
+
+class TestMeshBuffers(unittest.TestCase):
+	
+	def test_same_bytes(self):
+		if np is None:
+			self.skipTest('numpy not available')
+		mesh = synthetic_mesh(500)
+		for use_uvs in (True, False):
+			self.assertEqual(_write_all(build_buffers, mesh, use_uvs), _write_all(build_buffers_py, mesh, use_uvs))
+	
+	def test_legacy_ply(self):
+		mesh = synthetic_mesh(200)
+		ply = _write_all(build_buffers, mesh, True)[1][0]
+		self.assertEqual(ply, _legacy_ply(mesh))
+	
+	def test_dedup(self):
+		# two smooth triangles sharing an edge share two exported verts
+		co = [0,0,0, 1,0,0, 1,1,0, 0,1,0]
+		vnormals = [0,0,1] * 4
+		faces = [1,2,3,0, 1,3,0,0]
+		points, normals, uvs, tris = build_buffers(co, vnormals, faces, [0,0,1]*2, [True, True])
+		self.assertEqual(len(points), 4)
+		self.assertEqual([tuple(t) for t in tris], [(0,1,2), (0,2,3)])
+		points, normals, uvs, tris = build_buffers(co, vnormals, faces, [0,0,1]*2, [False, False])
+		self.assertEqual(len(points), 6)
+
+def benchmark(ntris=1000000):
+	import io, time
+	mesh = synthetic_mesh(int(ntris / 2))
+	start = time.time()
+	_legacy_ply(mesh)
+	print('%-6s build and per element ply write %.2fs' % ('legacy', time.time() - start))
+	for name, builder in (('python', build_buffers_py), ('array', build_buffers)):
+		start = time.time()
+		points, normals, uvs, tris = builder(*mesh)
+		built = time.time()
+		write_ply(io.BytesIO(), points, normals, uvs, tris)
+		written = time.time()
+		print('%-6s %d tris: build %.2fs, ply write %.2fs' % (name, len(tris), built - start, written - built))
+
+if __name__ == '__main__':
+	if sys.argv[1:] == ['benchmark']:
+		benchmark()
+	else:
+		unittest.main()
@@ -54,11 +54,15 @@ class mitsuba_engine(declarative_property_group):
 		'export_mode',
 		'render_mode',
 		'mesh_type',
+		'binary_hair',
 		'partial_export',
+		'geometry_cache',
+		'geometry_cache_size',
 		'refresh_interval'
 	]
 	
 	visibility = {
+		'geometry_cache_size':	{ 'geometry_cache': True },
 		'render_mode':		{ 'export_mode': 'render' },
 		'refresh_interval':	{ 'export_mode': 'render', 'render_mode' : 'cli' }
 	}
@@ -108,6 +112,14 @@ class mitsuba_engine(declarative_property_group):
 			'default': 'native',
 			'save_in_preset': True
 		},
+		{
+			'type': 'bool',
+			'attr': 'binary_hair',
+			'name': 'Binary hair files',
+			'description': 'Export hair particle systems in the binary hair format, which is smaller and faster to write and load',
+			'default': False,
+			'save_in_preset': True
+		},
 		{
 			'type': 'bool',
 			'attr': 'partial_export',
@@ -116,6 +128,24 @@ class mitsuba_engine(declarative_property_group):
 			'default': False,
 			'save_in_preset': True
 		},
+		{
+			'type': 'bool',
+			'attr': 'geometry_cache',
+			'name': 'Geometry Cache',
+			'description': 'Reuse exported Mesh files of unchanged geometry across frames and sessions, overrides Partial Mesh Export',
+			'default': False,
+			'save_in_preset': True
+		},
+		{
+			'type': 'int',
+			'attr': 'geometry_cache_size',
+			'name': 'Cache size (MB)',
+			'description': 'Least recently used Mesh files are removed from the cache when it grows beyond this size',
+			'default': 2048,
+			'min': 1,
+			'soft_min': 64,
+			'save_in_preset': True
+		},
 		{
 			'type': 'int',
 			'attr': 'refresh_interval',
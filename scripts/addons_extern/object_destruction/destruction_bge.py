@@ -1,5 +1,6 @@
 from bge import logic
 import destruction_data as dd
+import destruction_scheduler as ds
 import math
 from mathutils import Vector, Matrix
 from time import clock
@@ -50,6 +51,8 @@ tempLoc = Vector((0,0,0))
 initswap = []
 firstGround = None
 isCollapsing = False
+scheduler = ds.Scheduler()
+hierarchy = ds.HierarchyCache()
 
 def getProp(name):
     return dd.DataStore.properties[name]
@@ -241,6 +244,8 @@ def setup():
     print("setup")
     
     loadBGEProps()
+    #per frame time budget of the destruction scheduler, in milliseconds
+    scheduler.budget = getattr(getProp(scene.name), "frame_budget", 5.0) / 1000
     #temporarily parent
  
     for o in scene.objects:
@@ -281,7 +286,7 @@ def setup():
             #print(o, o.parent, len(o.parent.children))
             if flattenHierarchy(o):
                 for fp in firstparent:
-                    desc = descendants(fp)
+                    desc = hierarchy.getDescendants(fp, descendants)
                     if getProp(o.name).use_collision_compound and o in desc:#bpyObjs[o.name].game.use_collision_compound and o in desc :
                         if fp.name not in firstShard.keys() and fp.name != getProp(scene.name).custom_ball:#bpy.context.scene.custom_ball:
                             print("Setting compound", o.name)
@@ -304,6 +309,8 @@ def setup():
     for o in scene.objects:
         if "myParent" in o.getPropertyNames(): 
             o.removeParent()                   
+    
+    hierarchy.invalidate()
             
     print(len(children))
         
@@ -668,10 +675,10 @@ def collide():
             isGroundConn = True
             if fp.name in dd.DataStore.grids.keys():
                 grid = dd.DataStore.grids[fp.name] 
+                #modSpeed = math.sqrt(owner.worldLinearVelocity.length / 2)
+                speed = (owner.worldLinearVelocity).length # groundConn means obj has 0 speed
+                mSpeed = modSpeed(owner, speed)
                 for cell in grid.cells.values():
-                    #modSpeed = math.sqrt(owner.worldLinearVelocity.length / 2)
-                    speed = (owner.worldLinearVelocity).length # groundConn means obj has 0 speed
-                    mSpeed = modSpeed(owner, speed)
                     celldist = (owner.worldPosition - Vector(cell.center)).length
                     if celldist < mSpeed:
                         cellsToCheck.append(cell)
@@ -687,12 +694,7 @@ def collide():
     if not isGroundConn or isCollapsing or depth > 1:
         #without grid, check all objects (bad)
         #print("checking all")
-        for p in children.keys():
-            for objname in children[p]:
-                #print("objname", p, objname)
-                if not objname.startswith("P_"):
-                    if objname in scene.objects:
-                        objs.append(objname)
+        objs = [objname for objname in hierarchy.leafNames(children) if objname in scene.objects]
     else:
         for c in cellsToCheck:
             objs.extend(c.children)
@@ -715,11 +717,14 @@ def collide():
             
             #print("Collide", owner, dist, speed)
             if (dist < speed and glue < speed) or (dist < strength and glue < strength):  
-                dissolve(obj, depth, maxHierarchyDepth, owner)
+                scheduler.push(dissolve, obj, depth, maxHierarchyDepth, owner)
             
             #if isDeformable(obj):
             #    obj.cutSoftbodyLink(owner.worldPosition, dist)
             #    child.setSoftbodyPose(True, True)
+    
+    #start with the queued work immediately, the rest is done in the following frames
+    scheduler.run()
 
 def checkGravityCollapse():
     #check for gravity collapse (with ground connectivity)
@@ -748,17 +753,13 @@ def checkGravityCollapse():
                                 #g.worldOrientation = Matrix.Rotation(math.radians(15), 3, 'X')
                                 [destroyCell(c, cells, None) for c in grid.cells.values() if grid.inLayer(c, layer)]
                             
-                                for c in cells.values():
-                                    destroyNeighborhood(c)
-                 
-                                for c in cells.values():
-                                    c.visit = False
+                                queueNeighborhood(cells)
                                 
                                 #apply horizontal impulse according to cell distribution to make
                                 #object rotate...
                                 #g.worldOrientation = Matrix.Rotation(math.radians(0), 3, 'X')
                             
-                                restoreAll()
+                                scheduler.push(restoreAll)
                                 break    
  
 def findCompound(childs, parent):
@@ -1062,8 +1063,10 @@ def swapBackup(obj, owner):
     
    # print("SWAP:", ret, p, children[p])
     
+    hierarchy.invalidate()
+    
     if isGroundConnectivity(first):
-        calculateGrids()
+        scheduler.pushOnce("grids", calculateGrids)
       
     return ret
 
@@ -1098,11 +1101,7 @@ def compareSpeed(owner, obj):
 def findParent(obj):
     global children
     
-    parent = None
-    for p in children.keys():
-        if obj.name in children[p]:
-            parent = p
-            break
+    parent = hierarchy.findParentName(obj.name, children)
         
     par = None
     if parent != None:
@@ -1122,6 +1121,9 @@ def dissolve(obj, depth, maxdepth, owner):
     global initswap
     global children
     
+    if obj.invalid: #may have been ended before its queued dissolve ran
+        return
+    
     print("dissolve", obj, depth)
     parent = findParent(obj)
     owparent = findParent(owner)               
@@ -1161,9 +1163,9 @@ def dissolve(obj, depth, maxdepth, owner):
                         if isBackup(ch):
                             shards = swapBackup(ch, owner)
                             ch["swapped"] = True
-                            [activate(s, owner, grid) for s in shards if compareSpeed(owner, s)]
+                            [scheduler.push(activate, s, owner, grid) for s in shards if compareSpeed(owner, s)]
                         #else:
-                            activate(ch, owner, grid)
+                            scheduler.push(activate, ch, owner, grid)
                                         
                 objs = swapBackup(obj, owner)
                 obj["swapped"] = True
@@ -1173,11 +1175,11 @@ def dissolve(obj, depth, maxdepth, owner):
              #activate previously swapped shards    
             if (depth == objDepth+1):
                     
-                [activate(ob, owner, grid) for ob in initswap if compareSpeed(owner, ob)]
-                activate(obj, owner, grid)
+                [scheduler.push(activate, ob, owner, grid) for ob in initswap if compareSpeed(owner, ob)]
+                scheduler.push(activate, obj, owner, grid)
                  
         if depth < maxdepth and parent != None:
-            [dissolve(scene.objects[c], depth+1, maxdepth, owner) for c in children[parent.name] \
+            [scheduler.push(dissolve, scene.objects[c], depth+1, maxdepth, owner) for c in children[parent.name] \
             if c in scene.objects and not c.startswith("P_")]
 
 def activate(child, owner, grid):
@@ -1189,11 +1191,10 @@ def activate(child, owner, grid):
      
      delay = deadDelay(owner)
      
-     parent = None
-     for p in children.keys():
-        if child.name in children[p]:
-            parent = p
-            break
+     if child.invalid: #may have been ended before its queued activation ran
+         return
+     
+     parent = hierarchy.findParentName(child.name, children)
     # print("PARENT", parent)
      #ground is parent when connectivity is used    
      if parent == None:
@@ -1222,19 +1223,14 @@ def activate(child, owner, grid):
                  cell = cells[gridPos]
                  
                  if delay == 0:
-                    if (child.name in cell.children):
-                        cell.children.remove(child.name)
+                    cell.removeChild(child.name)
                 
                  if not cell.integrity(integrity):
                     #print("Low Integrity, destroying cell!")
                     destroyCell(cell, cells, None)
                     
                     
-                 for c in cells.values():
-                    destroyNeighborhood(c)
-                 
-                 for c in cells.values():
-                    c.visit = False
+                 queueNeighborhood(cells)
     
      #bpyOwner = bpy.data.objects[owner.name]
      dist = child.getDistanceTo(owner)
@@ -1442,11 +1438,30 @@ def destroyFalling(children):
         c.removeParent()
     restoreAll()   
 
-def destroyNeighborhood(cell):
+def resetVisits(cells):
+    for c in cells:
+        c.visit = False
+
+def queueNeighborhood(cells):
+    #one job per cell, the visit flags are reset after all of them ran.
+    #the jobs keep the current delay, other activations may change it before they run
+    cells = list(cells.values())
+    [scheduler.push(destroyNeighborhood, c, delay) for c in cells]
+    scheduler.push(resetVisits, cells)
+
+def processQueue():
+    #called each frame, processes queued destruction work within the frame budget
+    if scheduler.pending() > 0:
+        scheduler.run()
+
+def destroyNeighborhood(cell, cellDelay = None):
     
     global doReturn
     global integrity
+    global delay
 
+    if cellDelay != None:
+        delay = cellDelay
     doReturn = False
     destlist = []
     destructionList(cell, destlist)
@@ -1488,10 +1503,7 @@ def destroyCell(cell, cells, compound):
     
     ret = []
     if delay == 0:
-        for item in cells.items():
-            if cell == item[1] and item[0] in cells:
-                del cells[item[0]]
-                break
+        cell.grid.removeCell(cell, cells)
         
    # print("Destroyed: ", cell.gridPos)
     childs = [c for c in cell.children]
@@ -1518,7 +1530,7 @@ def destroyCell(cell, cells, compound):
         else:
             childs.remove(child) #remove invalid child
                     
-    cell.children = childs
+    cell.setChildren(childs)
     return ret      
     
 
@@ -12,6 +12,23 @@ import json
 import mathutils
 from mathutils import geometry, Vector
 
+#offsets of the 26 neighbors of a cell, in the order of the neighbor list:
+#  2---3
+#0-+-1 |
+#| 6-+-7
+#4---5
+#back, front, left, right, top, bottom, corners c0..c7, between corners b01..b37
+#the right slot stays None: the old per neighbor code assigned the right cell to
+#bottom by mistake, so destructionList never followed it. keep that until the
+#collapse behaviour is retuned for it.
+rightSlot = 3
+neighborOffsets = [( 0,  1,  0), ( 0, -1,  0), ( 1,  0,  0), (-1,  0,  0), ( 0,  0,  1), ( 0,  0, -1),
+                   (-1, -1,  1), ( 1, -1,  1), (-1,  1,  1), ( 1,  1,  1),
+                   (-1, -1, -1), ( 1, -1, -1), (-1,  1, -1), ( 1,  1, -1),
+                   ( 0, -1,  1), (-1,  0,  1), ( 1,  0,  1), ( 0,  1,  1),
+                   ( 0, -1, -1), (-1,  0, -1), ( 1,  0, -1), ( 0,  1, -1),
+                   (-1, -1,  0), ( 1, -1,  0), (-1,  1,  0), ( 1,  1,  0)]
+
 class Cell:
 
    
@@ -31,10 +48,12 @@ class Cell:
         self.range = [(self.center[0] - cellDim[0] / 2, self.center[0] + cellDim[0] / 2),
                       (self.center[1] - cellDim[1] / 2, self.center[1] + cellDim[1] / 2),
                       (self.center[2] - cellDim[2] / 2, self.center[2] + cellDim[2] / 2)] 
-                                         
-        self.children = [c.name for c in grid.children if self.isInside(c.worldPosition, 0)]
-        [self.assign(grid.cellCoord, c, self.gridPos) for c in self.children]
-        self.count = len(self.children)
+        
+        #children are bucketed in by the grid in one pass, see Grid.bucketChildren                                 
+        self.children = []
+        self.count = 0
+        self.neighbors = []
+        self.inGrid = True
     #    print("Cell created: ", self.center, self.count)
     #    print("W/L Orientation: " self.worldOrientation)
         self.isGroundCell = False
@@ -46,6 +65,18 @@ class Cell:
         if self.count == 0:
             return False
         return len(self.children) / self.count > intgr     
+    
+    def removeChild(self, name):
+        #keeps the per layer counters of the grid in sync, cells removed from the grid do not count
+        if name in self.children:
+            self.children.remove(name)
+            if self.inGrid:
+                self.grid.layerChildren[self.gridPos[2]] -= 1
+    
+    def setChildren(self, childs):
+        if self.inGrid:
+            self.grid.layerChildren[self.gridPos[2]] += len(childs) - len(self.children)
+        self.children = childs
             
     def isInside(self, pos, percentage):
       #  print("Cell center / pos / percentage: ", self.center, pos, percentage) 
@@ -59,141 +90,18 @@ class Cell:
         return False
     
     def findNeighbors(self):
-        
-        
-        #  2---3
-        #0-+-1 |
-        #| 6-+-7
-        #4---5
-        back = None
-        if self.gridPos[1] < self.grid.cellCounts[1] - 1:
-            back = self.grid.cells[(self.gridPos[0], self.gridPos[1] + 1, self.gridPos[2])]
-         
-        front = None
-        if self.gridPos[1] > 0:
-            front = self.grid.cells[(self.gridPos[0], self.gridPos[1] - 1, self.gridPos[2])]
-            
-        left = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1:
-            left = self.grid.cells[(self.gridPos[0] + 1, self.gridPos[1], self.gridPos[2])]
-         
-        right = None
-        if self.gridPos[0] > 0:
-            bottom = self.grid.cells[(self.gridPos[0] - 1, self.gridPos[1], self.gridPos[2])]
-            
-        top  = None
-        if self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            top = self.grid.cells[(self.gridPos[0], self.gridPos[1], self.gridPos[2] + 1)]
-         
-        bottom = None
-        if self.gridPos[2] > 0:
-            bottom = self.grid.cells[(self.gridPos[0], self.gridPos[1], self.gridPos[2] - 1)]
-       
-        #corners 
-        c0 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] > 0 and self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            c0 = self.grid.cells[(self.gridPos[0] - 1, self.gridPos[1] - 1, self.gridPos[2] + 1)]
-        
-        c1 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[1] > 0 and \
-           self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            c1 = self.grid.cells[(self.gridPos[0] + 1, self.gridPos[1] - 1, self.gridPos[2] + 1)]
-            
-        c2 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] < self.grid.cellCounts[1] - 1 and \
-           self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            c2 = self.grid.cells[(self.gridPos[0] - 1, self.gridPos[1] + 1, self.gridPos[2] + 1)]
-            
-        c3 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1  and self.gridPos[1] < self.grid.cellCounts[1] - 1 and \
-           self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            c3 = self.grid.cells[(self.gridPos[0] + 1, self.gridPos[1] + 1, self.gridPos[2] + 1)]
-         
-        c4 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] > 0 and self.gridPos[2] > 0:
-            c4 = self.grid.cells[(self.gridPos[0] - 1, self.gridPos[1] - 1, self.gridPos[2] - 1)]
-         
-        c5 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[1] > 0 and self.gridPos[2] > 0:
-            c5 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1] - 1, self.gridPos[2] - 1)]
-            
-        c6 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] < self.grid.cellCounts[1] - 1 and \
-           self.gridPos[2] > 0:
-            c6 = self.grid.cells[(self.gridPos[0] - 1, self.gridPos[1] + 1, self.gridPos[2] - 1)]
-         
-        c7 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[1] < self.grid.cellCounts[1] - 1 and \
-           self.gridPos[2] > 0:
-            c7 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1] + 1, self.gridPos[2] - 1)]
-       
-       
-        #between corners 
-        #b01
-        #b02
-        #b13
-        #b23
-        
-        b01 = None
-        if self.gridPos[1] > 0 and self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            b01 = self.grid.cells[(self.gridPos[0], self.gridPos[1] - 1, self.gridPos[2] + 1)]
-            
-        b02 = None
-        if self.gridPos[0] > 0 and self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            b02 = self.grid.cells[(self.gridPos[0] - 1 , self.gridPos[1], self.gridPos[2] + 1)]
-         
-        b13 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[2] < self.grid.cellCounts[2] - 1:
-            b13 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1], self.gridPos[2] + 1)]
-          
-        b23 = None
-        if self.gridPos[1] < self.grid.cellCounts[1] - 1 and self.gridPos[2] < self.grid.cellCounts[2] - 1:
-           b23 = self.grid.cells[(self.gridPos[0] , self.gridPos[1] + 1, self.gridPos[2] + 1)]
-        
-      #  b45
-      #  b46
-      #  b57
-      #  b67
-        
-        b45 = None
-        if self.gridPos[1] > 0 and self.gridPos[2] > 0:
-            b45 = self.grid.cells[(self.gridPos[0] , self.gridPos[1] - 1, self.gridPos[2] - 1)]
-            
-        b46 = None
-        if self.gridPos[0] > 0 and self.gridPos[2] > 0:
-            b46 = self.grid.cells[(self.gridPos[0] - 1 , self.gridPos[1], self.gridPos[2] - 1)]
-            
-        b57 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[2] > 0:
-            b57 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1], self.gridPos[2] - 1)]
-            
-        b67 = None
-        if self.gridPos[1] < self.grid.cellCounts[1] - 1 and self.gridPos[2] > 0:
-            b67 = self.grid.cells[(self.gridPos[0], self.gridPos[1] + 1, self.gridPos[2] - 1)]
-        
-    #    b04
-    #    b15
-    #    b26
-    #    b37 
-        
-        b04 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] > 0:
-            b04 = self.grid.cells[(self.gridPos[0] - 1 , self.gridPos[1] - 1, self.gridPos[2])]
-            
-        b15 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[1] > 0:
-            b15 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1] - 1, self.gridPos[2])]
-            
-        b26 = None
-        if self.gridPos[0] > 0 and self.gridPos[1] < self.grid.cellCounts[1] - 1:
-            b26 = self.grid.cells[(self.gridPos[0] - 1 , self.gridPos[1] + 1, self.gridPos[2])]
-            
-        b37 = None
-        if self.gridPos[0] < self.grid.cellCounts[0] - 1 and self.gridPos[1] < self.grid.cellCounts[1] - 1:
-            b37 = self.grid.cells[(self.gridPos[0] + 1 , self.gridPos[1] + 1, self.gridPos[2])]
-            
-        self.neighbors = [back, front, left, right, top, bottom, c0, c1, c2, c3, c4, c5, c6, c7,
-                          b01, b02, b13, b23, b45, b46, b57, b67, b04, b15, b26, b37]
+        #missing neighbors at the grid border are None
+        x, y, z = self.gridPos
+        counts = self.grid.cellCounts
+        self.neighbors = []
+        for i, (dx, dy, dz) in enumerate(neighborOffsets):
+            nx, ny, nz = x + dx, y + dy, z + dz
+            if i == rightSlot:
+                self.neighbors.append(None)
+            elif 0 <= nx < counts[0] and 0 <= ny < counts[1] and 0 <= nz < counts[2]:
+                self.neighbors.append(self.grid.cells[(nx, ny, nz)])
+            else:
+                self.neighbors.append(None)
         
     def testGroundCell(self):   
         #test distance of closest point on poly to cell center,
@@ -233,6 +141,11 @@ class Grid:
     
         self.cellDim = [ dim[0] / cellCounts[0], dim[1] / cellCounts[1], 
                          dim[2] / cellCounts[2]]
+        
+        #per layer counters of the cells in the grid: cells, initial and remaining children
+        self.layerCells = [cellCounts[0] * cellCounts[1]] * cellCounts[2]
+        self.layerCounts = [0] * cellCounts[2]
+        self.layerChildren = [0] * cellCounts[2]
                          
         print("cell/grid dimension/center: ", self.cellDim, self.dim, self.center)
         
@@ -241,9 +154,56 @@ class Grid:
             for y in range(0, cellCounts[1]):
                 for z in range(0, cellCounts[2]):
                    self.cells[(x,y,z)] = Cell((x,y,z), self)
+        
+        self.bucketChildren()
                    
         self.children = None
     
+    def cellIndex(self, pos):
+        #integer division of the position relative to the grid origin, None if outside
+        #a flat object has no extent along an axis, all its children are in the one cell there
+        index = []
+        for i in range(0, 3):
+            if self.cellDim[i] == 0:
+                index.append(0)
+                continue
+            f = (pos[i] - self.pos[i]) / self.cellDim[i]
+            if f < 0 or f > self.cellCounts[i]:
+                return None
+            #the upper border belongs to the last cell
+            index.append(min(int(f), self.cellCounts[i] - 1))
+        return tuple(index)
+    
+    def bucketChildren(self):
+        #assign each child to its cell in a single pass instead of testing each child against each cell
+        #a child exactly on a cell border goes to one cell only, the old isInside test put it into both
+        for c in self.children:
+            gridPos = self.cellIndex(c.worldPosition)
+            if gridPos is None:
+                continue
+            cell = self.cells[gridPos]
+            cell.children.append(c.name)
+            cell.assign(self.cellCoord, c.name, gridPos)
+            
+        for cell in self.cells.values():
+            cell.count = len(cell.children)
+            self.layerCounts[cell.gridPos[2]] += cell.count
+            
+        self.layerChildren = list(self.layerCounts)
+    
+    def removeCell(self, cell, cells):
+        #remove a destroyed cell from cells, the dict of the grid or a copy of it.
+        #only cells removed from the grid itself leave the layer counters
+        if cells.get(cell.gridPos) is not cell:
+            return
+        del cells[cell.gridPos]
+        if cells is self.cells:
+            z = cell.gridPos[2]
+            self.layerCells[z] -= 1
+            self.layerCounts[z] -= cell.count
+            self.layerChildren[z] -= len(cell.children)
+            cell.inGrid = False
+    
     def buildNeighborhood(self):
         [c.findNeighbors() for c in self.cells.values()]
         
@@ -269,27 +229,20 @@ class Grid:
         return cell.gridPos[2] >= layer
     
     def layerIntegrity(self, layer, integr):
-       # if layer > self.cellCounts[2]:
-      #        return False
-       # print("Integrity", layer, integr)
-        layercells = [c for c in self.cells.values() if self.inLayer(c, layer)]
-        layercount = 0
-        layerchilds = 0
-        for c in layercells:
-            layerchilds += len(c.children)
-            layercount += c.count
-            
+        if layer < 0 or layer >= self.cellCounts[2]:
+            return False
+        
+        layercount = self.layerCounts[layer]
         if layercount == 0:
             return False
-        print(layerchilds, layercount)
-        return (layerchilds / layercount) > integr
+        return (self.layerChildren[layer] / layercount) > integr
     
     def layerDestroyed(self, layer):
         return not self.layerIntegrity(layer, 0)
     
     def weightOnLayer(self, layer):
-        weight = [c.children for c in self.cells.values() if self.aboveLayer(c, layer)]
-        return len(weight)
+        #cells remaining in this layer and all layers above
+        return sum(self.layerCells[max(layer, 0):])
     
 #    def cellDistribution(self, layer):
 #        left = 0
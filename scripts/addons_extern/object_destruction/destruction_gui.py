@@ -334,6 +334,9 @@ class DestructionPhysicsPanel(DestructionBasePanel, bpy.types.Panel):
                 
                 if context.scene.useGravityCollapse:
                     row.prop(context.scene, "collapse_delay", text = "Collapse Delay")
+                
+                row = col.row(align=True)
+                row.prop(context.scene, "frameBudget", text = "Frame Budget (ms)")
     
 
 class DestructionHierarchyPanel(DestructionBasePanel, bpy.types.Panel):
@@ -823,6 +826,7 @@ class SetupPlayer(types.Operator):
         print(ops.text.open(filepath = currentDir + "\destruction_bge.py", internal = False))
         print(ops.text.open(filepath = currentDir + "\player.py", internal = False))
         print(ops.text.open(filepath = currentDir + "\destruction_data.py", internal = False))
+        print(ops.text.open(filepath = currentDir + "\destruction_scheduler.py", internal = False))
         
         #setup logic bricks -player
         context.scene.objects.active = data.objects["Player"]
@@ -914,6 +918,18 @@ class SetupPlayer(types.Operator):
         context.active_object.game.controllers[10].link(
             context.active_object.game.sensors[10])
         
+        #queued destruction work, processed each frame within the frame budget
+        ops.logic.controller_add(type = 'PYTHON', object = "Player")
+        context.active_object.game.controllers[11].mode = 'MODULE'
+        context.active_object.game.controllers[11].module = "destruction_bge.processQueue"
+        
+        ops.logic.sensor_add(type = 'ALWAYS', object = "Player")
+        context.active_object.game.sensors[11].use_pulse_true_level = True
+        context.active_object.game.sensors[11].frequency = 0
+        
+        context.active_object.game.controllers[11].link(
+            context.active_object.game.sensors[11])
+        
         
               
             
@@ -1145,6 +1161,7 @@ class ClearPlayer(types.Operator):
                                 False, False, False, False, False]
         
         data.texts.remove(data.texts["destruction_data.py"])                        
+        data.texts.remove(data.texts["destruction_scheduler.py"])
         data.texts.remove(data.texts["destruction_bge.py"])
         data.texts.remove(data.texts["player.py"])                        
         
@@ -62,6 +62,7 @@ def bgePropsScene(scene):
     props.hideLayer = scene.hideLayer
     props.collapse_delay = scene.collapse_delay
     props.use_gravity_collapse = scene.useGravityCollapse
+    props.frame_budget = scene.frameBudget
     
     return props
         
@@ -2867,6 +2868,8 @@ def initialize():
                                         description = "Collapse object automatically based on layer integrity (the lower, the weaker) ")
     Scene.collapse_delay = props.FloatProperty(name = "collapse_delay", min = 0.0, default = 1.0, 
                                         description = "Delay in seconds after which the dropping building should collapse completely") 
+    Scene.frameBudget = props.FloatProperty(name = "frameBudget", min = 0.1, default = 5.0,
+                                        description = "Time in milliseconds per frame the game engine may spend on queued destruction work")
     Scene.dummyPoolSize = props.IntProperty(name = "dummyPoolSize", min = 10, max = 1000, default = 100,
                                             description = "How many dummy objects to pre-allocate for dynamic destruction (cant add them dynamically in BGE)")
     Scene.runBGETests = props.BoolProperty(name = "runBGETests")
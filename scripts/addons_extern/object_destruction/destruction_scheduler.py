@@ -0,0 +1,114 @@
+#the scheduler spreads destruction work (dissolve, activate, neighborhood destruction)
+#over several frames, so a big impact does not stall the game engine for many frames.
+#work is queued as jobs and processed until the per frame time budget is spent.
+
+#the hierarchy cache keeps lookups which are expensive to compute on each collision pulse,
+#it is invalidated whenever the hierarchy changes (swapping backups etc.)
+
+#no bge and no bpy may be used here, so it can be driven by stub objects outside of blender
+from collections import deque
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    from time import clock
+
+class Scheduler:
+
+    def __init__(self, budget = 0.005):
+        self.budget = budget #seconds per frame
+        self.jobs = deque()
+        self.keys = set()
+        self.frameTimes = []
+        self.processed = 0
+
+    def push(self, func, *args):
+        self.jobs.append((None, func, args))
+
+    def pushOnce(self, key, func, *args):
+        #queue a job only if no job with the same key is pending, e.g. grid recalculation
+        if key in self.keys:
+            return
+        self.keys.add(key)
+        self.jobs.append((key, func, args))
+
+    def pending(self):
+        return len(self.jobs)
+
+    def clear(self):
+        self.jobs.clear()
+        self.keys.clear()
+
+    def run(self, budget = None):
+        #process queued jobs until the budget is spent, at least one job per call
+        #so the queue always drains, a negative budget processes all jobs.
+        #returns the number of processed jobs
+        if budget == None:
+            budget = self.budget
+
+        start = clock()
+        count = 0
+        while len(self.jobs) > 0:
+            key, func, args = self.jobs.popleft()
+            if key != None:
+                self.keys.discard(key)
+            func(*args)
+            count += 1
+            if budget >= 0 and clock() - start >= budget:
+                break
+
+        if count > 0:
+            self.frameTimes.append(clock() - start)
+        self.processed += count
+        return count
+
+    def percentiles(self, percents = (50, 90, 99, 100)):
+        #frame time percentiles in seconds of all frames which processed jobs
+        times = sorted(self.frameTimes)
+        ret = {}
+        if len(times) == 0:
+            return ret
+        for p in percents:
+            index = int(round(p / 100 * (len(times) - 1)))
+            ret[p] = times[index]
+        return ret
+
+class HierarchyCache:
+
+    def __init__(self):
+        self.valid = False
+        self.parentOf = {}
+        self.leaves = []
+        self.descendants = {}
+
+    def invalidate(self):
+        self.valid = False
+        self.descendants.clear()
+
+    def update(self, children):
+        #reverse lookup child name -> parent name and all leaf names from the children dict
+        if self.valid:
+            return
+
+        self.parentOf = {}
+        self.leaves = []
+        for p, childs in children.items():
+            for c in childs:
+                if c not in self.parentOf:
+                    self.parentOf[c] = p
+                if not c.startswith("P_"):
+                    self.leaves.append(c)
+        self.valid = True
+
+    def findParentName(self, name, children):
+        self.update(children)
+        return self.parentOf.get(name)
+
+    def leafNames(self, children):
+        self.update(children)
+        return self.leaves
+
+    def getDescendants(self, obj, func):
+        if obj.name not in self.descendants:
+            self.descendants[obj.name] = func(obj)
+        return self.descendants[obj.name]
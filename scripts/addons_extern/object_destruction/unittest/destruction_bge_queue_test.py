@@ -0,0 +1,198 @@
+#queued destruction in destruction_bge: dissolve and activate run as scheduler jobs over
+#several frames. runs in the game engine, importing destruction_bge needs bge and the
+#jsondata text of the player setup. the scene, hierarchy and properties the module works on
+#are replaced by stub game objects, run() executes the tests
+import unittest
+from mathutils import Vector
+import destruction_data as dd
+import destruction_scheduler as ds
+import destruction_bge as db
+
+
+class StubObject:
+
+    def __init__(self, name, pos = (0, 0, 0)):
+        self.name = name
+        self.worldPosition = Vector(pos)
+        self.linearVelocity = Vector((0, 0, 0))
+        self.invalid = False
+        self.dynamic = False
+        self.parent = None
+        self.children = []
+        self.props = {}
+
+    def getPropertyNames(self):
+        return list(self.props.keys())
+
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        self.props[key] = value
+
+    def getDistanceTo(self, other):
+        return (self.worldPosition - other.worldPosition).length
+
+    def restoreDynamics(self):
+        self.dynamic = True
+
+    def suspendDynamics(self):
+        self.dynamic = False
+
+    def removeParent(self):
+        self.parent = None
+
+    def endObject(self):
+        self.invalid = True
+
+
+class StubObjects(list):
+    #scene.objects of the game engine can be indexed and searched by name
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return any(o.name == item for o in self)
+        return list.__contains__(self, item)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for o in self:
+                if o.name == key:
+                    return o
+            raise KeyError(key)
+        return list.__getitem__(self, key)
+
+
+class StubScene:
+
+    def __init__(self, objects):
+        self.name = "Scene"
+        self.objects = StubObjects(objects)
+
+
+def setProps(name, **values):
+    props = dd.BGEProps()
+    props.__dict__.update(destroyable = False, destructor = False, destructor_targets = [],
+                          is_ground = False, ground_connectivity = False, use_collision_compound = False,
+                          backup = "", is_backup_for = "", glue_threshold = 0, dead_delay = 0,
+                          radius = 1, min_radius = 0, acceleration_factor = 1,
+                          hideLayer = 1, use_gravity_collapse = False, collapse_delay = 0)
+    props.__dict__.update(values)
+    dd.DataStore.properties[name] = props
+
+
+def buildScene(count, budget, groundConnected = False):
+    #P_0_S_1.000 holds P_1_S_1.001, which holds the shards, the ball may destroy P_1_S_1.001
+    top = StubObject("P_0_S_1.000")
+    parent = StubObject("P_1_S_1.001")
+    shards = [StubObject("S_1.%03d" % (i + 2), ((i % 4) * 0.25 - 0.375, (i // 4 % 4) * 0.25 - 0.375, 0))
+              for i in range(0, count)]
+    for s in shards:
+        s.parent = parent
+    balls = [StubObject("Ball"), StubObject("SlowBall")]
+
+    dd.DataStore.properties = {}
+    dd.DataStore.grids = {}
+    setProps("Scene")
+    setProps(top.name, destroyable = True)
+    setProps(parent.name, destroyable = True, ground_connectivity = groundConnected)
+    [setProps(s.name) for s in shards]
+    setProps("Ball", destructor = True, destructor_targets = [parent.name])
+    setProps("SlowBall", destructor = True, destructor_targets = [parent.name], dead_delay = 0.01)
+
+    db.scene = StubScene([top, parent] + shards + balls)
+    db.children = {top.name: [parent.name], parent.name: [s.name for s in shards]}
+    db.ground = None
+    db.firstparent = []
+    db.initswap = []
+    db.isCollapsing = False
+    db.delay = 0
+    db.firstGround = "Ground" if groundConnected else None
+    db.scheduler = ds.Scheduler(budget)
+    db.hierarchy = ds.HierarchyCache()
+
+    grid = None
+    if groundConnected:
+        dd.Grid.cellCoord.clear()
+        grid = dd.Grid((2, 2, 1), (0, 0, 0), (1, 1, 0.5), shards, None)
+        grid.buildNeighborhood()
+        dd.DataStore.grids[parent.name] = grid
+    return shards, balls, grid
+
+
+def runFrames(scheduler, budget, maxFrames = 1000):
+    frames = []
+    while scheduler.pending() > 0 and len(frames) < maxFrames:
+        frames.append(scheduler.run(budget))
+    return frames
+
+
+class TestQueuedDestruction(unittest.TestCase):
+
+    def activated(self, shards):
+        return [s.name for s in shards if s.props.get("activated", False)]
+
+    def test_dissolve_frames(self):
+        #one job per frame: the hit dissolves its siblings one level deeper, each of them
+        #queues its own activation, nothing is activated in the frame of the hit
+        shards, balls, grid = buildScene(8, 0)
+        db.scheduler.push(db.dissolve, shards[0], 1, 2, balls[0])
+        self.assertEqual(db.scheduler.run(0), 1)
+        self.assertEqual(self.activated(shards), [])
+        self.assertEqual(db.scheduler.pending(), len(shards))
+
+        frames = runFrames(db.scheduler, 0)
+        self.assertEqual(frames, [1] * (2 * len(shards)))
+        self.assertEqual(self.activated(shards), [s.name for s in shards])
+        self.assertTrue(all(s.dynamic and s.parent == None for s in shards))
+
+    def test_budget(self):
+        #all work is done within a few frames with an unlimited budget, the same work
+        #one job per frame with a budget of 0
+        for budget, frameCount in ((-1, 1), (0, 33)):
+            shards, balls, grid = buildScene(16, budget)
+            db.scheduler.push(db.dissolve, shards[3], 1, 2, balls[0])
+            frames = runFrames(db.scheduler, budget)
+            self.assertEqual(len(frames), frameCount)
+            self.assertEqual(sum(frames), 1 + 2 * len(shards))
+            self.assertEqual(len(self.activated(shards)), len(shards))
+
+    def test_ended_between_frames(self):
+        #shards ended after their jobs were queued are skipped when the jobs run
+        shards, balls, grid = buildScene(8, 0)
+        db.scheduler.push(db.dissolve, shards[0], 1, 2, balls[0])
+        db.scheduler.run(0)
+        shards[1].endObject()
+        db.scheduler.run(0)
+        shards[2].endObject()
+        runFrames(db.scheduler, 0)
+        self.assertEqual(self.activated(shards), [s.name for s in shards if not s.invalid])
+
+    def test_unregistered(self):
+        #P_0_S_1.000 is no target of the ball, its direct children are not dissolved
+        shards, balls, grid = buildScene(4, 0)
+        parent = db.scene.objects["P_1_S_1.001"]
+        db.scheduler.push(db.dissolve, parent, 1, 2, balls[0])
+        runFrames(db.scheduler, 0)
+        self.assertEqual(self.activated(shards), [])
+
+    def test_neighborhood_delay(self):
+        #the neighborhood jobs of an activation keep its delay, even when an activation by a
+        #destructor with dead delay runs between them
+        shards, balls, grid = buildScene(16, 0, True)
+        cells = list(grid.cells.values())
+        db.scheduler.push(db.activate, shards[0], balls[0], grid)
+        db.scheduler.push(db.activate, shards[5], balls[1], grid)
+        frames = runFrames(db.scheduler, 0)
+        self.assertTrue(len(frames) > 2)
+        self.assertEqual(db.delay, 0.01)
+        self.assertEqual(grid.cells, {})
+        self.assertEqual(sum(grid.layerChildren), 0)
+        self.assertEqual(self.activated(shards), [s.name for s in shards])
+        self.assertFalse(any(c.visit for c in cells))
+
+
+def run():
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestQueuedDestruction)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,132 @@
+#grid bookkeeping without bge: the per layer counters must answer the layer queries like
+#the old loops over the remaining cells did, also after cells were destroyed.
+#needs mathutils, run() executes the tests
+import unittest
+import random
+import destruction_data as dd
+
+
+class StubObject:
+
+    def __init__(self, name, pos):
+        self.name = name
+        self.worldPosition = pos
+
+
+def buildGrid(count, cellCounts = (4, 4, 4), seed = 0):
+    rnd = random.Random(seed)
+    #keep the shards off the cell borders, where the old bucketing put them into two cells
+    objs = [StubObject("S_" + str(i), tuple((rnd.randrange(0, 800) + 0.5) / 400 - 1 for k in range(0, 3)))
+            for i in range(0, count)]
+    dd.Grid.cellCoord.clear()
+    grid = dd.Grid(cellCounts, (0, 0, 0), (2, 2, 2), objs, None)
+    grid.buildNeighborhood()
+    return objs, grid
+
+
+#the layer queries as they were before the counters
+def legacyLayerIntegrity(grid, layer, integr):
+    layercells = [c for c in grid.cells.values() if grid.inLayer(c, layer)]
+    layercount = 0
+    layerchilds = 0
+    for c in layercells:
+        layerchilds += len(c.children)
+        layercount += c.count
+
+    if layercount == 0:
+        return False
+    return (layerchilds / layercount) > integr
+
+
+def legacyWeightOnLayer(grid, layer):
+    weight = [c.children for c in grid.cells.values() if grid.aboveLayer(c, layer)]
+    return len(weight)
+
+
+def destroyCell(grid, cell, cells, keep):
+    #what destruction_bge.destroyCell does to the grid with no delay: the cell leaves
+    #cells and only children which could not be released stay in it
+    grid.removeCell(cell, cells)
+    cell.setChildren(cell.children[:keep])
+
+
+class TestGrid(unittest.TestCase):
+
+    def assertLayers(self, grid):
+        for layer in range(-1, grid.cellCounts[2] + 1):
+            for integr in (0, 0.25, 0.5, 0.9):
+                self.assertEqual(grid.layerIntegrity(layer, integr), legacyLayerIntegrity(grid, layer, integr),
+                                 (layer, integr))
+            self.assertEqual(grid.layerDestroyed(layer), not legacyLayerIntegrity(grid, layer, 0))
+            self.assertEqual(grid.weightOnLayer(layer), legacyWeightOnLayer(grid, layer))
+
+    def test_bucket(self):
+        objs, grid = buildGrid(500)
+        for cell in grid.cells.values():
+            inside = [o.name for o in objs if cell.isInside(o.worldPosition, 0)]
+            self.assertEqual(sorted(cell.children), sorted(inside))
+            self.assertEqual(cell.count, len(inside))
+        for o in objs:
+            self.assertTrue(o.name in grid.cells[grid.getCellByName(o.name)].children)
+        self.assertLayers(grid)
+
+    def test_destroy_cell(self):
+        objs, grid = buildGrid(500)
+        rnd = random.Random(1)
+        cells = list(grid.cells.values())
+        rnd.shuffle(cells)
+        for cell in cells[:40]:
+            if rnd.random() < 0.5 and len(cell.children) > 0:
+                cell.removeChild(rnd.choice(cell.children))
+                self.assertLayers(grid)
+            destroyCell(grid, cell, grid.cells, rnd.randrange(0, 3))
+            self.assertFalse(cell.gridPos in grid.cells)
+            self.assertLayers(grid)
+            #the bge keeps using destroyed cells, they must not count again
+            cell.setChildren([])
+            self.assertLayers(grid)
+
+    def test_destroy_copy(self):
+        #activate and the layer collapse destroy cells of a copy of the cell dict
+        objs, grid = buildGrid(200)
+        cells = dict(grid.cells)
+        counts = list(grid.layerCounts), list(grid.layerCells)
+        for cell in [c for c in grid.cells.values() if grid.inLayer(c, 0)]:
+            destroyCell(grid, cell, cells, 0)
+            self.assertTrue(cell.gridPos in grid.cells)
+        self.assertEqual((grid.layerCounts, grid.layerCells), counts)
+        self.assertEqual(grid.layerChildren[0], 0)
+        self.assertTrue(grid.layerDestroyed(0))
+        self.assertLayers(grid)
+
+    def test_flat(self):
+        #a plane has a zero size axis, its children must still be bucketed
+        rnd = random.Random(2)
+        objs = [StubObject("S_" + str(i), ((rnd.randrange(0, 800) + 0.5) / 400 - 1,
+                                           (rnd.randrange(0, 800) + 0.5) / 400 - 1, 0))
+                for i in range(0, 100)]
+        dd.Grid.cellCoord.clear()
+        grid = dd.Grid((4, 4, 1), (0, 0, 0), (2, 2, 0), objs, None)
+        for cell in grid.cells.values():
+            inside = [o.name for o in objs if cell.isInside(o.worldPosition, 0)]
+            self.assertEqual(sorted(cell.children), sorted(inside))
+        self.assertEqual(sum(len(c.children) for c in grid.cells.values()), len(objs))
+        self.assertEqual(grid.cellIndex((0.1, 0.1, 0)), (2, 2, 0))
+
+    def test_neighbors(self):
+        objs, grid = buildGrid(10, (3, 3, 3))
+        for cell in grid.cells.values():
+            self.assertEqual(len(cell.neighbors), 26)
+            self.assertEqual(cell.neighbors[dd.rightSlot], None)
+            for i, (dx, dy, dz) in enumerate(dd.neighborOffsets):
+                pos = (cell.gridPos[0] + dx, cell.gridPos[1] + dy, cell.gridPos[2] + dz)
+                if i != dd.rightSlot:
+                    self.assertTrue(cell.neighbors[i] is grid.cells.get(pos))
+        center = grid.cells[(1, 1, 1)]
+        self.assertEqual(sum(1 for n in center.neighbors if n != None), 25)
+
+
+def run():
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestGrid)
+    unittest.TextTestRunner(verbosity=2).run(suite)
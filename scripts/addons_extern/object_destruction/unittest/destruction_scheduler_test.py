@@ -0,0 +1,129 @@
+#headless simulation of queued destruction work, no bge needed (the grid needs mathutils).
+#stub game objects stand in for the shards, run() executes the tests, benchmark() prints
+#frame time percentiles. destruction_bge_queue_test.py drives the queued destruction code itself
+import unittest
+import random
+import destruction_data as dd
+import destruction_scheduler as ds
+
+
+class StubObject:
+
+    def __init__(self, name, pos):
+        self.name = name
+        self.worldPosition = pos
+        self.invalid = False
+        self.props = {"activated": False, "suspended": True}
+
+    def restoreDynamics(self):
+        self.props["suspended"] = False
+
+    def removeParent(self):
+        pass
+
+    def endObject(self):
+        self.invalid = True
+
+
+def buildScene(count, cellCounts = (4, 4, 4)):
+    objs = [StubObject("S_" + str(i), (random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1)))
+            for i in range(0, count)]
+    grid = dd.Grid(cellCounts, (0, 0, 0), (2, 2, 2), objs, None)
+    grid.buildNeighborhood()
+    return objs, grid
+
+
+def activate(obj, grid):
+    #mimics destruction_bge.activate on a stub object
+    if obj.invalid:
+        return
+    cell = grid.cells[grid.getCellByName(obj.name)]
+    cell.removeChild(obj.name)
+    obj.restoreDynamics()
+    obj.props["activated"] = True
+    cell.integrity(0.5)
+
+
+def simulate(count, impacts, budget):
+    #each frame an impact queues a batch of activations, the scheduler processes them
+    objs, grid = buildScene(count)
+    scheduler = ds.Scheduler(budget)
+    pending = list(objs)
+    random.shuffle(pending)
+    batch = len(pending) // impacts
+    frames = 0
+
+    while len(pending) > 0 or scheduler.pending() > 0:
+        if len(pending) > 0:
+            [scheduler.push(activate, o, grid) for o in pending[:batch]]
+            pending = pending[batch:]
+        scheduler.run()
+        frames += 1
+
+    return scheduler, grid, frames
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_order(self):
+        scheduler = ds.Scheduler(-1)
+        seq = []
+        [scheduler.push(seq.append, i) for i in range(0, 10)]
+        scheduler.run()
+        self.assertEqual(seq, list(range(0, 10)))
+        self.assertEqual(scheduler.pending(), 0)
+
+    def test_budget(self):
+        scheduler = ds.Scheduler(0)
+        seq = []
+        [scheduler.push(seq.append, i) for i in range(0, 10)]
+        self.assertEqual(scheduler.run(), 1)
+        self.assertEqual(scheduler.pending(), 9)
+
+    def test_push_once(self):
+        scheduler = ds.Scheduler(-1)
+        seq = []
+        scheduler.pushOnce("grids", seq.append, 1)
+        scheduler.pushOnce("grids", seq.append, 2)
+        scheduler.run()
+        scheduler.pushOnce("grids", seq.append, 3)
+        scheduler.run()
+        self.assertEqual(seq, [1, 3])
+
+    def test_hierarchy_cache(self):
+        children = {"P_0_S_1.000": ["S_1.001", "P_1_S_1.002"], "P_1_S_1.002": ["S_1.003"]}
+        cache = ds.HierarchyCache()
+        self.assertEqual(cache.findParentName("S_1.003", children), "P_1_S_1.002")
+        self.assertEqual(sorted(cache.leafNames(children)), ["S_1.001", "S_1.003"])
+        children["P_0_S_1.000"].append("S_1.004")
+        cache.invalidate()
+        self.assertEqual(cache.findParentName("S_1.004", children), "P_0_S_1.000")
+
+    def test_simulation(self):
+        scheduler, grid, frames = simulate(500, 5, 0.0005)
+        self.assertEqual(scheduler.processed, 500)
+        self.assertEqual(sum(grid.layerChildren), 0)
+        self.assertTrue(grid.layerDestroyed(0))
+
+    def test_percentiles(self):
+        #one frame time per run() which processed jobs, the percentiles pick from the sorted times
+        scheduler, grid, frames = simulate(200, 4, 0)
+        self.assertEqual(len(scheduler.frameTimes), frames)
+        p = scheduler.percentiles()
+        self.assertEqual(sorted(p.keys()), [50, 90, 99, 100])
+        self.assertEqual(p[100], max(scheduler.frameTimes))
+        self.assertTrue(p[50] <= p[90] <= p[99] <= p[100])
+        self.assertEqual(ds.Scheduler().percentiles(), {})
+
+
+def benchmark(count = 20000, impacts = 10, budget = 0.005):
+    for b in (-1, budget):
+        scheduler, grid, frames = simulate(count, impacts, b)
+        p = scheduler.percentiles()
+        print("budget", b, "frames", frames, " ".join(["p" + str(k) + ": %.2f ms" % (v * 1000) for k, v in sorted(p.items())]))
+
+
+def run():
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestScheduler)
+    unittest.TextTestRunner(verbosity=2).run(suite)
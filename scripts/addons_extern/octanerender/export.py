@@ -25,6 +25,7 @@ import mathutils
 import datetime
 import octanerender
 from octanerender.utils import *
+from octanerender import obj_core
 
 # Build list of objects to export
 def obj_export(scene):
@@ -273,27 +274,51 @@ def write_mtl(mtlFile, mtl_dict, scene, copy_images):
     delta = datetime.datetime.now() - start_time
     log ('MTL export time: %d.%03ds' % (delta.seconds,delta.microseconds/1000))
 
-def write_obj(objFile, mtlFile, objects, scene, unitFactor):
+# Export settings of the OBJ writers, read once per file
+class ObjOptions:
+    def __init__(self, octane_render):
+        self.tri = octane_render.export_tri
+        self.edges = octane_render.export_edges
+        self.normals = octane_render.export_normals
+        self.uv = octane_render.export_UV
+        self.mtl = octane_render.export_materials
+        self.apply_modifiers = octane_render.export_apply_modifiers
+        self.rotx90 = octane_render.export_ROTX90
+        self.polygroups = octane_render.export_polygroups
+        self.curves_as_nurbs = octane_render.export_curves_as_nurbs
+        self.blen_obs = True
+        self.group_by_ob = False
+        self.group_by_mat = False
+        self.keep_vert_order = False
+
+# Lines of a material switch, the material is added to mtl_dict the first time
+def material_switch(options, mtl_dict, ob, key, material, image):
+    lines = ''
+    if key[0] == "None" and key[1] == "None":
+        # Write a null material, since we know the context has changed.
+        if options.group_by_mat:
+            lines += 'g %s_%s\n' % (fixName(ob.name), fixName(ob.data.name)) # can be mat_image or (null)
+        lines += 'usemtl Null\n' # mat, image
 
-    start_time = datetime.datetime.now()
-    octane_render = scene.octane_render
-    log('OBJ file: "%s"' % (objFile))
+    else:
+        mat_data = mtl_dict.get(key)
+        if not mat_data:
+            # First add to global dict so we can export to mtl
+            # Then write mtl
+
+            # Make a new names from the mat and image name,
+            # converting any spaces to underscores with fixName.
+            mat_data = mtl_dict[key] = ('%s'%fixName(key[0])), material, image
+
+        if options.group_by_mat:
+            lines += 'g %s_%s_%s\n' % (fixName(ob.name), fixName(ob.data.name), mat_data[0]) # can be mat_image or (null)
 
-    EXPORT_TRI = octane_render.export_tri
-    EXPORT_EDGES = octane_render.export_edges
-    EXPORT_NORMALS = octane_render.export_normals
-    EXPORT_NORMALS_HQ = octane_render.export_HQ
-    EXPORT_UV = octane_render.export_UV
-    EXPORT_MTL = octane_render.export_materials
-    EXPORT_COPY_IMAGES = octane_render.export_copy_images,
-    EXPORT_APPLY_MODIFIERS = octane_render.export_apply_modifiers
-    EXPORT_ROTX90 = octane_render.export_ROTX90
-    EXPORT_BLEN_OBS = True,
-    EXPORT_GROUP_BY_OB = False,
-    EXPORT_GROUP_BY_MAT = False,
-    EXPORT_KEEP_VERT_ORDER = False,
-    EXPORT_POLYGROUPS = octane_render.export_polygroups
-    EXPORT_CURVE_AS_NURBS = octane_render.export_curves_as_nurbs
+        lines += 'usemtl %s\n' % mat_data[0] # can be mat_image or (null)
+    return lines
+
+# Per face writer of the mesh lines, used when numpy isn't available
+def legacy_mesh_writer(options, mtl_dict, unitFactor):
+    globalNormals = {}
 
     def veckey3d(v):
         return round(v.x, 6), round(v.y, 6), round(v.z, 6)
@@ -321,43 +346,347 @@ def write_obj(objFile, mtlFile, objects, scene, unitFactor):
         else:
             return '(null)'
 
-    # TODO: implement this in C? dunno how it should be called...
-    def getVertsFromGroup(me, group_index):
-        ret = []
+    def write_mesh(out, ob, me, materials, material_names, faceuv, totverts, totuvco):
+        fw = out.write
+        me_verts = me.vertices[:]
+
+        # Make our own list so it can be sorted to reduce context switching
+        face_index_pairs = [ (face, index) for index, face in enumerate(me.tessfaces)]
+
+        if faceuv:
+            uv_layer = me.uv_textures.active.data[:]
+
+        # Sort by Material, then images
+        # so we dont over context switch in the obj file.
+        if options.keep_vert_order:
+            pass
+        elif faceuv:
+            face_index_pairs.sort(key=lambda a: (a[0].material_index, hash(uv_layer[a[1]].image), a[0].use_smooth))
+        elif len(materials) > 1:
+            face_index_pairs.sort(key=lambda a: (a[0].material_index, a[0].use_smooth))
+        else:
+            # no materials
+            face_index_pairs.sort(key=lambda a: a[0].use_smooth)
+
+        # Set the default mat to no material and no image.
+        contextMat = (0, 0) # Can never be this, so we will label a new material teh first chance we get.
+        contextSmooth = None # Will either be true or false,  set bad to force initialization switch.
+
+        # Vert
+        for v in me.vertices:
+            fw('v %.6f %.6f %.6f\n' % tuple(v.co*unitFactor))
+
+        # UV
+        uv_unique_count = 0
+        if faceuv:
+            # in case removing some of these dont get defined.
+            uv = uvkey = uv_dict = f_index = uv_index = None
+
+            uv_face_mapping = [[0, 0, 0, 0] for i in range(len(face_index_pairs))]  # a bit of a waste for tri's :/
+
+            uv_dict = {}  # could use a set() here
+            uv_layer = me.tessface_uv_textures.active.data
+            for f, f_index in face_index_pairs:
+                for uv_index, uv in enumerate(uv_layer[f_index].uv):
+                    uvkey = veckey2d(uv)
+                    try:
+                        uv_face_mapping[f_index][uv_index] = uv_dict[uvkey]
+                    except:
+                        uv_face_mapping[f_index][uv_index] = uv_dict[uvkey] = len(uv_dict)
+                        fw('vt %.6f %.6f\n' % uv[:])
+
+            uv_unique_count = len(uv_dict)
+
+            del uv, uvkey, uv_dict, f_index, uv_index
+            # Only need uv_unique_count and uv_face_mapping
+
+        # NORMAL, Smooth/Non smoothed.
+        if options.normals:
+            for f, f_index in face_index_pairs:
+                if f.use_smooth:
+                    noKeys = [veckey3d(me_verts[v_idx].normal) for v_idx in f.vertices]
+                else:
+                    # Hard, 1 normal from the face.
+                    noKeys = [veckey3d(f.normal)]
+                for noKey in noKeys:
+                    if noKey not in globalNormals:
+                        globalNormals[noKey] = len(globalNormals) + 1
+                        fw('vn %.6f %.6f %.6f\n' % noKey)
+
+        f_image = None
+
+        if options.polygroups:
+            # Retrieve the list of vertex groups
+            vertGroupNames = ob.vertex_groups.keys()
+
+            currentVGroup = ''
+            # Create a dictionary keyed by face id and listing, for each vertex, the vertex groups it belongs to
+            vgroupsMap = [[] for _i in range(len(me_verts))]
+            for v_idx, v_ls in enumerate(vgroupsMap):
+                v_ls[:] = [(vertGroupNames[g.group], g.weight) for g in me_verts[v_idx].groups]
+
+        for f, f_index in face_index_pairs:
+            f_smooth = f.use_smooth
+            f_mat = min(f.material_index, len(materials) - 1)
+
+            if faceuv:
+                tface = uv_layer[f_index]
+                f_image = tface.image
+
+            # MAKE KEY
+            if faceuv and f_image:  # Object is always true.
+                key = fixName(material_names[f_mat]), fixName(f_image.name)
+            else:
+                key = fixName(material_names[f_mat]), "None"  # No image, use None instead.
+
+            # Write the vertex group
+            if options.polygroups:
+                if ob.vertex_groups:
+                    # find what vertext group the face belongs to
+                    vgroup_of_face = findVertexGroupName(f, vgroupsMap)
+                    if vgroup_of_face != currentVGroup:
+                        currentVGroup = vgroup_of_face
+                        fw('g %s\n' % vgroup_of_face)
+
+            # CHECK FOR CONTEXT SWITCH
+            if key != contextMat:
+                fw(material_switch(options, mtl_dict, ob, key, materials[f_mat], f_image))
+
+            contextMat = key
+            if f_smooth != contextSmooth:
+                if f_smooth:  # on now off
+                    fw('s 1\n')
+                    contextSmooth = f_smooth
+                else:  # was off now on
+                    fw('s off\n')
+                    contextSmooth = f_smooth
+
+            f_v_orig = [(vi, me_verts[v_idx]) for vi, v_idx in enumerate(f.vertices)]
+
+            if not options.tri or len(f_v_orig) == 3:
+                f_v_iter = (f_v_orig, )
+            else:
+                f_v_iter = (f_v_orig[0], f_v_orig[1], f_v_orig[2]), (f_v_orig[0], f_v_orig[2], f_v_orig[3])
 
-        for i, v in enumerate(me.vertices):
-            for g in v.groups:
-                if g.group == group_index:
-                    ret.append((i, g.weight))
+            # support for triangulation
+            for f_v in f_v_iter:
+                fw('f')
+
+                if faceuv:
+                    if options.normals:
+                        if f_smooth:  # Smoothed, use vertex normals
+                            for vi, v in f_v:
+                                fw(" %d/%d/%d" %
+                                           (v.index + totverts,
+                                            totuvco + uv_face_mapping[f_index][vi],
+                                            globalNormals[veckey3d(v.normal)],
+                                            ))  # vert, uv, normal
+
+                        else:  # No smoothing, face normals
+                            no = globalNormals[veckey3d(f.normal)]
+                            for vi, v in f_v:
+                                fw(" %d/%d/%d" %
+                                           (v.index + totverts,
+                                            totuvco + uv_face_mapping[f_index][vi],
+                                            no,
+                                            ))  # vert, uv, normal
+                    else:  # No Normals
+                        for vi, v in f_v:
+                            fw(" %d/%d" % (
+                                       v.index + totverts,
+                                       totuvco + uv_face_mapping[f_index][vi],
+                                       ))  # vert, uv
+
+                else:  # No UV's
+                    if options.normals:
+                        if f_smooth:  # Smoothed, use vertex normals
+                            for vi, v in f_v:
+                                fw(" %d//%d" % (
+                                           v.index + totverts,
+                                           globalNormals[veckey3d(v.normal)],
+                                           ))
+                        else:  # No smoothing, face normals
+                            no = globalNormals[veckey3d(f.normal)]
+                            for vi, v in f_v:
+                                fw(" %d//%d" % (v.index + totverts, no))
+                    else:  # No Normals
+                        for vi, v in f_v:
+                            fw(" %d" % (v.index + totverts))
+
+            fw('\n')
+
+        # Write edges.
+        if options.edges:
+            for ed in me.edges:
+                if ed.is_loose:
+                    fw('f %d %d\n' % (ed.vertices[0] + totverts, ed.vertices[1] + totverts))
+
+        return uv_unique_count
+
+    return write_mesh
+
+# Buffers of a tessellated mesh, see obj_core
+def get_mesh_arrays(me):
+    np = obj_core.np
+    nfaces = len(me.tessfaces)
+
+    co = [0.0] * (3 * len(me.vertices))
+    me.vertices.foreach_get('co', co)
+    vnormals = [0.0] * (3 * len(me.vertices))
+    me.vertices.foreach_get('normal', vnormals)
+
+    face_verts = [0] * (4 * nfaces)
+    me.tessfaces.foreach_get('vertices_raw', face_verts)
+    fnormals = [0.0] * (3 * nfaces)
+    me.tessfaces.foreach_get('normal', fnormals)
+    smooth = [False] * nfaces
+    me.tessfaces.foreach_get('use_smooth', smooth)
+    material_index = [0] * nfaces
+    me.tessfaces.foreach_get('material_index', material_index)
+
+    face_verts = np.array(face_verts, dtype=np.int64).reshape(-1, 4)
+    return (co, vnormals, face_verts, fnormals, np.array(smooth, dtype=bool),
+            np.array(material_index, dtype=np.int64))
+
+# Array based writer of the mesh lines, see obj_core
+def array_mesh_writer(options, mtl_dict, unitFactor):
+    np = obj_core.np
+    globalNormals = obj_core.NormalIndex(1)
+
+    def write_mesh(out, ob, me, materials, material_names, faceuv, totverts, totuvco):
+        nfaces = len(me.tessfaces)
+
+        co, vnormals, face_verts, fnormals, smooth, material_index = get_mesh_arrays(me)
+        sizes = obj_core.tessface_sizes(face_verts)
+
+        if faceuv:
+            uv_layer = me.tessface_uv_textures.active.data
+            face_images = [tface.image for tface in uv_layer]
+        else:
+            face_images = [None] * nfaces
+
+        # Sort by Material, then images
+        # so we dont over context switch in the obj file.
+        if options.keep_vert_order:
+            order = np.arange(nfaces)
+        elif faceuv:
+            order = np.array(sorted(range(nfaces), key=lambda i: (material_index[i], hash(face_images[i]), smooth[i])), dtype=np.int64)
+        elif len(materials) > 1:
+            order = np.lexsort((smooth, material_index))
+        else:
+            # no materials
+            order = np.argsort(smooth, kind='mergesort')
+
+        # Vert
+        out.writelines(obj_core.vertex_lines(co, unitFactor))
+
+        # UV
+        uv_face_mapping = None
+        uv_unique_count = 0
+        if faceuv:
+            face_uvs = [0.0] * (8 * nfaces)
+            uv_layer.foreach_get('uv_raw', face_uvs)
+            lines, uv_unique_count, uv_face_mapping = obj_core.uv_lines(face_uvs, sizes, order)
+            out.writelines(lines)
+            uv_face_mapping += totuvco
+
+        # NORMAL, Smooth/Non smoothed.
+        normal_index = None
+        if options.normals:
+            lines, normal_index = globalNormals.face_normals(order, sizes, smooth, face_verts, vnormals, fnormals)
+            out.write(lines)
+
+        # Vertex group of each face
+        face_groups = None
+        vertGroupNames = None
+        if options.polygroups and ob.vertex_groups:
+            vertGroupNames = ob.vertex_groups.keys()
+            offsets = [0]
+            groups = []
+            weights = []
+            for v in me.vertices:
+                for g in v.groups:
+                    groups.append(g.group)
+                    weights.append(g.weight)
+                offsets.append(len(groups))
+            face_groups = obj_core.face_groups(face_verts, sizes, offsets, groups, weights, vertGroupNames)[order]
+
+        # Material keys, one per material and image combination
+        f_mats = np.minimum(material_index, len(materials) - 1)
+        image_ids = {}
+        face_image_ids = np.array([image_ids.setdefault(image, len(image_ids)) for image in face_images], dtype=np.int64)
+        combos, key_ids = np.unique(f_mats * max(1, len(image_ids)) + face_image_ids, return_inverse=True)
+        images = list(image_ids.keys())
+        keys = []
+        for combo in combos.tolist():
+            f_mat, f_image = divmod(combo, max(1, len(image_ids)))
+            f_image = images[f_image]
+            # MAKE KEY
+            if faceuv and f_image:  # Object is always true.
+                keys.append((fixName(material_names[f_mat]), fixName(f_image.name)))
+            else:
+                keys.append((fixName(material_names[f_mat]), "None"))  # No image, use None instead.
+        # combinations with equal names share a key
+        key_numbers = {}
+        key_ids = np.array([key_numbers.setdefault(key, len(key_numbers)) for key in keys], dtype=np.int64)[key_ids.ravel()]
+        key_list = list(key_numbers.keys())
+
+        def material_lines(key_id, position):
+            f_index = order[position]
+            return material_switch(options, mtl_dict, ob, key_list[key_id], materials[f_mats[f_index]], face_images[f_index])
+
+        lines = obj_core.face_lines(order, sizes, face_verts, totverts, uv_face_mapping, normal_index, options.tri)
+        obj_core.write_faces(out, lines, key_ids[order], smooth[order], face_groups, vertGroupNames, material_lines)
+
+        # Write edges.
+        if options.edges:
+            edges = me.edges
+            loose = [False] * len(edges)
+            edges.foreach_get('is_loose', loose)
+            edge_verts = [0] * (2 * len(edges))
+            edges.foreach_get('vertices', edge_verts)
+            edge_verts = np.array(edge_verts, dtype=np.int64).reshape(-1, 2)[np.array(loose, dtype=bool)]
+            out.writelines(obj_core.format_rows('f %d %d\n', edge_verts + totverts))
+
+        return uv_unique_count
+
+    return write_mesh
+
+# Write the OBJ file of objects and their dupli children, the lines of each
+# mesh come from a writer made by mesh_writer. Returns the materials used
+def write_obj(objFile, mtlFile, objects, scene, unitFactor, mesh_writer=None):
+    if mesh_writer is None:
+        mesh_writer = legacy_mesh_writer if obj_core.np is None else array_mesh_writer
 
-        return ret
+    start_time = datetime.datetime.now()
+    options = ObjOptions(scene.octane_render)
+    log('OBJ file: "%s"' % (objFile))
 
     file = open(objFile, "w", encoding="utf8", newline="\n")
-    fw = file.write
+    out = obj_core.ChunkedWriter(file)
+    fw = out.write
 
     # Write Header
     fw('# Blender v%s OBJ File: %s\n' % (bpy.app.version_string, os.path.basename(objFile)))
     fw('# www.blender.org\n')
 
     # Tell the obj file what material file to use.
-    if EXPORT_MTL:
-        file.write('mtllib %s\n' % ( os.path.basename(mtlFile)))
+    if options.mtl:
+        fw('mtllib %s\n' % ( os.path.basename(mtlFile)))
 
-    if EXPORT_ROTX90:
+    if options.rotx90:
         mat_xrot90= mathutils.Matrix.Rotation(-math.pi/2, 4, 'X')
 
-    # Initialize totals, these are updated each object
-    totverts = totuvco = totno = 1
-    face_vert_index = 1
-    globalNormals = {}
-
     # A Dict of Materials
     # (material.name, image.name):matname_imagename # matname_imagename has gaps removed.
     mtl_dict = {}
-    copy_set = set()
+    write_mesh = mesh_writer(options, mtl_dict, unitFactor)
+
+    # Initialize totals, these are updated each object
+    totverts = totuvco = 1
+
     # Get all meshes
     for ob_main in objects:
-        #log ('Processing <%s>' % (ob_main.name))
         start_obj = datetime.datetime.now()
 
         # Ignore dupli children
@@ -381,52 +710,39 @@ def write_obj(objFile, mtlFile, objects, scene, unitFactor):
         for ob, ob_mat in obs:
 
             # Nurbs curve support attempt
-            if EXPORT_CURVE_AS_NURBS and test_nurbs_compat(ob):
-                if EXPORT_ROTX90:
+            if options.curves_as_nurbs and test_nurbs_compat(ob):
+                if options.rotx90:
                     ob_mat = ob_mat * mat_xrot90
-                    totverts += write_nurb(file, ob, ob_mat)
+                out.flush()
+                totverts += write_nurb(file, ob, ob_mat)
                 continue
 
             try:
-                me = ob.to_mesh(scene, EXPORT_APPLY_MODIFIERS, 'RENDER')
+                me = ob.to_mesh(scene, options.apply_modifiers, 'RENDER')
             except RuntimeError:
                 me = None
             if me is None:
                 continue
 
-            if EXPORT_ROTX90:
+            if options.rotx90:
                 me.transform(mat_xrot90 * ob_mat)
             else:
                 me.transform(ob_mat)
 
-            if EXPORT_UV:
-                faceuv = len(me.uv_textures) > 0
-                if faceuv:
-                    uv_layer = me.uv_textures.active.data[:]
-            else:
-                faceuv = False
+            faceuv = options.uv and len(me.uv_textures) > 0
+            nverts = len(me.vertices)
+            nfaces = len(me.tessfaces)
+            nedges = len(me.edges) if options.edges else 0
 
-            me_verts = me.vertices[:]
-
-            # Make our own list so it can be sorted to reduce context switching
-            face_index_pairs = [ (face, index) for index, face in enumerate(me.tessfaces)]
-            # faces = [ f for f in me.faces ]
-
-            if EXPORT_EDGES:
-                edges = me.edges
-            else:
-                edges = []
-
-            if not (len(face_index_pairs)+len(edges)+len(me.vertices)): # Make sure there is somthing to write
+            if not (nfaces+nedges+nverts): # Make sure there is somthing to write
 
                 # clean up
                 bpy.data.meshes.remove(me)
 
                 continue # dont bother with this mesh.
 
-            # XXX
             # High Quality Normals
-            if EXPORT_NORMALS and face_index_pairs:
+            if options.normals and nfaces:
                 me.calc_normals()
             if ob.type == "META": # or ob.type == "CURVE":
                 materials = ob.data.materials[:]
@@ -434,47 +750,12 @@ def write_obj(objFile, mtlFile, objects, scene, unitFactor):
                 materials = me.materials[:]
             material_names = [m.name if m else None for m in materials]
 
-#            materialNames = []
-#            materialItems = [m for m in materials]
-
             # avoid bad index errors
             if not materials:
                 materials = [None]
                 material_names = ["Null"]
 
-#            if materials:
-#                for mat in materials:
-#                    if mat: # !=None
-#                        material_names.append(mat.name)
-#                    else:
-#                        material_names.append(None)
-                # Cant use LC because some materials are None.
-                # materialNames = map(lambda mat: mat.name, materials) # Bug Blender, dosent account for null materials, still broken.
-
-            # Possible there null materials, will mess up indicies
-            # but at least it will export, wait until Blender gets fixed.
-            #materialNames.extend((16-len(materialNames)) * [None])
-            #materialItems.extend((16-len(materialItems)) * [None])
-
-            # Sort by Material, then images
-            # so we dont over context switch in the obj file.
-            if EXPORT_KEEP_VERT_ORDER:
-                pass
-            elif faceuv:
-                face_index_pairs.sort(key=lambda a: (a[0].material_index, hash(uv_layer[a[1]].image), a[0].use_smooth))
-            elif len(materials) > 1:
-                face_index_pairs.sort(key=lambda a: (a[0].material_index, a[0].use_smooth))
-            else:
-                # no materials
-                face_index_pairs.sort(key=lambda a: a[0].use_smooth)
-
-            #faces = [pair[0] for pair in face_index_pairs]
-
-            # Set the default mat to no material and no image.
-            contextMat = (0, 0) # Can never be this, so we will label a new material teh first chance we get.
-            contextSmooth = None # Will either be true or false,  set bad to force initialization switch.
-
-            if EXPORT_BLEN_OBS or EXPORT_GROUP_BY_OB:
+            if options.blen_obs or options.group_by_ob:
                 name1 = ob.name
                 name2 = ob.data.name
                 if name1 == name2:
@@ -482,201 +763,16 @@ def write_obj(objFile, mtlFile, objects, scene, unitFactor):
                 else:
                     obnamestring = '%s_%s' % (fixName(name1), fixName(name2))
 
-                if EXPORT_BLEN_OBS:
+                if options.blen_obs:
                     fw('o %s\n' % obnamestring)  # Write Object name
-                else:  # if EXPORT_GROUP_BY_OB:
+                else:  # if options.group_by_ob:
                     fw('g %s\n' % obnamestring)
 
-            # Vert
-            for v in me.vertices:
-                fw('v %.6f %.6f %.6f\n' % tuple(v.co*unitFactor))
-
-            # UV
-            if faceuv:
-                # in case removing some of these dont get defined.
-                uv = uvkey = uv_dict = f_index = uv_index = None
-
-                uv_face_mapping = [[0, 0, 0, 0] for i in range(len(face_index_pairs))]  # a bit of a waste for tri's :/
-
-                uv_dict = {}  # could use a set() here
-                uv_layer = me.tessface_uv_textures.active.data
-                for f, f_index in face_index_pairs:
-                    for uv_index, uv in enumerate(uv_layer[f_index].uv):
-                        uvkey = veckey2d(uv)
-                        try:
-                            uv_face_mapping[f_index][uv_index] = uv_dict[uvkey]
-                        except:
-                            uv_face_mapping[f_index][uv_index] = uv_dict[uvkey] = len(uv_dict)
-                            fw('vt %.6f %.6f\n' % uv[:])
-                            #file.write('vt %.6f %.6f\n' % tuple(uv))
-
-                uv_unique_count = len(uv_dict)
-
-                del uv, uvkey, uv_dict, f_index, uv_index
-                # Only need uv_unique_count and uv_face_mapping
-
-            # NORMAL, Smooth/Non smoothed.
-            if EXPORT_NORMALS:
-                for f, f_index in face_index_pairs:
-                    if f.use_smooth:
-                        for v_idx in f.vertices:
-                            v = me_verts[v_idx]
-                            noKey = veckey3d(v.normal)
-                            if noKey not in globalNormals:
-                                globalNormals[noKey] = totno
-                                totno += 1
-                                fw('vn %.6f %.6f %.6f\n' % noKey)
-                    else:
-                        # Hard, 1 normal from the face.
-                        noKey = veckey3d(f.normal)
-                        if noKey not in globalNormals:
-                            globalNormals[noKey] = totno
-                            totno += 1
-                            fw('vn %.6f %.6f %.6f\n' % noKey)
-
-            if not faceuv:
-                f_image = None
-
-            # XXX
-            if EXPORT_POLYGROUPS:
-                # Retrieve the list of vertex groups
-                vertGroupNames = ob.vertex_groups.keys()
-
-                currentVGroup = ''
-                # Create a dictionary keyed by face id and listing, for each vertex, the vertex groups it belongs to
-                vgroupsMap = [[] for _i in range(len(me_verts))]
-                for v_idx, v_ls in enumerate(vgroupsMap):
-                    v_ls[:] = [(vertGroupNames[g.group], g.weight) for g in me_verts[v_idx].groups]
-
-            for f, f_index in face_index_pairs:
-                f_smooth = f.use_smooth
-                f_mat = min(f.material_index, len(materials) - 1)
-
-                if faceuv:
-                    tface = uv_layer[f_index]
-                    f_image = tface.image
-
-                # MAKE KEY
-                if faceuv and f_image:  # Object is always true.
-                    key = fixName(material_names[f_mat]), fixName(f_image.name)
-                else:
-                    key = fixName(material_names[f_mat]), "None"  # No image, use None instead.
-
-                # Write the vertex group
-                if EXPORT_POLYGROUPS:
-                    if ob.vertex_groups:
-                        # find what vertext group the face belongs to
-                        vgroup_of_face = findVertexGroupName(f, vgroupsMap)
-                        if vgroup_of_face != currentVGroup:
-                            currentVGroup = vgroup_of_face
-                            fw('g %s\n' % vgroup_of_face)
-
-                # CHECK FOR CONTEXT SWITCH
-                if key == contextMat:
-                    pass  # Context alredy switched, dont do anything
-                else:
-                    if key[0] == "None" and key[1] == "None":
-                        # Write a null material, since we know the context has changed.
-                        if EXPORT_GROUP_BY_MAT:
-                            # can be mat_image or (null)
-                            fw('g %s_%s\n' % (fixName(ob.name), fixName(ob.data.name)) ) # can be mat_image or (null)
-                        fw('usemtl Null\n') # mat, image
-
-                    else:
-                        mat_data = mtl_dict.get(key)
-                        if not mat_data:
-                            # First add to global dict so we can export to mtl
-                            # Then write mtl
-
-                            # Make a new names from the mat and image name,
-                            # converting any spaces to underscores with fixName.
-
-                            # If none image dont bother adding it to the name
-                            #if key[1] == None:
-                            mat_data = mtl_dict[key] = ('%s'%fixName(key[0])), materials[f_mat], f_image
-#                           else:
-#                              mat_data = mtl_dict[key] = ('%s_%s' % (fixName(key[0]), fixName(key[1]))), materialItems[f_mat], f_image
-
-                        if EXPORT_GROUP_BY_MAT:
-                            fw('g %s_%s_%s\n' % (fixName(ob.name), fixName(ob.data.name), mat_data[0]) ) # can be mat_image or (null)
-
-                        fw('usemtl %s\n' % mat_data[0]) # can be mat_image or (null)
-
-                contextMat = key
-                if f_smooth != contextSmooth:
-                    if f_smooth:  # on now off
-                        fw('s 1\n')
-                        contextSmooth = f_smooth
-                    else:  # was off now on
-                        fw('s off\n')
-                        contextSmooth = f_smooth
-
-                f_v_orig = [(vi, me_verts[v_idx]) for vi, v_idx in enumerate(f.vertices)]
-
-                if not EXPORT_TRI or len(f_v_orig) == 3:
-                    f_v_iter = (f_v_orig, )
-                else:
-                    f_v_iter = (f_v_orig[0], f_v_orig[1], f_v_orig[2]), (f_v_orig[0], f_v_orig[2], f_v_orig[3])
-
-                # support for triangulation
-                for f_v in f_v_iter:
-                    fw('f')
-
-                    if faceuv:
-                        if EXPORT_NORMALS:
-                            if f_smooth:  # Smoothed, use vertex normals
-                                for vi, v in f_v:
-                                    fw(" %d/%d/%d" %
-                                               (v.index + totverts,
-                                                totuvco + uv_face_mapping[f_index][vi],
-                                                globalNormals[veckey3d(v.normal)],
-                                                ))  # vert, uv, normal
-
-                            else:  # No smoothing, face normals
-                                no = globalNormals[veckey3d(f.normal)]
-                                for vi, v in f_v:
-                                    fw(" %d/%d/%d" %
-                                               (v.index + totverts,
-                                                totuvco + uv_face_mapping[f_index][vi],
-                                                no,
-                                                ))  # vert, uv, normal
-                        else:  # No Normals
-                            for vi, v in f_v:
-                                fw(" %d/%d" % (
-                                           v.index + totverts,
-                                           totuvco + uv_face_mapping[f_index][vi],
-                                           ))  # vert, uv
-
-                        face_vert_index += len(f_v)
-
-                    else:  # No UV's
-                        if EXPORT_NORMALS:
-                            if f_smooth:  # Smoothed, use vertex normals
-                                for vi, v in f_v:
-                                    fw(" %d//%d" % (
-                                               v.index + totverts,
-                                               globalNormals[veckey3d(v.normal)],
-                                               ))
-                            else:  # No smoothing, face normals
-                                no = globalNormals[veckey3d(f.normal)]
-                                for vi, v in f_v:
-                                    fw(" %d//%d" % (v.index + totverts, no))
-                        else:  # No Normals
-                            for vi, v in f_v:
-                                fw(" %d" % (v.index + totverts))
-
-                fw('\n')
-
-            # Write edges.
-            if EXPORT_EDGES:
-                for ed in edges:
-                    if ed.is_loose:
-                        fw('f %d %d\n' % (ed.vertices[0] + totverts, ed.vertices[1] + totverts))
+            uv_unique_count = write_mesh(out, ob, me, materials, material_names, faceuv, totverts, totuvco)
 
             # Make the indices global rather then per mesh
-            totverts += len(me_verts)
-            if faceuv:
-                totuvco += uv_unique_count
+            totverts += nverts
+            totuvco += uv_unique_count
 
             # clean up
             bpy.data.meshes.remove(me)
@@ -684,7 +780,7 @@ def write_obj(objFile, mtlFile, objects, scene, unitFactor):
         if ob_main.dupli_type != 'NONE':
             ob_main.dupli_list_clear()
         log ('Processed <%s> in %s' % (ob_main.name,elapsed_short(start_obj)))
+    out.flush()
     file.close()
     log ('OBJ export time: %s' % elapsed_short(start_time))
     return mtl_dict
-
@@ -0,0 +1,279 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# This script by Lionel Zamouth
+# Array based core of the OBJ writer
+#
+# Works on the vertex and tessface buffers of a mesh as returned by
+# foreach_get: UVs and normals are deduplicated with numpy.unique on rounded
+# arrays, face vertex groups are found with one weight accumulation over all
+# face corners and the face lines are formatted per face size in one go.
+# Output is written in chunks. The result is identical to the per face loop
+# of the original writer for Blender's single precision data.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHUNK_SIZE = 1 << 20
+CHUNK_ROWS = 1 << 16
+
+class ChunkedWriter:
+    """
+    Collects written strings and passes them to the file in chunks
+    """
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def writelines(self, texts):
+        for text in texts:
+            self.write(text)
+
+    def flush(self):
+        if self.parts:
+            self.file.write(''.join(self.parts))
+        self.parts = []
+        self.size = 0
+
+def format_rows(fmt, rows):
+    # fmt applied to each row, in chunks of CHUNK_ROWS rows
+    rows = np.asarray(rows)
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        yield (fmt * len(chunk)) % tuple(chunk.ravel().tolist())
+
+def round6(values):
+    # as round(v, 6) on single precision data, which is exact when scaled by 1e6
+    return np.round(np.asarray(values, dtype=np.float64), 6)
+
+def first_unique(rows):
+    """
+    Number the unique rows by their first appearance. Returns the index of
+    each first appearance and the number of each row. -0.0 equals 0.0.
+    """
+    rows = np.ascontiguousarray(np.asarray(rows, dtype=np.float64) + 0.0)
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    view = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    unique, first, inverse = np.unique(view, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[inverse.ravel()]
+
+def face_corners(order, sizes, counts=None):
+    # face and corner slot of every corner, faces in the given order
+    if counts is None:
+        counts = sizes[order]
+    face = np.repeat(order, counts)
+    slot = np.arange(len(face)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return face, slot
+
+def tessface_sizes(face_verts):
+    # the 4th vertex index of a tessface triangle is 0, never for a quad
+    return np.where(face_verts[:, 3] == 0, 3, 4)
+
+def vertex_lines(co, unit):
+    # scaled in single precision, as v.co * unitFactor
+    co = np.asarray(co, dtype=np.float32).reshape(-1, 3) * np.float32(unit)
+    return format_rows('v %.6f %.6f %.6f\n', co.astype(np.float64))
+
+def uv_lines(face_uvs, sizes, order):
+    """
+    Unique UVs by their first appearance in the faces. Returns the vt
+    lines, the number of UVs and the UV number per face corner.
+    """
+    face_uvs = np.asarray(face_uvs, dtype=np.float32).reshape(-1, 4, 2)
+    face, slot = face_corners(order, sizes)
+    uvs = face_uvs[face, slot].astype(np.float64)
+    first, index = first_unique(round6(uvs))
+    mapping = np.zeros((len(sizes), 4), dtype=np.int64)
+    mapping[face, slot] = index
+    return list(format_rows('vt %.6f %.6f\n', uvs[first])), len(first), mapping
+
+class NormalIndex:
+    """
+    Normals shared by all meshes of the file, numbered from start
+    """
+    def __init__(self, start=1):
+        self.index = {}
+        self.next = start
+
+    def add(self, keys):
+        # returns the vn lines of new keys and the number of every key
+        keys = np.asarray(keys, dtype=np.float64)
+        first, inverse = first_unique(keys)
+        ids = np.empty(len(first), dtype=np.int64)
+        lines = []
+        for i, key in enumerate(keys[first].tolist()):
+            key = tuple(key)
+            n = self.index.get(key)
+            if n is None:
+                n = self.index[key] = self.next
+                self.next += 1
+                lines.append('vn %.6f %.6f %.6f\n' % key)
+            ids[i] = n
+        return ''.join(lines), ids[inverse]
+
+    def face_normals(self, order, sizes, smooth, face_verts, vnormals, fnormals):
+        """
+        Vertex normals of smooth faces and face normals of flat faces.
+        Returns the vn lines and the normal number per face corner.
+        """
+        smooth = np.asarray(smooth, dtype=bool)
+        vnormals = np.asarray(vnormals, dtype=np.float32).reshape(-1, 3)
+        fnormals = np.asarray(fnormals, dtype=np.float32).reshape(-1, 3)
+        face, slot = face_corners(order, sizes, np.where(smooth[order], sizes[order], 1))
+        corner_smooth = smooth[face]
+        rows = np.where(corner_smooth[:, None], vnormals[face_verts[face, slot]], fnormals[face])
+        text, ids = self.add(round6(rows))
+
+        index = np.zeros((len(sizes), 4), dtype=np.int64)
+        index[face[corner_smooth], slot[corner_smooth]] = ids[corner_smooth]
+        index[face[~corner_smooth]] = ids[~corner_smooth][:, None]
+        return text, index
+
+def face_groups(face_verts, sizes, offsets, groups, weights, names):
+    """
+    The vertex group of each face: the group with the highest sum of
+    weights over the face vertices, ties going to the greater name as
+    with max() over (weight, name). Vertex i is in groups[offsets[i]:
+    offsets[i+1]] with weights[...]. Returns a group number per face, -1
+    for faces without groups.
+    """
+    nfaces = len(sizes)
+    ngroups = len(names)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    face, slot = face_corners(np.arange(nfaces), sizes)
+    v = face_verts[face, slot]
+    counts = offsets[v + 1] - offsets[v]
+    corner, entry = face_corners(np.arange(len(v)), None, counts)
+    entry += np.repeat(offsets[v], counts)
+
+    result = np.full(nfaces, -1, dtype=np.int64)
+    if len(entry) == 0:
+        return result
+
+    # accumulated in corner order, as the dict of the per face loop
+    key = face[corner] * ngroups + groups[entry]
+    unique, inverse = np.unique(key, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=weights[entry])
+    pair_face = unique // ngroups
+    pair_group = unique % ngroups
+
+    name_rank = np.empty(ngroups, dtype=np.int64)
+    name_rank[sorted(range(ngroups), key=lambda i: names[i])] = np.arange(ngroups)
+    best = np.lexsort((name_rank[pair_group], sums, pair_face))
+    last = np.r_[pair_face[best][1:] != pair_face[best][:-1], True]
+    result[pair_face[best][last]] = pair_group[best][last]
+    return result
+
+def face_lines(order, sizes, face_verts, vbase, uv_index=None, normal_index=None, triangulate=False):
+    """
+    The f line of each face in order, without newline. A triangulated
+    quad writes both triangles in one line as the per face loop did.
+    """
+    if uv_index is not None and normal_index is not None:
+        corner = ' %d/%d/%d'
+    elif uv_index is not None:
+        corner = ' %d/%d'
+    elif normal_index is not None:
+        corner = ' %d//%d'
+    else:
+        corner = ' %d'
+
+    lines = np.empty(len(order), dtype=object)
+    ordered_sizes = sizes[order]
+    for size in (3, 4):
+        positions = np.flatnonzero(ordered_sizes == size)
+        if len(positions) == 0:
+            continue
+        faces = order[positions]
+        if triangulate and size == 4:
+            slots = [0, 1, 2, 0, 2, 3]
+            fmt = 'f' + corner * 3 + 'f' + corner * 3 + '\n'
+        else:
+            slots = list(range(size))
+            fmt = 'f' + corner * size + '\n'
+
+        columns = [face_verts[faces][:, slots] + vbase]
+        if uv_index is not None:
+            columns.append(uv_index[faces][:, slots])
+        if normal_index is not None:
+            columns.append(normal_index[faces][:, slots])
+        data = np.stack(columns, axis=2).reshape(len(faces), -1)
+
+        parts = []
+        for text in format_rows(fmt, data):
+            parts.extend(text.split('\n')[:-1])
+        lines[positions] = parts
+    return lines
+
+def write_faces(out, lines, key_ids, smooth, group_ids=None, group_names=None, material_lines=None):
+    """
+    Write the face lines of faces in order, with the g, usemtl and s lines
+    where the vertex group, material key or smoothing changes.
+    material_lines(key_id, position) returns the lines of a material switch.
+    """
+    count = len(lines)
+    if count == 0:
+        return
+    key_ids = np.asarray(key_ids)
+    smooth = np.asarray(smooth, dtype=bool)
+    change = np.zeros(count, dtype=bool)
+    change[0] = True
+    change[1:] |= key_ids[1:] != key_ids[:-1]
+    change[1:] |= smooth[1:] != smooth[:-1]
+    if group_ids is not None:
+        group_ids = np.asarray(group_ids)
+        change[1:] |= group_ids[1:] != group_ids[:-1]
+
+    events = np.flatnonzero(change).tolist() + [count]
+    lines = lines.tolist()
+    key_ids = key_ids.tolist()
+    smooth = smooth.tolist()
+    if group_ids is not None:
+        group_ids = group_ids.tolist()
+    context_key = None
+    context_smooth = None
+    context_group = None
+    for start, end in zip(events[:-1], events[1:]):
+        if group_ids is not None and group_ids[start] != context_group:
+            context_group = group_ids[start]
+            out.write('g %s\n' % (group_names[context_group] if context_group >= 0 else '(null)'))
+        if key_ids[start] != context_key:
+            context_key = key_ids[start]
+            if material_lines is not None:
+                out.write(material_lines(context_key, start))
+        if smooth[start] != context_smooth:
+            context_smooth = smooth[start]
+            out.write('s 1\n' if context_smooth else 's off\n')
+        out.write('\n'.join(lines[start:end]) + '\n')
@@ -0,0 +1,229 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Tests of the array based OBJ writer against the per face loop of the
+# original writer, on synthetic meshes. Needs numpy, run outside of Blender
+# from this directory with:
+#     python obj_core_test.py
+# and the benchmark on a mesh of a million faces with:
+#     python obj_core_test.py benchmark
+
+import sys
+import unittest
+
+from obj_core import (np, ChunkedWriter, NormalIndex, face_groups, face_lines,
+                      tessface_sizes, uv_lines, vertex_lines, write_faces)
+
+def synthetic_mesh(nfaces, ngroups=3, seed=0):
+    """
+    Random tessface buffers of a grid like mesh, mixed tris and quads,
+    single precision coordinates, UVs on a coarse grid so they repeat.
+    """
+    rnd = np.random.RandomState(seed)
+    nverts = max(8, nfaces // 2)
+    co = rnd.uniform(-10, 10, (nverts, 3)).astype(np.float32)
+    vnormals = rnd.choice([-1.0, -1e-9, 0.0, 0.5, 1.0], (nverts, 3)).astype(np.float32)
+    face_verts = rnd.randint(1, nverts, (nfaces, 4))
+    face_verts[rnd.rand(nfaces) < 0.3, 3] = 0
+    fnormals = rnd.choice([-1e-9, 0.0, 0.25, 1.0], (nfaces, 3)).astype(np.float32)
+    smooth = rnd.rand(nfaces) < 0.6
+    smooth[nfaces // 3:nfaces // 2] = True
+    face_uvs = (rnd.randint(0, 64, (nfaces, 4, 2)) / 63.0 + rnd.choice([0.0, 1e-8], (nfaces, 4, 2))).astype(np.float32)
+    mat = np.sort(rnd.randint(0, 3, nfaces))
+
+    offsets = [0]
+    groups = []
+    weights = []
+    for v in range(nverts):
+        for g in range(ngroups):
+            if rnd.rand() < 0.4:
+                groups.append(g)
+                weights.append(float(np.float32(rnd.choice([0.0, 0.25, 0.5, 1.0]))))
+        offsets.append(len(groups))
+    return co, vnormals, face_verts, fnormals, smooth, face_uvs, mat, (offsets, groups, weights)
+
+def write_mesh(out, mesh, normals, unit=1.0, use_uvs=True, use_normals=True, triangulate=False,
+               totverts=1, totuvco=1, group_names=None):
+    # the export path of write_obj on plain buffers, keys are the materials
+    co, vnormals, face_verts, fnormals, smooth, face_uvs, mat, vgroups = mesh
+    sizes = tessface_sizes(face_verts)
+    order = np.arange(len(sizes))
+    out.writelines(vertex_lines(co, unit))
+    uv_index = None
+    if use_uvs:
+        text, count, uv_index = uv_lines(face_uvs, sizes, order)
+        out.writelines(text)
+        uv_index = uv_index + totuvco
+    normal_index = None
+    if use_normals:
+        text, normal_index = normals.face_normals(order, sizes, smooth, face_verts, vnormals, fnormals)
+        out.write(text)
+    group_ids = None
+    if group_names:
+        group_ids = face_groups(face_verts, sizes, vgroups[0], vgroups[1], vgroups[2], group_names)[order]
+    lines = face_lines(order, sizes, face_verts, totverts, uv_index, normal_index, triangulate)
+    write_faces(out, lines, mat[order], smooth[order], group_ids, group_names,
+                lambda key, position: 'usemtl m%d\n' % key)
+
+def _legacy_write_mesh(fw, mesh, globalNormals, unit=1.0, use_uvs=True, use_normals=True, triangulate=False,
+                       totverts=1, totuvco=1, group_names=None):
+    # the per face loop of the original writer
+    import struct
+    co, vnormals, face_verts, fnormals, smooth, face_uvs, mat, vgroups = mesh
+    smooth = smooth.tolist()
+    mat = mat.tolist()
+    unit32 = struct.unpack('<f', struct.pack('<f', unit))[0]
+    def f32(x):
+        return struct.unpack('<f', struct.pack('<f', x))[0]
+    def veckey3d(v):
+        return round(v[0], 6), round(v[1], 6), round(v[2], 6)
+    def veckey2d(v):
+        return round(v[0], 6), round(v[1], 6)
+
+    for v in co.tolist():
+        fw('v %.6f %.6f %.6f\n' % tuple(f32(c * unit32) for c in v))
+    faces = []
+    for i, fv in enumerate(face_verts.tolist()):
+        faces.append(fv[:3] if fv[3] == 0 else fv)
+    if use_uvs:
+        uv_face_mapping = [[0, 0, 0, 0] for f in faces]
+        uv_dict = {}
+        for f_index, f in enumerate(faces):
+            for uv_index, uv in enumerate(face_uvs[f_index].tolist()[:len(f)]):
+                uvkey = veckey2d(uv)
+                try:
+                    uv_face_mapping[f_index][uv_index] = uv_dict[uvkey]
+                except:
+                    uv_face_mapping[f_index][uv_index] = uv_dict[uvkey] = len(uv_dict)
+                    fw('vt %.6f %.6f\n' % tuple(uv))
+    vn = vnormals.tolist()
+    fn = fnormals.tolist()
+    if use_normals:
+        for f_index, f in enumerate(faces):
+            if smooth[f_index]:
+                keys = [veckey3d(vn[v]) for v in f]
+            else:
+                keys = [veckey3d(fn[f_index])]
+            for noKey in keys:
+                if noKey not in globalNormals:
+                    globalNormals[noKey] = len(globalNormals) + 1
+                    fw('vn %.6f %.6f %.6f\n' % noKey)
+    if group_names:
+        offsets, groups, weights = vgroups
+        vgroupsMap = [[(group_names[groups[i]], weights[i]) for i in range(offsets[v], offsets[v + 1])]
+                      for v in range(len(co))]
+    contextMat = (0, 0)
+    contextSmooth = None
+    currentVGroup = ''
+    for f_index, f in enumerate(faces):
+        if group_names:
+            weightDict = {}
+            for vert_index in f:
+                for vGroupName, weight in vgroupsMap[vert_index]:
+                    weightDict[vGroupName] = weightDict.get(vGroupName, 0.0) + weight
+            if weightDict:
+                vgroup_of_face = max((weight, vGroupName) for vGroupName, weight in weightDict.items())[1]
+            else:
+                vgroup_of_face = '(null)'
+            if vgroup_of_face != currentVGroup:
+                currentVGroup = vgroup_of_face
+                fw('g %s\n' % vgroup_of_face)
+        key = mat[f_index]
+        if key != contextMat:
+            fw('usemtl m%d\n' % key)
+        contextMat = key
+        f_smooth = smooth[f_index]
+        if f_smooth != contextSmooth:
+            fw('s 1\n' if f_smooth else 's off\n')
+            contextSmooth = f_smooth
+        f_v_orig = list(enumerate(f))
+        if not triangulate or len(f_v_orig) == 3:
+            f_v_iter = (f_v_orig, )
+        else:
+            f_v_iter = (f_v_orig[0], f_v_orig[1], f_v_orig[2]), (f_v_orig[0], f_v_orig[2], f_v_orig[3])
+        for f_v in f_v_iter:
+            fw('f')
+            for vi, v in f_v:
+                fields = [v + totverts]
+                if use_uvs:
+                    fields.append(totuvco + uv_face_mapping[f_index][vi])
+                if use_normals:
+                    fields.append(globalNormals[veckey3d(vn[v] if f_smooth else fn[f_index])])
+                if use_uvs and use_normals:
+                    fw(' %d/%d/%d' % tuple(fields))
+                elif use_uvs:
+                    fw(' %d/%d' % tuple(fields))
+                elif use_normals:
+                    fw(' %d//%d' % tuple(fields))
+                else:
+                    fw(' %d' % tuple(fields))
+        fw('\n')
+
+class TestObjCore(unittest.TestCase):
+
+    def compare(self, nfaces, **options):
+        import io
+        legacy = io.StringIO()
+        new = io.StringIO()
+        out = ChunkedWriter(new, 4096)
+        globalNormals = {}
+        normals = NormalIndex()
+        for seed in (0, 1):
+            mesh = synthetic_mesh(nfaces, seed=seed)
+            _legacy_write_mesh(legacy.write, mesh, globalNormals, **options)
+            write_mesh(out, mesh, normals, **options)
+        out.flush()
+        self.assertEqual(new.getvalue(), legacy.getvalue())
+
+    def test_identical(self):
+        names = ['Leg', 'Arm', 'arm']
+        for uvs in (True, False):
+            for normals in (True, False):
+                self.compare(300, use_uvs=uvs, use_normals=normals)
+        self.compare(300, triangulate=True, unit=0.01)
+        self.compare(300, group_names=names)
+
+    def test_group_ties(self):
+        # equal weights, the greater name wins
+        face_verts = np.array([[1, 2, 3, 0], [3, 4, 5, 0]])
+        offsets = [0, 0, 2, 2, 3, 3, 3]
+        groups = [0, 1, 1]
+        weights = [0.5, 0.5, 0.0]
+        result = face_groups(face_verts, tessface_sizes(face_verts), offsets, groups, weights, ['b', 'a'])
+        self.assertEqual(result.tolist(), [0, 1])
+
+def benchmark(nfaces=1000000):
+    import io, time
+    mesh = synthetic_mesh(nfaces)
+    names = ['Group%d' % i for i in range(3)]
+    for name, func, normals in (('per face', _legacy_write_mesh, {}), ('arrays', write_mesh, NormalIndex())):
+        out = io.StringIO()
+        start = time.time()
+        if func is write_mesh:
+            writer = ChunkedWriter(out)
+            func(writer, mesh, normals, group_names=names)
+            writer.flush()
+        else:
+            func(out.write, mesh, normals, group_names=names)
+        print('%-8s %d faces: %.2fs, %.1f MB' % (name, nfaces, time.time() - start, len(out.getvalue()) / 1048576.0))
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        unittest.main()
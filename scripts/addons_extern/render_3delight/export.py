@@ -25,9 +25,13 @@
 
 import bpy
 import bpy_types
+from bpy.app.handlers import persistent
 import math
 import os
 import time
+import io
+import array
+import hashlib
 import subprocess
 import mathutils
 from mathutils import Matrix, Vector, Quaternion
@@ -38,6 +42,7 @@ from .util import bpy_newer_257
 from .util import BlenderVersionError
 from .util import rib, rib_path, rib_ob_bounds
 from .util import make_frame_path
+from .rib_encode import open_rib, write_array, write_ints
 from .util import init_env
 from .util import get_sequence_path
 from .util import user_path
@@ -65,12 +70,17 @@ from .shader_parameters import tex_optimised_path
 
 from .nodes import export_shader_nodetree
 
+from .texture_jobs import TextureJob, Manifest, MANIFEST_NAME, run_jobs
+from . import static_archives
+from .static_archives import classify_object, share_frame, link_frame
+
 class RPass:    
     def __init__(self, scene, objects=[], paths={}, type="", motion_blur=False):
         
         self.type = type if type != "" else "default"
         self.objects = objects
         self.archives = archive_objects(scene)
+        self.static_archives = None
         self.paths = paths
         
         self.do_render = True
@@ -111,11 +121,9 @@ class RPass:
 # ------------- Texture optimisation -------------
 
 # 3Delight specific tdlmake stuff
-def make_optimised_texture_3dl(tex, texture_optimiser, srcpath, optpath):
+def optimised_texture_cmd_3dl(tex, texture_optimiser, srcpath, optpath):
     rm = tex.renderman
 
-    print("Optimising Texture: %s --> %s" % (tex.name, optpath))
-
     cmd = [texture_optimiser]
 
     if rm.format == 'ENV_LATLONG':
@@ -190,12 +198,22 @@ def make_optimised_texture_3dl(tex, texture_optimiser, srcpath, optpath):
     cmd.append(srcpath)
     cmd.append(optpath)
     
+    return cmd
+
+def make_optimised_texture_3dl(tex, texture_optimiser, srcpath, optpath):
+    print("Optimising Texture: %s --> %s" % (tex.name, optpath))
+    
+    cmd = optimised_texture_cmd_3dl(tex, texture_optimiser, srcpath, optpath)
     proc = subprocess.Popen(cmd).wait()
 
 def auto_optimise_textures(paths, scene):
     
     rm_textures = [tex for tex in bpy.data.textures if tex.renderman.auto_generate_texture == True]
     
+    # source state and options of previous conversions
+    manifest = Manifest(os.path.join(paths['export_dir'], MANIFEST_NAME))
+    jobs = []
+    
     for tex in rm_textures:
         rm = tex.renderman
         srcpath = tex_source_path(tex, scene.frame_current)
@@ -205,14 +223,26 @@ def auto_optimise_textures(paths, scene):
         if not os.path.exists(srcpath):
             continue
         
-        if rm.generate_if_nonexistent and not os.path.exists(optpath):
-            generate = True
-        elif rm.generate_if_older and os.path.getmtime(optpath) < os.path.getmtime(srcpath):
-            generate = True
+        cmd = optimised_texture_cmd_3dl(tex, paths['texture_optimiser'], srcpath, optpath)
+        job = TextureJob(tex.name, cmd, srcpath, optpath)
         
-        if not generate: continue
+        if not os.path.exists(optpath):
+            generate = rm.generate_if_nonexistent
+        elif rm.generate_if_older:
+            generate = os.path.getmtime(optpath) < os.path.getmtime(srcpath) or manifest.changed(job)
+        
+        if not generate:
+            # remember existing conversions, to notice later changes
+            if os.path.exists(optpath) and not manifest.has(job):
+                manifest.update(job)
+            continue
         
-        make_optimised_texture_3dl(tex, paths['texture_optimiser'], srcpath, optpath)
+        jobs.append(job)
+    
+    run_jobs(jobs, scene.renderman.texture_threads, manifest)
+    
+    if os.path.isdir(paths['export_dir']):
+        manifest.save()
 
 # ------------- Filtering -------------
 
@@ -234,9 +264,7 @@ def renderable_objects(scene):
 # ------------- Archive Helpers -------------
 
 # Generate an automatic path to write an archive when 'Export as Archive' is enabled
-def auto_archive_path(paths, objects, create_folder=False):
-    filename = objects[0].name + ".rib"
-    
+def auto_archive_dir(paths, create_folder=False):
     if os.getenv("ARCHIVE") != None:
         archive_dir = os.getenv("ARCHIVE")
     else:
@@ -244,8 +272,12 @@ def auto_archive_path(paths, objects, create_folder=False):
 
     if create_folder and not os.path.exists(archive_dir):
         os.mkdir(archive_dir)
+    
+    return archive_dir
 
-    return os.path.join(archive_dir, filename)
+def auto_archive_path(paths, objects, create_folder=False):
+    filename = objects[0].name + ".rib"
+    return os.path.join(auto_archive_dir(paths, create_folder), filename)
 
 def archive_objects(scene):
     archive_obs = []
@@ -319,6 +351,9 @@ def is_deforming_fluid(ob):
             return True
 
 
+def object_class(ob, motion):
+    return classify_object(ob, motion, is_deforming(ob) or is_deforming_fluid(ob))
+
 def psys_motion_name(ob, psys):
     return ob.name + "_" + psys.name
     
@@ -373,31 +408,24 @@ def get_particles(scene, ob, psys):
 
 # Mesh data access
 def get_mesh(mesh):
-    nverts = []
-    verts = []
-    P = []
+    nverts = [0] * len(mesh.polygons)
+    verts = [0] * len(mesh.loops)
+    P = [0.0] * (3 * len(mesh.vertices))
     
-    for v in mesh.vertices:
-        P.extend( v.co )
-  
-    for p in mesh.polygons:
-        nverts.append( p.loop_total )
-        verts.extend( p.vertices )
+    mesh.vertices.foreach_get('co', P)
+    mesh.polygons.foreach_get('loop_total', nverts)
+    # polygon loops are stored consecutively, in polygon order
+    mesh.loops.foreach_get('vertex_index', verts)
         
     return (nverts, verts, P)
 
 def get_mesh_vertex_N(mesh):
-    N = []
-    
-    for v in mesh.vertices:
-        N.extend( v.normal )
-    
+    N = [0.0] * (3 * len(mesh.vertices))
+    mesh.vertices.foreach_get('normal', N)
     return N
 
 # requires facevertex interpolation
 def get_mesh_uv(mesh, name=""):
-    uvs = []
-
     if name == "":
         uv_loop_layer = mesh.uv_layers.active
     else:
@@ -408,9 +436,9 @@ def get_mesh_uv(mesh, name=""):
     if uv_loop_layer == None:
         return None
     
-    for uvloop in uv_loop_layer.data:
-        uvs.append( uvloop.uv.x )
-        uvs.append( 1.0 - uvloop.uv.y )     # renderman expects UVs flipped vertically from blender
+    uvs = [0.0] * (2 * len(uv_loop_layer.data))
+    uv_loop_layer.data.foreach_get('uv', uvs)
+    uvs[1::2] = [1.0 - v for v in uvs[1::2]]     # renderman expects UVs flipped vertically from blender
 
     return uvs
 
@@ -418,13 +446,11 @@ def get_mesh_uv(mesh, name=""):
 # requires facevertex interpolation
 def get_mesh_vcol(mesh, name=""):
     vcol_layer = mesh.vertex_colors[name] if name != "" else mesh.vertex_colors.active
-    cols = []
-    
     if vcol_layer == None:
         return None
     
-    for vcloop in vcol_layer.data:
-        cols.extend( vcloop.color )
+    cols = [0.0] * (3 * len(vcol_layer.data))
+    vcol_layer.data.foreach_get('color', cols)
     
     return cols
 
@@ -457,32 +483,32 @@ def export_primvars(file, ob, geo, interpolation=""):
     if rm.export_smooth_normals and ob.renderman.primitive in ('AUTO', 'POLYGON_MESH', 'SUBDIVISION_MESH'):
         N = get_mesh_vertex_N(geo)
         if N is not None:
-            file.write('            "varying normal N" %s \n' % rib(N) )
+            write_array(file, N, '            "varying normal N" ', ' \n')
     if rm.export_default_uv:
         uvs = get_mesh_uv(geo)
         if uvs is not None:
-            file.write('            "%s float[2] st" %s \n' % (interpolation, rib(uvs)) )
+            write_array(file, uvs, '            "%s float[2] st" ' % interpolation, ' \n')
     if rm.export_default_vcol:
         vcols = get_mesh_vcol(geo)
         if vcols is not None:
-            file.write('            "%s color Cs" %s \n' % (interpolation, rib(vcols)) )
+            write_array(file, vcols, '            "%s color Cs" ' % interpolation, ' \n')
     
     # custom prim vars
     for p in rm.prim_vars:
         if p.data_source == 'VERTEX_COLOR':
             vcols = get_mesh_vcol(geo, p.data_name)
             if vcols is not None:
-                file.write('            "%s color %s" %s \n' % (interpolation, p.name, rib(vcols)) )
+                write_array(file, vcols, '            "%s color %s" ' % (interpolation, p.name), ' \n')
 
         elif p.data_source == 'UV_TEXTURE':
             uvs = get_mesh_uv(geo, p.data_name)
             if uvs is not None:
-                file.write('            "%s float[2] %s" %s \n' % (interpolation, p.name, rib(uvs)) )
+                write_array(file, uvs, '            "%s float[2] %s" ' % (interpolation, p.name), ' \n')
 
         elif p.data_source == 'VERTEX_GROUP':
             weights = get_mesh_vgroup(ob, geo, p.data_name)
             if weights is not None:
-                file.write('            "vertex float %s" %s \n' % (p.name, rib(weights)) )
+                write_array(file, weights, '            "vertex float %s" ' % p.name, ' \n')
     
 def export_primvars_particle(file, scene, psys):
     rm = psys.settings.renderman
@@ -499,7 +525,7 @@ def export_primvars_particle(file, scene, psys):
                 for pa in [p for p in psys.particles if valid_particle(p, cfra)]:
                     vars.extend ( pa.angular_velocity )
 
-            file.write('            "varying float[3] %s" %s \n' % (p.name, rib(vars)) )
+            write_array(file, vars, '            "varying float[3] %s" ' % p.name, ' \n')
 
         elif p.data_source in ('SIZE', 'AGE', 'BIRTH_TIME', 'DIE_TIME', 'LIFE_TIME'):
             if p.data_source == 'SIZE':
@@ -518,7 +544,7 @@ def export_primvars_particle(file, scene, psys):
                 for pa in [p for p in psys.particles if valid_particle(p, cfra)]:
                     vars.append ( pa.lifetime )
 
-            file.write('            "varying float %s" %s \n' % (p.name, rib(vars)) )
+            write_array(file, vars, '            "varying float %s" ' % p.name, ' \n')
 
 
 def get_fluid_mesh(scene, ob):
@@ -791,9 +817,9 @@ def export_strands(file, rpass, scene, ob, motion):
         
             file.write('    Basis "catmull-rom" 1 "catmull-rom" 1\n')
             file.write('    Curves "cubic" \n')
-            file.write('        %s \n' % rib(nverts))
+            write_ints(file, nverts, '        ', ' \n')
             file.write('        "nonperiodic" \n')
-            file.write('        "P" %s \n' % rib(P))
+            write_array(file, P, '        "P" ', ' \n')
             file.write('        "constantwidth" [ %f ] \n' % rm.width)
 
         if motion_blur:
@@ -891,12 +917,12 @@ def export_particle_points(file, scene, ob, psys, motion):
     for P, rot, width in samples:
         
         file.write('        Points \n')
-        file.write('            "P" %s \n' % rib(P))
+        write_array(file, P, '            "P" ', ' \n')
         file.write('            "uniform string type" [ "%s" ] \n' % rm.particle_type)
         if rm.constant_width:
             file.write('            "constantwidth" [%f] \n' % rm.width)
         elif rm.export_default_size:
-            file.write('            "varying float width" %s \n' % rib(width))
+            write_array(file, width, '            "varying float width" ', ' \n')
 
         export_primvars_particle(file, scene, psys)
 
@@ -1109,15 +1135,17 @@ def export_curve(file, scene, ob, motion):
             file.write('        Curves "cubic" \n')
             file.write('            [ %s ] \n' % rib(npt))
             file.write('            "%s" \n' % period)
-            file.write('            "P" %s \n' % rib(P))
-            file.write('            "width" %s \n' % rib(width))
+            write_array(file, P, '            "P" ', ' \n')
+            write_array(file, width, '            "width" ', ' \n')
             #file.write('        "constantwidth" [ %f ] \n' % 0.2)
             
     if motion_blur:
         file.write('        MotionEnd\n')
 
-def export_subdivision_mesh(file, scene, ob, motion):
-    mesh = create_mesh(scene, ob)
+def export_subdivision_mesh(file, scene, ob, motion, mesh=None):
+    owned = mesh is None
+    if owned:
+        mesh = create_mesh(scene, ob)
     
     motion_blur = ob.name in motion['deformation']
     
@@ -1136,8 +1164,8 @@ def export_subdivision_mesh(file, scene, ob, motion):
         floatargs = []
 
         file.write('        SubdivisionMesh "catmull-clark" \n')
-        file.write('            %s\n' % rib(nverts))
-        file.write('            %s\n' % rib(verts))
+        write_ints(file, nverts, '            ')
+        write_ints(file, verts, '            ')
         if len(creases) > 0:
             for c in creases:
                 tags.append( '"crease"' )
@@ -1150,17 +1178,20 @@ def export_subdivision_mesh(file, scene, ob, motion):
         
         file.write('            %s %s %s %s \n' % (rib(tags), rib(nargs), rib(intargs), rib(floatargs)) )
                 
-        file.write('            "P" %s\n' % rib(P))
+        write_array(file, P, '            "P" ')
         export_primvars(file, ob, mesh, "facevertex")
         
 
     if motion_blur:
         file.write('        MotionEnd\n')
             
-    bpy.data.meshes.remove(mesh)
+    if owned:
+        bpy.data.meshes.remove(mesh)
 
-def export_polygon_mesh(file, scene, ob, motion):
-    mesh = create_mesh(scene, ob)
+def export_polygon_mesh(file, scene, ob, motion, mesh=None):
+    owned = mesh is None
+    if owned:
+        mesh = create_mesh(scene, ob)
     
     motion_blur = ob.name in motion['deformation']
     
@@ -1173,20 +1204,23 @@ def export_polygon_mesh(file, scene, ob, motion):
     for nverts, verts, P in samples:
 
         file.write('        PointsPolygons \n')
-        file.write('            %s\n' % rib(nverts))
-        file.write('            %s\n' % rib(verts))
-        file.write('            "P" %s\n' % rib(P))
+        write_ints(file, nverts, '            ')
+        write_ints(file, verts, '            ')
+        write_array(file, P, '            "P" ')
         export_primvars(file, ob, mesh, "facevarying")
         
     if motion_blur:
         file.write('        MotionEnd\n')
             
-    bpy.data.meshes.remove(mesh)
+    if owned:
+        bpy.data.meshes.remove(mesh)
 
-def export_points(file, scene, ob, motion):
+def export_points(file, scene, ob, motion, mesh=None):
     rm = ob.renderman
     
-    mesh = create_mesh(scene, ob)
+    owned = mesh is None
+    if owned:
+        mesh = create_mesh(scene, ob)
     
     motion_blur = ob.name in motion['deformation']
     
@@ -1199,14 +1233,15 @@ def export_points(file, scene, ob, motion):
     for nverts, verts, P in samples:
 
         file.write('        Points \n')
-        file.write('            "P" %s\n' % rib(P))
+        write_array(file, P, '            "P" ')
         file.write('            "uniform string type" [ "%s" ] \n' % rm.primitive_point_type)
         file.write('            "constantwidth" [ %f ] \n' % rm.primitive_point_width)
             
     if motion_blur:
         file.write('        MotionEnd\n')
             
-    bpy.data.meshes.remove(mesh)
+    if owned:
+        bpy.data.meshes.remove(mesh)
 
 
 def export_sphere(file, scene, ob, motion):
@@ -1237,6 +1272,36 @@ def export_torus(file, scene, ob, motion):
 def is_dupli(ob):
     return ob.type == 'EMPTY' and ob.dupli_type != 'NONE'
 
+def export_geometry_material(file, rpass, scene, ob):
+    if ob.data and ob.data.materials:
+        for mat in [mat for mat in ob.data.materials if mat != None]:
+            export_material(file, rpass, scene, mat)
+            break
+
+def export_primitive(file, scene, ob, motion, prim, mesh=None):
+    if prim == 'SPHERE':
+        export_sphere(file, scene, ob, motion)
+    elif prim == 'CYLINDER':
+        export_cylinder(file, scene, ob, motion)
+    elif prim == 'CONE':
+        export_cone(file, scene, ob, motion)
+    elif prim == 'DISK':
+        export_disk(file, scene, ob, motion)
+    elif prim == 'TORUS':
+        export_torus(file, scene, ob, motion)
+    
+    # curve only
+    elif prim == 'CURVE':
+        export_curve(file, scene, ob, motion) 
+        
+    # mesh only
+    elif prim == 'POLYGON_MESH':
+        export_polygon_mesh(file, scene, ob, motion, mesh)
+    elif prim == 'SUBDIVISION_MESH':
+        export_subdivision_mesh(file, scene, ob, motion, mesh)
+    elif prim == 'POINTS':
+        export_points(file, scene, ob, motion, mesh)
+
 def export_geometry_data(file, rpass, scene, ob, motion, force_prim=''):
 
     # handle duplis
@@ -1260,34 +1325,102 @@ def export_geometry_data(file, rpass, scene, ob, motion, force_prim=''):
     if prim == 'NONE':
         return
 
-    if ob.data and ob.data.materials:
-        for mat in [mat for mat in ob.data.materials if mat != None]:
-            export_material(file, rpass, scene, mat)
-            break
+    export_geometry_material(file, rpass, scene, ob)
+    export_primitive(file, scene, ob, motion, prim)
+
+# ------------- Static geometry archives -------------
+
+# primitives written to static archives, the others are cheap to export inline
+STATIC_PRIMITIVES = ('POLYGON_MESH', 'SUBDIVISION_MESH', 'POINTS')
+
+def _hash_floats(h, values):
+    h.update(array.array('f', values).tobytes())
+
+# hash of the evaluated mesh and the settings written with it
+def geometry_fingerprint(scene, ob, prim, mesh):
+    h = hashlib.sha1()
+    nverts, verts, P = get_mesh(mesh)
+    h.update(array.array('i', nverts).tobytes())
+    h.update(array.array('i', verts).tobytes())
+    _hash_floats(h, P)
+    _hash_floats(h, get_mesh_vertex_N(mesh))
+    
+    for layer in mesh.uv_layers:
+        uvs = [0.0] * (2 * len(layer.data))
+        layer.data.foreach_get('uv', uvs)
+        _hash_floats(h, uvs)
+    for layer in mesh.vertex_colors:
+        cols = [0.0] * (3 * len(layer.data))
+        layer.data.foreach_get('color', cols)
+        _hash_floats(h, cols)
+    
+    settings = [prim, scene.renderman.rib_compression]
+    if prim == 'SUBDIVISION_MESH':
+        settings.append(get_subd_creases(mesh))
+    elif prim == 'POINTS':
+        settings.append((ob.renderman.primitive_point_type, ob.renderman.primitive_point_width))
     
-    if prim == 'SPHERE':
-        export_sphere(file, scene, ob, motion)
-    elif prim == 'CYLINDER':
-        export_cylinder(file, scene, ob, motion)
-    elif prim == 'CONE':
-        export_cone(file, scene, ob, motion)
-    elif prim == 'DISK':
-        export_disk(file, scene, ob, motion)
-    elif prim == 'TORUS':
-        export_torus(file, scene, ob, motion)
+    if ob.type == 'MESH':
+        rm = ob.data.renderman
+        settings.append((rm.export_smooth_normals, rm.export_default_uv, rm.export_default_vcol,
+                         mesh.uv_layers.active.name if mesh.uv_layers.active else '',
+                         mesh.vertex_colors.active.name if mesh.vertex_colors.active else ''))
+        for p in rm.prim_vars:
+            settings.append((p.name, p.data_source, p.data_name))
+            if p.data_source == 'VERTEX_GROUP':
+                weights = get_mesh_vgroup(ob, mesh, p.data_name)
+                if weights is not None:
+                    _hash_floats(h, weights)
+    
+    h.update(repr(settings).encode('utf-8'))
+    return h.hexdigest()
+
+def export_static_geometry(file, rpass, scene, ob, motion):
+    archives = rpass.static_archives
+    prim = detect_primitive(ob)
     
-    # curve only
-    elif prim == 'CURVE':
-        export_curve(file, scene, ob, motion) 
-        
-    # mesh only
-    elif prim == 'POLYGON_MESH':
-        export_polygon_mesh(file, scene, ob, motion)
-    elif prim == 'SUBDIVISION_MESH':
-        export_subdivision_mesh(file, scene, ob, motion)
-    elif prim == 'POINTS':
-        export_points(file, scene, ob, motion)
-  
+    if prim not in STATIC_PRIMITIVES:
+        export_geometry_data(file, rpass, scene, ob, motion)
+        return
+    
+    # material stays in the scene RIB, shader edits don't touch the archive
+    export_geometry_material(file, rpass, scene, ob)
+    
+    # the mesh is evaluated once per session, or after the object changed,
+    # and written from the same evaluation if the archive is out of date
+    archive_path = archives.path(ob.name)
+    if archives.is_current(ob.name):
+        archives.reused += 1
+    else:
+        mesh = create_mesh(scene, ob)
+        key = geometry_fingerprint(scene, ob, prim, mesh)
+        if archives.lookup(ob.name, key):
+            archives.reused += 1
+        else:
+            archive = open_rib(archive_path, scene.renderman.rib_compression)
+            export_header(archive)
+            export_primitive(archive, scene, ob, empty_motion(), prim, mesh)
+            archive.close()
+            archives.store(ob.name, key)
+            archives.written += 1
+        bpy.data.meshes.remove(mesh)
+    
+    file.write('        ReadArchive "%s"\n' % rib_path(archive_path))
+
+# objects whose data Blender updated get their archives checked again
+@persistent
+def static_archives_update(scene):
+    if not static_archives.sessions:
+        return
+    if not (bpy.data.objects.is_updated or bpy.data.meshes.is_updated):
+        return
+    static_archives.invalidate(ob.name for ob in bpy.data.objects
+            if ob.is_updated_data or (ob.data != None and ob.data.is_updated))
+
+@persistent
+def static_archives_load(dummy):
+    static_archives.reset()
+
 def export_geometry(file, rpass, scene, ob, motion):
     rm = ob.renderman
     
@@ -1296,8 +1429,13 @@ def export_geometry(file, rpass, scene, ob, motion):
             archive_path = rib_path(auto_archive_path(rpass.paths, [ob]))        
             if os.path.exists(archive_path):
                 file.write('        ReadArchive "%s"\n' % archive_path)
-        else:
+        elif rpass.static_archives is None:
+            export_geometry_data(file, rpass, scene, ob, motion)
+        elif object_class(ob, motion) == 'DEFORMING':
+            rpass.static_archives.deforming += 1
             export_geometry_data(file, rpass, scene, ob, motion)
+        else:
+            export_static_geometry(file, rpass, scene, ob, motion)
 
     else:    
         file.write(geometry_source_rib(scene, ob))
@@ -1508,22 +1646,48 @@ def export_archive(scene, objects, filepath="", archive_motion=True, animated=Tr
     if filepath == "":
         filepath = auto_archive_path(paths, objects, create_folder=True)
     
+    last_ribpath = None
+    last_shading = None
+    
     for frame in range(frame_start, frame_end+1):
         scene.frame_set(frame)
         
         motion = export_motion(rpass, scene) if archive_motion else empty_motion()
         ribpath = anim_archive_path(filepath, frame) if animated else filepath
-
         
-        file = open(ribpath, "w")
+        # without deforming objects only the materials can change the frame,
+        # they are exported first and compared with the last frame's
+        classes = [object_class(ob, motion) for ob in rpass.objects]
+        shading = None
+        if animated and 'DEFORMING' not in classes:
+            shading = []
+            for ob in rpass.objects:
+                buf = io.StringIO()
+                if detect_primitive(ob) != 'NONE':
+                    export_geometry_material(buf, rpass, scene, ob)
+                shading.append(buf.getvalue())
+        
+        if share_frame(classes, shading, last_shading):
+            link_frame(last_ribpath, ribpath)
+            continue
+        
+        file = open_rib(ribpath, scene.renderman.rib_compression)
         export_header(file)
         
-        for ob in rpass.objects:
-            export_geometry_data(file, rpass, scene, ob, motion)
+        if shading is None:
+            for ob in rpass.objects:
+                export_geometry_data(file, rpass, scene, ob, motion)
+        else:
+            for ob, ob_shading in zip(rpass.objects, shading):
+                file.write(ob_shading)
+                export_primitive(file, scene, ob, motion, detect_primitive(ob))
     
         file.close()
+        
+        last_ribpath = ribpath
+        last_shading = shading
     
-    return file.name
+    return ribpath
 
 
 def export_integrator(file, rpass, scene):
@@ -2119,7 +2283,11 @@ def write_rib(rpass, scene, info_callback):
     # precalculate motion blur data
     motion = export_motion(rpass, scene)
     
-    file = open(rpass.paths['rib_output'], "w")
+    if scene.renderman.static_archives:
+        archive_dir = os.path.join(auto_archive_dir(rpass.paths, create_folder=True), "static")
+        rpass.static_archives = static_archives.open_archives(archive_dir)
+    
+    file = open_rib(rpass.paths['rib_output'], scene.renderman.rib_compression)
     
     export_header(file)
     export_searchpaths(file, rpass.paths)
@@ -2146,6 +2314,12 @@ def write_rib(rpass, scene, info_callback):
     file.write('WorldEnd\n\n')
 
     file.write('FrameEnd\n\n')
+    
+    file.close()
+    
+    if rpass.static_archives is not None:
+        rpass.static_archives.save()
+        print(rpass.static_archives.summary())
 
 def initialise_paths(scene):
     paths = {}
@@ -2366,9 +2540,11 @@ def render_rib(engine):
 
 
 def register():
-    pass
+    bpy.app.handlers.scene_update_post.append(static_archives_update)
+    bpy.app.handlers.load_post.append(static_archives_load)
      #bpy.utils.register_module(__name__)
 
 def unregister():
-    pass
+    bpy.app.handlers.scene_update_post.remove(static_archives_update)
+    bpy.app.handlers.load_post.remove(static_archives_load)
      #bpy.utils.unregister_module(__name__)
\ No newline at end of file
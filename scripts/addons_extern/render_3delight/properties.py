@@ -345,6 +345,10 @@ class RendermanSceneSettings(bpy.types.PropertyGroup):
                 name="Threads",
                 description="Number of processor threads to use",
                 min=1, max=32, default=2)
+    texture_threads = IntProperty(
+                name="Texture Threads",
+                description="Number of texture optimisations to run at once (0 = one per processor)",
+                min=0, max=32, default=0)
     max_trace_depth = IntProperty(
                 name="Max Trace Depth",
                 description="Maximum number of ray bounces (0 disables ray tracing)",
@@ -388,6 +392,16 @@ class RendermanSceneSettings(bpy.types.PropertyGroup):
                 subtype='FILE_PATH',
                 default="$OUT/{scene}.rib")
     
+    rib_compression = BoolProperty(
+                name="Compress RIB",
+                description="Write gzip compressed RIB files and archives. Smaller files at the cost of some export time",
+                default=False)
+    
+    static_archives = BoolProperty(
+                name="Cache Static Geometry",
+                description="Write the geometry of objects that don't deform to archives once and reuse them while unchanged, across frames and renders",
+                default=False)
+    
     output_action = EnumProperty(
                 name="Action",
                 description="Action to take when rendering",
@@ -0,0 +1,90 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# RIB encoding of geometry arrays.
+#
+# Arrays are formatted with one %-format call per chunk instead of a str()
+# call per value, and written to the file chunk by chunk, so multi-million
+# element arrays never exist as one string. Floats are written with 9
+# significant digits, which round-trips Blender's single precision data.
+# open_rib writes gzip compressed files when the scene asks for them.
+
+import gzip
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHUNK_SIZE = 3 * 65536
+GZIP_LEVEL = 3
+
+FLOAT_FORMAT = '%.9g '
+INT_FORMAT = '%d '
+
+
+def open_rib(path, compress=False):
+    # 3Delight reads gzip compressed RIB files transparently
+    if compress:
+        return gzip.open(path, 'wt', compresslevel=GZIP_LEVEL)
+    return open(path, 'w')
+
+
+def _as_list(values):
+    if np is not None and isinstance(values, np.ndarray):
+        return values.ravel().tolist()
+    return values
+
+
+def _format(values, integer):
+    fmt = INT_FORMAT if integer else FLOAT_FORMAT
+    return (fmt * len(values)) % tuple(values)
+
+
+def rib_array(values, integer=False):
+    """
+    Format an array as a RIB array string, for small arrays.
+    """
+    values = _as_list(values)
+    return '[ ' + _format(values, integer) + ']'
+
+
+def write_array(file, values, prefix='', suffix='\n', integer=False,
+                chunk_size=CHUNK_SIZE):
+    """
+    Write prefix, values as a RIB array and suffix, chunk by chunk.
+    values may be any sequence of numbers or a numpy array.
+    """
+    values = _as_list(values)
+    file.write(prefix + '[ ')
+    for start in range(0, len(values), chunk_size):
+        if start > 0:
+            file.write('\n')
+        file.write(_format(values[start:start + chunk_size], integer))
+    file.write(']' + suffix)
+
+
+def write_ints(file, values, prefix='', suffix='\n'):
+    write_array(file, values, prefix, suffix, integer=True)
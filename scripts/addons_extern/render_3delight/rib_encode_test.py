@@ -0,0 +1,130 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# Tests of the RIB array encoding, run outside of Blender from this
+# directory with:
+#     python rib_encode_test.py
+# and the benchmark on a synthetic mesh of a million quads with:
+#     python rib_encode_test.py benchmark
+
+import gzip
+import sys
+import unittest
+
+from rib_encode import np, open_rib, rib_array, write_array, write_ints
+
+
+def synthetic_mesh(nquads):
+    side = max(2, int(nquads ** 0.5))
+    P = []
+    for y in range(side + 1):
+        for x in range(side + 1):
+            P.extend((x * 0.1, y * 0.1, ((x * 7 + y * 13) % 17) / 17.0))
+    nverts = []
+    verts = []
+    for y in range(side):
+        for x in range(side):
+            a = y * (side + 1) + x
+            nverts.append(4)
+            verts.extend((a, a + 1, a + side + 2, a + side + 1))
+    return nverts, verts, P
+
+
+def _parse(text):
+    return [float(v) for v in text.replace('[', ' ').replace(']', ' ').split()]
+
+
+class TestRibEncode(unittest.TestCase):
+
+    def test_ints(self):
+        self.assertEqual(rib_array([4, 3, 4], integer=True), '[ 4 3 4 ]')
+
+    def test_float32_roundtrip(self):
+        import struct, random
+        rnd = random.Random(0)
+        values = [struct.unpack('<f', struct.pack('<f', rnd.uniform(-1e4, 1e4) ** 3))[0] for i in range(2000)]
+        values += [0.0, -0.0, 1.0, 1e-30, 0.1]
+        parsed = _parse(rib_array(values))
+        packed = struct.pack('<%df' % len(values), *values)
+        self.assertEqual(struct.pack('<%df' % len(parsed), *parsed), packed)
+
+    def test_chunks(self):
+        import io
+        values = [i * 0.5 for i in range(1000)]
+        out = io.StringIO()
+        write_array(out, values, '"P" ', chunk_size=64)
+        text = out.getvalue()
+        self.assertTrue(text.startswith('"P" [ '))
+        self.assertTrue(text.endswith(']\n'))
+        self.assertEqual(_parse(text[4:]), values)
+        self.assertEqual(_parse(rib_array(values)), values)
+
+    def test_numpy(self):
+        if np is None:
+            self.skipTest('numpy not available')
+        values = np.arange(12, dtype=np.float32).reshape(4, 3) / 3
+        self.assertEqual(rib_array(values), rib_array(values.ravel().tolist()))
+
+    def test_gzip(self):
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), 'test.rib')
+        with open_rib(path, True) as file:
+            write_ints(file, [1, 2, 3], 'PointsPolygons ')
+        with gzip.open(path, 'rt') as file:
+            self.assertEqual(file.read(), 'PointsPolygons [ 1 2 3 ]\n')
+
+
+def benchmark(nquads=1000000):
+    import os, shutil, tempfile, time
+    nverts, verts, P = synthetic_mesh(nquads)
+
+    def legacy(file):
+        # rib() of util.py
+        for values in (nverts, verts, P):
+            file.write('            %s\n' % ("[ " + " ".join(str(i) for i in values) + " ]"))
+
+    def chunked(file):
+        write_ints(file, nverts, '            ')
+        write_ints(file, verts, '            ')
+        write_array(file, P, '            "P" ')
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.rib')
+    for name, func, compress in (('str join', legacy, False),
+                                 ('chunked', chunked, False),
+                                 ('chunked gzip', chunked, True)):
+        start = time.time()
+        with open_rib(path, compress) as file:
+            func(file)
+        print('%-12s %d quads: %.2fs, %.1f MB' % (name, len(nverts), time.time() - start,
+                                                 os.path.getsize(path) / 1048576.0))
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,177 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# Static geometry archives.
+#
+# Geometry of objects that don't deform is written once to an archive per
+# object, archives/static/<object>.rib, and referenced with ReadArchive.
+# Whether an object deforms is decided from its modifiers and animation
+# data, without evaluating its mesh. Each archive is checked against a
+# hash of the evaluated mesh once per session, and again after Blender
+# reports the object's data as updated. The hashes are kept in an index
+# next to the archives, so archives are also reused across sessions.
+
+import os
+import json
+import shutil
+
+INDEX_NAME = 'index.json'
+
+# modifier settings which point to other objects
+MODIFIER_OBJECTS = ('object', 'offset_object', 'mirror_object', 'target',
+                    'start_cap', 'end_cap')
+
+
+def is_animated(id_data):
+    return id_data is not None and id_data.animation_data is not None
+
+def animated_paths(id_data):
+    # data paths of the active action and the drivers
+    anim = id_data.animation_data
+    fcurves = list(anim.drivers)
+    if anim.action is not None:
+        fcurves.extend(anim.action.fcurves)
+    return [fc.data_path for fc in fcurves]
+
+def moves(ob, motion):
+    while ob is not None:
+        if ob.name in motion['transformation'] or is_animated(ob) or ob.constraints:
+            return True
+        ob = ob.parent
+    return False
+
+def modifies_geometry(ob, motion):
+    # animated modifier settings, or modifiers following moving objects
+    if is_animated(ob) and [p for p in animated_paths(ob) if p.startswith('modifiers')]:
+        return True
+    for mod in ob.modifiers:
+        for attr in MODIFIER_OBJECTS:
+            other = getattr(mod, attr, None)
+            if other is not None and other != ob and moves(other, motion):
+                return True
+    return False
+
+
+# objects are exported as 'DEFORMING' (geometry changes between or within
+# frames, exported inline per frame), 'TRANSFORM' (only the matrix is
+# animated) or 'STATIC'. geometry of the latter two is shared between
+# frames. deforming is the result of the exporter's modifier checks, duplis
+# are exported through their objects and count as deforming.
+def classify_object(ob, motion, deforming):
+    data = ob.data
+    if (deforming or ob.name in motion['deformation'] or
+            getattr(ob, 'dupli_type', 'NONE') != 'NONE' or
+            is_animated(data) or is_animated(getattr(data, 'shape_keys', None)) or
+            modifies_geometry(ob, motion)):
+        return 'DEFORMING'
+    if moves(ob, motion):
+        return 'TRANSFORM'
+    return 'STATIC'
+
+
+# an animated archive frame is the previous frame's file when its objects
+# keep their geometry and the materials written with them are unchanged
+def share_frame(classes, shading, last_shading):
+    return 'DEFORMING' not in classes and last_shading is not None and shading == last_shading
+
+def link_frame(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except (AttributeError, OSError):
+        shutil.copyfile(src, dst)
+
+
+class StaticArchives:
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        if not os.path.exists(archive_dir):
+            os.makedirs(archive_dir)
+
+        self.index_path = os.path.join(archive_dir, INDEX_NAME)
+        self.index = {}
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+        # archives checked against their object in this session
+        self.current = set()
+
+        self.reused = 0
+        self.written = 0
+        self.deforming = 0
+
+    def path(self, name):
+        return os.path.join(self.archive_dir, name + ".rib")
+
+    def is_current(self, name):
+        return name in self.current and os.path.exists(self.path(name))
+
+    def lookup(self, name, key):
+        if self.index.get(name) == key and os.path.exists(self.path(name)):
+            self.current.add(name)
+            return True
+        return False
+
+    def store(self, name, key):
+        self.index[name] = key
+        self.current.add(name)
+
+    def invalidate(self, names):
+        self.current.difference_update(names)
+
+    def save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        os.rename(tmp_path, self.index_path)
+
+    def summary(self):
+        return ("Static geometry archives: %d reused, %d written, %d deforming objects exported inline" %
+                (self.reused, self.written, self.deforming))
+
+
+# archives by directory, kept between exports of a session
+sessions = {}
+
+def open_archives(archive_dir):
+    archives = sessions.get(archive_dir)
+    if archives is None:
+        archives = sessions[archive_dir] = StaticArchives(archive_dir)
+    archives.reused = archives.written = archives.deforming = 0
+    return archives
+
+def invalidate(names):
+    names = set(names)
+    for archives in sessions.values():
+        archives.invalidate(names)
+
+def reset():
+    sessions.clear()
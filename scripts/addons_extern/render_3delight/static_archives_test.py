@@ -0,0 +1,203 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# Tests of the static geometry archives on stand-in objects, run outside
+# of Blender from this directory with:
+#     python static_archives_test.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import static_archives
+from static_archives import StaticArchives, classify_object, share_frame, link_frame
+
+
+class FCurve:
+    def __init__(self, data_path):
+        self.data_path = data_path
+
+class Action:
+    def __init__(self, *paths):
+        self.fcurves = [FCurve(p) for p in paths]
+
+class AnimData:
+    def __init__(self, action=None, drivers=()):
+        self.action = action
+        self.drivers = [FCurve(p) for p in drivers]
+
+class ID:
+    def __init__(self, name='', animation_data=None, **attrs):
+        self.name = name
+        self.animation_data = animation_data
+        self.__dict__.update(attrs)
+
+def Object(name, data=None, **attrs):
+    values = dict(modifiers=[], constraints=[], parent=None, dupli_type='NONE')
+    values.update(attrs)
+    return ID(name, data=data if data is not None else ID(name, shape_keys=None), **values)
+
+def motion(transformation=(), deformation=()):
+    return {'transformation': dict((name, []) for name in transformation),
+            'deformation': dict((name, []) for name in deformation)}
+
+
+class TestClassify(unittest.TestCase):
+
+    def test_static(self):
+        self.assertEqual(classify_object(Object('Cube'), motion(), False), 'STATIC')
+        # modifiers pointing to objects that don't move
+        target = Object('Target')
+        ob = Object('Cube', modifiers=[ID('Boolean', object=target)])
+        self.assertEqual(classify_object(ob, motion(), False), 'STATIC')
+
+    def test_transform(self):
+        moving = Object('Parent', animation_data=AnimData(Action('location')))
+        for ob, m in ((Object('Cube'), motion(transformation=['Cube'])),
+                      (Object('Cube', animation_data=AnimData(Action('rotation_euler'))), motion()),
+                      (Object('Cube', animation_data=AnimData(drivers=['scale'])), motion()),
+                      (Object('Cube', constraints=[ID('Track To')]), motion()),
+                      (Object('Cube', parent=Object('Empty', parent=moving)), motion())):
+            self.assertEqual(classify_object(ob, m, False), 'TRANSFORM')
+
+    def test_deforming(self):
+        animated = AnimData(Action('eval_time'))
+        moving = Object('Cutter', constraints=[ID('Follow Path')])
+        for ob, m in ((Object('Cube'), motion(deformation=['Cube'])),
+                      (Object('Cube', data=ID('Mesh', animated)), motion()),
+                      (Object('Cube', data=ID('Mesh', shape_keys=ID('Key', animated))), motion()),
+                      (Object('Cube', animation_data=AnimData(Action('location', 'modifiers["Array"].count'))), motion()),
+                      (Object('Cube', animation_data=AnimData(drivers=['modifiers["Solidify"].thickness'])), motion()),
+                      (Object('Cube', modifiers=[ID('Boolean', object=moving)]), motion()),
+                      (Object('Cube', modifiers=[ID('Array', offset_object=Object('Empty'))]), motion(transformation=['Empty'])),
+                      (Object('Group', data=None, dupli_type='GROUP'), motion())):
+            self.assertEqual(classify_object(ob, m, False), 'DEFORMING')
+        # the exporter's modifier checks
+        self.assertEqual(classify_object(Object('Cube'), motion(), True), 'DEFORMING')
+
+
+class TestArchives(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.dir, 'archives', 'static')
+        static_archives.reset()
+
+    def tearDown(self):
+        static_archives.reset()
+        shutil.rmtree(self.dir)
+
+    def write(self, archives, name, key):
+        with open(archives.path(name), 'w') as f:
+            f.write('PointsPolygons %s\n' % key)
+        archives.store(name, key)
+
+    def test_lookup(self):
+        archives = StaticArchives(self.archive_dir)
+        self.assertTrue(os.path.isdir(self.archive_dir))
+        self.assertFalse(archives.lookup('Cube', 'a'))
+        self.write(archives, 'Cube', 'a')
+        self.assertTrue(archives.lookup('Cube', 'a'))
+        self.assertFalse(archives.lookup('Cube', 'b'))
+        os.remove(archives.path('Cube'))
+        self.assertFalse(archives.lookup('Cube', 'a'))
+        self.assertFalse(archives.is_current('Cube'))
+
+    def test_index(self):
+        archives = StaticArchives(self.archive_dir)
+        self.write(archives, 'Cube', 'a')
+        self.write(archives, 'Suzanne', 'b')
+        archives.store('Deleted', 'c')
+        archives.save()
+        self.assertFalse(os.path.exists(archives.index_path + '.tmp'))
+
+        # the next session knows the keys, but has checked no archive yet
+        loaded = StaticArchives(self.archive_dir)
+        self.assertEqual(loaded.index, {'Cube': 'a', 'Suzanne': 'b', 'Deleted': 'c'})
+        self.assertFalse(loaded.is_current('Cube'))
+        self.assertTrue(loaded.lookup('Cube', 'a'))
+        self.assertTrue(loaded.is_current('Cube'))
+        self.assertFalse(loaded.lookup('Suzanne', 'changed'))
+        self.assertFalse(loaded.lookup('Deleted', 'c'))
+
+        with open(archives.index_path, 'w') as f:
+            f.write('{"Cube": ')
+        self.assertEqual(StaticArchives(self.archive_dir).index, {})
+
+    def test_session(self):
+        # archives checked in an export are reused by the next exports of
+        # the session, until their objects are updated
+        archives = static_archives.open_archives(self.archive_dir)
+        self.write(archives, 'Cube', 'a')
+        self.write(archives, 'Suzanne', 'b')
+        archives.written = 2
+
+        again = static_archives.open_archives(self.archive_dir)
+        self.assertIs(again, archives)
+        self.assertEqual(again.written, 0)
+        self.assertTrue(again.is_current('Cube'))
+
+        static_archives.invalidate(['Cube', 'Lamp'])
+        self.assertFalse(again.is_current('Cube'))
+        self.assertTrue(again.is_current('Suzanne'))
+
+        static_archives.reset()
+        reopened = static_archives.open_archives(self.archive_dir)
+        self.assertIsNot(reopened, archives)
+        self.assertFalse(reopened.is_current('Suzanne'))
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_share(self):
+        shading = ['Surface "plastic" "Kd" [ 0.5 ]\n', '']
+        self.assertTrue(share_frame(['STATIC', 'TRANSFORM'], shading, list(shading)))
+        # first frame, deforming objects and changed materials are written
+        self.assertFalse(share_frame(['STATIC', 'TRANSFORM'], shading, None))
+        self.assertFalse(share_frame(['STATIC', 'DEFORMING'], shading, list(shading)))
+        self.assertFalse(share_frame(['STATIC', 'STATIC'], shading,
+                                     ['Surface "plastic" "Kd" [ 0.6 ]\n', '']))
+
+    def test_link(self):
+        dir = tempfile.mkdtemp()
+        try:
+            src = os.path.join(dir, 'archive.0001.rib')
+            dst = os.path.join(dir, 'archive.0002.rib')
+            with open(src, 'w') as f:
+                f.write('frame 1\n')
+            with open(dst, 'w') as f:
+                f.write('left from an earlier export\n')
+            link_frame(src, dst)
+            with open(dst, 'r') as f:
+                self.assertEqual(f.read(), 'frame 1\n')
+            link_frame(src, dst)
+            self.assertEqual(sorted(os.listdir(dir)), ['archive.0001.rib', 'archive.0002.rib'])
+        finally:
+            shutil.rmtree(dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# Texture optimisation job runner.
+#
+# Runs texture optimiser (tdlmake) commands in a bounded pool of worker
+# threads, each waiting on its own subprocess. A manifest in the export
+# directory records source mtime, size and a hash of the optimiser options
+# of every converted texture, so unchanged textures are not converted again
+# on the next export.
+
+import os
+import json
+import time
+import hashlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = 'texture_manifest.json'
+
+
+class TextureJob:
+    def __init__(self, name, cmd, srcpath, optpath):
+        # the last two arguments of cmd are the source and output paths
+        self.name = name
+        self.cmd = cmd
+        self.srcpath = srcpath
+        self.optpath = optpath
+        self.time = 0.0
+        self.returncode = None
+
+    def options_hash(self):
+        return hashlib.sha1('\0'.join(self.cmd[:-2]).encode('utf-8')).hexdigest()
+
+    def source_state(self):
+        st = os.stat(self.srcpath)
+        return {'mtime': st.st_mtime, 'size': st.st_size, 'options': self.options_hash()}
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            pass
+
+    def has(self, job):
+        return job.optpath in self.entries
+
+    def changed(self, job):
+        # only known textures can be found changed, unknown ones are left
+        # to the modification time checks of the caller
+        entry = self.entries.get(job.optpath)
+        if entry is None:
+            return False
+        return entry != job.source_state()
+
+    def update(self, job):
+        self.entries[job.optpath] = job.source_state()
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+
+
+def default_workers():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _run(job):
+    start = time.time()
+    job.returncode = subprocess.Popen(job.cmd).wait()
+    job.time = time.time() - start
+    return job
+
+
+def run_jobs(jobs, workers=0, manifest=None, report=print):
+    """
+    Run the jobs with at most workers (0 = one per processor) at once and
+    report the time of each. Successful jobs are recorded in the manifest.
+    Returns the jobs in the order they were given.
+    """
+    if len(jobs) == 0:
+        return jobs
+
+    if workers <= 0:
+        workers = default_workers()
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        for job in executor.map(_run, jobs):
+            if job.returncode == 0:
+                if manifest is not None:
+                    manifest.update(job)
+                report("Optimised Texture: %s (%.2fs)" % (job.name, job.time))
+            else:
+                report("Failed to optimise Texture: %s (error %d)" % (job.name, job.returncode))
+
+    report("Optimised %d textures in %.2fs with %d workers" % (len(jobs), time.time() - start, workers))
+    return jobs
@@ -0,0 +1,105 @@
+# ##### BEGIN MIT LICENSE BLOCK #####
+#
+# Copyright (c) 2011 Matt Ebb
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+# 
+#
+# ##### END MIT LICENSE BLOCK #####
+
+# Tests of the texture job runner with a stand-in converter, run outside
+# of Blender from this directory with:
+#     python texture_jobs_test.py
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+from texture_jobs import TextureJob, Manifest, MANIFEST_NAME, run_jobs
+
+
+CONVERTER = '''
+import sys, time, shutil
+time.sleep(float(sys.argv[1]))
+shutil.copy(sys.argv[-2], sys.argv[-1])
+'''
+
+
+class TestTextureJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.converter = os.path.join(self.dir, 'converter.py')
+        with open(self.converter, 'w') as f:
+            f.write(CONVERTER)
+        self.manifest = Manifest(os.path.join(self.dir, MANIFEST_NAME))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_jobs(self, count, delay='0.3'):
+        jobs = []
+        for i in range(count):
+            src = os.path.join(self.dir, 'tex%d.png' % i)
+            if not os.path.exists(src):
+                with open(src, 'w') as f:
+                    f.write('texture %d' % i)
+            cmd = [sys.executable, self.converter, delay, src, os.path.splitext(src)[0] + '.tif']
+            jobs.append(TextureJob('tex%d' % i, cmd, src, cmd[-1]))
+        return jobs
+
+    def test_parallel(self):
+        jobs = self.make_jobs(4)
+        start = time.time()
+        run_jobs(jobs, 4, self.manifest, report=lambda msg: None)
+        self.assertLess(time.time() - start, 4 * 0.3)
+        for job in jobs:
+            self.assertEqual(job.returncode, 0)
+            self.assertTrue(os.path.exists(job.optpath))
+            self.assertGreater(job.time, 0.0)
+
+    def test_manifest(self):
+        jobs = self.make_jobs(2, '0')
+        run_jobs(jobs, 2, self.manifest, report=lambda msg: None)
+        self.manifest.save()
+
+        manifest = Manifest(self.manifest.path)
+        jobs = self.make_jobs(2, '0')
+        self.assertTrue(all(manifest.has(job) and not manifest.changed(job) for job in jobs))
+
+        # changed source, changed options
+        with open(jobs[0].srcpath, 'a') as f:
+            f.write('edit')
+        self.assertTrue(manifest.changed(jobs[0]))
+        jobs[1].cmd.insert(2, '-flips')
+        self.assertTrue(manifest.changed(jobs[1]))
+
+    def test_failure(self):
+        jobs = self.make_jobs(1, '0')
+        jobs[0].cmd[-2] = os.path.join(self.dir, 'missing.png')
+        run_jobs(jobs, 1, self.manifest, report=lambda msg: None)
+        self.assertNotEqual(jobs[0].returncode, 0)
+        self.assertFalse(self.manifest.has(jobs[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
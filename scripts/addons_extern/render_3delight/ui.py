@@ -402,6 +402,8 @@ class RENDER_PT_renderman_output(bpy.types.Panel):
         rm = scene.renderman
         
         layout.prop(rm, "path_rib_output")
+        layout.prop(rm, "rib_compression")
+        layout.prop(rm, "static_archives")
         layout.prop(rm, "output_action")
         layout.prop(rm, "display_driver")
         if rm.display_driver not in ('idisplay', 'AUTO'):
@@ -570,6 +572,7 @@ class RENDER_PT_3Delight_performance(bpy.types.Panel):
         split = layout.split()
         col = split.column()
         col.prop(rm, "threads")
+        col.prop(rm, "texture_threads")
         col.prop(rm, "max_trace_depth")
         col.prop(rm, "max_specular_depth")
         col.prop(rm, "max_diffuse_depth")
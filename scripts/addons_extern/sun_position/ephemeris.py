@@ -0,0 +1,181 @@
+############################################################################
+#
+# Batch versions of the NOAA sun position calculations in sun_calc.py.
+#
+# Times are given as arrays of UTC timestamps (seconds since 1/1/1970),
+# latitude and longitude in degrees (north and east positive) as scalars
+# or arrays broadcastable to the timestamps.  Move_sun places a whole
+# ecliptic or analemma object group with one call of sunPosition, and
+# gets sunrise, sunset and solar noon from one call of sunEvents.
+# Without numpy, sun_calc keeps using its scalar functions.
+#
+############################################################################
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SecondsPerDay = 86400.0
+UnixEpochJD = 2440587.5  # Julian Day for 1/1/1970 00:00 gmt
+
+
+def julianDay(timestamps):
+    return np.asarray(timestamps, dtype=np.float64) / SecondsPerDay + \
+        UnixEpochJD
+
+
+def julianCent(jd):
+    return (jd - 2451545.0) / 36525.0
+
+
+def meanLongitudeSun(t):
+    return (280.46646 + 36000.76983 * t + 0.0003032 * t ** 2) % 360
+
+
+def meanAnomalySun(t):
+    return (357.52911 + t * (35999.05029 - 0.0001537 * t))
+
+
+def eccentricityEarthOrbit(t):
+    return (0.016708634 - 0.000042037 * t - 0.0000001267 * t ** 2)
+
+
+def equationOfSunCenter(t):
+    m = np.radians(meanAnomalySun(t))
+    return ((1.914602 - 0.004817 * t - 0.000014 * t ** 2) * np.sin(m) +
+            (0.019993 - 0.000101 * t) * np.sin(m * 2) +
+            0.000289 * np.sin(m * 3))
+
+
+def obliquityCorrection(t):
+    ec = (23.0 + 26.0 / 60 + (21.4480 - 46.8150) / 3600 * t -
+          (0.00059 / 3600) * t ** 2 + (0.001813 / 3600) * t ** 3)
+    return ec + 0.00256 * np.cos(np.radians(125.04 - 1934.136 * t))
+
+
+def apparentLongitudeOfSun(t):
+    return np.radians(meanLongitudeSun(t) + equationOfSunCenter(t) -
+                      0.00569 - 0.00478 *
+                      np.sin(np.radians(125.04 - 1934.136 * t)))
+
+
+def sunDeclination(t):
+    e = np.radians(obliquityCorrection(t))
+    return np.arcsin(np.sin(e) * np.sin(apparentLongitudeOfSun(t)))
+
+
+def equationOfTime(t):
+    ml = np.radians(meanLongitudeSun(t))
+    e = eccentricityEarthOrbit(t)
+    m = np.radians(meanAnomalySun(t))
+    y = np.tan(np.radians(obliquityCorrection(t)) / 2.0)
+    y = y * y
+    sinm = np.sin(m)
+    etime = (y * np.sin(2.0 * ml) - 2.0 * e * sinm +
+             4.0 * e * y * sinm * np.cos(2.0 * ml) -
+             0.5 * y ** 2 * np.sin(4.0 * ml) - 1.25 * e ** 2 * np.sin(2.0 * m))
+    return np.degrees(etime) * 4
+
+
+def _latitude(latitude):
+    # Latitude 90 and -90 gives erroneous results so nudge it
+    return np.radians(np.clip(latitude, -89.93, 89.93))
+
+
+def refraction(elevation):
+    # Atmospheric refraction correction in degrees for the
+    # exoatmospheric elevation, as in getSunPosition
+    te = np.tan(np.radians(elevation))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        high = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+        low = 1735.0 + elevation * (-518.2 + elevation *
+                (103.4 + elevation * (-12.79 + elevation * 0.711)))
+        below = -20.774 / te
+    correction = np.where(elevation > 5.0, high,
+                          np.where(elevation > -0.575, low, below))
+    return np.where(elevation > 85.0, 0.0, correction) / 3600
+
+
+def sunPosition(timestamps, latitude, longitude, useRefraction=True):
+    """Returns azimuth (clockwise from north) and elevation in degrees."""
+    jd = julianDay(timestamps)
+    t = julianCent(jd)
+    lat = _latitude(latitude)
+    solarDec = sunDeclination(t)
+
+    utcMinutes = (jd - 0.5) % 1.0 * 1440.0
+    trueSolarTime = (utcMinutes + equationOfTime(t) +
+                     4.0 * np.asarray(longitude)) % 1440
+    hourAngle = trueSolarTime / 4.0 - 180.0
+
+    csz = (np.sin(lat) * np.sin(solarDec) +
+           np.cos(lat) * np.cos(solarDec) * np.cos(np.radians(hourAngle)))
+    zenith = np.arccos(np.clip(csz, -1.0, 1.0))
+
+    azDenom = np.cos(lat) * np.sin(zenith)
+    safeDenom = np.where(np.abs(azDenom) > 0.001, azDenom, 1.0)
+    azRad = np.clip(((np.sin(lat) * np.cos(zenith)) - np.sin(solarDec)) /
+                    safeDenom, -1.0, 1.0)
+    azimuth = 180.0 - np.degrees(np.arccos(azRad))
+    azimuth = np.where(hourAngle > 0.0, -azimuth, azimuth)
+    azimuth = np.where(np.abs(azDenom) > 0.001, azimuth,
+                       np.where(lat > 0.0, 180.0, 0.0))
+    azimuth = np.where(azimuth < 0.0, azimuth + 360.0, azimuth)
+
+    elevation = 90.0 - np.degrees(zenith)
+    if useRefraction:
+        elevation = elevation + refraction(elevation)
+    return azimuth, elevation
+
+
+def _hourAngleSunrise(lat, solarDec):
+    HAarg = (math.cos(math.radians(90.833)) /
+             (np.cos(lat) * np.cos(solarDec)) -
+             np.tan(lat) * np.tan(solarDec))
+    return np.arccos(np.clip(HAarg, -1.0, 1.0))
+
+
+def _sunriseSetUTC(rise, jd, lat, longitude):
+    t = julianCent(jd)
+    hourAngle = _hourAngleSunrise(lat, sunDeclination(t))
+    if not rise:
+        hourAngle = -hourAngle
+    delta = longitude + np.degrees(hourAngle)
+    return 720 - (4.0 * delta) - equationOfTime(t)
+
+
+def sunEvents(timestamps, latitude, longitude, useRefraction=True):
+    """Returns a table of sunrise, sunset and solar noon for the days
+    containing the timestamps.
+
+    The times are UTC timestamps, the table is a dict of arrays with the
+    keys 'day', 'sunrise', 'sunset', 'noon' and the sun's azimuth and
+    elevation at each of them ('sunrise_azimuth', 'noon_elevation', ...).
+    As in calcSunrise_Sunset, days without sunrise or sunset get the times
+    at which the sun comes closest to the horizon.
+    """
+    day = np.floor(np.asarray(timestamps, dtype=np.float64) /
+                   SecondsPerDay) * SecondsPerDay
+    jd = julianDay(day)
+    lat = _latitude(latitude)
+    longitude = np.asarray(longitude, dtype=np.float64)
+
+    table = {'day': day}
+    for name, rise in (('sunrise', True), ('sunset', False)):
+        timeUTC = _sunriseSetUTC(rise, jd, lat, longitude)
+        timeUTC = _sunriseSetUTC(rise, jd + timeUTC / 1440.0, lat, longitude)
+        table[name] = day + timeUTC * 60.0
+
+    eqTime = equationOfTime(julianCent(jd - longitude / 360.0))
+    noonOffset = 720.0 - (longitude * 4.0) - eqTime
+    eqTime = equationOfTime(julianCent(jd + noonOffset / 1440.0))
+    table['noon'] = day + (720.0 - (longitude * 4.0) - eqTime) * 60.0
+
+    for name in ('sunrise', 'sunset', 'noon'):
+        az, el = sunPosition(table[name], latitude, longitude, useRefraction)
+        table[name + '_azimuth'] = az
+        table[name + '_elevation'] = el
+    return table
@@ -0,0 +1,123 @@
+############################################################################
+#
+# Checks of the batch ephemeris against the scalar functions of
+# sun_calc.py.  sun_calc needs Blender's property module, run from within
+# Blender with:
+#     from sun_position import ephemeris_test; ephemeris_test.run()
+# and the benchmark of a year at 1-minute steps with:
+#     from sun_position import ephemeris_test; ephemeris_test.benchmark()
+#
+############################################################################
+
+import calendar
+import datetime
+import time
+import unittest
+
+import numpy as np
+
+from . import ephemeris
+from . import sun_calc as sc
+from . properties import Sun
+
+
+def yearTimestamps(year, step):
+    start = calendar.timegm((year, 1, 1, 0, 0, 0))
+    end = calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+    return np.arange(start, end, step, dtype=np.float64)
+
+
+class TestEphemeris(unittest.TestCase):
+
+    places = ((48.2, 16.37), (-33.9, 151.2), (64.1, -21.9), (78.2, 15.6))
+    names = ('Latitude', 'Longitude', 'UTCzone', 'DaylightSavings',
+             'ShowRefraction', 'Year', 'Month', 'Day', 'SunDistance')
+
+    def setUp(self):
+        self.saved = dict((name, getattr(Sun, name)) for name in self.names)
+        Sun.ShowRefraction = True
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(Sun, name, value)
+
+    def test_timestamp(self):
+        for year, month, day, utcTime in ((2013, 3, 31, 1.5),
+                (2012, 2, 29, 23.0), (2013, 2, 29, -2.0), (2013, 12, 40, 30.0)):
+            jd = sc.getJulianDay(year, month, day) + utcTime / 24
+            stamp = sc.utcTimestamp(year, month, day, utcTime)
+            self.assertAlmostEqual(ephemeris.julianDay(stamp), jd, 9)
+
+    def test_position(self):
+        stamps = yearTimestamps(2013, 3600 * 7 + 61)
+        for lat, lon in self.places:
+            az, el = ephemeris.sunPosition(stamps, lat, lon)
+            for i in range(0, len(stamps), 37):
+                d = datetime.datetime.utcfromtimestamp(stamps[i])
+                hours = d.hour + d.minute / 60.0 + d.second / 3600.0
+                sc.getSunPosition(None, hours, lat, lon, 0.0, 0,
+                                  d.month, d.day, d.year, 1.0)
+                self.assertAlmostEqual(sc.Sun.Azimuth, az[i], 6)
+                self.assertAlmostEqual(sc.Sun.Elevation, el[i], 6)
+
+    def test_events(self):
+        days = yearTimestamps(2013, 86400 * 5)
+        for lat, lon in self.places:
+            table = ephemeris.sunEvents(days, lat, lon)
+            for i in range(0, len(days)):
+                jd = ephemeris.julianDay(days[i])
+                for name, rise in (('sunrise', True), ('sunset', False)):
+                    t = sc.calcSunriseSetUTC(rise, jd, lat, lon)
+                    t = sc.calcSunriseSetUTC(rise, jd + t / 1440.0, lat, lon)
+                    self.assertAlmostEqual(days[i] + t * 60.0,
+                                           table[name][i], 3)
+                sc.calcSolarNoon(jd, lon, 0, False)
+                noon = (table['noon'][i] - days[i]) / 60.0 % 1440
+                self.assertAlmostEqual(sc.Sun.SolarNoon.time * 60.0, noon, 6)
+
+    def test_panel_events(self):
+        # calcSunEvents gives what calcSunrise_Sunset gives for the panel
+        Sun.SunDistance = 50.0
+        for lat, lon in self.places:
+            for month, day in ((1, 15), (3, 31), (6, 21), (10, 27)):
+                for zone, dst in ((0, False), (1, False), (2, True)):
+                    Sun.Latitude, Sun.Longitude = lat, lon
+                    Sun.Year, Sun.Month, Sun.Day = 2013, month, day
+                    Sun.UTCzone, Sun.DaylightSavings = zone, dst
+                    sc.calcSunrise_Sunset(1)
+                    sc.calcSunrise_Sunset(0)
+                    old = [(e.time, e.azimuth, e.elevation) for e in
+                           (Sun.Sunrise, Sun.Sunset, Sun.SolarNoon)]
+                    sc.calcSunEvents()
+                    new = [(e.time, e.azimuth, e.elevation) for e in
+                           (Sun.Sunrise, Sun.Sunset, Sun.SolarNoon)]
+                    for a, b in zip(old[:2], new[:2]):
+                        for x, y in zip(a, b):
+                            self.assertAlmostEqual(x, y, 5)
+                    self.assertAlmostEqual(old[2][0], new[2][0], 5)
+                    if not dst:
+                        # with daylight savings the old noon elevation was
+                        # taken an hour after solar noon
+                        self.assertAlmostEqual(old[2][2], new[2][2], 5)
+
+
+def benchmark(year=2013, latitude=48.2, longitude=16.37, sample=5000):
+    # the scalar time is measured on a sample of the minutes and scaled
+    stamps = yearTimestamps(year, 60)
+    start = time.time()
+    az, el = ephemeris.sunPosition(stamps, latitude, longitude)
+    table = ephemeris.sunEvents(stamps[::1440], latitude, longitude)
+    batch = time.time() - start
+    start = time.time()
+    for stamp in stamps[::len(stamps) // sample][:sample]:
+        d = datetime.datetime.utcfromtimestamp(stamp)
+        sc.getSunPosition(None, d.hour + d.minute / 60.0, latitude, longitude,
+                          0.0, 0, d.month, d.day, d.year, 1.0)
+    scalar = (time.time() - start) / sample * len(stamps)
+    print("%d samples and %d days: batch %.3f s, scalar ~%.1f s" %
+          (len(stamps), len(table['day']), batch, scalar))
+
+
+def run():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestEphemeris)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -7,6 +7,11 @@ import sys
 import os
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from . sun_calc import degToRad, radToDeg, format_hms
 from . properties import Display, Sun
 
@@ -688,7 +693,80 @@ class ImageBuffer:
             return None
 
 
-def ConvertToLatLong(inpic, outpic):
+# Remap tables of the angular to equirectangular conversion, keyed by
+# (width, height, bilinear) of the mirror ball image.
+_latlong_remaps = {}
+
+
+def latlong_remap(width, height, bilinear=False):
+    key = (width, height, bilinear)
+    if key in _latlong_remaps:
+        return _latlong_remaps[key]
+
+    uv_width = width * 2 - 1
+    uv_height = height - 1
+
+    # output columns are flipped, as in ConvertToLatLong_py
+    phi = (np.arange(uv_width, -1, -1) / uv_width) * 2 * math.pi
+    theta = (1 - np.arange(height) / uv_height) * math.pi
+    phi = phi[np.newaxis, :]
+    theta = theta[:, np.newaxis]
+
+    m = np.sqrt(2 * (1 + np.sin(-theta) * np.sin(phi)))
+    m[m == 0] = 1e-12
+    fx = (np.sin(theta) * np.cos(phi) / m + 1) * (0.5 * width)
+    fy = (np.cos(theta) / m + 1) * (0.5 * height)
+
+    if not bilinear:
+        x = np.clip(fx.astype(np.intp), 0, width - 1)
+        y = np.clip(fy.astype(np.intp), 0, height - 1)
+        remap = (y * width + x, None)
+    else:
+        # sample between pixel centres
+        fx = np.clip(fx - 0.5, 0, width - 1)
+        fy = np.clip(fy - 0.5, 0, height - 1)
+        x0 = np.floor(fx).astype(np.intp)
+        y0 = np.floor(fy).astype(np.intp)
+        x1 = np.minimum(x0 + 1, width - 1)
+        y1 = np.minimum(y0 + 1, height - 1)
+        tx = (fx - x0)[..., np.newaxis]
+        ty = (fy - y0)[..., np.newaxis]
+        index = np.array([y0 * width + x0, y0 * width + x1,
+                          y1 * width + x0, y1 * width + x1])
+        weight = np.array([(1 - tx) * (1 - ty), tx * (1 - ty),
+                           (1 - tx) * ty, tx * ty], dtype=np.float32)
+        remap = (index, weight)
+
+    _latlong_remaps[key] = remap
+    return remap
+
+
+def ConvertToLatLong(inpic, outpic, bilinear=False):
+
+    if np is None:
+        ConvertToLatLong_py(inpic, outpic)
+        return
+
+    width = inpic.size[0]
+    height = inpic.size[1]
+    out_width = outpic.size[0]
+    out_height = outpic.size[1]
+
+    src = np.array(inpic.pixels[:], dtype=np.float32).reshape(-1, 4)
+    index, weight = latlong_remap(width, height, bilinear)
+    if weight is None:
+        latlong = src[index]
+    else:
+        latlong = (src[index] * weight).sum(axis=0)
+
+    out = np.zeros((out_height, out_width, 4), dtype=np.float32)
+    h = min(height, out_height)
+    w = min(width * 2, out_width)
+    out[:h, :w] = latlong[:h, :w]
+    outpic.pixels = out.ravel().tolist()
+
+
+def ConvertToLatLong_py(inpic, outpic):
 
     width = inpic.size[0]
     height = inpic.size[1]
@@ -713,7 +791,8 @@ def ConvertToLatLong(inpic, outpic):
             x = int((math.sin(theta) * math.cos(phi) / m + 1) * pc_width)
             y = int((math.cos(theta) / m + 1) * pc_height)
             pixel = p_in.get_pixel(x, y)
-            p_out.set_pixel(flip - col, row, pixel)
+            if pixel is not None:
+                p_out.set_pixel(flip - col, row, pixel)
     p_out.update()
 
 
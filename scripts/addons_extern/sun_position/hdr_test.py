@@ -0,0 +1,66 @@
+############################################################################
+#
+# Checks of the NumPy mirror ball to lat-long conversion of hdr.py against
+# the per pixel ConvertToLatLong_py.  hdr.py needs Blender's modules, run
+# from within Blender with:
+#     from sun_position import hdr_test; hdr_test.run()
+#
+############################################################################
+
+import random
+import unittest
+
+import numpy as np
+
+from . import hdr
+
+
+class Picture:
+    # the size and pixels of a bpy image
+    def __init__(self, width, height, pixels=None):
+        self.size = [width, height]
+        if pixels is None:
+            pixels = [0.0] * (width * height * 4)
+        self.pixels = pixels
+
+
+def mirrorBall(width, height, colour):
+    return Picture(width, height, [c for y in range(height)
+                                   for x in range(width) for c in colour(x, y)])
+
+
+class TestLatLong(unittest.TestCase):
+
+    def convert(self, inpic, bilinear=False):
+        out = Picture(inpic.size[0] * 2, inpic.size[1])
+        hdr.ConvertToLatLong(inpic, out, bilinear)
+        return np.array(out.pixels).reshape(inpic.size[1], -1, 4)
+
+    def test_nearest(self):
+        rnd = random.Random(0)
+        inpic = mirrorBall(32, 32, lambda x, y: (rnd.random(), rnd.random(),
+                                                 rnd.random(), 1.0))
+        out = Picture(64, 32)
+        hdr.ConvertToLatLong_py(inpic, out)
+        expected = np.array(out.pixels).reshape(32, -1, 4)
+        np.testing.assert_allclose(self.convert(inpic), expected, atol=1e-6)
+
+    def test_bilinear_constant(self):
+        inpic = mirrorBall(32, 32, lambda x, y: (0.25, 0.5, 2.0, 1.0))
+        latlong = self.convert(inpic, True)
+        np.testing.assert_allclose(latlong, np.tile((0.25, 0.5, 2.0, 1.0), (32, 64, 1)),
+                                   rtol=1e-5)
+
+    def test_bilinear_ramp(self):
+        # on a ramp the bilinear samples lie within a pixel of the nearest
+        # ones, but are not all at pixel values
+        inpic = mirrorBall(32, 32, lambda x, y: (x, y, 0.0, 1.0))
+        nearest = self.convert(inpic)
+        latlong = self.convert(inpic, True)
+        self.assertTrue(np.all(np.abs(latlong - nearest) <= 1 + 1e-5))
+        self.assertTrue(np.any(np.abs(latlong - np.round(latlong)) > 0.1))
+
+
+def run():
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestLatLong)
+    unittest.TextTestRunner(verbosity=2).run(suite)
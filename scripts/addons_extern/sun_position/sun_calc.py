@@ -1,8 +1,10 @@
 from mathutils import *
 import math
 import datetime
+import calendar
 
 from . properties import *
+from . import ephemeris
 
 Degrees = "\xb0"
 
@@ -116,8 +118,11 @@ def Move_sun():
     northOffset = radToDeg(Sun.NorthOffset)
 
     if Sun.ShowRiseSet:
-        calcSunrise_Sunset(1)
-        calcSunrise_Sunset(0)
+        if ephemeris.np is not None:
+            calcSunEvents()
+        else:
+            calcSunrise_Sunset(1)
+            calcSunrise_Sunset(0)
 
     getSunPosition(None, localTime, Sun.Latitude, Sun.Longitude,
             northOffset, zone, Sun.Month, Sun.Day, Sun.Year,
@@ -151,6 +156,10 @@ def Move_sun():
     if totalObjects < 1 or not Sun.UseObjectGroup:
         return False
 
+    if ephemeris.np is not None:
+        placeObjectGroup(localTime, zone, northOffset)
+        return True
+
     if Sun.ObjectGroup == 'ECLIPTIC':
         # Ecliptic
         if totalObjects > 1:
@@ -196,6 +205,44 @@ def Move_sun():
 
     return True
 
+
+def placeObjectGroup(localTime, zone, northOffset):
+    # The ecliptic and analemma placement of Move_sun with the sun
+    # positions of all objects computed in one batch
+    objects = [obj for obj in Sun.Selected_objects
+               if obj.type == 'LAMP' or obj.type == 'MESH']
+    count = len(objects)
+    totalObjects = len(Sun.Selected_objects)
+    stamps = []
+
+    if Sun.ObjectGroup == 'ECLIPTIC':
+        if totalObjects > 1:
+            timeIncrement = Sun.TimeSpread / (totalObjects - 1)
+            localTime = localTime + timeIncrement * (totalObjects - 1)
+        else:
+            timeIncrement = Sun.TimeSpread
+        for i in range(count):
+            stamps.append(utcTimestamp(Sun.Year, Sun.Month, Sun.Day,
+                localTime - timeIncrement * i + zone))
+    else:
+        dayIncrement = 365 / totalObjects
+        day = Sun.Day_of_year + dayIncrement * (totalObjects - 1)
+        for i in range(count):
+            dt = (datetime.date(Sun.Year, 1, 1) +
+                  datetime.timedelta(day - dayIncrement * i - 1))
+            stamps.append(utcTimestamp(Sun.Year, dt.month, dt.day,
+                localTime + zone))
+
+    azimuth, elevation = ephemeris.sunPosition(stamps, Sun.Latitude,
+        Sun.Longitude, Sun.ShowRefraction)
+    for i, obj in enumerate(objects):
+        setSunAngles(float(azimuth[i]), float(elevation[i]), northOffset)
+        setSunPosition(obj, Sun.SunDistance)
+        if obj.type == 'LAMP':
+            obj.rotation_euler = (
+                (math.radians(Sun.Elevation - 90), 0,
+                math.radians(-Sun.AzNorth)))
+
 ############################################################################
 #
 # Calculate the actual position of the sun based on input parameters.
@@ -291,6 +338,11 @@ def getSunPosition(obj, localTime, latitude, longitude, northOffset,
     else:
         solarElevation = 90.0 - radToDeg(zenith)
 
+    setSunAngles(azimuth, solarElevation, northOffset)
+
+
+def setSunAngles(azimuth, solarElevation, northOffset):
+
     solarAzimuth = azimuth + northOffset
 
     Sun.AzNorth = solarAzimuth
@@ -396,6 +448,36 @@ def calcSunrise_Sunset(rise):
         Sun.Sunset.azimuth = Sun.Azimuth
         Sun.Sunset.elevation = Sun.Elevation
 
+
+def calcSunEvents():
+    # calcSunrise_Sunset for sunrise and sunset, with the solar noon,
+    # from one batch of the ephemeris.  The noon elevation is the one
+    # at solar noon, also with daylight savings.
+    if Sun.Longitude > 0:
+        zone = Sun.UTCzone * -1
+    else:
+        zone = Sun.UTCzone
+    dst = 60.0 if Sun.DaylightSavings else 0.0
+
+    day = utcTimestamp(Sun.Year, Sun.Month, Sun.Day, 0.0)
+    table = ephemeris.sunEvents([day], Sun.Latitude, Sun.Longitude,
+                                Sun.ShowRefraction)
+
+    for name, event in (('sunrise', Sun.Sunrise), ('sunset', Sun.Sunset)):
+        timeLocal = (table[name][0] - day) / 60.0 - zone * 60.0 + dst
+        tl = timeLocal / 60.0
+        if tl < 0.0:
+            tl += 24.0
+        elif tl > 24.0:
+            tl -= 24.0
+        event.time = tl
+        event.azimuth = float(table[name + '_azimuth'][0])
+        event.elevation = float(table[name + '_elevation'][0])
+
+    noonLocal = ((table['noon'][0] - day) / 60.0 - zone * 60.0 + dst) % 1440
+    Sun.SolarNoon.time = noonLocal / 60.0
+    Sun.SolarNoon.elevation = float(table['noon_elevation'][0])
+
 ##########################################################################
 ## Get the elapsed julian time since 1/1/2000 12:00 gmt
 ## Y2k epoch (1/1/2000 12:00 gmt) is Julian day 2451545.0
@@ -409,6 +491,13 @@ def julianTimeFromY2k(utcTime, year, month, day):
     return ((jd + (utcTime / 24)) - epoch) / century
 
 
+def utcTimestamp(year, month, day, utcTime):
+    # Seconds since 1/1/1970 for the ephemeris, days past the end of the
+    # month and hours past midnight carry over like in getJulianDay
+    return (calendar.timegm((year, month, 1, 0, 0, 0)) +
+            ((day - 1) * 24 + utcTime) * 3600.0)
+
+
 def getJulianDay(year, month, day):
     if month <= 2:
         year -= 1
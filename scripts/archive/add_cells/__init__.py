@@ -61,6 +61,7 @@ from math import fabs
 from time import time
 from mathutils import Matrix,Vector
 from  mathutils.geometry import normal as TriangleNormal 
+from . import voxelize
 
 
 
@@ -110,43 +111,13 @@ def InsideZProjection(point, faces,mesh):
     
 #####################################################################
 
-def Cells(object, cell, solid = False):
-    print("L130 ===Cells called=== object is =",object.name," cell is", cell.name)    
-    t0 = time()
-    
+def BinCellsLegacy(mesh, cell_dimensions, solid):
+    # cells of the hollow or solid voxel model, one vertex and face at a time
+
     es = [Vector((1.0, 0.0, 0.0)),
             Vector((0.0, 1.0, 0.0)),
             Vector((0.0, 0.0, 1.0))]
 
-    # transform object/mesh (to get cell-alignment right)
-    ######################################################
-    
-    cm  = cell.matrix_local.copy()
-    cmi = cm.inverted() # is different matrix!
-
-    om = object.matrix_local.copy()
-    omi = om.inverted()
-    
-    tm  = om * cmi
-    tmi = cm * omi
-    
-    mesh = object.data
-        
-    # transform mesh to align with cell
-    mesh.transform(tm)
-    
-    # calculate cell dimensions
-    ########################### boundingbox is a box with (0 1 2 3)(4 5 6 7)
-    # 0 and 6 are diagonal 1 7, 2 4, 3 5 too 
-        
-    cell_gbb_min = cell.bound_box[0]
-#for debug pkhg    print("L153 cellinfo =",type(cell_gbb_min),cell_gbb_min)
-    cell_lbb_min = Vector(cell_gbb_min).to_4d() * cmi
-    cell_lbb_max = cell.bound_box[6]
-    cell_lbb_max = Vector(cell_lbb_max).to_4d() * cmi
-
-
-    cell_dimensions = cell_lbb_max - cell_lbb_min
     cell_dimension_x,cell_dimension_y,cell_dimension_z = cell_dimensions[0:3]
 
     # bin vertices
@@ -344,7 +315,64 @@ def Cells(object, cell, solid = False):
                     else:
                         if odd_parity:  
                             f_cells[(idx, idy, idz)] = 1 # odd parity -> empty cell inside object
-                                
+
+    return f_cells
+
+#####################################################################
+
+def BinCellsArrays(mesh, cell_dimensions, solid):
+    # the same cells computed by voxelize in one batch
+
+    co = voxelize.np.zeros(len(mesh.vertices) * 3)
+    mesh.vertices.foreach_get("co", co)
+    faces = voxelize.np.zeros(len(mesh.faces) * 4, dtype=int)
+    mesh.faces.foreach_get("vertices_raw", faces)
+    faces = faces.reshape(-1, 4)[:, :3]
+    cells = voxelize.Voxelize(co, faces, cell_dimensions[0:3], solid)
+    return [tuple(id) for id in cells.tolist()]
+
+#####################################################################
+
+def Cells(object, cell, solid = False):
+    print("L130 ===Cells called=== object is =",object.name," cell is", cell.name)    
+    t0 = time()
+    
+    # transform object/mesh (to get cell-alignment right)
+    ######################################################
+    
+    cm  = cell.matrix_local.copy()
+    cmi = cm.inverted() # is different matrix!
+
+    om = object.matrix_local.copy()
+    omi = om.inverted()
+    
+    tm  = om * cmi
+    tmi = cm * omi
+    
+    mesh = object.data
+        
+    # transform mesh to align with cell
+    mesh.transform(tm)
+    
+    # calculate cell dimensions
+    ########################### boundingbox is a box with (0 1 2 3)(4 5 6 7)
+    # 0 and 6 are diagonal 1 7, 2 4, 3 5 too 
+        
+    cell_gbb_min = cell.bound_box[0]
+#for debug pkhg    print("L153 cellinfo =",type(cell_gbb_min),cell_gbb_min)
+    cell_lbb_min = Vector(cell_gbb_min).to_4d() * cmi
+    cell_lbb_max = cell.bound_box[6]
+    cell_lbb_max = Vector(cell_lbb_max).to_4d() * cmi
+
+
+    cell_dimensions = cell_lbb_max - cell_lbb_min
+    cell_dimension_x,cell_dimension_y,cell_dimension_z = cell_dimensions[0:3]
+
+    if voxelize.np is not None:
+        f_cells = BinCellsArrays(mesh, cell_dimensions, solid)
+    else:
+        f_cells = BinCellsLegacy(mesh, cell_dimensions, solid)
+
     # create new object
     ###################
             
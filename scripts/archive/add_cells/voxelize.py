@@ -0,0 +1,180 @@
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+#
+# --------------------------------------------------------------------------
+
+"""
+Voxelization of a triangulated mesh with numpy, as done by Cells.
+
+All vertices are binned into cells at once, all (face, cell) pairs are
+listed from the cell span of each face and tested in one batch, and for
+a solid model all columns are filled from one parity test of all
+candidate cell centres.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#####################################################################
+
+def TriangleNormals(co, faces):
+    # like face.normal, not normalized
+    vs = co[faces]
+    (a, b) = (vs[:,0] - vs[:,1], vs[:,1] - vs[:,2])
+    return np.stack((a[:,1]*b[:,2] - a[:,2]*b[:,1],
+                     a[:,2]*b[:,0] - a[:,0]*b[:,2],
+                     a[:,0]*b[:,1] - a[:,1]*b[:,0]), axis=1)
+
+def VertexCells(co, dims):
+    # cell index of every vertex; rint rounds halves to even like round()
+    return np.rint(co / dims).astype(int)
+
+def Radius(a, dims):
+    # half of the projection of a cell on the axes a
+    return 0.5 * (np.abs(a[...,0]) * dims[0] +
+                  np.abs(a[...,1]) * dims[1] +
+                  np.abs(a[...,2]) * dims[2])
+
+def Dots(a, v):
+    return a[...,0] * v[...,0] + a[...,1] * v[...,1] + a[...,2] * v[...,2]
+
+def OverlapCells(tris, centres, dims):
+    # separating axis test of triangles against the cells around centres
+
+    vs = tris - centres[:,None,:]
+    fs = vs[:,[1, 2, 0]] - vs
+    a0 = np.cross(fs[:,0], fs[:,1])
+    overlap = np.abs(Dots(a0, vs[:,0])) <= Radius(a0, dims)
+
+    for e in np.eye(3):
+        # a = e x f for all three edges f
+        a = np.cross(e, fs)
+        r = Radius(a, dims)
+        ds = np.stack([Dots(a, vs[:,[n]]) for n in range(3)], axis=2)
+        overlap &= ~((ds.min(axis=2) > r) | (ds.max(axis=2) < -r)).any(axis=1)
+    return overlap
+
+def FaceCells(co, faces, dims):
+    """
+    All pairs of a face and a cell it overlaps (the hollow voxel model).
+    co: (n, 3) vertex coordinates aligned with the cell
+    faces: (m, 3) vertex indices of triangles
+    dims: the cell dimensions
+    Returns the face indices and the (k, 3) cell indices.
+    """
+    ids = VertexCells(co, dims)[faces]
+    lo = ids.min(axis=1)
+    spans = ids.max(axis=1) - lo + 1
+    counts = spans.prod(axis=1)
+
+    # every cell in the span of every face
+    face = np.repeat(np.arange(len(faces)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    (sy, sz) = (spans[face,1], spans[face,2])
+    cell = lo[face] + np.stack((k // (sy*sz), (k // sz) % sy, k % sz), axis=1)
+
+    # faces spanning cells in one direction only overlap all of them,
+    # the others are tested cell by cell
+    test = ((spans > 1).sum(axis=1) > 1)[face]
+    keep = ~test
+    if test.any():
+        keep[test] = OverlapCells(co[faces[face[test]]], cell[test] * dims, dims)
+    return (face[keep], cell[keep])
+
+def UniqueCells(cell):
+    # sorted cells without duplicates
+    if len(cell) == 0:
+        return cell.reshape(0, 3)
+    order = np.lexsort((cell[:,2], cell[:,1], cell[:,0]))
+    cell = cell[order]
+    first = np.r_[True, (cell[1:] != cell[:-1]).any(axis=1)]
+    return cell[first]
+
+def InsideTriangles(points, tris):
+    # point in z projection of each triangle, the edge crossing test of
+    # InsideZProjection. Crossings of an edge shared by two faces cancel,
+    # so the parity over all face edges is the one over the boundary edges
+    (px, py) = (points[:,0], points[:,1])
+    inside = np.zeros(len(points), dtype=bool)
+    for n in range(3):
+        (p0, p1) = (tris[:,n], tris[:,(n+1) % 3])
+        cz = (px - p0[:,0])*(p0[:,1] - p1[:,1]) - (py - p0[:,1])*(p0[:,0] - p1[:,0])
+        up = (p0[:,1] <= py) & (py < p1[:,1])
+        down = (p1[:,1] <= py) & (py < p0[:,1])
+        inside ^= (up & (cz < 0.0)) | (down & (cz > 0.0))
+    return inside
+
+def FillCells(co, faces, dims, face, cell):
+    """
+    Cells inside the closed mesh that no face overlaps.
+    Each (x, y) column is walked upwards; a face flips the parity at its
+    lowest cell in the column, if the column centre lies inside its z
+    projection, and empty cells at odd parity are filled.
+    """
+    if len(cell) == 0:
+        return cell.reshape(0, 3)
+    (minz, maxz) = (cell[:,2].min(), cell[:,2].max())
+
+    # the lowest cell of each face in each column
+    order = np.lexsort((cell[:,2], face, cell[:,1], cell[:,0]))
+    (face, cell) = (face[order], cell[order])
+    first = np.r_[True, (face[1:] != face[:-1]) | (cell[1:,:2] != cell[:-1,:2]).any(axis=1)]
+    (face, cell) = (face[first], cell[first])
+
+    # vertical faces are counted as facing up and down, which cancels
+    normalZ = TriangleNormals(co, faces)[:,2]
+    flip = normalZ[face] != 0.0
+    (face, cell) = (face[flip], cell[flip])
+    flip = InsideTriangles(cell[:,:2] * dims[:2], co[faces[face]][:,:,:2])
+    cell = cell[flip]
+
+    # cells flipped an odd number of times
+    order = np.lexsort((cell[:,2], cell[:,1], cell[:,0]))
+    cell = cell[order]
+    if len(cell) == 0:
+        return cell.reshape(0, 3)
+    starts = np.flatnonzero(np.r_[True, (cell[1:] != cell[:-1]).any(axis=1)])
+    odd = np.diff(np.r_[starts, len(cell)]) % 2 == 1
+    cell = cell[starts[odd]]
+
+    # odd parity from every other flip up to the next one in the column
+    column = np.r_[True, (cell[1:,:2] != cell[:-1,:2]).any(axis=1)]
+    columnStart = np.maximum.accumulate(np.where(column, np.arange(len(cell)), 0))
+    opening = (np.arange(len(cell)) - columnStart) % 2 == 0
+    closing = np.r_[~column[1:], False]
+    end = np.where(closing, np.r_[cell[1:,2], 0], maxz + 1)
+    (start, end, xy) = (cell[opening,2], end[opening], cell[opening,:2])
+    end = np.clip(end, minz, maxz + 1)
+    lengths = end - start
+    z = start.repeat(lengths) + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.column_stack((xy.repeat(lengths, axis=0), z))
+
+def Voxelize(co, faces, dims, solid=False):
+    """
+    Cell indices of the voxel model of a triangulated mesh, sorted.
+    solid: fill the inside of the (closed, manifold) mesh
+    """
+    co = np.asarray(co, dtype=float).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=int).reshape(-1, 3)
+    dims = np.asarray(dims, dtype=float)
+    (face, cell) = FaceCells(co, faces, dims)
+    if solid:
+        cell = np.concatenate((cell, FillCells(co, faces, dims, face, cell)))
+    return UniqueCells(cell)
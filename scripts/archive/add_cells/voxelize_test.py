@@ -0,0 +1,187 @@
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+#
+# --------------------------------------------------------------------------
+
+"""
+Tests of voxelize on tori, against the cells the list based Cells code
+finds. Run from this directory with:
+    python voxelize_test.py
+and the benchmark on a dense torus with:
+    python voxelize_test.py benchmark
+"""
+
+import sys
+import unittest
+from time import time
+
+import numpy as np
+
+from voxelize import Voxelize
+
+def _normal(p0, p1, p2):
+    (a, b) = ([p0[i] - p1[i] for i in range(3)], [p1[i] - p2[i] for i in range(3)])
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+def _insideZProjection(point, faces, co):
+    # InsideZProjection
+    boundary_edges = set()
+    for face in faces:
+        for edge in ((face[0], face[1]), (face[1], face[2]), (face[2], face[0])):
+            if (edge[0], edge[1]) in boundary_edges:
+                boundary_edges.remove((edge[0], edge[1]))
+            elif (edge[1], edge[0]) in boundary_edges:
+                boundary_edges.remove((edge[1], edge[0]))
+            else:
+                boundary_edges.add(edge)
+    inside = False
+    for edge in boundary_edges:
+        (p0, p1) = (co[edge[0]], co[edge[1]])
+        cz = (point[0] - p0[0])*(p0[1] - p1[1]) - (point[1] - p0[1])*(p0[0] - p1[0])
+        if p0[1] <= point[1] < p1[1]:
+            if cz < 0.0:
+                inside = not inside
+            continue
+        if p1[1] <= point[1] < p0[1]:
+            if cz > 0.0:
+                inside = not inside
+            continue
+    return inside
+
+def _legacyCells(co, faces, dims, solid=False):
+    # the binning and filling of Cells, on lists
+    es = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)]
+    dot = lambda a, v: a[0]*v[0] + a[1]*v[1] + a[2]*v[2]
+    radius = lambda a: 0.5 * (abs(a[0]) * dims[0] + abs(a[1]) * dims[1] + abs(a[2]) * dims[2])
+    cross = lambda a, b: (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+    v_cells = [tuple(int(round(c[i] / dims[i])) for i in range(3)) for c in co]
+    f_cells = {}
+    for (index, verts) in enumerate(faces):
+        ids = [v_cells[v] for v in verts]
+        lo = [min(i[axis] for i in ids) for axis in range(3)]
+        hi = [max(i[axis] for i in ids) for axis in range(3)]
+        if sum(hi[axis] > lo[axis] for axis in range(3)) <= 1:
+            for fidx in range(lo[0], hi[0] + 1):
+                for fidy in range(lo[1], hi[1] + 1):
+                    for fidz in range(lo[2], hi[2] + 1):
+                        f_cells.setdefault((fidx, fidy, fidz), set()).add(index)
+            continue
+        for fidx in range(lo[0], hi[0] + 1):
+            for fidy in range(lo[1], hi[1] + 1):
+                for fidz in range(lo[2], hi[2] + 1):
+                    cc = (fidx * dims[0], fidy * dims[1], fidz * dims[2])
+                    vs = [[co[v][i] - cc[i] for i in range(3)] for v in verts]
+                    fs = [[vs[(n+1) % 3][i] - vs[n][i] for i in range(3)] for n in range(3)]
+                    a0 = cross(fs[0], fs[1])
+                    r0 = radius(a0)
+                    if not (-r0 <= dot(a0, vs[0]) <= r0):
+                        continue
+                    overlap = True
+                    for e in es:
+                        for f in fs:
+                            a = cross(e, f)
+                            r = radius(a)
+                            ds = sorted(dot(a, v) for v in vs)
+                            if ds[0] > r or ds[-1] < -r:
+                                overlap = False
+                    if overlap:
+                        f_cells.setdefault((fidx, fidy, fidz), set()).add(index)
+    if solid and f_cells:
+        (min_idx, min_idy, min_idz) = [min(id[axis] for id in f_cells) for axis in range(3)]
+        (max_idx, max_idy, max_idz) = [max(id[axis] for id in f_cells) for axis in range(3)]
+        for idx in range(min_idx, max_idx + 1):
+            for idy in range(min_idy, max_idy + 1):
+                testpoint = (idx * dims[0], idy * dims[1])
+                odd_parity = False
+                tested_faces = set()
+                for idz in range(min_idz, max_idz + 1):
+                    fs = f_cells.get((idx, idy, idz), set()) - tested_faces
+                    if fs:
+                        pfaces = []
+                        nfaces = []
+                        for f in fs:
+                            fnoz = _normal(*[co[v] for v in faces[f]])[2]
+                            if fnoz >= 0.0:
+                                pfaces.append(faces[f])
+                            if fnoz <= 0.0:
+                                nfaces.append(faces[f])
+                            tested_faces.add(f)
+                        if pfaces and _insideZProjection(testpoint, pfaces, co):
+                            odd_parity = not odd_parity
+                        if nfaces and _insideZProjection(testpoint, nfaces, co):
+                            odd_parity = not odd_parity
+                    elif odd_parity:
+                        f_cells[(idx, idy, idz)] = 1
+    return sorted(f_cells)
+
+def MakeTorus(major, minor, rings, segments, offset=(0.0, 0.0, 0.0)):
+    # triangulated torus, closed and manifold; tilted so that the faces
+    # are not aligned with the cells
+    (u, v) = np.meshgrid(np.linspace(0, 2*np.pi, rings, endpoint=False),
+                         np.linspace(0, 2*np.pi, segments, endpoint=False), indexing='ij')
+    r = major + minor * np.cos(v)
+    co = np.stack((r * np.cos(u), r * np.sin(u), minor * np.sin(v)), axis=-1).reshape(-1, 3)
+    (s, c) = (np.sin(0.3), np.cos(0.3))
+    co = co @ np.array([[1, 0, 0], [0, c, s], [0, -s, c]]) + offset
+    (i, j) = np.meshgrid(np.arange(rings), np.arange(segments), indexing='ij')
+    (a, b) = (i * segments + j, ((i+1) % rings) * segments + j)
+    (d, e) = (i * segments + (j+1) % segments, ((i+1) % rings) * segments + (j+1) % segments)
+    faces = np.concatenate((np.stack((a, b, e), axis=-1).reshape(-1, 3),
+                            np.stack((a, e, d), axis=-1).reshape(-1, 3)))
+    return (co, faces)
+
+class TestVoxelize(unittest.TestCase):
+    def check(self, co, faces, dims, solid):
+        cells = Voxelize(co, faces, dims, solid)
+        expected = _legacyCells(co.tolist(), faces.tolist(), dims, solid)
+        self.assertEqual([tuple(c) for c in cells.tolist()], expected)
+        return cells
+
+    def testTorus(self):
+        (co, faces) = MakeTorus(1.0, 0.4, 24, 12, (0.013, -0.021, 0.007))
+        for dims in ((0.1, 0.1, 0.1), (0.23, 0.17, 0.3), (0.6, 0.6, 0.6)):
+            hollow = self.check(co, faces, dims, False)
+            solid = self.check(co, faces, dims, True)
+            self.assertGreaterEqual(len(solid), len(hollow))
+        self.assertGreater(len(solid), 0)
+
+    def testSingleCell(self):
+        co = np.array([[0.01, 0.02, 0.0], [0.02, 0.01, 0.0], [0.0, 0.0, 0.01]])
+        faces = np.array([[0, 1, 2]])
+        self.assertEqual(Voxelize(co, faces, (1, 1, 1)).tolist(), [[0, 0, 0]])
+        self.assertEqual(Voxelize(co, faces, (1, 1, 1), solid=True).tolist(), [[0, 0, 0]])
+        self.assertEqual(Voxelize(co, faces[:0], (1, 1, 1), solid=True).shape, (0, 3))
+
+def benchmark(rings=256, segments=96, size=0.04):
+    (co, faces) = MakeTorus(1.0, 0.4, rings, segments)
+    dims = (size, size, size)
+    for solid in (False, True):
+        time1 = time()
+        expected = _legacyCells(co.tolist(), faces.tolist(), dims, solid)
+        time2 = time()
+        cells = Voxelize(co, faces, dims, solid)
+        time3 = time()
+        assert len(cells) == len(expected)
+        print("%d faces, %s, %d cells: lists %.2f s, numpy %.3f s" %
+            (len(faces), "solid" if solid else "hollow", len(cells), time2 - time1, time3 - time2))
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+    else:
+        unittest.main()
@@ -20,6 +20,8 @@
 
 import bpy
 
+from . import bezier_fit
+
 
 def vis_curve_object():
     scene = bpy.data.scenes[0]  # weak!
@@ -120,6 +122,44 @@ def solve_curvature(p1, p2, n1, n2, fac, fallback):
         return fallback.copy()  # p1.lerp(p2, fac)
 
 
+def beziers_to_blend_curve(beziers, joints, cu=None):
+    """ return new bezier spline datablock from the control points of
+        bezier_fit.fit_bezier or add to an existing
+    """
+    np = bezier_fit.np
+    if not cu:
+        cu = bpy.data.curves.new(name="Curve", type='CURVE')
+
+    spline = cu.splines.new(type='BEZIER')
+    spline.bezier_points.add(len(beziers))
+
+    co = np.r_[beziers[:, 0], beziers[-1:, 3]]
+    hl = np.r_[2.0 * beziers[:1, 0] - beziers[:1, 1], beziers[:, 2]]
+    hr = np.r_[beziers[:, 1], 2.0 * beziers[-1:, 3] - beziers[-1:, 2]]
+    spline.bezier_points.foreach_set("co", co.ravel())
+    spline.bezier_points.foreach_set("handle_left", hl.ravel())
+    spline.bezier_points.foreach_set("handle_right", hr.ravel())
+
+    # align handles that are (nearly) in line, except at joints
+    va = co - hl
+    vb = hr - co
+    lengths = np.linalg.norm(va, axis=1) * np.linalg.norm(vb, axis=1)
+    cos = (va * vb).sum(axis=1) / np.where(lengths > 0.0, lengths, 1.0)
+    aligned = (~joints) & (np.arccos(np.clip(cos, -1.0, 1.0)) < 0.1)
+    for bp, is_aligned in zip(spline.bezier_points, aligned):
+        handle_type = 'ALIGNED' if is_aligned else 'FREE'
+        bp.handle_left_type = bp.handle_right_type = handle_type
+
+    scene = bpy.data.scenes[0]  # weak!
+    ob = bpy.data.objects.new(name="Test", object_data=cu)
+    ob.layers = [True] * 20
+    base = scene.objects.link(ob)
+    scene.objects.active = ob
+    base.select = True
+
+    return cu
+
+
 def points_to_bezier(points_orig,
                      double_limit=0.0001,
                      kink_tolerance=0.25,
@@ -128,6 +168,37 @@ def points_to_bezier(points_orig,
                      angle_span=0.95,  # 1.0 tries to evaluate splines of 180d
                      ):
 
+    if bezier_fit.np is None:
+        return points_to_bezier_legacy(points_orig,
+                                       double_limit,
+                                       kink_tolerance,
+                                       bezier_tolerance,
+                                       subdiv,
+                                       angle_span,
+                                       )
+
+    # subdiv and angle_span are only used by the legacy fitting, which
+    # redistributes the points before solving
+    beziers, joints = bezier_fit.fit_bezier([p.to_3d()[:] for p in points_orig],
+                                            double_limit,
+                                            kink_tolerance,
+                                            bezier_tolerance,
+                                            )
+    if not len(beziers):
+        return None
+    print("%d segments" % len(beziers))
+
+    return beziers_to_blend_curve(beziers, joints)
+
+
+def points_to_bezier_legacy(points_orig,
+                            double_limit=0.0001,
+                            kink_tolerance=0.25,
+                            bezier_tolerance=0.05,  # error distance, scale dependant
+                            subdiv=8,
+                            angle_span=0.95,  # 1.0 tries to evaluate splines of 180d
+                            ):
+
     import math
     from mathutils import Vector
 
@@ -0,0 +1,199 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Fitting of cubic bezier segments to a stream of points with numpy.
+
+The points are split at joints (kinks, found like Point.angle_diff), then
+every segment between two knots gets a least squares fit of its handles,
+with the knots fixed. All segments are fitted in one batch; those further
+than the tolerance from their points are split at the worst point and the
+halves fitted in the next batch.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def remove_doubles(co, double_limit=0.0001):
+    """ Drop points closer than double_limit to the previous point.
+    """
+    if double_limit == 0.0 or len(co) < 2:
+        return co
+    length = np.linalg.norm(co[1:] - co[:-1], axis=1)
+    return co[np.r_[True, length >= double_limit]]
+
+
+def point_angles(co):
+    """ Angle between the segments before and after each point,
+        0.0 for the end points and zero length segments.
+    """
+    angles = np.zeros(len(co))
+    if len(co) < 3:
+        return angles
+    va = co[1:-1] - co[:-2]
+    vb = co[2:] - co[1:-1]
+    lengths = np.linalg.norm(va, axis=1) * np.linalg.norm(vb, axis=1)
+    valid = lengths > 0.0
+    cos = np.einsum("ij,ij->i", va[valid], vb[valid]) / lengths[valid]
+    angles[1:-1][valid] = np.arccos(np.clip(cos, -1.0, 1.0))
+    return angles
+
+
+def find_joints(co, kink_tolerance=0.25):
+    """ Mask of the knots the curve is split at first: the end points and
+        the points bending more than both neighbours, by more than
+        kink_tolerance (in units of pi) over the previous one.
+    """
+    angles = point_angles(co)
+    joints = np.zeros(len(co), dtype=bool)
+    joints[0] = joints[-1] = True
+    if len(co) > 2:
+        (a, prev, next) = (angles[1:-1], angles[:-2], angles[2:])
+        joints[1:-1] = ((a > prev) & (a > next) &
+                        (np.abs(a - prev) / np.pi > kink_tolerance))
+    return joints
+
+
+def bernstein(u):
+    ui = 1.0 - u
+    return np.stack((ui * ui * ui,
+                     3.0 * ui * ui * u,
+                     3.0 * ui * u * u,
+                     u * u * u,
+                     ), axis=1)
+
+
+def evaluate(beziers, u):
+    """ Points at the parameters u of the bezier segments
+        (one parameter per segment).
+    """
+    return np.einsum("ik,ikj->ij", bernstein(u), beziers)
+
+
+def fit_segments(co, starts, ends, reparam=2):
+    """ Fit one cubic bezier to each range of points co[start:end + 1].
+        The end points are kept, the handles are the least squares
+        solution for chord length parameters, refined by reparam
+        Newton steps of the parameters.
+
+        Returns the (m, 4, dim) control points, the largest distance of
+        each segment to its points and the index of the worst point.
+    """
+    counts = ends - starts + 1
+    offsets = np.cumsum(counts) - counts
+    seg = np.repeat(np.arange(len(starts)), counts)
+    index = starts[seg] + np.arange(counts.sum()) - offsets[seg]
+    data = co[index]
+    (p0, p3) = (co[starts][seg], co[ends][seg])
+    last = offsets + counts - 1
+
+    # chord length parameters
+    step = np.r_[0.0, np.linalg.norm(data[1:] - data[:-1], axis=1)]
+    step[offsets] = 0.0
+    u = np.cumsum(step)
+    u -= u[offsets][seg]
+    total = u[last][seg]
+    even = (index - starts[seg]) / (counts[seg] - 1)
+    u = np.where(total > 0.0, u / np.where(total > 0.0, total, 1.0), even)
+
+    for i in range(reparam + 1):
+        b = bernstein(u)
+        rest = data - b[:, :1] * p0 - b[:, 3:] * p3
+        a11 = np.add.reduceat(b[:, 1] * b[:, 1], offsets)
+        a12 = np.add.reduceat(b[:, 1] * b[:, 2], offsets)
+        a22 = np.add.reduceat(b[:, 2] * b[:, 2], offsets)
+        x1 = np.add.reduceat(b[:, 1:2] * rest, offsets)
+        x2 = np.add.reduceat(b[:, 2:3] * rest, offsets)
+        det = a11 * a22 - a12 * a12
+        solved = np.abs(det) > 1e-12 * a11 * a22
+        det = np.where(solved, det, 1.0)[:, None]
+        h1 = (a22[:, None] * x1 - a12[:, None] * x2) / det
+        h2 = (a11[:, None] * x2 - a12[:, None] * x1) / det
+
+        # too few points, fall back to a straight line
+        (q0, q3) = (co[starts], co[ends])
+        h1[~solved] = (2.0 * q0[~solved] + q3[~solved]) / 3.0
+        h2[~solved] = (q0[~solved] + 2.0 * q3[~solved]) / 3.0
+        beziers = np.stack((q0, h1, h2, q3), axis=1)
+
+        if i == reparam:
+            break
+
+        # Newton step of the parameters towards the closest curve points
+        bz = beziers[seg]
+        ui = 1.0 - u
+        d1 = 3.0 * (ui * ui)[:, None] * (bz[:, 1] - bz[:, 0])
+        d1 += 6.0 * (ui * u)[:, None] * (bz[:, 2] - bz[:, 1])
+        d1 += 3.0 * (u * u)[:, None] * (bz[:, 3] - bz[:, 2])
+        d2 = 6.0 * ui[:, None] * (bz[:, 2] - 2.0 * bz[:, 1] + bz[:, 0])
+        d2 += 6.0 * u[:, None] * (bz[:, 3] - 2.0 * bz[:, 2] + bz[:, 1])
+        diff = evaluate(bz, u) - data
+        num = np.einsum("ij,ij->i", diff, d1)
+        den = np.einsum("ij,ij->i", d1, d1) + np.einsum("ij,ij->i", diff, d2)
+        u = np.clip(u - num / np.where(den > 0.0, den, np.inf), 0.0, 1.0)
+        u[offsets] = 0.0
+        u[last] = 1.0
+
+    errors = np.linalg.norm(evaluate(beziers[seg], u) - data, axis=1)
+    error_max = np.maximum.reduceat(errors, offsets)
+    # the first worst point of each segment
+    positions = np.where(errors == error_max[seg], np.arange(len(errors)), len(errors))
+    worst = index[np.minimum.reduceat(positions, offsets)]
+    return beziers, error_max, worst
+
+
+def fit_bezier(points,
+               double_limit=0.0001,
+               kink_tolerance=0.25,
+               bezier_tolerance=0.05,  # error distance, scale dependant
+               reparam=2,
+               ):
+    """ Fit a bezier curve to a stream of points.
+
+        Returns the (m, 4, dim) control points of the segments (knot,
+        handle, handle, knot) and a mask of the m + 1 knots that are
+        joints, where the curve may have a kink.
+    """
+    co = remove_doubles(np.asarray(points, dtype=float), double_limit)
+    if len(co) < 2:
+        return np.zeros((0, 4, co.shape[1])), np.zeros(len(co), dtype=bool)
+    joints = find_joints(co, kink_tolerance)
+    knots = np.flatnonzero(joints)
+
+    (starts, ends) = (knots[:-1], knots[1:])
+    done = []
+    while len(starts):
+        beziers, errors, worst = fit_segments(co, starts, ends, reparam)
+        split = (errors > bezier_tolerance) & (ends - starts > 1)
+        done.append((starts[~split], beziers[~split]))
+        worst = np.clip(worst, starts + 1, ends - 1)[split]
+        (starts, ends) = (np.r_[starts[split], worst],
+                          np.r_[worst, ends[split]])
+
+    starts = np.concatenate([s for s, b in done])
+    beziers = np.concatenate([b for s, b in done])
+    order = np.argsort(starts)
+    knots = np.r_[starts[order], len(co) - 1]
+    is_joint = joints[knots]
+    is_joint[[0, -1]] = False
+    return beziers[order], is_joint
@@ -0,0 +1,116 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Tests of bezier_fit on exact cubics, corners and a noisy spiral stroke,
+against fitting one segment at a time. Run from this directory with:
+    python bezier_fit_test.py
+"""
+
+import unittest
+
+import numpy as np
+
+from bezier_fit import (evaluate, find_joints, fit_bezier, fit_segments,
+                        remove_doubles)
+
+
+def _fit_recursive(points, double_limit=0.0001, kink_tolerance=0.25,
+                   bezier_tolerance=0.05, reparam=2):
+    # one segment at a time, splitting depth first
+    co = remove_doubles(np.asarray(points, dtype=float), double_limit)
+    knots = np.flatnonzero(find_joints(co, kink_tolerance))
+    beziers = []
+
+    def fit(start, end):
+        bezier, error, worst = fit_segments(co, np.array([start]), np.array([end]), reparam)
+        if error[0] > bezier_tolerance and end - start > 1:
+            worst = min(max(worst[0], start + 1), end - 1)
+            fit(start, worst)
+            fit(worst, end)
+        else:
+            beziers.append(bezier[0])
+
+    for start, end in zip(knots[:-1], knots[1:]):
+        fit(start, end)
+    return np.array(beziers)
+
+
+def _distance_to_curve(beziers, co, samples=2000):
+    # distance of each point to a dense sampling of the curve
+    u = np.linspace(0.0, 1.0, samples)
+    curve = np.concatenate([evaluate(np.repeat(b[None], samples, 0), u) for b in beziers])
+    return np.array([np.linalg.norm(curve - p, axis=1).min() for p in co])
+
+
+def make_stroke(count, seed=0):
+    # a wobbly spiral with two sharp corners
+    rnd = np.random.RandomState(seed)
+    t = np.linspace(0.0, 6.0 * np.pi, count)
+    r = 1.0 + 0.1 * t
+    co = np.stack((r * np.cos(t), r * np.sin(t), 0.05 * np.sin(5.0 * t)), axis=1)
+    co[count // 3:] = co[count // 3] + (co[count // 3:] - co[count // 3]) @ \
+        np.array([[0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    co[2 * count // 3:] = co[2 * count // 3] + (co[2 * count // 3:] - co[2 * count // 3]) @ \
+        np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    return co + rnd.normal(0.0, 0.0005, co.shape)
+
+
+class TestBezierFit(unittest.TestCase):
+    def test_cubic(self):
+        # points on one bezier give it back, the parameters converge slowly
+        bezier = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, 0.0], [3.0, 2.0, 1.0], [4.0, 0.0, 0.0]])
+        co = evaluate(np.repeat(bezier[None], 50, 0), np.linspace(0.0, 1.0, 50) ** 1.3)
+        beziers, errors, worst = fit_segments(co, np.array([0]), np.array([49]), reparam=60)
+        self.assertLess(errors[0], 0.001)
+        self.assertTrue(np.allclose(beziers[0], bezier, atol=0.01))
+        beziers, joints = fit_bezier(co, bezier_tolerance=0.05)
+        self.assertEqual(len(beziers), 1)
+        self.assertEqual(joints.tolist(), [False, False])
+
+    def test_corner(self):
+        co = np.r_[np.stack((np.linspace(0, 1, 20), np.zeros(20)), axis=1),
+                   np.stack((np.ones(20), np.linspace(0, 1, 21)[1:]), axis=1)]
+        self.assertEqual(np.flatnonzero(find_joints(co)).tolist(), [0, 19, 39])
+        beziers, joints = fit_bezier(co, bezier_tolerance=0.001)
+        self.assertEqual(len(beziers), 2)
+        self.assertEqual(joints.tolist(), [False, True, False])
+        self.assertTrue(np.allclose(beziers[0, 3], [1.0, 0.0]))
+
+    def test_stroke(self):
+        co = make_stroke(3000)
+        for tolerance in (0.05, 0.005):
+            beziers, joints = fit_bezier(co, bezier_tolerance=tolerance)
+            self.assertTrue(joints.sum() >= 2)
+            # consecutive segments share their knots
+            self.assertTrue(np.array_equal(beziers[1:, 0], beziers[:-1, 3]))
+            self.assertTrue(np.array_equal(beziers[0, 0], co[0]))
+            self.assertTrue(np.array_equal(beziers[-1, 3], co[-1]))
+            self.assertLess(_distance_to_curve(beziers, co[::7]).max(), tolerance * 1.001)
+            self.assertTrue(np.allclose(beziers, _fit_recursive(co, bezier_tolerance=tolerance)))
+
+    def test_small(self):
+        self.assertEqual(fit_bezier([[0.0, 0.0]])[0].shape, (0, 4, 2))
+        beziers, joints = fit_bezier([[0.0, 0.0], [1.0, 0.0]])
+        self.assertTrue(np.allclose(beziers[0], [[0, 0], [1 / 3, 0], [2 / 3, 0], [1, 0]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,6 +44,8 @@ import bpy
 import mathutils as M
 import mathutils.geometry as G
 from heapq import heappush, heappop
+from . import overlap
+from . import packing
 pi=3.141592653589783
 priority_effect={
 	'convex':1,
@@ -139,7 +141,7 @@ class Unfolder:
 		self.mesh.generate_stickers(default_width = properties.sticker_width * page_size.y / scale)
 		#Scale everything so that page height is 1
 		self.mesh.finalize_islands(scale_factor = scale / page_size.y)
-		self.mesh.fit_islands(aspect_ratio = page_size.x / page_size.y)
+		self.mesh.fit_islands(aspect_ratio = page_size.x / page_size.y, allow_rotation = properties.rotate_islands)
 		if not properties.output_pure:
 			self.mesh.save_uv(aspect_ratio = page_size.x / page_size.y)
 			#TODO: do we really need a switch of our own?
@@ -288,15 +290,18 @@ class Mesh:
 	
 	def fix_overlaps(self):
 		"""Split all self-overlapping Islands as needed"""
-		remaining_islands = list(self.islands)
+		#overlaps are found once; splitting keeps the others within the parts
+		remaining_islands = [(island, island.get_overlaps()) for island in self.islands]
 		while len(remaining_islands) > 0:
-			island = remaining_islands.pop()
-			uvfaces = island.get_overlap()
+			island, overlaps = remaining_islands.pop()
+			uvfaces = island.get_overlap(overlaps)
 			if uvfaces:
 				island_parts = island.split(*uvfaces)
 				self.islands.remove(island)
 				self.islands += island_parts
-				remaining_islands += island_parts #check the new ones too
+				for part in island_parts: #check the new ones too
+					faces = set(part.faces)
+					remaining_islands.append((part, [pair for pair in overlaps if pair[0] in faces and pair[1] in faces]))
 	
 	def generate_stickers(self, default_width):
 		"""Add sticker faces where they are needed."""
@@ -320,152 +325,29 @@ class Mesh:
 			island.apply_scale(scale_factor)
 			island.generate_bounding_box()
 	
-	def largest_island_ratio(self, page_size):
-		largest_ratio=0
-		for island in self.islands:
-			ratio=max(island.bounding_box.x/page_size.x, island.bounding_box.y/page_size.y)
-			largest_ratio=max(ratio, largest_ratio)
-		return largest_ratio
+	def largest_island_ratio(self, page_size, allow_rotation=False):
+		sizes=[(island.bounding_box.x, island.bounding_box.y) for island in self.islands]
+		return packing.largest_ratio(sizes, page_size.x, page_size.y, allow_rotation)
 	
-	def fit_islands(self, aspect_ratio):
+	def fit_islands(self, aspect_ratio, allow_rotation=False):
 		"""Move islands so that they fit into pages, based on their bounding boxes"""
-		#this algorithm is not optimal, but cool enough
-		#it handles with two basic domains:
-		#list of Points: they describe all sensible free rectangle area available on the page
-		#Boundaries: linked list of points around the used area and the page - makes many calculations a lot easier
-		page_size=M.Vector((aspect_ratio, 1))
-		class Boundary:
-			"""Generic point in usable boundary defined by rectangles and borders of the page"""
-			def __init__(self, x, y):
-				self.previous=None
-				self.next=None
-				self.point=None
-				self.x=x
-				self.y=y
-			def __rshift__(self, next):
-				"""Connect another Boundary after this one."""
-				if next and next.next and ((next.x<self.x and next.next.x>next.x) or (next.y<self.y and next.next.y>next.y)):
-					self >> next.next
-				elif next is not self:
-					self.next=next
-					if next:
-						next.previous=self
-				return self
-		class Point:
-			"""A point on the boundary we may want to attach a rectangle to"""
-			def __init__(self, boundary, points):
-				self.points=points
-				points.append(self)
-				self.boundary=boundary
-				boundary.point=self
-				self.previous=boundary.previous
-				self.next=boundary.next
-				#if we are an outer corner...
-				if boundary.previous and boundary.previous.y<boundary.y:
-					current=self.previous
-					while current: #go along the boundary to left up
-						if current.y > boundary.y:
-							self.boundary=Boundary(current.x, boundary.y)
-							current.previous >> self.boundary
-							self.boundary >> current
-							break
-						current=current.previous
-				elif boundary.next and boundary.next.x < boundary.x:
-					current=self.next
-					while current: #go along the boundary to right down
-						if current.x > boundary.y:
-							self.boundary=Boundary(boundary.x, current.y)
-							current.previous >> self.boundary
-							self.boundary >> current
-							break
-						current=current.next
-				#calculate the maximal rectangle that can fit here
-				self.area=M.Vector((0,0))
-				current=self.previous
-				while current: #go along the boundary to left up
-					if current.x > self.boundary.x:
-						self.area.y=current.y-self.boundary.y
-						break
-					current=current.previous
-				current=self.next
-				while current: #go along the boundary to right down
-					if current.y > self.boundary.y:
-						self.area.x=current.x-self.boundary.x
-						break
-					current=current.next
-				self.niceness=self.area.x*self.area.y
-			def add_island(self, island):
-				"""Attach an island to this point and update all affected neighbourhood."""
-				island.pos=M.Vector((self.boundary.x, self.boundary.y))
-				#you have to draw this if you want to get it
-				a=Boundary(island.pos.x, island.pos.y+island.bounding_box.y)
-				b=Boundary(island.pos.x+island.bounding_box.x, island.pos.y+island.bounding_box.y)
-				c=Boundary(island.pos.x+island.bounding_box.x, island.pos.y)
-				a >> b
-				b >> c
-				if self.previous:
-					self.previous.next >> self.next.previous #note: they don't have to be the same. They are rather the closest obstacles
-					self.previous >> a
-				c >> self.next.previous
-				Point(a, self.points)
-				Point(c, self.points)
-				#update all points whose area overlaps this island
-				current=self.previous
-				while current and current.x<self.boundary.x:
-					if current.point:
-						if current.point.area.x+current.x > self.boundary.x:
-							current.point.area.x=self.boundary.x-current.x
-					current=current.previous
-				current=self.next
-				while current and current.y<self.boundary.y:
-					if current.point:
-						if current.point.area.y+current.y > self.boundary.y:
-							current.point.area.y=self.boundary.y-current.y
-					current=current.next
-				#If we have no reference to the rest of the boundary, let us rest in peace
-				if (not self.previous or self.previous.next is not self) and \
-					(not self.next or self.next.previous is not self):
-						self.points.remove(self)
-			def __str__(self):
-				return "Point at "+str(self.boundary.x)+" "+str(self.boundary.y)+" of available area "+str(self.area)
 		#fixme: at first, it should cut all islands that are too big to fit the page
-		#todo: there should be a list of points off the boundary that are created from pairs of open edges
-		largest_island_ratio = self.largest_island_ratio(page_size) 
+		page_size=M.Vector((aspect_ratio, 1))
+		largest_island_ratio = self.largest_island_ratio(page_size, allow_rotation)
 		if largest_island_ratio > 1:
 			raise UnfoldError("An island is too big to fit to the page size. To make the export possible, scale the object down "+strf(largest_island_ratio)+" times.")
-		islands=list(self.islands)
-		#sort islands by their ugliness (we need an ugly expression to treat ugliness correctly)
-		islands.sort(key=lambda island: (lambda vector:-pow(vector.x, 2)-pow(vector.y, 2)-pow(vector.x-vector.y, 2))(island.bounding_box))
-		remaining_count=len(islands)
-		page_num=1
-		while remaining_count > 0:
-			#create a new page and try to fit as many islands onto it as possible
-			page=Page(page_num)
-			page_num+=1
-			points=[]
-			#We start with the whole page
-			a=Boundary(page_size.x, page_size.y)
-			b=Boundary(0, page_size.y)
-			c=Boundary(0, 0)
-			d=Boundary(page_size.x, 0)
-			e=Boundary(page_size.x, page_size.y)
-			a >> b
-			b >> c
-			c >> d
-			d >> e
-			Point(c, points)
-			for island in islands:
-				if not island.is_placed:
-					for point in points:
-						#test if it would fit to this point
-						if island.bounding_box.x<=point.area.x and island.bounding_box.y<=point.area.y:
-							point.add_island(island)
-							island.is_placed=True
-							page.add(island)
-							remaining_count -= 1
-							break
-					points.sort(key=lambda point: point.niceness) #ugly points first (to get rid of them)
-			self.pages.append(page)
+		sizes=[(island.bounding_box.x, island.bounding_box.y) for island in self.islands]
+		placements, skylines=packing.pack(sizes, page_size.x, page_size.y, allow_rotation)
+		pages=[Page(num+1) for num in range(len(skylines))]
+		for page, skyline in zip(pages, skylines):
+			page.utilisation=skyline.utilisation()
+		for island, placement in zip(self.islands, placements):
+			if placement.rotated:
+				island.rotate_box()
+			island.pos=M.Vector((placement.x, placement.y))
+			island.is_placed=True
+			pages[placement.page].add(island)
+		self.pages+=pages
 	
 	def save_uv(self, aspect_ratio=1): #page_size is in pixels
 		bpy.ops.object.mode_set()
@@ -913,13 +795,23 @@ class Island:
 		self.angle=best_box[1]
 		self.bounding_box=best_box[2]
 		self.offset=-best_box[3]
-	def get_overlap(self) -> "(UVFace, UVFace)":
-		"""Get two overlapping UVFaces of this Island"""
-		#TODO: Quadratic complexity is dreadful
-		for uvface in self.faces:
-			overlap_uvface = uvface.get_overlap(self.faces)
-			if overlap_uvface:
-				return uvface, overlap_uvface
+	def rotate_box(self):
+		"""Turn the island by 90 degrees inside its bounding box (as generate_bounding_box does)"""
+		self.angle+=pi/2
+		self.offset=M.Vector((self.bounding_box.y-self.offset.y, self.offset.x))
+		self.bounding_box=self.bounding_box.yx
+	def get_overlaps(self) -> "[(UVFace, UVFace)]":
+		"""Get all pairs of overlapping UVFaces of this Island"""
+		polygons = [[(uvvertex, uvvertex.co.x, uvvertex.co.y) for uvvertex in uvface.verts] for uvface in self.faces]
+		return [(self.faces[i], self.faces[j]) for i, j in overlap.overlapping_pairs(polygons)]
+	def get_overlap(self, overlaps=None) -> "(UVFace, UVFace)":
+		"""Get two overlapping UVFaces of this Island, the first ones found going through self.faces"""
+		if overlaps is None:
+			overlaps = self.get_overlaps()
+		position = {uvface: i for i, uvface in enumerate(self.faces)}
+		pair = overlap.first_pair([(position[uvface_a], position[uvface_b]) for uvface_a, uvface_b in overlaps])
+		if pair:
+			return self.faces[pair[0]], self.faces[pair[1]]
 	def split(self, uvface_a, uvface_b) -> "(Island, Island)":
 		"""Split this Island in half between two given UVFaces"""
 		#DEBUG
@@ -986,6 +878,7 @@ class Page:
 		self.islands=[]
 		self.image=None
 		self.name="page"+str(num)
+		self.utilisation=0 #covered fraction of the page
 	def add(self, island):
 		self.islands.append(island)
 class UVVertex:
@@ -1355,6 +1248,7 @@ class EXPORT_OT_paper_model(bpy.types.Operator):
 	bake_selected_to_active = bpy.props.BoolProperty(name="Selected to Active", description="Bake selected to active (if not exporting pure net)", default=True)
 	sticker_width = bpy.props.FloatProperty(name="Tab Size", description="Width of gluing tabs", default=0.005, soft_min=0, soft_max=0.05, subtype="UNSIGNED", unit="LENGTH")
 	model_scale = bpy.props.FloatProperty(name="Scale", description="Coefficient of all dimensions when exporting", default=1, soft_min=0.001, soft_max=10, subtype="FACTOR")
+	rotate_islands = bpy.props.BoolProperty(name="Rotate Islands", description="Turn islands by 90 degrees where they pack better", default=True)
 	unfolder=None
 	largest_island_ratio=0
 	
@@ -1365,6 +1259,9 @@ class EXPORT_OT_paper_model(bpy.types.Operator):
 	def execute(self, context):
 		try:
 			self.unfolder.save(self.properties)
+			pages=self.unfolder.mesh.pages
+			if pages:
+				self.report(type="INFO", message=str(len(pages))+" pages, "+strf(100*sum(page.utilisation for page in pages)/len(pages))+"% of paper used")
 			return {"FINISHED"}
 		except UnfoldError as error:
 			self.report(type="ERROR_INVALID_INPUT", message=error.args[0])
@@ -1391,7 +1288,8 @@ class EXPORT_OT_paper_model(bpy.types.Operator):
 		layout.prop(self.properties, "output_dpi")
 		layout.label(text="Model scale:")
 		layout.prop(self.properties, "model_scale")
-		scale_ratio = self.unfolder.mesh.largest_island_ratio(M.Vector((self.properties.output_size_x, self.properties.output_size_y))) * self.properties.model_scale
+		layout.prop(self.properties, "rotate_islands")
+		scale_ratio = self.unfolder.mesh.largest_island_ratio(M.Vector((self.properties.output_size_x, self.properties.output_size_y)), self.properties.rotate_islands) * self.properties.model_scale
 		if scale_ratio > 1:
 			layout.label(text="An island is "+strf(scale_ratio)+"x bigger than page", icon="ERROR")
 		elif scale_ratio > 0:
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+"""Overlap detection of the faces of an Island using a uniform grid.
+
+Faces are given as polygons: lists of (vertex key, x, y), where equal keys
+mean a shared vertex. Edges are hashed into the grid cells covered by their
+bounding boxes and only edges sharing a cell are tested, so all overlapping
+pairs of faces are found in one pass.
+"""
+
+from math import floor
+
+def edges_crossing(A, B, C, D):
+	"""Test if edges AB and CD cross each other inside (as UVFace.get_overlap did)"""
+	#E, F are AB and CD rotated by 90 degrees
+	E = (A[1]-B[1], B[0]-A[0])
+	F = (C[1]-D[1], D[0]-C[0])
+	denominator_a = (D[0]-C[0])*E[0] + (D[1]-C[1])*E[1]
+	denominator_b = (B[0]-A[0])*F[0] + (B[1]-A[1])*F[1]
+	if denominator_a == 0 or denominator_b == 0:
+		return False
+	a = ((A[0]-C[0])*E[0] + (A[1]-C[1])*E[1]) / denominator_a
+	b = ((C[0]-A[0])*F[0] + (C[1]-A[1])*F[1]) / denominator_b
+	return 0 < a < 1 and 0 < b < 1
+
+def polygon_edges(polygons):
+	"""List of edges (face index, key a, key b, A, B, bounding box) of all polygons"""
+	edges = []
+	for index, polygon in enumerate(polygons):
+		previous = polygon[-1]
+		for vertex in polygon:
+			A, B = (previous[1], previous[2]), (vertex[1], vertex[2])
+			edges.append((index, previous[0], vertex[0], A, B,
+				(min(A[0], B[0]), min(A[1], B[1]), max(A[0], B[0]), max(A[1], B[1]))))
+			previous = vertex
+	return edges
+
+def overlapping_pairs(polygons, cell_size=None):
+	"""Set of all (i, j), i<j, such that an edge of polygons[i] crosses an edge of polygons[j]"""
+	edges = polygon_edges(polygons)
+	if not edges:
+		return set()
+	if cell_size is None:
+		#about as big as an average edge
+		total = sum(max(box[2]-box[0], box[3]-box[1]) for face, ka, kb, A, B, box in edges)
+		cell_size = total / len(edges) or 1.0
+	grid = dict()
+	for number, edge in enumerate(edges):
+		box = edge[5]
+		for x in range(int(floor(box[0]/cell_size)), int(floor(box[2]/cell_size))+1):
+			for y in range(int(floor(box[1]/cell_size)), int(floor(box[3]/cell_size))+1):
+				grid.setdefault((x, y), []).append(number)
+	pairs = set()
+	for (x, y), cell in grid.items():
+		for i, number_a in enumerate(cell):
+			face_a, ka, kb, A, B, box_a = edges[number_a]
+			for number_b in cell[i+1:]:
+				face_b, kc, kd, C, D, box_b = edges[number_b]
+				if face_a == face_b or (min(face_a, face_b), max(face_a, face_b)) in pairs:
+					continue
+				#the edges must touch, and this must be their first common cell
+				left, bottom = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+				if left > min(box_a[2], box_b[2]) or bottom > min(box_a[3], box_b[3]):
+					continue
+				if int(floor(left/cell_size)) != x or int(floor(bottom/cell_size)) != y:
+					continue
+				if ka in (kc, kd) or kb in (kc, kd):
+					continue
+				if edges_crossing(A, B, C, D):
+					pairs.add((min(face_a, face_b), max(face_a, face_b)))
+	return pairs
+
+def first_pair(pairs):
+	"""The pair (i, j) that a scan of faces in their order finds first, both ways round"""
+	best = None
+	for i, j in pairs:
+		for pair in ((i, j), (j, i)):
+			if best is None or pair < best:
+				best = pair
+	return best
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+"""Tests of overlap against testing every edge with every other edge, as
+UVFace.get_overlap did. Run from this directory with:
+	python overlap_test.py
+"""
+
+import unittest
+import random
+
+from overlap import edges_crossing, polygon_edges, overlapping_pairs, first_pair
+
+def _brute_force_pairs(polygons):
+	"""All pairs tested with every edge of every other face, like UVFace.get_overlap"""
+	edges = polygon_edges(polygons)
+	pairs = set()
+	for face_a, ka, kb, A, B, box_a in edges:
+		for face_b, kc, kd, C, D, box_b in edges:
+			if face_a < face_b and not (ka in (kc, kd) or kb in (kc, kd)) and edges_crossing(A, B, C, D):
+				pairs.add((face_a, face_b))
+	return pairs
+
+def grid_net(columns, rows, jitter=0.0, seed=0):
+	"""Quads of a columns x rows grid sharing vertices, optionally jittered"""
+	rnd = random.Random(seed)
+	coords = dict()
+	for x in range(columns+1):
+		for y in range(rows+1):
+			coords[x, y] = (x + rnd.uniform(-jitter, jitter), y + rnd.uniform(-jitter, jitter))
+	return [[(key,) + coords[key] for key in ((x, y), (x+1, y), (x+1, y+1), (x, y+1))]
+		for x in range(columns) for y in range(rows)]
+
+class TestOverlap(unittest.TestCase):
+	def test_crossing(self):
+		self.assertTrue(edges_crossing((0, 0), (2, 2), (0, 2), (2, 0)))
+		self.assertFalse(edges_crossing((0, 0), (1, 1), (2, 0), (3, 1))) #parallel
+		self.assertFalse(edges_crossing((0, 0), (2, 0), (1, 0), (1, 1))) #touching
+
+	def test_net(self):
+		polygons = grid_net(20, 15, jitter=0.2)
+		self.assertEqual(overlapping_pairs(polygons), set())
+		#move one face over the others
+		polygons[7] = [(("moved", i), x+3.3, y+2.6) for i, (key, x, y) in enumerate(polygons[7])]
+		pairs = overlapping_pairs(polygons)
+		self.assertTrue(pairs)
+		self.assertEqual(pairs, _brute_force_pairs(polygons))
+
+	def test_random(self):
+		rnd = random.Random(1)
+		polygons = []
+		for i in range(150):
+			x, y, size = rnd.uniform(0, 10), rnd.uniform(0, 10), rnd.uniform(0.05, 2)
+			polygons.append([((i, n), x + size*rnd.random(), y + size*rnd.random()) for n in range(rnd.choice((3, 4)))])
+		expected = _brute_force_pairs(polygons)
+		self.assertEqual(overlapping_pairs(polygons), expected)
+		self.assertEqual(overlapping_pairs(polygons, cell_size=0.3), expected)
+		self.assertEqual(first_pair(expected), min(min(expected), min((j, i) for i, j in expected)))
+
+if __name__ == "__main__":
+	unittest.main()
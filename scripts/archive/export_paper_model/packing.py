@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+"""Packing of island bounding boxes onto pages.
+
+Each page keeps a skyline: the upper outline of the boxes placed so far,
+as a list of horizontal segments. A box goes where its top ends lowest,
+leftmost on ties, on the first page it fits, optionally turned by 90
+degrees.
+"""
+
+class Skyline:
+	"""Free space of one page above the placed boxes"""
+	def __init__(self, width, height):
+		self.width=width
+		self.height=height
+		self.segments=[[0, 0, width]] #x, y, width from left to right
+		self.used_area=0
+		#segment ends are sums of box widths, allow for their rounding
+		self.tolerance=width*1e-9
+	def find(self, width, height):
+		"""Best position (top, x, y, segment index) for a box, or None if it does not fit"""
+		best=None
+		segments=self.segments
+		tolerance=self.tolerance
+		for i, (x, y, w) in enumerate(segments):
+			end=x + width
+			if end > self.width + tolerance:
+				break
+			#the box rests on the highest segment below it
+			top=y
+			j=i
+			while j < len(segments) and segments[j][0] < end - tolerance:
+				top=max(top, segments[j][1])
+				j+=1
+			if top + height <= self.height and (best is None or (top + height, x) < best[:2]):
+				best=(top + height, x, top, i)
+		return best
+	def place(self, width, height, found):
+		"""Put a box to the position given by find"""
+		top, x, y, i=found
+		segments=self.segments
+		end=x + width
+		#remove the segments under the box, keep what sticks out at the right
+		j=i
+		while j < len(segments) and segments[j][0] < end - self.tolerance:
+			j+=1
+		last=segments[j-1]
+		rest=last[0] + last[2] - end
+		segments[i:j]=[[x, top, width]] + ([[end, last[1], rest]] if rest > self.tolerance else [])
+		#merge neighbours of equal height
+		for k in (i+1, i):
+			if 0 < k < len(segments) and segments[k-1][1] == segments[k][1]:
+				segments[k-1][2]+=segments[k][2]
+				del segments[k]
+		self.used_area+=width*height
+		return x, y
+	def utilisation(self):
+		return self.used_area / (self.width*self.height)
+
+class Placement:
+	"""Where a box ended up: page index, position of its lower left corner and whether it is turned"""
+	def __init__(self, page, x, y, rotated):
+		self.page=page
+		self.x=x
+		self.y=y
+		self.rotated=rotated
+	def __repr__(self):
+		return "Placement(page={}, x={:.3f}, y={:.3f}, rotated={})".format(self.page, self.x, self.y, self.rotated)
+
+def largest_ratio(sizes, page_width, page_height, allow_rotation=False):
+	"""How many times the biggest box is larger than the page (in the better orientation)"""
+	largest=0
+	for width, height in sizes:
+		ratio=max(width/page_width, height/page_height)
+		if allow_rotation:
+			ratio=min(ratio, max(height/page_width, width/page_height))
+		largest=max(largest, ratio)
+	return largest
+
+def pack(sizes, page_width, page_height, allow_rotation=False):
+	"""Place boxes given by (width, height) onto as few pages as possible.
+	Returns a list of Placements in the order of sizes and a list of Skylines, one per page."""
+	if largest_ratio(sizes, page_width, page_height, allow_rotation) > 1:
+		raise ValueError("A box is bigger than the page")
+	#big boxes first, the small ones fill the gaps
+	order=sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -min(sizes[i]), i))
+	pages=[]
+	placements=[None]*len(sizes)
+	for i in order:
+		width, height=sizes[i]
+		orientations=[(width, height, False)]
+		if allow_rotation and width != height:
+			orientations.append((height, width, True))
+		for page_index, page in enumerate(pages + [None]):
+			if page is None:
+				page=Skyline(page_width, page_height)
+				pages.append(page)
+			best=None
+			for w, h, rotated in orientations:
+				found=page.find(w, h)
+				if found and (best is None or found[:2] < best[0][:2]):
+					best=(found, w, h, rotated)
+			if best:
+				found, w, h, rotated=best
+				x, y=page.place(w, h, found)
+				placements[i]=Placement(page_index, x, y, rotated)
+				break
+	return placements, pages
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+"""Tests of packing: no box leaves its page or overlaps another one on
+random and exactly fitting sizes. Run from this directory with:
+	python packing_test.py
+"""
+
+import unittest
+import random
+
+from packing import largest_ratio, pack
+
+def random_sizes(count, seed=0, largest=0.3):
+	rnd=random.Random(seed)
+	return [(rnd.uniform(0.02, largest), rnd.uniform(0.02, largest)) for i in range(count)]
+
+class TestPacking(unittest.TestCase):
+	def check(self, sizes, placements, pages, page_width, page_height):
+		boxes=[]
+		for (width, height), placement in zip(sizes, placements):
+			if placement.rotated:
+				width, height=height, width
+			self.assertGreaterEqual(placement.x, 0)
+			self.assertGreaterEqual(placement.y, 0)
+			self.assertLessEqual(placement.x + width, page_width + 1e-12)
+			self.assertLessEqual(placement.y + height, page_height + 1e-12)
+			boxes.append((placement.page, placement.x, placement.y, placement.x + width, placement.y + height))
+		boxes.sort()
+		for i, a in enumerate(boxes):
+			for b in boxes[i+1:]:
+				if b[0] != a[0] or b[1] >= a[3]:
+					break
+				self.assertFalse(a[2] < b[4] - 1e-12 and b[2] < a[4] - 1e-12, (a, b))
+		area=sum(width*height for width, height in sizes)
+		self.assertAlmostEqual(sum(page.used_area for page in pages), area)
+		for page in pages:
+			self.assertLessEqual(page.utilisation(), 1)
+
+	def test_pack(self):
+		sizes=random_sizes(300)
+		for allow_rotation in (False, True):
+			placements, pages=pack(sizes, 0.7, 1, allow_rotation)
+			self.check(sizes, placements, pages, 0.7, 1)
+
+	def test_exact(self):
+		#four quarters fill a page
+		sizes=[(0.5, 0.5)]*8
+		placements, pages=pack(sizes, 1, 1)
+		self.assertEqual(len(pages), 2)
+		self.assertEqual([page.utilisation() for page in pages], [1, 1])
+
+	def test_page_width(self):
+		#boxes as wide as the page together, their summed widths don't add up to it exactly
+		for a in (0.1, 1/3, 0.2):
+			sizes=[(a, 0.3), (1-a, 0.2), (1.0, 0.1)]
+			placements, pages=pack(sizes, 1, 1)
+			self.assertEqual(len(pages), 1)
+			self.check(sizes, placements, pages, 1, 1)
+			self.assertEqual([placement.y for placement in placements], [0.1, 0.1, 0])
+
+	def test_rotation(self):
+		#wide boxes only fit turned
+		sizes=[(0.9, 0.2)]*10
+		self.assertGreater(largest_ratio(sizes, 0.5, 1), 1)
+		self.assertRaises(ValueError, pack, sizes, 0.5, 1)
+		placements, pages=pack(sizes, 0.5, 1, allow_rotation=True)
+		self.assertTrue(all(placement.rotated for placement in placements))
+		self.assertEqual(len(pages), 5)
+		self.check(sizes, placements, pages, 0.5, 1)
+
+if __name__=="__main__":
+	unittest.main()
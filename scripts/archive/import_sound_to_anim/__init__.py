@@ -53,6 +53,8 @@ from bpy.props import *
 
 import wave
 
+from . import sound_envelope
+
 #TODO
 #    Arrumar - não tem rotacao para objeto - so transformacao
 #    alterar OBJETO NOMEADO
@@ -350,6 +352,32 @@ def wavimport(infile, context):
 
 def SoundConv(File, DivSens, Sensibil, Resol):
 
+    if sound_envelope.np is None:
+        return SoundConvLegacy(File, DivSens, Sensibil, Resol)
+
+    print('')
+    print("================================================================")   
+    from time import strftime
+    print(strftime("Go!  %H:%M:%S"))
+    print("================================================================")   
+    print('')   
+    print('Sensitivity: \t', Sensibil)
+    print('DivMovim: \t', DivSens)
+    print(' ')
+
+    # todos os canais, lidos em blocos
+    _array= sound_envelope.sound_to_array(File, DivSens, Sensibil, Resol)
+
+    print("================================================================")   
+    print(strftime("End Process:  %H:%M:%S"))
+    print("================================================================")   
+
+    return _array
+
+
+# Lê um frame por vez, usado se numpy nao estiver disponivel
+def SoundConvLegacy(File, DivSens, Sensibil, Resol):
+
     try:
         Wave_read= wave.open(File, 'rb')
     except IOError as e:
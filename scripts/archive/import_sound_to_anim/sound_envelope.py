@@ -0,0 +1,194 @@
+#  ***** GPL LICENSE BLOCK *****
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  All rights reserved.
+#  ***** GPL LICENSE BLOCK *****
+
+"""
+Envelope extraction of WAV files with numpy.
+
+The file is read in blocks of frames, so files larger than memory can be
+processed. Samples of any width (8, 16, 24 and 32 bits) and all channels
+are decoded, and the peak or RMS of each window of frames is computed with
+reductions over reshaped blocks.
+
+sound_to_array() gives the same array as SoundConv for each Sensibil mode.
+"""
+
+import wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+BLOCK_FRAMES = 1 << 16
+
+
+#==================================================================================================
+# Reading
+#==================================================================================================
+
+def decode(data, sampwidth, nchannels):
+    """Signed samples of the raw frame data, as an int32 array (frames, channels)"""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if sampwidth == 1:
+        samples = raw.astype(np.int32) - 128
+    elif sampwidth == 2:
+        samples = raw.view('<i2').astype(np.int32)
+    elif sampwidth == 3:
+        b = raw.reshape(-1, 3).astype(np.int32)
+        samples = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        samples = (samples ^ 0x800000) - 0x800000
+    elif sampwidth == 4:
+        samples = raw.view('<i4')
+    else:
+        raise ValueError("unsupported sample width %d" % sampwidth)
+    return samples.reshape(-1, nchannels)
+
+
+def read_blocks(wave_read, block_frames=BLOCK_FRAMES):
+    """Yields the samples of an open wave file in blocks of block_frames frames"""
+    sampwidth = wave_read.getsampwidth()
+    nchannels = wave_read.getnchannels()
+    while True:
+        data = wave_read.readframes(block_frames)
+        if not data:
+            break
+        yield decode(data, sampwidth, nchannels)
+
+
+def decimate(blocks, step):
+    """Every step-th frame of a sequence of blocks, starting with the first"""
+    offset = 0
+    for block in blocks:
+        if step > 1:
+            picked = block[offset::step]
+            offset = (offset - len(block)) % step
+            block = picked
+        if len(block):
+            yield block
+
+
+def windows(blocks, window, reduce):
+    """
+    Applies reduce to consecutive windows of window frames, the last one
+    possibly shorter. reduce takes an array (windows, frames, channels) and
+    returns one value per window. Yields arrays of window values.
+    """
+    rest = None
+    for block in blocks:
+        if rest is not None and len(rest):
+            block = np.concatenate((rest, block))
+        count = len(block) // window
+        if count:
+            yield reduce(block[:count * window].reshape(count, window, -1))
+        rest = block[count * window:]
+    if rest is not None and len(rest):
+        yield reduce(rest[np.newaxis])
+
+
+def peak(windows):
+    return np.abs(windows).max(axis=(1, 2))
+
+
+def rms(windows):
+    squares = windows.astype(np.float64) ** 2
+    return np.sqrt(squares.mean(axis=(1, 2)))
+
+
+def envelope(filename, window, mode='PEAK', step=1, block_frames=BLOCK_FRAMES):
+    """
+    Peak or RMS envelope of a wav file over all channels, one value in
+    [0, 1] per window of window frames. Only every step-th frame is used.
+    """
+    wave_read = wave.open(filename, 'rb')
+    try:
+        if wave_read.getcomptype() != 'NONE':
+            raise ValueError("compressed wav files are not supported")
+        scale = float(1 << (8 * wave_read.getsampwidth() - 1))
+        reduce = {'PEAK': peak, 'RMS': rms}[mode]
+        blocks = decimate(read_blocks(wave_read, block_frames * step), step)
+        values = [v for v in windows(blocks, window, reduce)]
+    finally:
+        wave_read.close()
+    if not values:
+        return np.zeros(0)
+    return np.concatenate(values) / scale
+
+
+#==================================================================================================
+# SoundConv compatible array
+#==================================================================================================
+
+# bits dropped from a 16 bits sample for Sensibil 1 to 4, the 8 following bits are used
+SENSIBIL_SHIFTS = {1: 6, 2: 5, 3: 4, 4: 2}
+
+
+def sensibil_bytes(samples, sampwidth, sensibil):
+    """
+    The values SoundConv takes from the samples for a Sensibil mode, 0 for
+    the samples it ignores. 8 bits samples are used unchanged, wider ones
+    are reduced to 16 bits.
+    """
+    if sampwidth == 1:
+        return samples + 128
+    samples = samples >> (8 * (sampwidth - 2))
+    if sensibil == 5:
+        return samples & 0xFF
+    # the high byte must be below 127
+    used = (samples >= 0) & (samples < 0x7F00)
+    if sensibil == 0:
+        values = (samples >> 8) << 1
+    else:
+        values = (samples >> SENSIBIL_SHIFTS[sensibil]) & 0xFF
+    return np.where(used, values, 0)
+
+
+def sound_to_array(filename, DivSens, Sensibil, Resol, block_frames=BLOCK_FRAMES):
+    """
+    The array of SoundConv: the peak of each video frame, one value per
+    frame in 0-255. The first frame of every DivSens frames is looked at,
+    DivSens video frames at a time, Resol being the video frame rate.
+    Returns False if the file can't be read.
+    """
+    try:
+        wave_read = wave.open(filename, 'rb')
+    except (IOError, wave.Error) as e:
+        print("File Open Error: ", e)
+        return False
+
+    try:
+        if wave_read.getcomptype() != 'NONE':
+            print('Formato de Compressão Nao Suportado ', wave_read.getcomptype())
+            return False
+        sampwidth = wave_read.getsampwidth()
+        frames = wave_read.getnframes()
+        window = max(1, int(wave_read.getframerate() / Resol))
+
+        def reduce(windows):
+            return sensibil_bytes(windows, sampwidth, Sensibil).max(axis=(1, 2))
+
+        blocks = decimate(read_blocks(wave_read, block_frames * DivSens), DivSens)
+        peaks = [v for v in windows(blocks, window, reduce)]
+    finally:
+        wave_read.close()
+
+    size = frames // window
+    count = size // DivSens
+    peaks = np.concatenate(peaks)[:count] if peaks else np.zeros(0, dtype=np.int32)
+    array = np.zeros(size, dtype=np.uint8)
+    array[:len(peaks) * DivSens] = np.repeat(peaks, DivSens)
+    return bytearray(array.tobytes())
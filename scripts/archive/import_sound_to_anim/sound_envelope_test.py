@@ -0,0 +1,169 @@
+#  ***** GPL LICENSE BLOCK *****
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#  All rights reserved.
+#  ***** GPL LICENSE BLOCK *****
+
+"""
+Tests of sound_envelope against a port of the SoundConv reading loop of
+the addon, on generated WAV files. Run from this directory with:
+    python sound_envelope_test.py
+"""
+
+import os
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from sound_envelope import envelope, read_blocks, sound_to_array
+
+
+def write_wav(filename, samples, sampwidth, framerate=44100):
+    """Writes signed int samples (frames, channels) to a wav file"""
+    samples = np.asarray(samples, dtype=np.int64)
+    if sampwidth == 1:
+        data = (samples + 128).astype(np.uint8).tobytes()
+    elif sampwidth == 3:
+        v = samples.astype('<i4').view(np.uint8).reshape(-1, 4)
+        data = v[:, :3].tobytes()
+    else:
+        data = samples.astype('<i%d' % sampwidth).tobytes()
+    w = wave.open(filename, 'wb')
+    w.setnchannels(samples.shape[1])
+    w.setsampwidth(sampwidth)
+    w.setframerate(framerate)
+    w.writeframes(data)
+    w.close()
+
+
+def synthetic_samples(frames, channels, sampwidth, seed=0):
+    rnd = np.random.RandomState(seed)
+    full = 1 << (8 * sampwidth - 1)
+    t = np.arange(frames)
+    level = 0.5 + 0.5 * np.sin(t / 3000.0)
+    noise = rnd.uniform(-1, 1, (frames, channels))
+    return np.clip(level[:, None] * noise * full, -full, full - 1).astype(np.int64)
+
+
+def _legacy_sound_conv(File, DivSens, Sensibil, Resol):
+    # SoundConv reading mono files frame by frame, without the prints
+    Wave_read = wave.open(File, 'rb')
+    NumCh = Wave_read.getnchannels()
+    SampW = Wave_read.getsampwidth() // NumCh
+    FrameR = Wave_read.getframerate() // NumCh
+    NumFr = Wave_read.getnframes()
+    BytesResol = int(FrameR / Resol)
+    BytesDadosTotProcess = NumFr // BytesResol
+    _array = bytearray(BytesDadosTotProcess)
+    j = 0
+    looptot = int(BytesDadosTotProcess // DivSens)
+    for jj in range(looptot):
+        ValorPico = 0
+        for i in range(BytesResol):
+            frame = Wave_read.readframes(DivSens)
+            if len(frame) == 0: break
+            if SampW == 1:
+                if frame[0] > ValorPico:
+                    ValorPico = frame[0]
+            if SampW == 2:
+                if Sensibil == 0:
+                    if frame[1] < 127:
+                        fr = frame[1] << 1
+                        if fr > ValorPico:
+                            ValorPico = fr
+                if Sensibil == 4:
+                    if frame[1] < 127:
+                        frame0 = ((frame[0] & 0b11111100) >> 2) | ((frame[1] & 0b00000011) << 6)
+                        if frame0 > ValorPico:
+                            ValorPico = frame0
+                if Sensibil == 3:
+                    if frame[1] < 127:
+                        frame0 = ((frame[0] & 0b11110000) >> 4) | ((frame[1] & 0b00001111) << 4)
+                        if frame0 > ValorPico:
+                            ValorPico = frame0
+                if Sensibil == 2:
+                    if frame[1] < 127:
+                        frame0 = ((frame[0] & 0b11100000) >> 5) | ((frame[1] & 0b00011111) << 3)
+                        if frame0 > ValorPico:
+                            ValorPico = frame0
+                if Sensibil == 1:
+                    if frame[1] < 127:
+                        frame0 = ((frame[0] & 0b11000000) >> 6) | ((frame[1] & 0b00111111) << 2)
+                        if frame0 > ValorPico:
+                            ValorPico = frame0
+                if Sensibil == 5:
+                    if frame[0] > ValorPico:
+                        ValorPico = frame[0]
+        for ii in range(DivSens):
+            _array[j] = ValorPico
+            j += 1
+    Wave_read.close()
+    return _array
+
+
+class TestSoundEnvelope(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def wav(self, samples, sampwidth, framerate=44100):
+        filename = os.path.join(self.dir, 'test%d.wav' % len(os.listdir(self.dir)))
+        write_wav(filename, samples, sampwidth, framerate)
+        return filename
+
+    def test_decode(self):
+        for sampwidth in (1, 2, 3, 4):
+            samples = synthetic_samples(1000, 2, sampwidth)
+            full = 1 << (8 * sampwidth - 1)
+            samples[:4, 0] = [-full, full - 1, 0, -1]
+            wave_read = wave.open(self.wav(samples, sampwidth), 'rb')
+            decoded = np.concatenate(list(read_blocks(wave_read, 300)))
+            wave_read.close()
+            np.testing.assert_array_equal(decoded, samples)
+
+    def test_sound_conv(self):
+        # the rest of the frames doesn't fill a window, and some windows at the end
+        samples = synthetic_samples(44100 + 12345, 1, 2)
+        for framerate, DivSens, Resol in ((44100, 6, 24), (22050, 1, 25), (8000, 4, 30)):
+            filename = self.wav(samples, 2, framerate)
+            for Sensibil in range(6):
+                expected = _legacy_sound_conv(filename, DivSens, Sensibil, Resol)
+                computed = sound_to_array(filename, DivSens, Sensibil, Resol, block_frames=1000)
+                self.assertEqual(computed, expected, (framerate, DivSens, Sensibil))
+        filename = self.wav(synthetic_samples(30000, 1, 1), 1)
+        self.assertEqual(sound_to_array(filename, 3, 2, 24, block_frames=777),
+                         _legacy_sound_conv(filename, 3, 2, 24))
+
+    def test_envelope(self):
+        samples = synthetic_samples(10007, 2, 3)
+        filename = self.wav(samples, 3)
+        full = float(1 << 23)
+        for step in (1, 3):
+            picked = samples[::step]
+            starts = range(0, len(picked), 100)
+            expected_peak = [np.abs(picked[s:s + 100]).max() / full for s in starts]
+            expected_rms = [np.sqrt((picked[s:s + 100] ** 2.0).mean()) / full for s in starts]
+            np.testing.assert_allclose(envelope(filename, 100, 'PEAK', step, block_frames=999), expected_peak)
+            np.testing.assert_allclose(envelope(filename, 100, 'RMS', step, block_frames=999), expected_rms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,14 +43,20 @@ if "bpy" in locals():
     import imp
     if "IfcImport" in locals():
         imp.reload(IfcImport)
+    if "mesh_cache" in locals():
+        imp.reload(mesh_cache)
 
+import time
 import bpy
 import mathutils
 from bpy.props import StringProperty, IntProperty, BoolProperty
 from bpy_extras.io_utils import ImportHelper
 
+from . import mesh_cache
+
 major,minor = bpy.app.version[0:2]
 transpose_matrices = minor >= 62
+use_polygons = (major, minor) >= (2, 63)
 
 bpy.types.Object.ifc_id = IntProperty(name="IFC Entity ID",
     description="The STEP entity instance name")
@@ -60,7 +66,29 @@ bpy.types.Object.ifc_name = StringProperty(name="IFC Entity Name",
     description="The optional name attribute")
 bpy.types.Object.ifc_type = StringProperty(name="IFC Entity Type",
     description="The STEP Datatype keyword")
+
 
+def mesh_from_buffers(name, co, tris):
+    """New mesh from the buffers given by mesh_cache.MeshCache.lookup"""
+    me = bpy.data.meshes.new(name)
+    np = mesh_cache.np
+    if np is None or not use_polygons:
+        if np is not None:
+            co, tris = co.tolist(), tris.tolist()
+        me.from_pydata(co, [], tris)
+        return me
+    me.vertices.add(len(co))
+    me.vertices.foreach_set("co", co.astype(np.float32).ravel())
+    me.loops.add(tris.size)
+    me.loops.foreach_set("vertex_index", tris.ravel())
+    me.polygons.add(len(tris))
+    me.polygons.foreach_set("loop_start",
+        np.arange(0, tris.size, 3, dtype=np.int32))
+    me.polygons.foreach_set("loop_total",
+        np.full(len(tris), 3, dtype=np.int32))
+    me.update(calc_edges=True)
+    return me
+
 
 def import_ifc(filename, use_names, process_relations):
     from . import IfcImport
@@ -74,6 +102,7 @@ def import_ifc(filename, use_names, process_relations):
     id_to_parent = {}
     id_to_matrix = {}
     old_progress = -1
+    cache = mesh_cache.MeshCache()
     print("Creating geometry...")
     while True:
         ob = IfcImport.Get()
@@ -84,19 +113,19 @@ def import_ifc(filename, use_names, process_relations):
         t = ob.type[0:21]
         nm = ob.name if len(ob.name) and use_names else ob.guid
 
-        verts = [[v[i], v[i + 1], v[i + 2]] \
-            for i in range(0, len(v), 3)]
-        faces = [[f[i], f[i + 1], f[i + 2]] \
-            for i in range(0, len(f), 3)]
-
-        me = bpy.data.meshes.new('mesh%d' % ob.mesh.id)
-        me.from_pydata(verts, [], faces)
-        if t in bpy.data.materials:
-            mat = bpy.data.materials[t]
-            mat.use_fake_user = True
-        else:
-            mat = bpy.data.materials.new(t)
-        me.materials.append(mat)
+        # products of the same shape share the mesh of the first one
+        key, me, co, tris = cache.lookup(v, f, t)
+        me_new = me is None
+        if me_new:
+            start = time.time()
+            me = mesh_from_buffers('mesh%d' % ob.mesh.id, co, tris)
+            if t in bpy.data.materials:
+                mat = bpy.data.materials[t]
+                mat.use_fake_user = True
+            else:
+                mat = bpy.data.materials.new(t)
+            me.materials.append(mat)
+            build_time = time.time() - start
 
         bob = bpy.data.objects.new(nm, me)
         mat = mathutils.Matrix(([m[0], m[1], m[2], 0],
@@ -111,10 +140,13 @@ def import_ifc(filename, use_names, process_relations):
             bob.matrix_world = mat
         bpy.context.scene.objects.link(bob)
 
-        bpy.context.scene.objects.active = bob
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.normals_make_consistent()
-        bpy.ops.object.mode_set(mode='OBJECT')
+        if me_new:
+            start = time.time()
+            bpy.context.scene.objects.active = bob
+            bpy.ops.object.mode_set(mode='EDIT')
+            bpy.ops.mesh.normals_make_consistent()
+            bpy.ops.object.mode_set(mode='OBJECT')
+            cache.add(key, me, build_time + time.time() - start)
 
         bob.ifc_id, bob.ifc_guid, bob.ifc_name, bob.ifc_type = \
             ob.id, ob.guid, ob.name, ob.type
@@ -136,6 +168,7 @@ def import_ifc(filename, use_names, process_relations):
             break
 
     print("\rDone creating geometry" + " " * 30)
+    print("Meshes: " + cache.summary())
 
     id_to_parent_temp = dict(id_to_parent)
     
@@ -200,7 +233,7 @@ def import_ifc(filename, use_names, process_relations):
 
     IfcImport.CleanUp()
     
-    return True
+    return cache
 
 
 class ImportIFC(bpy.types.Operator, ImportHelper):
@@ -220,10 +253,14 @@ class ImportIFC(bpy.types.Operator, ImportHelper):
         default=False)
 
     def execute(self, context):
-        if not import_ifc(self.filepath, self.use_names, self.process_relations):
-            self.report({'ERROR'},
-                'Unable to parse .ifc file or no geometrical entities found'
-            )
+        cache = import_ifc(self.filepath, self.use_names,
+            self.process_relations)
+        if not cache:
+            self.report({'ERROR'},
+                'Unable to parse .ifc file or no geometrical entities found'
+            )
+        else:
+            self.report({'INFO'}, "Meshes: " + cache.summary())
         return {'FINISHED'}
 
 
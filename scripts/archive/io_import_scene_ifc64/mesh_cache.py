@@ -0,0 +1,130 @@
+###############################################################################
+#                                                                             #
+# This file is part of IfcOpenShell.                                          #
+#                                                                             #
+# IfcOpenShell is free software: you can redistribute it and/or modify        #
+# it under the terms of the Lesser GNU General Public License as published by #
+# the Free Software Foundation, either version 3.0 of the License, or         #
+# (at your option) any later version.                                         #
+#                                                                             #
+# IfcOpenShell is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+# Lesser GNU General Public License for more details.                         #
+#                                                                             #
+# You should have received a copy of the Lesser GNU General Public License    #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.        #
+#                                                                             #
+###############################################################################
+
+# <pep8 compliant>
+
+"""Sharing of meshes between IFC products of the same shape.
+
+Building models repeat the same window, door and column geometry many
+times. Each product comes with its own vertex and face buffers in object
+coordinates, so equal shapes have equal buffers. They are keyed by a hash
+of the coordinates, snapped to a grid of TOLERANCE, the triangles and the
+material name. The first product of a shape builds the mesh, the others
+link it with their own matrix.
+"""
+
+import array
+import hashlib
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TOLERANCE = 1e-6
+
+
+def buffer_arrays(verts, faces):
+    """Flat verts and faces vectors to (n, 3) float and (m, 3) int arrays"""
+    co = np.fromiter(verts, np.float64, len(verts)).reshape(-1, 3)
+    tris = np.fromiter(faces, np.int32, len(faces)).reshape(-1, 3)
+    return co, tris
+
+
+def shape_key(co, tris, tag="", tolerance=TOLERANCE):
+    """Digest of a shape given as arrays, equal for coordinates that snap
+    to the same grid points"""
+    if tolerance:
+        co = np.rint(co / tolerance).astype(np.int64)
+    digest = hashlib.sha1(tag.encode("utf-8"))
+    digest.update(array.array("q", co.shape + tris.shape).tobytes())
+    digest.update(np.ascontiguousarray(co).tobytes())
+    digest.update(np.ascontiguousarray(tris, np.int32).tobytes())
+    return digest.digest()
+
+
+def shape_key_legacy(verts, faces, tag="", tolerance=TOLERANCE):
+    """shape_key for the flat vectors, without numpy"""
+    if tolerance:
+        co = array.array("q", [int(round(x / tolerance)) for x in verts])
+    else:
+        co = array.array("d", verts)
+    digest = hashlib.sha1(tag.encode("utf-8"))
+    digest.update(array.array("q", (len(verts) // 3, 3,
+        len(faces) // 3, 3)).tobytes())
+    digest.update(co.tobytes())
+    digest.update(array.array("i", faces).tobytes())
+    return digest.digest()
+
+
+class MeshCache:
+    """Meshes by shape key, with the counts and times for the report"""
+
+    def __init__(self, tolerance=TOLERANCE):
+        self.tolerance = tolerance
+        self.meshes = {}
+        self.hits = 0
+        self.misses = 0
+        self.hash_time = 0.0
+        self.build_time = 0.0
+
+    def lookup(self, verts, faces, tag=""):
+        """Returns (key, mesh, co, tris). The mesh is None for a shape not
+        seen yet, co and tris are then the buffers to build it from: arrays,
+        or nested lists without numpy."""
+        start = time.time()
+        if np is not None:
+            co, tris = buffer_arrays(verts, faces)
+            key = shape_key(co, tris, tag, self.tolerance)
+        else:
+            co, tris = verts, faces
+            key = shape_key_legacy(verts, faces, tag, self.tolerance)
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            self.misses += 1
+            if np is None:
+                co = [[verts[i], verts[i + 1], verts[i + 2]]
+                    for i in range(0, len(verts), 3)]
+                tris = [[faces[i], faces[i + 1], faces[i + 2]]
+                    for i in range(0, len(faces), 3)]
+        else:
+            self.hits += 1
+        self.hash_time += time.time() - start
+        return key, mesh, co, tris
+
+    def add(self, key, mesh, build_time):
+        """Store a mesh built for a shape missed by lookup"""
+        self.meshes[key] = mesh
+        self.build_time += build_time
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def time_saved(self):
+        """Estimate: mean build time for every reused mesh, less hashing"""
+        if not self.misses:
+            return 0.0
+        return self.hits * self.build_time / self.misses - self.hash_time
+
+    def summary(self):
+        return "%d objects, %d meshes, %.0f%% shared, ~%.1fs saved" % (
+            self.hits + self.misses, self.misses,
+            100 * self.hit_ratio(), self.time_saved())
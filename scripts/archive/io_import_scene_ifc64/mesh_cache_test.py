@@ -0,0 +1,106 @@
+###############################################################################
+#                                                                             #
+# This file is part of IfcOpenShell.                                          #
+#                                                                             #
+# IfcOpenShell is free software: you can redistribute it and/or modify        #
+# it under the terms of the Lesser GNU General Public License as published by #
+# the Free Software Foundation, either version 3.0 of the License, or         #
+# (at your option) any later version.                                         #
+#                                                                             #
+# IfcOpenShell is distributed in the hope that it will be useful,             #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of              #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the                #
+# Lesser GNU General Public License for more details.                         #
+#                                                                             #
+# You should have received a copy of the Lesser GNU General Public License    #
+# along with this program. If not, see <http://www.gnu.org/licenses/>.        #
+#                                                                             #
+###############################################################################
+
+# <pep8 compliant>
+
+"""Tests of mesh_cache on random models of repeated shapes, the numpy
+shape keys against the ones computed from the flat vectors. Run from this
+directory with:
+    python mesh_cache_test.py
+"""
+
+import random
+import unittest
+
+from mesh_cache import (TOLERANCE, MeshCache, buffer_arrays, shape_key,
+    shape_key_legacy)
+
+
+def random_shape(rnd, verts=40, faces=60):
+    """Flat buffers like IfcImport gives them"""
+    v = [round(rnd.uniform(-2, 2), 3) for i in range(verts * 3)]
+    f = [rnd.randrange(verts) for i in range(faces * 3)]
+    return v, f
+
+
+def random_model(shapes=20, objects=500, seed=0, verts=40, faces=60):
+    """Stream of (shape index, verts, faces), each shape used many times"""
+    rnd = random.Random(seed)
+    library = [random_shape(rnd, verts, faces) for i in range(shapes)]
+    model = []
+    for i in range(objects):
+        index = rnd.randrange(shapes) if i >= shapes else i
+        model.append((index,) + library[index])
+    return model
+
+
+class TestMeshCache(unittest.TestCase):
+    def run_model(self, model, tags=None):
+        cache = MeshCache()
+        owner = {}
+        for i, (index, v, f) in enumerate(model):
+            tag = tags[i] if tags else ""
+            key, mesh, co, tris = cache.lookup(v, f, tag)
+            if mesh is None:
+                self.assertEqual(len(co), len(v) // 3)
+                self.assertEqual(len(tris), len(f) // 3)
+                mesh = (index, tag)
+                cache.add(key, mesh, 0.001)
+            owner[i] = mesh
+        return cache, owner
+
+    def test_shared(self):
+        model = random_model()
+        cache, owner = self.run_model(model)
+        self.assertEqual(cache.misses, 20)
+        self.assertEqual(cache.hits, len(model) - 20)
+        self.assertAlmostEqual(cache.hit_ratio(), 1 - 20 / len(model))
+        for i, (index, v, f) in enumerate(model):
+            self.assertEqual(owner[i][0], index)
+
+    def test_tags(self):
+        model = random_model()
+        tags = ["IfcWindow" if i % 2 else "IfcDoor" for i in range(len(model))]
+        cache, owner = self.run_model(model, tags)
+        self.assertEqual(cache.misses, 40)
+        for i, (index, v, f) in enumerate(model):
+            self.assertEqual(owner[i], (index, tags[i]))
+
+    def test_tolerance(self):
+        rnd = random.Random(1)
+        v, f = random_shape(rnd)
+        noise = [x + 1e-9 for x in v]
+        moved = [x + 1e-3 for x in v]
+        cache, owner = self.run_model([(0, v, f), (0, noise, f), (1, moved, f)])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        # other triangles on the same points are another shape
+        cache, owner = self.run_model([(0, v, f), (1, v, f[3:] + f[:3])])
+        self.assertEqual(cache.misses, 2)
+
+    def test_legacy(self):
+        model = random_model(seed=2)
+        for tolerance in (TOLERANCE, 0):
+            for index, v, f in model[:40]:
+                co, tris = buffer_arrays(v, f)
+                self.assertEqual(shape_key(co, tris, "x", tolerance),
+                    shape_key_legacy(v, f, "x", tolerance))
+
+
+if __name__ == "__main__":
+    unittest.main()
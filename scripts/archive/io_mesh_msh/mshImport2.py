@@ -27,7 +27,7 @@ open.
 
 Notes:<br>\
   Heavily based on importRaw script by Anthony D'Agostino (Scorpius) and Aurel Wildfellner
-  Only works on ASCII .msh files currently
+  Only works on ASCII .msh files currently, binary ones too if numpy is available
   This is version 0.3: This time surface sets are imported as vertex groups.  So, one .msh file = 1 mesh object, but surface sets should show up as vertex groups
 """
 
@@ -36,8 +36,42 @@ Notes:<br>\
 import re
 import bpy
 from import_scene_obj import unpack_face_list, unpack_list
+from io_mesh_msh import mshReader
 
 def readMesh(meshFilePath, objName):
+    if mshReader.np is None:
+        return readMeshLegacy(meshFilePath, objName)
+    np = mshReader.np
+
+    #----------------------------------------
+    #Map the mesh file and decode it zone by zone
+    #----------------------------------------
+    print("Importing %s" % meshFilePath)
+    co, faceZones, names = mshReader.readMeshArrays(meshFilePath)
+    counts = np.concatenate([np.zeros(0, int)] + [zone.counts for zone in faceZones])
+    nodes = np.concatenate([np.zeros(0, int)] + [zone.nodes for zone in faceZones])
+    faces = mshReader.faceVertsRaw(counts, nodes)
+
+    #----------------------------------------
+    #Surface sets: the nodes and name of each face zone
+    #----------------------------------------
+    FACESETS = [[np.unique(zone.nodes).tolist()] for zone in faceZones]
+    RAW_NAMES = [names.get(zone.zone, "zone-%d" % zone.zone) for zone in faceZones]
+
+    #----------------------------------------
+    #Create Blender Objects
+    #----------------------------------------
+    mesh = bpy.data.meshes.new(objName)
+    print ("ADDING POINTS TO MESH")
+    mesh.add_geometry(len(co), 0, len(faces))
+    mesh.verts.foreach_set("co", co.ravel())
+    print ("ADDING FACES TO MESH")
+    mesh.faces.foreach_set("verts", faces.ravel())
+
+    print ("done")
+    return mesh, FACESETS, RAW_NAMES
+
+def readMeshLegacy(meshFilePath, objName):
     #----------------------------------------
     #Declare Variables, etc.
     #----------------------------------------
@@ -0,0 +1,313 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Streaming reader of Fluent .msh files with numpy.
+
+The file is memory mapped and its sections are found in one pass, jumping
+over the data blocks. Node and face blocks are decoded with numpy, ASCII
+ones (hex indices) in chunks of whole lines, binary ones (2010/3010,
+2013/3013) straight from the map. Each zone becomes arrays that can be
+passed to foreach_set.
+"""
+
+import re
+import mmap
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SECTION_ID = re.compile(rb'\((\d+)\s*')
+SPACE = re.compile(rb'\s*')
+BINARY_END = b'End of Binary Section'
+CHUNK_SIZE = 1 << 24
+
+NODES = 10
+CELLS = 12
+FACES = 13
+ZONE_NAMES = (39, 45)
+
+
+class Section(object):
+    """A section of the file: its index (e.g. 10, 2010 or 3010), the
+    tokens of its header and the byte range of its data block, if any"""
+    __slots__ = ("index", "header", "start", "end", "binary")
+
+    def __init__(self, index, header, start=None, end=None):
+        self.index = index
+        self.header = header
+        self.start = start
+        self.end = end
+        self.binary = index >= 2000
+
+    def kind(self):
+        return self.index % 1000
+
+    def hexHeader(self):
+        return [int(x, 16) for x in self.header]
+
+
+def scanSections(data):
+    """Yield the top level Sections of the file data (bytes or mmap)"""
+    pos = 0
+    while True:
+        p = data.find(b'(', pos)
+        if p < 0:
+            return
+        m = SECTION_ID.match(data, p)
+        if not m:
+            pos = p + 1
+            continue
+        index = int(m.group(1))
+        q = m.end()
+        first = data[q:q + 1]
+
+        if first == b'"':
+            # comment or header text
+            q = data.find(b'"', q + 1)
+            pos = data.find(b')', q) + 1
+            continue
+
+        if first != b'(':
+            # (2 3)
+            close = data.find(b')', q)
+            yield Section(index, data[q:close].split())
+            pos = close + 1
+            continue
+
+        close = data.find(b')', q)
+        header = data[q + 1:close].split()
+        r = SPACE.match(data, close + 1).end()
+        if data[r:r + 1] != b'(':
+            yield Section(index, header)
+            pos = r + 1
+        elif index >= 2000:
+            marker = data.find(BINARY_END, r)
+            end = data.rfind(b')', r, marker)
+            yield Section(index, header, r + 1, end)
+            pos = data.find(b')', marker) + 1
+        else:
+            end = data.find(b')', r + 1)
+            yield Section(index, header, r + 1, end)
+            pos = data.find(b')', end + 1) + 1
+        if pos <= 0:
+            return
+
+
+def lineChunks(data, start, end, size=None):
+    """Byte ranges of about size bytes (CHUNK_SIZE), ending at line ends"""
+    size = size or CHUNK_SIZE
+    while start < end:
+        stop = min(start + size, end)
+        if stop < end:
+            newline = data.find(b'\n', stop, end)
+            stop = end if newline < 0 else newline + 1
+        yield (start, stop)
+        start = stop
+
+
+HEX_DIGITS = None
+
+
+def hexTokens(chars, lines=False):
+    """Values of the hex numbers in the uint8 array chars and, with lines,
+    the line (counted from 0) each of them is on"""
+    global HEX_DIGITS
+    if HEX_DIGITS is None:
+        HEX_DIGITS = np.full(256, -1, np.int8)
+        for (n, c) in enumerate(b'0123456789abcdef'):
+            HEX_DIGITS[c] = n
+            HEX_DIGITS[ord(chr(c).upper())] = n
+
+    digits = HEX_DIGITS[chars]
+    isHex = digits >= 0
+    edges = np.flatnonzero(np.diff(np.r_[False, isHex, False]))
+    (tokenStart, tokenEnd) = (edges[::2], edges[1::2])
+    lengths = tokenEnd - tokenStart
+
+    # sum of the digits shifted by their place from the end of the token
+    at = np.flatnonzero(isHex)
+    shift = 4 * (np.repeat(tokenEnd - 1, lengths) - at)
+    values = np.add.reduceat(digits[at].astype(np.int64) << shift, np.cumsum(lengths) - lengths) \
+        if len(at) else np.zeros(0, np.int64)
+    if not lines:
+        return values
+    return (values, np.searchsorted(np.flatnonzero(chars == 10), tokenStart))
+
+
+class NodeZone(object):
+    """Nodes first..last (1 based) of a zone, co is (count, dims)"""
+
+    def __init__(self, zone, first, last, co):
+        self.zone = zone
+        self.first = first
+        self.last = last
+        self.co = co
+
+
+class FaceZone(object):
+    """Faces of a zone: the node count of each face, the nodes of all
+    faces after each other (0 based) and the two cells of each face
+    (1 based, 0 for none)"""
+
+    def __init__(self, zone, first, last, bcType, faceType, counts, nodes, cells):
+        self.zone = zone
+        self.first = first
+        self.last = last
+        self.bcType = bcType
+        self.faceType = faceType
+        self.counts = counts
+        self.nodes = nodes
+        self.cells = cells
+
+
+def decodeNodes(data, section, dims=3):
+    header = section.hexHeader()
+    (zone, first, last) = header[:3]
+    if len(header) > 4:
+        dims = header[4]
+    count = last - first + 1
+    if section.binary:
+        dtype = '<f4' if section.index // 1000 == 2 else '<f8'
+        co = np.frombuffer(data, dtype, count * dims, section.start).astype(float)
+    else:
+        co = np.concatenate([np.fromstring(data[a:b], sep=' ')
+                             for (a, b) in lineChunks(data, section.start, section.end)] or [np.zeros(0)])
+    return NodeZone(zone, first, last, co.reshape(count, dims))
+
+
+def splitFaces(values, starts, counts):
+    # nodes and cells of faces given as: count, nodes..., c0, c1
+    n = np.repeat(np.arange(len(starts)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    nodes = values[starts[n] + 1 + offset]
+    cells = values[(starts + counts + 1)[:, None] + np.arange(2)]
+    return (nodes, cells)
+
+
+def decodeFaces(data, section):
+    header = section.hexHeader()
+    (zone, first, last, bcType, faceType) = header[:5]
+    count = last - first + 1
+    mixed = faceType not in (2, 3, 4)
+
+    if section.binary:
+        ints = np.frombuffer(data, '<i4', (section.end - section.start) // 4, section.start)
+        if mixed:
+            # the faces have to be walked one by one
+            starts = np.zeros(count, np.int64)
+            values = ints.tolist()
+            pos = 0
+            for i in range(count):
+                starts[i] = pos
+                pos += values[pos] + 3
+            values = ints.astype(np.int64)
+            counts = values[starts]
+            (nodes, cells) = splitFaces(values, starts, counts)
+        else:
+            rows = ints[:count * (faceType + 2)].astype(np.int64).reshape(count, faceType + 2)
+            counts = np.full(count, faceType, np.int64)
+            (nodes, cells) = (rows[:, :faceType].ravel(), rows[:, faceType:])
+    else:
+        (countParts, nodeParts, cellParts) = ([], [], [])
+        for (a, b) in lineChunks(data, section.start, section.end):
+            chars = np.frombuffer(data, np.uint8, b - a, a)
+            if mixed:
+                (values, lines) = hexTokens(chars, lines=True)
+                # each face is on a line of its own
+                starts = np.flatnonzero(np.r_[True, lines[1:] != lines[:-1]]) if len(lines) else lines
+                counts = values[starts]
+                (nodes, cells) = splitFaces(values, starts, counts)
+            else:
+                rows = hexTokens(chars).reshape(-1, faceType + 2)
+                counts = np.full(len(rows), faceType, np.int64)
+                (nodes, cells) = (rows[:, :faceType].ravel(), rows[:, faceType:])
+            countParts.append(counts)
+            nodeParts.append(nodes)
+            cellParts.append(cells)
+        counts = np.concatenate(countParts)
+        nodes = np.concatenate(nodeParts)
+        cells = np.concatenate(cellParts).reshape(-1, 2)
+    return FaceZone(zone, first, last, bcType, faceType, counts, nodes - 1, cells)
+
+
+def readZones(filepath):
+    """Yield the NodeZones, FaceZones and (zone, name) pairs of a file"""
+    with open(filepath, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        dims = 3
+        for section in scanSections(data):
+            kind = section.kind()
+            if section.index == 2:
+                dims = int(section.header[0])
+            elif section.start is None:
+                continue
+            elif kind == NODES:
+                yield decodeNodes(data, section, dims)
+            elif kind == FACES:
+                yield decodeFaces(data, section)
+            elif section.index in ZONE_NAMES:
+                yield (int(section.header[0]), section.header[2].decode())
+    finally:
+        data.close()
+
+
+def faceVertsRaw(counts, nodes):
+    """(n, 4) vertex indices for faces.foreach_set: quads, triangles padded
+    with 0 (a 0 never last), longer polygons as fans, lines dropped"""
+    offsets = np.cumsum(counts) - counts
+    tris = np.maximum(counts - 2, 0)
+    tris[counts == 4] = 0
+    face = np.repeat(np.arange(len(counts)), tris)
+    k = np.arange(tris.sum()) - np.repeat(np.cumsum(tris) - tris, tris)
+    fan = np.stack((nodes[offsets[face]], nodes[offsets[face] + k + 1], nodes[offsets[face] + k + 2],
+                    np.zeros(len(face), nodes.dtype)), axis=1)
+    quads = nodes[offsets[counts == 4][:, None] + np.arange(4)]
+    raw = np.concatenate((quads, fan))
+    order = np.argsort(np.r_[np.flatnonzero(counts == 4), face], kind='stable')
+    raw = raw[order]
+    # rotate so that 0 is not the last index of quads or the third of triangles
+    isTri = np.r_[np.zeros(len(quads), bool), np.ones(len(fan), bool)][order]
+    rotate = np.where(isTri, raw[:, 2] == 0, raw[:, 3] == 0)
+    raw[rotate & isTri, :3] = raw[rotate & isTri][:, [2, 0, 1]]
+    raw[rotate & ~isTri] = raw[rotate & ~isTri][:, [3, 0, 1, 2]]
+    return raw
+
+
+def readMeshArrays(filepath):
+    """
+    The whole mesh of a file:
+    co: (n, 3) coordinates of all nodes
+    faceZones: the FaceZones, in the order of the file
+    names: {zone: name}
+    """
+    (nodeZones, faceZones, names) = ([], [], {})
+    for item in readZones(filepath):
+        if isinstance(item, NodeZone):
+            nodeZones.append(item)
+        elif isinstance(item, FaceZone):
+            faceZones.append(item)
+        else:
+            names[item[0]] = item[1]
+    co = np.zeros((max([z.last for z in nodeZones] or [0]), 3))
+    for z in nodeZones:
+        co[z.first - 1:z.last, :z.co.shape[1]] = z.co
+    return (co, faceZones, names)
@@ -0,0 +1,161 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Tests of mshReader on generated ASCII and binary .msh files, against the
+regular expression parsing of readMesh. Run from this directory with:
+    python mshReader_test.py
+"""
+
+import os
+import re
+import tempfile
+import unittest
+
+import numpy as np
+
+import mshReader
+from mshReader import faceVertsRaw, readMeshArrays
+
+
+def writeMsh(filepath, co, zones, names, binary=False):
+    # zones: (faceType, list of node lists, cells) with 1 based nodes
+    out = [b'(0 "test mesh (made up)")\n', b'(1 "mshReader")\n', b'(2 3)\n']
+    out.append(b'(10 (0 1 %x 0 3))\n' % len(co))
+    if binary:
+        out.append(b'(3010 (1 1 %x 1 3)\n(' % len(co) + np.asarray(co, '<f8').tobytes() +
+                   b')\nEnd of Binary Section 3010)\n')
+    else:
+        out.append(b'(10 (1 1 %x 1 3)(\n' % len(co) +
+                   b''.join(b'%.17g %.17g %.17g\n' % tuple(c) for c in co) + b'))\n')
+    first = 1
+    for (i, (faceType, faces, cells)) in enumerate(zones):
+        zone = i + 10
+        last = first + len(faces) - 1
+        header = b'(%x %x %x 3 %x)' % (zone, first, last, faceType)
+        rows = [([len(f)] if faceType in (0, 5) else []) + list(f) + list(c) for (f, c) in zip(faces, cells)]
+        if binary:
+            ints = np.array([x for r in rows for x in r], '<i4')
+            out.append(b'(2013 ' + header + b'\n(' + ints.tobytes() + b')\nEnd of Binary Section 2013)\n')
+        else:
+            out.append(b'(13 ' + header + b'(\n' +
+                       b''.join(b' '.join(b'%x' % x for x in r) + b'\n' for r in rows) + b'))\n')
+        first = last + 1
+    for (zone, name) in names.items():
+        out.append(b'(45 (%d wall %s)())\n' % (zone, name.encode()))
+    with open(filepath, 'wb') as file:
+        file.write(b''.join(out))
+
+
+def _legacyRead(filepath):
+    # the parsing of readMesh: nodes and the first three nodes of faces
+    nodeHdr = re.compile('\\(10 \\(.*\\).*\\(')
+    faceHdr = re.compile('\\(13 \\(.*\\).*\\(')
+    nameHdr = re.compile('\\(45 \\(.*\\)\\)')
+    tailHdr = re.compile('\\)\\)')
+    with open(filepath, 'r') as file:
+        meshData = file.read()
+    RAW_NODES = []
+    FACESETS = []
+    RAW_NAMES = []
+    for thisNodeSet in nodeHdr.finditer(meshData):
+        RAW_NODES = []
+        nodeData = meshData[thisNodeSet.end() + 1:]
+        nodeData = nodeData[:tailHdr.search(nodeData).start() - 1]
+        for eachNode in nodeData.splitlines():
+            RAW_NODES.append([float(x) for x in eachNode.split()])
+    for thisFaceSet in faceHdr.finditer(meshData):
+        FACES = []
+        faceData = meshData[thisFaceSet.end() + 1:]
+        faceData = faceData[:tailHdr.search(faceData).start() - 1]
+        for eachFace in faceData.splitlines():
+            f = eachFace.split()
+            FACES.append([int(f[0], 16) - 1, int(f[1], 16) - 1, int(f[2], 16) - 1])
+        FACESETS.append(FACES)
+    for thisName in nameHdr.finditer(meshData):
+        RAW_NAMES.append(thisName.group().split()[3].strip('()'))
+    return (RAW_NODES, FACESETS, RAW_NAMES)
+
+
+def makeGrid(nx, ny, seed=0):
+    # nodes of a wavy grid and its faces as triangles and quads
+    rnd = np.random.RandomState(seed)
+    (x, y) = np.meshgrid(np.arange(nx, dtype=float), np.arange(ny, dtype=float), indexing='ij')
+    co = np.stack((x, y, np.sin(x * 0.3) + rnd.uniform(-1, 1, x.shape)), axis=-1).reshape(-1, 3)
+    i = np.arange(nx - 1)[:, None] * ny + np.arange(ny - 1)[None, :]
+    quads = np.stack((i, i + ny, i + ny + 1, i + 1), axis=-1).reshape(-1, 4) + 1
+    tris = np.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]))
+    return (co, tris, quads)
+
+
+class TestMshReader(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.msh')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testAscii(self):
+        (co, tris, quads) = makeGrid(30, 20)
+        cells = np.arange(2 * len(tris)).reshape(-1, 2)
+        writeMsh(self.path, co, [(3, tris, cells), (3, tris[:5], cells[:5])], {10: 'wall-1', 11: 'inlet'})
+        (nodes, faceSets, names) = _legacyRead(self.path)
+        (co2, faceZones, names2) = readMeshArrays(self.path)
+        self.assertEqual(co2.tolist(), nodes)
+        self.assertEqual([z.nodes.reshape(-1, 3).tolist() for z in faceZones], faceSets)
+        self.assertEqual([names2[z.zone] for z in faceZones], names)
+        self.assertEqual(faceZones[0].cells.tolist(), cells.tolist())
+
+    def testBinaryAndMixed(self):
+        (co, tris, quads) = makeGrid(12, 9)
+        faces = [list(f) for f in quads[:10]] + [list(f) for f in tris[:7]] + [[1, 2, 3, 4, 5]]
+        cells = [[i + 1, 0] for i in range(len(faces))]
+        zones = [(4, quads, np.ones((len(quads), 2), int)), (0, faces, cells), (5, faces[::-1], cells)]
+        for binary in (False, True):
+            writeMsh(self.path, co, zones, {10: 'a', 11: 'b', 12: 'c'}, binary)
+            (co2, faceZones, names) = readMeshArrays(self.path)
+            self.assertTrue(np.array_equal(co2, co))
+            self.assertEqual(names, {10: 'a', 11: 'b', 12: 'c'})
+            for (z, (faceType, f, c)) in zip(faceZones, zones):
+                self.assertEqual(z.faceType, faceType)
+                self.assertEqual(z.counts.tolist(), [len(x) for x in f])
+                self.assertEqual(z.nodes.tolist(), [x - 1 for n in f for x in n])
+                self.assertEqual(z.cells.tolist(), np.asarray(c).tolist())
+
+    def testChunks(self):
+        (co, tris, quads) = makeGrid(40, 30)
+        writeMsh(self.path, co, [(0, quads, np.zeros((len(quads), 2), int))], {})
+        (size, mshReader.CHUNK_SIZE) = (mshReader.CHUNK_SIZE, 1000)
+        try:
+            (co2, faceZones, names) = readMeshArrays(self.path)
+        finally:
+            mshReader.CHUNK_SIZE = size
+        self.assertTrue(np.array_equal(co2, co))
+        self.assertEqual(faceZones[0].nodes.tolist(), (quads - 1).ravel().tolist())
+
+    def testFaceVertsRaw(self):
+        counts = np.array([3, 4, 5, 3, 4, 2])
+        nodes = np.array([5, 6, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 7, 8, 9, 9, 8, 7, 6, 1, 2])
+        raw = faceVertsRaw(counts, nodes)
+        self.assertEqual(raw.tolist(), [[0, 5, 6, 0], [0, 1, 2, 3], [1, 2, 3, 0], [1, 3, 4, 0],
+                                        [1, 4, 5, 0], [7, 8, 9, 0], [9, 8, 7, 6]])
+
+
+if __name__ == '__main__':
+    unittest.main()
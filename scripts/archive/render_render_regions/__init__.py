@@ -18,6 +18,7 @@
 
 import bpy
 import os,subprocess
+from . import region_farm
 
 bl_info = {
     'name': 'Render Regions',
@@ -68,6 +69,28 @@ scn.RR_save_region = bpy.props.BoolProperty(name = "Join and save",
     description = "Join and save the regions",
     default = True)
 
+scn.RR_farm = bpy.props.BoolProperty(name = "Region farm",
+    description = "Render the regions in background processes at the same time, from the saved file",
+    default = False)
+
+scn.RR_farm_workers = bpy.props.IntProperty(
+    name = "Workers",
+    description = "Set number of regions rendered at the same time",
+    default = 2,
+    min = 1,
+    max = 64)
+
+scn.RR_farm_retries = bpy.props.IntProperty(
+    name = "Retries",
+    description = "Set number of times a failed region is rendered again",
+    default = 2,
+    min = 0,
+    max = 10)
+
+scn.RR_farm_command = bpy.props.StringProperty(name = "Command",
+    description = "Command rendering one region, empty= background Blender; fields: {blender} {blend} {worker} {min_x} {max_x} {min_y} {max_y} {percentage} {crop} {output}",
+    default = "")
+
 def RENDER_PT_Region(self, context):
         layout = self.layout
         scn = context.scene
@@ -105,6 +128,14 @@ def RENDER_PT_Region(self, context):
         row4.label(text=label_save)
         
         row5.operator("render.regions", text="Regions", icon="RENDER_REGION")
+
+        row6.prop(scn, "RR_farm")
+        sub = row6.row()
+        sub.active = scn.RR_farm
+        sub.prop(scn, "RR_farm_workers")
+        sub.prop(scn, "RR_farm_retries")
+        if scn.RR_farm:
+            box.prop(scn, "RR_farm_command")
         
 
 class RenderRegions(bpy.types.Operator):
@@ -113,10 +144,68 @@ class RenderRegions(bpy.types.Operator):
     bl_description = "Start render regions - Shortcut Ctrl Shift F12"
     bl_options = {'REGISTER', 'UNDO'}
 
+    def execute_farm(self, context):
+        scn = context.scene
+        rnd = context.scene.render
+
+        if not bpy.data.filepath:
+            self.report({'ERROR'}, "Save the file first, the region farm renders it from disk")
+            return {'CANCELLED'}
+
+        file_name=os.path.splitext( os.path.split(bpy.data.filepath)[1])[0]
+        dir_output=bpy.path.abspath(rnd.filepath)
+
+        if scn.RR_dim_region==False:
+            num_cols=scn.RR_reg_columns
+            num_rows=scn.RR_reg_rows
+            percentage=rnd.resolution_percentage
+            crop=rnd.use_crop_to_border
+        else:
+            num_cols=num_rows=scn.RR_multiplier
+            percentage=scn.RR_multiplier*100
+            crop=True
+
+        reg=region_farm.parse_regions(scn.RR_who_region, num_cols*num_rows)
+        if reg is None:
+            self.report({'ERROR'}, "Select regions: all, x , y , z or x - z")
+            return {'CANCELLED'}
+        print ("Regions to render:")
+        print (reg)
+
+        grid=region_farm.region_grid(num_cols, num_rows)
+        command=scn.RR_farm_command or region_farm.BLENDER_COMMAND
+        worker=os.path.join(os.path.dirname(__file__), "region_worker.py")
+        jobs=[]
+        for a in reg:
+            region=grid[a]
+            output=dir_output+region_farm.region_name(file_name, region, ".tga")
+            args=region_farm.job_command(command, blender=bpy.app.binary_path, blend=bpy.data.filepath,
+                worker=worker, percentage=percentage, crop=int(crop), output=output, **region.borders())
+            jobs.append(region_farm.RegionJob(region, args, output))
+
+        region_farm.run_jobs(jobs, scn.RR_farm_workers, scn.RR_farm_retries)
+
+        failed=[job.region.index for job in jobs if not job.done]
+        if failed:
+            self.report({'ERROR'}, "Regions not rendered: "+", ".join(map(str, failed)))
+        elif scn.RR_save_region==True and scn.RR_who_region=="all":
+            if region_farm.np is None:
+                self.report({'WARNING'}, "Joining the regions of the region farm needs numpy")
+            else:
+                width=int(rnd.resolution_x*percentage/100)
+                height=int(rnd.resolution_y*percentage/100)
+                final_img=region_farm.join_regions(jobs, width, height, dir_output+file_name+".png")
+                print("Saved "+final_img)
+
+        return{'FINISHED'}
+
     def execute(self, context):
         scn = context.scene
         rnd = context.scene.render
 
+        if scn.RR_farm==True:
+            return self.execute_farm(context)
+
         file_name=os.path.splitext( os.path.split(bpy.data.filepath)[1])[0]
 
         if scn.RR_dim_region==False:
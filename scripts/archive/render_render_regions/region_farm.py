@@ -0,0 +1,226 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Region farm: render the regions in local background processes and join them.
+
+Each region is a job running a command, by default a background Blender
+with region_worker.py, which writes the region as an uncompressed TGA.
+Up to N jobs run at the same time, failed ones are retried, and the
+finished tiles are pasted into one image with numpy, written as PNG.
+"""
+
+import os
+import time
+import shlex
+import struct
+import subprocess
+import zlib
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BLENDER_COMMAND = ('"{blender}" -b "{blend}" -P "{worker}" -- '
+                   '{min_x} {max_x} {min_y} {max_y} {percentage} {crop} "{output}"')
+
+class Region:
+    """ One block of the render, borders in 0..1 from the lower left corner """
+
+    def __init__(self, index, row, col, columns, rows):
+        self.index = index
+        self.row = row
+        self.col = col
+        self.min_x = col / columns
+        self.max_x = (col + 1) / columns
+        self.min_y = row / rows
+        self.max_y = (row + 1) / rows
+
+    def borders(self):
+        return {"min_x": self.min_x, "max_x": self.max_x,
+                "min_y": self.min_y, "max_y": self.max_y}
+
+    def pixel_rect(self, width, height):
+        """ (left, top, right, bottom) in pixels, rows counted from the top """
+        return (int(round(self.min_x * width)), height - int(round(self.max_y * height)),
+                int(round(self.max_x * width)), height - int(round(self.min_y * height)))
+
+def region_grid(columns, rows):
+    """ Regions numbered row by row from the bottom, like RenderRegions """
+    return [Region(row * columns + col, row, col, columns, rows)
+            for row in range(rows) for col in range(columns)]
+
+def parse_regions(spec, total):
+    """ Region numbers from the "Select regions" text: all, x,y,z, x-z or x.
+        Returns None if the text is not understood.
+    """
+    if "all" in spec:
+        numbers = list(range(total))
+    elif "," in spec:
+        if not spec.replace(',', '').isdigit():
+            return None
+        numbers = [int(a) for a in spec.split(",")]
+    elif "-" in spec:
+        if not spec.replace('-', '').isdigit():
+            return None
+        first, last = spec.split("-")[:2]
+        numbers = list(range(int(first), int(last) + 1))
+    elif spec.isdigit():
+        numbers = [int(spec)]
+    else:
+        return None
+    return [a for a in numbers if a < total]
+
+def region_name(file_name, region, extension):
+    return "%s_%03d_%03d%s" % (file_name, region.row, region.col, extension)
+
+def job_command(template, **fields):
+    """ Argument list of the command template, fields replaced """
+    return [arg.format(**fields) for arg in shlex.split(template)]
+
+#
+#    Scheduler
+#
+
+class RegionJob:
+    def __init__(self, region, command, output):
+        self.region = region
+        self.command = command
+        self.output = output
+        self.log = output + ".log"
+        self.attempts = 0
+        self.seconds = 0.0
+        self.done = False
+
+def run_jobs(jobs, workers=2, retries=2, report=print, poll=0.05):
+    """ Run the jobs, at most workers at once. A job succeeds if its
+        command exits with 0 and writes its output; failed jobs are
+        queued again up to retries times.
+    """
+    pending = deque(jobs)
+    running = []
+    finished = 0
+    start_all = time.time()
+
+    while pending or running:
+        while pending and len(running) < workers:
+            job = pending.popleft()
+            job.attempts += 1
+            if os.path.exists(job.output):
+                os.remove(job.output)
+            with open(job.log, "w") as log:
+                process = subprocess.Popen(job.command, stdout=log, stderr=subprocess.STDOUT)
+            running.append((job, process, time.time()))
+
+        time.sleep(poll)
+        still_running = []
+        for job, process, start in running:
+            if process.poll() is None:
+                still_running.append((job, process, start))
+                continue
+            seconds = time.time() - start
+            if process.returncode == 0 and os.path.exists(job.output):
+                job.done = True
+                job.seconds = seconds
+                finished += 1
+                report("region %d done in %.2f s (%d/%d)" % (job.region.index, seconds, finished, len(jobs)))
+            elif job.attempts <= retries:
+                report("region %d failed after %.2f s, retrying (see %s)" % (job.region.index, seconds, job.log))
+                pending.append(job)
+            else:
+                report("region %d failed %d times, giving up (see %s)" % (job.region.index, job.attempts, job.log))
+        running = still_running
+
+    report("%d of %d regions in %.2f s" % (finished, len(jobs), time.time() - start_all))
+    return jobs
+
+#
+#    Images
+#
+
+def read_tga(filepath):
+    """ Uncompressed TGA (as written by TARGA_RAW) to (height, width, 4)
+        uint8 RGBA, first row on top.
+    """
+    with open(filepath, "rb") as file:
+        data = file.read()
+    (id_length, colormap_type, image_type) = struct.unpack("<BBB", data[:3])
+    (width, height, bits, descriptor) = struct.unpack("<HHBB", data[12:18])
+    if colormap_type != 0 or image_type not in (2, 3) or bits not in (8, 24, 32):
+        raise ValueError("%s: only uncompressed true color or gray TGA is supported" % filepath)
+    channels = bits // 8
+    offset = 18 + id_length
+    pixels = np.frombuffer(data, np.uint8, width * height * channels, offset)
+    pixels = pixels.reshape(height, width, channels)
+    if not descriptor & 0x20:
+        pixels = pixels[::-1]
+    rgba = np.full((height, width, 4), 255, np.uint8)
+    if channels == 1:
+        rgba[..., :3] = pixels
+    else:
+        rgba[..., :3] = pixels[..., 2::-1]
+        if channels == 4:
+            rgba[..., 3] = pixels[..., 3]
+    return rgba
+
+def write_tga(filepath, rgba):
+    """ (height, width, 4) uint8 RGBA to an uncompressed TGA, first row on top """
+    (height, width) = rgba.shape[:2]
+    header = struct.pack("<BBBHHBHHHHBB", 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28)
+    bgra = rgba[..., [2, 1, 0, 3]]
+    with open(filepath, "wb") as file:
+        file.write(header + bgra.tobytes())
+
+def write_png(filepath, rgba):
+    """ (height, width, 4) uint8 RGBA to a PNG, without filtering """
+    (height, width) = rgba.shape[:2]
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data +
+                struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+    rows = np.zeros((height, width * 4 + 1), np.uint8)
+    rows[:, 1:] = rgba.reshape(height, -1)
+    with open(filepath, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        file.write(chunk(b"IEND", b""))
+
+def stitch(tiles, width, height):
+    """ Join (region, rgba) tiles into one image. A tile of the full size
+        gives the pixels inside its region; a smaller (cropped) tile is
+        put at the corner of its region.
+    """
+    image = np.zeros((height, width, 4), np.uint8)
+    for region, rgba in tiles:
+        (left, top, right, bottom) = region.pixel_rect(width, height)
+        if rgba.shape[:2] == (height, width):
+            image[top:bottom, left:right] = rgba[top:bottom, left:right]
+        else:
+            part = rgba[:height - top, :width - left]
+            image[top:top + part.shape[0], left:left + part.shape[1]] = part
+    return image
+
+def join_regions(jobs, width, height, filepath):
+    """ Stitch the outputs of the finished jobs and save them as PNG """
+    tiles = [(job.region, read_tga(job.output)) for job in jobs if job.done]
+    write_png(filepath, stitch(tiles, width, height))
+    return filepath
@@ -0,0 +1,125 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Tests of region_farm with a stand-in renderer in place of Blender, which
+writes coloured regions and fails on request. Run from this directory with:
+    python region_farm_test.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from region_farm import (region_grid, parse_regions, region_name, job_command,
+                         RegionJob, run_jobs, read_tga, write_tga, stitch, join_regions)
+
+# stand-in renderer: fills its region with a colour of the region number,
+# fails once for region numbers in the comma separated list of the sixth
+# argument, always for those in the seventh
+STAND_IN = """
+import os, sys
+sys.path.insert(0, %r)
+import region_farm, numpy as np
+(index, columns, rows, width, height) = map(int, sys.argv[1:6])
+(flaky, broken, output) = sys.argv[6:9]
+marker = output + ".tried"
+if str(index) in broken.split(",") or (str(index) in flaky.split(",") and not os.path.exists(marker)):
+    open(marker, "w").close()
+    sys.exit(1)
+region = region_farm.region_grid(columns, rows)[index]
+(left, top, right, bottom) = region.pixel_rect(width, height)
+rgba = np.zeros((height, width, 4), np.uint8)
+rgba[top:bottom, left:right] = (index * 10, 255 - index, 7, 255)
+if %r:
+    rgba = rgba[top:bottom, left:right]
+region_farm.write_tga(output, rgba)
+"""
+
+def expected_image(columns, rows, width, height):
+    image = np.zeros((height, width, 4), np.uint8)
+    for region in region_grid(columns, rows):
+        (left, top, right, bottom) = region.pixel_rect(width, height)
+        image[top:bottom, left:right] = (region.index * 10, 255 - region.index, 7, 255)
+    return image
+
+class TestRegionFarm(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def farm(self, columns, rows, width, height, crop=False, flaky="", broken="", regions=None):
+        directory = tempfile.mkdtemp(dir=self.directory)
+        script = os.path.join(directory, "stand_in.py")
+        with open(script, "w") as file:
+            file.write(STAND_IN % (os.path.dirname(os.path.abspath(__file__)), crop))
+        template = ('"{python}" "{script}" {index} {columns} {rows} {width} {height} '
+                    '"{flaky}" "{broken}" "{output}"')
+        jobs = []
+        for region in region_grid(columns, rows):
+            if regions is not None and region.index not in regions:
+                continue
+            output = os.path.join(directory, region_name("test", region, ".tga"))
+            command = job_command(template, python=sys.executable, script=script, index=region.index,
+                                  columns=columns, rows=rows, width=width, height=height,
+                                  flaky=flaky, broken=broken, output=output)
+            jobs.append(RegionJob(region, command, output))
+        messages = []
+        run_jobs(jobs, workers=3, retries=1, report=messages.append, poll=0.01)
+        return jobs, messages
+
+    def test_join(self):
+        for crop in (False, True):
+            jobs, messages = self.farm(3, 2, 61, 37, crop=crop, flaky="2,4")
+            self.assertTrue(all(job.done for job in jobs))
+            self.assertEqual([job.attempts for job in jobs], [1, 1, 2, 1, 2, 1])
+            self.assertEqual(len(messages), 6 + 2 + 1)
+            path = join_regions(jobs, 61, 37, os.path.join(self.directory, "joined.png"))
+            self.assertTrue(os.path.exists(path))
+            image = stitch([(job.region, read_tga(job.output)) for job in jobs], 61, 37)
+            self.assertTrue(np.array_equal(image, expected_image(3, 2, 61, 37)))
+
+    def test_broken(self):
+        jobs, messages = self.farm(2, 2, 20, 20, broken="1")
+        self.assertEqual([job.done for job in jobs], [True, False, True, True])
+        self.assertEqual(jobs[1].attempts, 2)
+        self.assertTrue(messages[-1].startswith("3 of 4 regions"))
+
+    def test_tga(self):
+        rgba = np.random.RandomState(0).randint(0, 256, (5, 7, 4)).astype(np.uint8)
+        path = os.path.join(self.directory, "test.tga")
+        write_tga(path, rgba)
+        self.assertTrue(np.array_equal(read_tga(path), rgba))
+
+    def test_parse(self):
+        self.assertEqual(parse_regions("all", 4), [0, 1, 2, 3])
+        self.assertEqual(parse_regions("1,3,7", 4), [1, 3])
+        self.assertEqual(parse_regions("2-5", 4), [2, 3])
+        self.assertEqual(parse_regions("2", 4), [2])
+        self.assertEqual(parse_regions("x", 4), None)
+        self.assertEqual([r.index for r in region_grid(3, 2)], list(range(6)))
+        self.assertEqual(region_name("a", region_grid(3, 2)[4], ".png"), "a_001_001.png")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Render one region in a background Blender, used by the region farm:
+# blender -b file.blend -P region_worker.py -- min_x max_x min_y max_y percentage crop output
+
+import bpy
+import sys
+
+argv = sys.argv[sys.argv.index("--") + 1:]
+
+rnd = bpy.context.scene.render
+rnd.use_border = True
+rnd.border_min_x, rnd.border_max_x, rnd.border_min_y, rnd.border_max_y = map(float, argv[0:4])
+rnd.resolution_percentage = int(argv[4])
+rnd.use_crop_to_border = bool(int(argv[5]))
+
+# uncompressed TGA, the farm reads it back without any image library
+settings = getattr(rnd, "image_settings", rnd)
+settings.file_format = 'TARGA_RAW'
+settings.color_mode = 'RGBA'
+rnd.use_file_extension = False
+rnd.filepath = argv[6]
+
+bpy.ops.render.render(write_still=True)
@@ -86,6 +86,9 @@ from mathutils import *
 from bpy.props import *
 from bpy_extras.io_utils import ImportHelper
 
+from . import bvh_data
+from . import fcurve_simplify
+
 ###################################################################################
 #    BVH importer. 
 #    The importer that comes with Blender had memory leaks which led to instability.
@@ -169,6 +172,147 @@ Deg2Rad = math.pi/180
 Epsilon = 1e-5
 
 def readBvhFile(context, filepath, scn, scan):
+    if bvh_data.np is None:
+        return readBvhFileLegacy(context, filepath, scn, scan)
+    ensureInited(context)
+    scale = scn['MhxBvhScale']
+    startFrame = scn['MhxStartFrame']
+    endFrame = scn['MhxEndFrame']
+    rot90 = scn['MhxRot90Anim']
+    subsample = scn['MhxSubsample']
+    defaultSS = scn['MhxDefaultSS']
+    print(filepath)
+    fileName = os.path.realpath(os.path.expanduser(filepath))
+    (shortName, ext) = os.path.splitext(fileName)
+    if ext.lower() != ".bvh":
+        raise NameError("Not a bvh file: " + fileName)
+    print( "Loading BVH file "+ fileName )
+
+    trgRig = context.object
+    bpy.ops.object.mode_set(mode='POSE')
+
+    time1 = time.clock()
+    scn = context.scene
+    clip = bvh_data.loadBvh(fileName)
+    (root, nodes) = buildNodes(clip, scale, rot90)
+    if scan:
+        return root
+
+    guessTargetArmature(trgRig)
+    amt = bpy.data.armatures.new("BvhAmt")
+    rig = bpy.data.objects.new("BvhRig", amt)
+    scn.objects.link(rig)
+    scn.objects.active = rig
+    bpy.ops.object.mode_set(mode='EDIT')
+    root.build(amt, Vector((0,0,0)), None)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    if defaultSS:
+        subsample = clip.frameFactor()
+    findSrcArmature(context, rig)
+    bpy.ops.object.mode_set(mode='POSE')
+    for pb in rig.pose.bones:
+        pb.rotation_mode = 'QUATERNION'
+
+    print("Reading motion")
+    addFrames(clip.subsample(startFrame, endFrame, max(1, subsample)), nodes, rig, scale)
+
+    setInterpolation(rig)
+    time2 = time.clock()
+    print("Bvh file loaded in %.3f s" % (time2-time1))
+    return rig
+
+#
+#    buildNodes(clip, scale, rot90):
+#    Nodes of the hierarchy parsed by bvh_data. Returns the root and
+#    the nodes with channels, like readBvhFileLegacy
+#
+
+def buildNodes(clip, scale, rot90):
+    cnodes = []
+    nodes = []
+    firsts = clip.firstChannels()
+    for n,name in enumerate(clip.names):
+        parent = clip.parents[n]
+        node = CNode([None, name], cnodes[parent] if parent >= 0 else None)
+        (x,y,z) = clip.offsets[n]
+        if rot90:
+            node.offset = scale*Vector((x,-z,y))
+        else:
+            node.offset = scale*Vector((x,y,z))
+        node.first = firsts[n]
+        node.modes = bvh_data.channelModes(clip.channels[n], rot90)
+        for (mode, indices) in node.modes:
+            node.channels.append((mode, [(index, sign) for (index, sign, column) in indices]))
+        cnodes.append(node)
+        if not clip.isEndSite(n):
+            nodes.append(node)
+    return (cnodes[0], nodes)
+
+#
+#    addFrames(motion, nodes, rig, scale):
+#    addFrame for all frames at once, one row of motion per frame
+#
+
+def addFrames(motion, nodes, rig, scale):
+    np = bvh_data.np
+    frames = np.arange(1, len(motion)+1, dtype=float)
+    pbones = rig.pose.bones
+    first = True
+    for node in nodes:
+        name = node.name
+        try:
+            pb = pbones[name]
+        except:
+            pb = None
+        if not pb:
+            continue
+        matrix = np.array([list(row) for row in node.matrix])
+        inverse = np.array([list(row) for row in node.inverse])
+        for (mode, indices) in node.modes:
+            if mode == Location:
+                if first:
+                    vecs = np.zeros((len(motion), 3))
+                    for (index, sign, column) in indices:
+                        vecs[:,index] = sign*motion[:,node.first+column]
+                    locs = np.dot(scale*vecs - np.array(node.head), inverse)
+                    insertFCurves(rig, name, 'location', locs, frames)
+                first = False
+            elif mode == Rotation:
+                axes = [axis for (axis, sign, column) in indices]
+                signs = np.array([sign for (axis, sign, column) in indices])
+                columns = [node.first+column for (axis, sign, column) in indices]
+                mats = bvh_data.rotationMatrices(motion[:,columns]*signs, axes)
+                mats = np.matmul(np.matmul(inverse, mats), matrix)
+                quats = bvh_data.matricesToQuaternions(mats)
+                insertFCurves(rig, name, 'rotation_quaternion', quats, frames)
+    return
+
+#
+#    insertFCurves(rig, name, attr, values, frames):
+#    One F-curve per column of values, keyed at frames
+#
+
+def insertFCurves(rig, name, attr, values, frames):
+    if not rig.animation_data:
+        rig.animation_data_create()
+    act = rig.animation_data.action
+    if not act:
+        act = bpy.data.actions.new(rig.name + "Action")
+        rig.animation_data.action = act
+    path = 'pose.bones["%s"].%s' % (name, attr)
+    co = bvh_data.np.empty(2*len(frames))
+    co[0::2] = frames
+    for n in range(values.shape[1]):
+        fcu = act.fcurves.new(path, index=n, action_group=name)
+        co[1::2] = values[:,n]
+        fcu.keyframe_points.add(len(frames))
+        fcu.keyframe_points.foreach_set('co', co.tolist())
+        fcu.update()
+    return
+
+# Per line, used when numpy isn't available
+def readBvhFileLegacy(context, filepath, scn, scan):
     global theTarget
     ensureInited(context)
     scale = scn['MhxBvhScale']
@@ -1881,8 +2025,11 @@ def simplifyFCurves(context, rig, useVisible, useMarkers):
     else:
         (minTime, maxTime) = ('All', 0)
 
-    for fcu in fcurves:
-        simplifyFCurve(fcu, act, scn.MhxErrorLoc, scn.MhxErrorRot, minTime, maxTime)
+    if fcurve_simplify.np is not None:
+        simplifyFCurvesArrays(list(fcurves), act, scn.MhxErrorLoc, scn.MhxErrorRot, minTime, maxTime)
+    else:
+        for fcu in fcurves:
+            simplifyFCurve(fcu, act, scn.MhxErrorLoc, scn.MhxErrorRot, minTime, maxTime)
     setInterpolation(rig)
     print("Curves simplified")
     return
@@ -1891,19 +2038,22 @@ def simplifyFCurves(context, rig, useVisible, useMarkers):
 #    simplifyFCurve(fcu, act, maxErrLoc, maxErrRot, minTime, maxTime):
 #
 
-def simplifyFCurve(fcu, act, maxErrLoc, maxErrRot, minTime, maxTime):
-    #print("WARNING: F-curve simplification turned off")
-    #return
+def getMaxErr(fcu, maxErrLoc, maxErrRot):
     words = fcu.data_path.split('.')
     if words[-1] == 'location':
-        maxErr = maxErrLoc
+        return maxErrLoc
     elif words[-1] == 'rotation_quaternion':
-        maxErr = maxErrRot * math.pi/180
+        return maxErrRot * math.pi/180
     elif words[-1] == 'rotation_euler':
-        maxErr = maxErrRot * math.pi/180
+        return maxErrRot * math.pi/180
     else:
         raise NameError("Unknown FCurve type %s" % words[-1])
 
+def simplifyFCurve(fcu, act, maxErrLoc, maxErrRot, minTime, maxTime):
+    #print("WARNING: F-curve simplification turned off")
+    #return
+    maxErr = getMaxErr(fcu, maxErrLoc, maxErrRot)
+
     if minTime == 'All':
         points = fcu.keyframe_points
         before = []
@@ -1954,6 +2104,42 @@ def simplifyFCurve(fcu, act, maxErrLoc, maxErrRot, minTime, maxTime):
 
     return
 
+#
+#    simplifyFCurvesArrays(fcurves, act, maxErrLoc, maxErrRot, minTime, maxTime):
+#    simplifyFCurve for all F-curves at once
+#
+
+def simplifyFCurvesArrays(fcurves, act, maxErrLoc, maxErrRot, minTime, maxTime):
+    np = fcurve_simplify.np
+    maxErrs = [getMaxErr(fcu, maxErrLoc, maxErrRot) for fcu in fcurves]
+    counts = [len(fcu.keyframe_points) for fcu in fcurves]
+    cos = []
+    for (fcu, count) in zip(fcurves, counts):
+        co = [0.0]*(2*count)
+        fcu.keyframe_points.foreach_get('co', co)
+        cos += co
+    co = np.array(cos).reshape(-1, 2)
+
+    if minTime == 'All':
+        (minTime, maxTime) = (None, None)
+    (keep, changed) = fcurve_simplify.simplifyCurves(co, counts, maxErrs, minTime, maxTime)
+
+    start = 0
+    for (n, fcu) in enumerate(fcurves):
+        end = start + counts[n]
+        if changed[n]:
+            newVerts = co[start:end][keep[start:end]]
+            path = fcu.data_path
+            index = fcu.array_index
+            grp = fcu.group.name
+            act.fcurves.remove(fcu)
+            nfcu = act.fcurves.new(path, index, grp)
+            nfcu.keyframe_points.add(len(newVerts))
+            nfcu.keyframe_points.foreach_set('co', newVerts.ravel().tolist())
+            nfcu.update()
+        start = end
+    return
+
 #
 #    getMarkedTime(scn):
 #
@@ -0,0 +1,309 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+BVH reader with columnar motion storage.
+
+The HIERARCHY is parsed into a node table, and the MOTION block is read
+in one pass into a frames x channels array. Parsed clips are cached on
+disk, so that retargeting a clip again skips the parsing.
+"""
+
+import os
+import math
+import hashlib
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+Location = 1
+Rotation = 2
+
+CacheDir = os.path.join(tempfile.gettempdir(), 'mhx_bvh_cache')
+CacheVersion = 1
+
+#
+#    class CBvhClip:
+#
+
+class CBvhClip:
+    def __init__(self):
+        self.names = []
+        self.parents = []
+        self.offsets = []
+        self.channels = []
+        self.frameTime = 0.0
+        self.motion = None
+        return
+
+    def __repr__(self):
+        return "CBvhClip %d nodes %d frames" % (len(self.names), self.nFrames())
+
+    def nFrames(self):
+        return len(self.motion)
+
+    def nChannels(self):
+        return sum([len(chans) for chans in self.channels])
+
+    def firstChannels(self):
+        #column of the first channel of each node
+        counts = [len(chans) for chans in self.channels]
+        return [sum(counts[:n]) for n in range(len(counts))]
+
+    def isEndSite(self, n):
+        return self.names[n] == 'Site' and n not in self.parents
+
+    def frameFactor(self):
+        #subsample to get 25 fps
+        return max(1, int(1.0/(25*self.frameTime) + 0.49))
+
+    def subsample(self, startFrame, endFrame, subsample):
+        #the frames n with startFrame <= n <= endFrame and n % subsample == 0
+        first = -(-max(startFrame, 0) // subsample) * subsample
+        return self.motion[first:endFrame+1:subsample]
+
+#
+#    parseHierarchy(lines):
+#    readBvh(filepath):
+#
+
+def parseHierarchy(lines):
+    clip = CBvhClip()
+    level = 0
+    node = -1
+    for line in lines:
+        words = line.split()
+        if len(words) == 0:
+            continue
+        key = words[0].upper()
+        if key == 'HIERARCHY':
+            continue
+        elif key in ['ROOT', 'JOINT', 'END']:
+            clip.names.append(' '.join(words[1:]))
+            clip.parents.append(node)
+            clip.offsets.append((0.0, 0.0, 0.0))
+            clip.channels.append(())
+            node = len(clip.names) - 1
+        elif key == 'OFFSET':
+            clip.offsets[node] = (float(words[1]), float(words[2]), float(words[3]))
+        elif key == 'CHANNELS':
+            clip.channels[node] = tuple(words[2:])
+        elif key == '{':
+            level += 1
+        elif key == '}':
+            level -= 1
+            node = clip.parents[node]
+        else:
+            raise NameError("Did not expect %s" % words[0])
+    if level != 0:
+        raise NameError("Tokenizer out of kilter %d" % level)
+    clip.offsets = np.array(clip.offsets, dtype=float).reshape(-1, 3)
+    return clip
+
+def readBvh(filepath):
+    fp = open(filepath, "r")
+    try:
+        lines = []
+        while True:
+            line = fp.readline()
+            if not line:
+                raise NameError("No MOTION in %s" % filepath)
+            if line.split()[:1] and line.split()[0].upper() == 'MOTION':
+                break
+            lines.append(line)
+        clip = parseHierarchy(lines)
+
+        nFrames = None
+        while clip.frameTime == 0.0:
+            words = fp.readline().split()
+            if len(words) == 0:
+                continue
+            key = words[0].upper()
+            if key == 'FRAMES:':
+                nFrames = int(words[1])
+            elif key == 'FRAME' and words[1].upper() == 'TIME:':
+                clip.frameTime = float(words[2])
+            else:
+                raise NameError("Did not expect %s" % words[0])
+        values = np.fromstring(fp.read(), dtype=float, sep=' ')
+    finally:
+        fp.close()
+
+    nChannels = clip.nChannels()
+    if nChannels:
+        count = len(values) // nChannels
+        if nFrames is not None:
+            count = min(count, nFrames)
+        clip.motion = values[:count*nChannels].reshape(count, nChannels)
+    else:
+        clip.motion = np.zeros((nFrames or 0, 0))
+    return clip
+
+#
+#    saveClip(clip, path):
+#    loadClip(path):
+#    loadBvh(filepath, cacheDir):
+#
+
+def saveClip(clip, path):
+    chans = [' '.join(c) for c in clip.channels]
+    tmp = path + '.%d.tmp' % os.getpid()
+    fp = open(tmp, 'wb')
+    try:
+        np.savez(fp, version=CacheVersion, names=np.array(clip.names, dtype=str),
+            parents=np.array(clip.parents, dtype=int), offsets=clip.offsets,
+            channels=np.array(chans, dtype=str), frameTime=clip.frameTime, motion=clip.motion)
+    finally:
+        fp.close()
+    os.replace(tmp, path)
+    return
+
+def loadClip(path):
+    data = np.load(path)
+    try:
+        if int(data['version']) != CacheVersion:
+            return None
+        clip = CBvhClip()
+        clip.names = [str(name) for name in data['names']]
+        clip.parents = [int(n) for n in data['parents']]
+        clip.offsets = data['offsets']
+        clip.channels = [tuple(str(c).split()) for c in data['channels']]
+        clip.frameTime = float(data['frameTime'])
+        clip.motion = data['motion']
+    finally:
+        data.close()
+    return clip
+
+def cachePath(filepath, cacheDir):
+    stat = os.stat(filepath)
+    key = "%s %d %d" % (os.path.realpath(filepath), stat.st_size, stat.st_mtime)
+    return os.path.join(cacheDir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+def loadBvh(filepath, cacheDir=CacheDir):
+    if not cacheDir:
+        return readBvh(filepath)
+    path = cachePath(filepath, cacheDir)
+    if os.path.exists(path):
+        try:
+            clip = loadClip(path)
+            if clip:
+                return clip
+        except Exception as e:
+            print("Ignoring bvh cache %s: %s" % (path, e))
+    clip = readBvh(filepath)
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        saveClip(clip, path)
+    except (IOError, OSError) as e:
+        print("Could not cache %s: %s" % (filepath, e))
+    return clip
+
+#
+#    channelModes(words, rot90):
+#    Groups the channels of a node like readBvhFile does
+#
+
+ChannelYup = {
+    'Xrotation' : ('X', Rotation, +1),
+    'Yrotation' : ('Y', Rotation, +1),
+    'Zrotation' : ('Z', Rotation, +1),
+    'Xposition' : (0, Location, +1),
+    'Yposition' : (1, Location, +1),
+    'Zposition' : (2, Location, +1),
+}
+
+ChannelZup = {
+    'Xrotation' : ('X', Rotation, +1),
+    'Yrotation' : ('Z', Rotation, +1),
+    'Zrotation' : ('Y', Rotation, -1),
+    'Xposition' : (0, Location, +1),
+    'Yposition' : (2, Location, +1),
+    'Zposition' : (1, Location, -1),
+}
+
+def channelModes(words, rot90):
+    #list of (mode, [(index, sign, column)]), columns relative to the node
+    table = ChannelZup if rot90 else ChannelYup
+    modes = []
+    oldmode = None
+    for column,word in enumerate(words):
+        (index, mode, sign) = table[word]
+        if mode != oldmode:
+            indices = []
+            modes.append((mode, indices))
+            oldmode = mode
+        indices.append((index, sign, column))
+    return modes
+
+#
+#    Rotations of all frames at once
+#    rotationMatrices(angles, axes):
+#    matricesToQuaternions(mats):
+#
+
+Deg2Rad = math.pi/180
+
+def axisRotations(angles, axis):
+    c = np.cos(angles)
+    s = np.sin(angles)
+    mats = np.zeros((len(angles), 3, 3))
+    i = 'XYZ'.index(axis)
+    j = (i+1) % 3
+    k = (i+2) % 3
+    mats[:,i,i] = 1
+    mats[:,j,j] = c
+    mats[:,k,k] = c
+    mats[:,j,k] = -s
+    mats[:,k,j] = s
+    return mats
+
+def rotationMatrices(degrees, axes):
+    #mats[0]*mats[1]*mats[2] of addFrame, for each row of degrees
+    mats = None
+    for n,axis in enumerate(axes):
+        mat = axisRotations(degrees[:,n]*Deg2Rad, axis)
+        mats = mat if mats is None else np.matmul(mats, mat)
+    return mats
+
+def matricesToQuaternions(mats):
+    #w, x, y, z like Matrix.to_quaternion
+    m = mats
+    quats = np.empty((len(m), 4))
+    tr = 0.25*(1.0 + m[:,0,0] + m[:,1,1] + m[:,2,2])
+    a = tr > 1e-6
+    b = ~a & (m[:,0,0] > m[:,1,1]) & (m[:,0,0] > m[:,2,2])
+    c = ~a & ~b & (m[:,1,1] > m[:,2,2])
+    d = ~a & ~b & ~c
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.sqrt(tr)
+        quats[a] = np.stack((s, (m[:,2,1] - m[:,1,2])/(4*s), (m[:,0,2] - m[:,2,0])/(4*s),
+            (m[:,1,0] - m[:,0,1])/(4*s)), axis=1)[a]
+        s = 2.0*np.sqrt(1.0 + m[:,0,0] - m[:,1,1] - m[:,2,2])
+        quats[b] = np.stack(((m[:,2,1] - m[:,1,2])/s, 0.25*s, (m[:,0,1] + m[:,1,0])/s,
+            (m[:,0,2] + m[:,2,0])/s), axis=1)[b]
+        s = 2.0*np.sqrt(1.0 + m[:,1,1] - m[:,0,0] - m[:,2,2])
+        quats[c] = np.stack(((m[:,0,2] - m[:,2,0])/s, (m[:,0,1] + m[:,1,0])/s, 0.25*s,
+            (m[:,1,2] + m[:,2,1])/s), axis=1)[c]
+        s = 2.0*np.sqrt(1.0 + m[:,2,2] - m[:,0,0] - m[:,1,1])
+        quats[d] = np.stack(((m[:,1,0] - m[:,0,1])/s, (m[:,0,2] + m[:,2,0])/s,
+            (m[:,1,2] + m[:,2,1])/s, 0.25*s), axis=1)[d]
+    return quats / np.sqrt((quats**2).sum(axis=1))[:,None]
@@ -0,0 +1,135 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Tests of bvh_data on a generated clip, the rotations against the matrix
+products of the old addFrame. Run from this directory with:
+    python bvh_data_test.py
+"""
+
+import os
+import math
+import tempfile
+import unittest
+
+import numpy as np
+
+from bvh_data import (Location, Rotation, Deg2Rad, readBvh, loadBvh,
+    channelModes, rotationMatrices, matricesToQuaternions)
+
+def makeBvh(nFrames, seed=0):
+    rnd = np.random.RandomState(seed)
+    lines = ["HIERARCHY", "ROOT Hips", "{", "\tOFFSET 0.0 0.0 0.0",
+        "\tCHANNELS 6 Xposition Yposition Zposition Zrotation Xrotation Yrotation"]
+    nChannels = 6
+    depth = 1
+    for (name, offset) in [("Left Up Leg", (3.4, 0, 0)), ("LeftLeg", (0, -17.5, 0)), ("LeftFoot", (0, -16.1, 0))]:
+        lines += ["\t"*depth + "JOINT " + name, "\t"*depth + "{",
+            "\t"*(depth+1) + "OFFSET %g %g %g" % offset,
+            "\t"*(depth+1) + "CHANNELS 3 Zrotation Xrotation Yrotation"]
+        nChannels += 3
+        depth += 1
+    lines += ["\t"*depth + "End Site", "\t"*depth + "{", "\t"*(depth+1) + "OFFSET 0 -3 4", "\t"*depth + "}"]
+    for n in range(depth-1, -1, -1):
+        lines.append("\t"*n + "}")
+    motion = np.round(rnd.uniform(-90, 90, (nFrames, nChannels)), 4)
+    lines += ["MOTION", "Frames: %d" % nFrames, "Frame Time: 0.008333"]
+    lines += [" ".join(["%.4f" % x for x in row]) for row in motion]
+    return "\n".join(lines) + "\n", motion
+
+def _legacyRotation(words, axes, signs):
+    #Matrix.Rotation products of addFrame, with lists
+    mat = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for (word, axis, sign) in zip(words, axes, signs):
+        angle = sign*float(word)*Deg2Rad
+        (c, s) = (math.cos(angle), math.sin(angle))
+        i = 'XYZ'.index(axis)
+        (j, k) = ((i+1) % 3, (i+2) % 3)
+        rot = [[0.0]*3 for n in range(3)]
+        rot[i][i] = 1.0
+        rot[j][j] = rot[k][k] = c
+        rot[j][k] = -s
+        rot[k][j] = s
+        mat = [[sum(mat[r][n]*rot[n][col] for n in range(3)) for col in range(3)] for r in range(3)]
+    return mat
+
+class TestBvhData(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        (text, self.motion) = makeBvh(50)
+        self.path = os.path.join(self.dir, 'test.bvh')
+        fp = open(self.path, 'w')
+        fp.write(text)
+        fp.close()
+
+    def tearDown(self):
+        for (root, dirs, files) in os.walk(self.dir, topdown=False):
+            for name in files:
+                os.remove(os.path.join(root, name))
+            os.rmdir(root)
+
+    def testRead(self):
+        clip = readBvh(self.path)
+        self.assertEqual(clip.names, ['Hips', 'Left Up Leg', 'LeftLeg', 'LeftFoot', 'Site'])
+        self.assertEqual(clip.parents, [-1, 0, 1, 2, 3])
+        self.assertTrue(clip.isEndSite(4))
+        self.assertEqual(clip.firstChannels(), [0, 6, 9, 12, 15])
+        np.testing.assert_array_equal(clip.offsets[2], [0, -17.5, 0])
+        np.testing.assert_allclose(clip.motion, self.motion)
+        self.assertEqual(clip.frameFactor(), 5)
+
+    def testSubsample(self):
+        clip = readBvh(self.path)
+        for (start, end, ss) in [(1, 32000, 1), (1, 32000, 5), (7, 20, 3), (0, 0, 2), (10, 49, 4)]:
+            frames = [n for n in range(clip.nFrames()) if n >= start and n <= end and n % ss == 0]
+            np.testing.assert_array_equal(clip.subsample(start, end, ss), clip.motion[frames])
+
+    def testCache(self):
+        cacheDir = os.path.join(self.dir, 'cache')
+        clip = loadBvh(self.path, cacheDir)
+        self.assertEqual(len(os.listdir(cacheDir)), 1)
+        cached = loadBvh(self.path, cacheDir)
+        self.assertEqual(cached.names, clip.names)
+        self.assertEqual(cached.channels, clip.channels)
+        self.assertEqual(cached.frameTime, clip.frameTime)
+        np.testing.assert_array_equal(cached.motion, clip.motion)
+
+    def testRotations(self):
+        clip = readBvh(self.path)
+        for rot90 in [False, True]:
+            modes = channelModes(clip.channels[0], rot90)
+            self.assertEqual([mode for (mode, indices) in modes], [Location, Rotation])
+            indices = modes[1][1]
+            axes = [axis for (axis, sign, column) in indices]
+            signs = np.array([sign for (axis, sign, column) in indices])
+            columns = [column for (axis, sign, column) in indices]
+            mats = rotationMatrices(clip.motion[:,columns]*signs, axes)
+            for (n, row) in enumerate(clip.motion):
+                expected = _legacyRotation(row[columns], axes, signs)
+                np.testing.assert_allclose(mats[n], expected, atol=1e-12)
+
+        quats = matricesToQuaternions(mats)
+        w, x, y, z = quats.T
+        #back to matrices
+        back = np.stack((1-2*(y*y+z*z), 2*(x*y-w*z), 2*(x*z+w*y),
+            2*(x*y+w*z), 1-2*(x*x+z*z), 2*(y*z-w*x),
+            2*(x*z-w*y), 2*(y*z+w*x), 1-2*(x*x+y*y)), axis=1).reshape(-1, 3, 3)
+        np.testing.assert_allclose(back, mats, atol=1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+F-curve simplification with numpy.
+
+The keyframes of many F-curves are simplified in one batch: each pass
+splits every segment between kept keyframes at its worst keyframe, if
+that one is further than the max error from the segment, for all
+segments of all curves at once. This is the Ramer-Douglas-Peucker
+reduction done by iterateFCurves.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#
+#    simplifyKeeps(co, curves, maxErrs, keep):
+#    simplifyCurves(co, counts, maxErrs, minTime, maxTime):
+#
+
+def simplifyKeeps(co, curves, maxErrs, keep):
+    #iterateFCurves on all segments until no keyframe is added.
+    #co are the keyframes of all curves after each other, curves the curve
+    #of each keyframe, keep the initially kept keyframes, including the
+    #first and last keyframe of each curve
+    (x, y) = (co[:,0], co[:,1])
+    maxErr = maxErrs[curves]
+    #only keyframes in segments split in the last pass can be added
+    active = np.flatnonzero(~keep)
+    while len(active):
+        kept = np.flatnonzero(keep)
+        pos = np.searchsorted(kept, active)
+        (n0, n1) = (kept[pos-1], kept[pos])
+        sloped = x[n1] > x[n0]
+        (n, n0, n1) = (active[sloped], n0[sloped], n1[sloped])
+        if len(n) == 0:
+            break
+        dydx = (y[n1]-y[n0])/(x[n1]-x[n0])
+        err = np.abs(y[n] - (y[n0] + dydx*(x[n]-x[n0])))
+
+        #the first worst keyframe of each segment. the keyframes are
+        #sorted, so the segments are runs of equal n0
+        starts = np.flatnonzero(np.r_[True, n0[1:] != n0[:-1]])
+        segments = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(n)]))
+        worstErr = np.maximum.reduceat(err, starts)
+        isWorst = err == worstErr[segments]
+        worst = np.minimum.reduceat(np.where(isWorst, np.arange(len(n)), len(n)), starts)
+        split = worstErr > maxErr[n[worst]]
+        keep[n[worst[split]]] = True
+        active = n[split[segments] & ~keep[n]]
+    return keep
+
+def simplifyCurves(co, counts, maxErrs, minTime=None, maxTime=None):
+    """
+    co: keyframes (time, value) of all curves after each other
+    counts: the number of keyframes of each curve
+    maxErrs: the max error of each curve
+    Keyframes outside [minTime, maxTime] are kept unchanged.
+    Returns the mask of keyframes to keep and the mask of curves that
+    changed. Like simplifyFCurve, curves with no more than two keyframes
+    in the range are not changed, and changed curves loose keyframes
+    that are not on whole frames.
+    """
+    co = np.asarray(co, dtype=float).reshape(-1, 2)
+    counts = np.asarray(counts, dtype=int)
+    maxErrs = np.asarray(maxErrs, dtype=float)
+    curves = np.repeat(np.arange(len(counts)), counts)
+    t = co[:,0]
+    if minTime is None:
+        inside = np.ones(len(co), dtype=bool)
+    else:
+        inside = (t >= minTime) & (t <= maxTime)
+
+    insideCounts = np.bincount(curves[inside], minlength=len(counts))
+    changed = insideCounts > 2
+    points = inside & changed[curves]
+
+    #first and last keyframes in the range of each curve
+    subCurves = curves[points]
+    subKeep = np.zeros(len(subCurves), dtype=bool)
+    if len(subCurves):
+        bounds = np.flatnonzero(subCurves[1:] != subCurves[:-1])
+        subKeep[0] = subKeep[-1] = True
+        subKeep[bounds] = subKeep[bounds+1] = True
+    subKeep = simplifyKeeps(co[points], subCurves, maxErrs, subKeep)
+
+    keep = np.ones(len(co), dtype=bool)
+    keep[points] = subKeep
+    whole = np.abs(t - np.trunc(t)) <= 1e-5
+    keep &= whole | ~changed[curves]
+    return (keep, changed)
@@ -0,0 +1,114 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Tests of fcurve_simplify on random walk curves, against a list port of
+iterateFCurves and simplifyFCurves. Run from this directory with:
+    python fcurve_simplify_test.py
+"""
+
+import unittest
+
+import numpy as np
+
+from fcurve_simplify import simplifyCurves
+
+def _legacyIterate(points, keeps, maxErr):
+    #iterateFCurves, interpolating at the time of each keyframe
+    new = []
+    for edge in range(len(keeps)-1):
+        n0 = keeps[edge]
+        n1 = keeps[edge+1]
+        (x0, y0) = points[n0]
+        (x1, y1) = points[n1]
+        if x1 > x0:
+            dydx = (y1-y0)/(x1-x0)
+            err = 0
+            for n in range(n0+1, n1):
+                (x, y) = points[n]
+                yn = y0 + dydx*(x-x0)
+                if abs(y-yn) > err:
+                    err = abs(y-yn)
+                    worst = n
+            if err > maxErr:
+                new.append(worst)
+    return new
+
+def _legacySimplify(points, maxErr, minTime=None, maxTime=None):
+    #the keyframes simplifyFCurve writes back
+    if minTime is None:
+        (before, inside, after) = ([], points, [])
+    else:
+        before = [co for co in points if co[0] < minTime]
+        inside = [co for co in points if co[0] >= minTime and co[0] <= maxTime]
+        after = [co for co in points if co[0] > maxTime]
+    if len(inside) <= 2:
+        return points
+    keeps = []
+    new = [0, len(inside)-1]
+    while new:
+        keeps += new
+        keeps.sort()
+        new = _legacyIterate(inside, keeps, maxErr)
+    newVerts = before + [inside[n] for n in keeps] + after
+    return [co for co in newVerts if abs(co[0] - int(co[0])) <= 1e-5]
+
+def makeCurves(nCurves, nPoints, seed=0):
+    rnd = np.random.RandomState(seed)
+    curves = []
+    for n in range(nCurves):
+        count = rnd.randint(1, nPoints)
+        t = np.arange(1, count+1, dtype=float)
+        y = np.cumsum(rnd.normal(0, 0.003, count)) + 0.3*np.sin(t/rnd.uniform(5, 40))
+        curves.append(np.stack((t, y), axis=1))
+    return curves
+
+class TestFCurveSimplify(unittest.TestCase):
+    def check(self, curves, maxErrs, minTime=None, maxTime=None):
+        co = np.concatenate(curves)
+        counts = [len(c) for c in curves]
+        (keep, changed) = simplifyCurves(co, counts, maxErrs, minTime, maxTime)
+        start = 0
+        for (n, curve) in enumerate(curves):
+            expected = _legacySimplify(curve.tolist(), maxErrs[n], minTime, maxTime)
+            kept = co[start:start+len(curve)][keep[start:start+len(curve)]]
+            self.assertEqual(kept.tolist(), expected)
+            t = curve[:,0]
+            inside = len(t) if minTime is None else np.sum((t >= minTime) & (t <= maxTime))
+            self.assertEqual(changed[n], inside > 2)
+            start += len(curve)
+
+    def testCurves(self):
+        curves = makeCurves(40, 200)
+        maxErrs = np.linspace(0.001, 0.2, len(curves))
+        self.check(curves, maxErrs)
+        self.check(curves, maxErrs, 30, 90.5)
+
+    def testSmall(self):
+        line = np.array([[1, 0.0], [2, 1.0], [3, 2.0], [4, 3.0]])
+        self.check([line, line[:2], line[:1]], [0.01, 0.01, 0.01])
+        (keep, changed) = simplifyCurves(line, [4], [0.01])
+        self.assertEqual(keep.tolist(), [True, False, False, True])
+        #keyframes between frames are dropped from changed curves
+        halves = np.array([[1, 0.0], [1.5, 5.0], [2, 0.0], [3, 1.0], [4, 0.0]])
+        self.check([halves], [0.1])
+        #flat segments and equal times
+        self.check([np.array([[1, 1.0], [1, 2.0], [2, 1.0], [3, 1.0], [4, 1.0], [5, 3.0]])], [0.1])
+
+if __name__ == '__main__':
+    unittest.main()